@@ -1,473 +1,677 @@
+import asyncio
+import hashlib
 import os
-import requests
+import threading
+import time
 
-import pandas as pd
 import streamlit as st
 import json
-from dataclasses import dataclass, asdict
-from datetime import datetime
+from dataclasses import asdict
+from datetime import date, datetime
 from uuid import uuid4
 
-from src.ai.service import generate_recommendation
-from src.ui import render_mnemo_selectable, render_machine_panel, render_telemetry_panel
+from src.ai.schemas import AiRecommendation
+from src.ai.service import build_recommendation_input
+from src.ui import (
+    get_telemetry_df,
+    render_hierarchy_nav,
+    render_machine_panel,
+    render_mnemo_selectable,
+    render_telemetry_panel,
+)
+from src.hierarchy import HierarchyRollup, HierarchySpec
+from src.mnemo import MnemoLayout
 from src.providers import get_provider
-from src.config_loader import load_config
-
-from src.telemetry.simulator import (
-    TelemetryThresholds,
-    generate_telemetry_df,
-    compute_alarms,
-    summarize_telemetry,
+from src.config_loader import ConfigError, load_config
+from src.erp.client import ErpClient
+from src.jobs.handlers import (
+    AI_RECOMMENDATION, ERP_HISTORY, ERP_INBOX, ERP_SYNC, ERP_UPDATE_STATUS,
+    PRIORITY_BACKGROUND, PRIORITY_INTERACTIVE, make_handlers,
 )
+from src.jobs.queue import JobQueue
+from src.jobs.worker import WorkerPool
+from src.maintenance.requests import OPEN_STATUSES, PRIORITIES, STATUSES, MaintenanceRequest, RequestStore
+from src.observability.profiling import profile_request
+from src.observability.server import serve_from_env
+
+from src.telemetry.thresholds import ThresholdWatcher
+from src.telemetry.view import telemetry_features, telemetry_summary, telemetry_view
 
 
 st.set_page_config(page_title="OEE Shopfloor Mnemo", layout="wide")
 
-config_path = os.environ.get("OEE_CONFIG", "config/basic.yaml")
-cfg = load_config(config_path)
+# замер всей отрисовки; ?profile=cprofile|pyinstrument — профиль этого запроса в data/profiles/
+serve_from_env()
+# st.stop()/st.rerun() прерывают скрипт исключением — замер и профиль закрывает контекстный менеджер
+with profile_request("app.render", mode=st.query_params.get("profile")) as render_trace:
+    config_path = os.environ.get("OEE_CONFIG", "config/basic.yaml")
+    try:
+        # снимок общий на процесс; YAML перечитывается только при изменении файлов-слоёв
+        cfg = load_config(config_path)
+    except ConfigError as e:
+        st.error(f"Ошибка конфигурации ({config_path}): {e}")
+        st.stop()
 
-st.title(f"Мнемосхема цеха — уровень {cfg['level']}")
-st.caption("Уровень оснащения задаётся конфигом. UI одинаковый для BASIC/STANDARD/ADVANCED.")
+    st.title(f"Мнемосхема цеха — уровень {cfg['level']}")
+    st.caption("Уровень оснащения задаётся конфигом. UI одинаковый для BASIC/STANDARD/ADVANCED.")
 
-provider = get_provider(cfg["provider"])
-machines = provider.get_overview()
+    @st.cache_resource(max_entries=1)
+    def _shared_provider(provider_name: str, options_json: str, shift_day: str):
+        # один провайдер (и его пул потоков) на процесс, а не новый на каждый rerun;
+        # окно смены провайдер считает при создании — поэтому день смены входит в ключ
+        return get_provider(provider_name, json.loads(options_json), batch=True)
 
-if not machines:
-    st.error("Провайдер не вернул ни одного станка (machines пуст).")
-    st.stop()
+    # provider_options в снимке уже проверены схемой провайдера
+    options_json = json.dumps(cfg.to_dict()["provider_options"], sort_keys=True, default=str)
+    provider = _shared_provider(cfg["provider"], options_json, date.today().isoformat())
 
-if "selected_machine_id" not in st.session_state:
-    st.session_state.selected_machine_id = machines[0].machine_id
 
-left, right = st.columns([2, 1], gap="large")
+    @st.cache_resource
+    def _threshold_watcher(path: str) -> ThresholdWatcher:
+        # правка секции thresholds в конфиге подхватывается без перезапуска приложения
+        return ThresholdWatcher(path)
 
-with left:
-    st.subheader("Мнемосхема")
-    st.session_state.selected_machine_id = render_mnemo_selectable(
-        machines,
-        st.session_state.selected_machine_id
-    )
-    st.info("Легенда: 🟢 Работает | ⚪ Не в работе | 🔴 Ремонт/ТО. Наведите курсор на станок для подсказки.")
-
-selected_id = st.session_state.selected_machine_id
-selected = next((m for m in machines if m.machine_id == selected_id), None)
-
-if selected is None:
-    st.error(f"Не найден станок с id={selected_id}")
-    st.stop()
-
-df_oee = provider.get_oee_timeseries(selected_id)
-stops = provider.get_stops(selected_id)
-
-def actions_to_list(actions):
-    out = []
-    for a in actions or []:
-        if hasattr(a, "model_dump"):          # pydantic v2
-            out.append(a.model_dump())
-        elif isinstance(a, dict):
-            out.append(a)
-        else:
-            out.append({"title": str(a), "details": None})
-    return out
-
-
-def build_telemetry_hint(machine_obj, cfg: dict, stops_list, economics: dict | None):
-    """
-    Собираем реальные цифры телеметрии (last/max) + статусы alarm/warn/ok.
-    Берём df из session_state тем же ключом, что использует render_telemetry_panel,
-    чтобы AI видел те же данные, что на графике.
-    economics — what-if цифры (можно None).
-    """
-    if not cfg.get("features", {}).get("telemetry", False):
-        return {"status": "DISABLED", "reason": "telemetry feature flag is off", "economics": economics}
-
-    level = cfg.get("level", "BASIC")
-    state = getattr(machine_obj, "state", "RUN")
-
-    cache_key = f"telemetry::{level}::{machine_obj.machine_id}::{state}"
-
-    if cache_key in st.session_state:
-        df = st.session_state[cache_key]
-    else:
-        df = generate_telemetry_df(
-            machine_obj.machine_id,
-            level=level,
-            state=state,
-            minutes=240,
-            step_sec=30
+
+    threshold_watcher = _threshold_watcher(config_path)
+
+    ERP_URL = os.environ.get("ERP_URL", "http://127.0.0.1:8008")
+
+
+    @st.cache_resource
+    def _erp_client(url: str) -> ErpClient:
+        # одна keep-alive сессия на процесс вместо нового соединения на каждый запрос
+        return ErpClient(url)
+
+
+    erp = _erp_client(ERP_URL)
+
+
+    @st.cache_resource
+    def _event_loop() -> asyncio.AbstractEventLoop:
+        # один фоновый цикл asyncio на процесс: asyncio.run создавал и закрывал новый на каждый rerun
+        loop = asyncio.new_event_loop()
+        threading.Thread(target=loop.run_forever, name="app-asyncio", daemon=True).start()
+        return loop
+
+
+    JOBS_DB = os.environ.get("JOBS_DB", "data/jobs.sqlite")
+    REQUESTS_DB = os.environ.get("REQUESTS_DB", "data/maintenance.sqlite")
+    JOB_POLL_SECONDS = 0.5
+
+
+    @st.cache_resource
+    def _request_store(db_path: str) -> RequestStore:
+        # реестр заявок общий для всех сессий и переживает перезапуск
+        return RequestStore(db_path)
+
+
+    @st.cache_resource
+    def _job_pool(db_path: str, erp_url: str, requests_db: str) -> WorkerPool:
+        # AI и ERP — в фоновых воркерах: скрипт только ставит задачи и читает их состояние
+        handlers = make_handlers(_erp_client(erp_url), _request_store(requests_db))
+        return WorkerPool(JobQueue(db_path), handlers, workers=4).start()
+
+
+    request_store = _request_store(REQUESTS_DB)
+    jobs = _job_pool(JOBS_DB, ERP_URL, REQUESTS_DB).queue
+    machines = provider.get_overview()
+
+    if not machines:
+        st.error("Провайдер не вернул ни одного станка (machines пуст).")
+        st.stop()
+
+    if "selected_machine_id" not in st.session_state:
+        st.session_state.selected_machine_id = machines[0].machine_id
+
+    # refresh_seconds > 0: мнемосхема и телеметрия обновляются сами (fragment rerun),
+    # остальная страница — только по действию пользователя
+    refresh_seconds = float(cfg.get("refresh_seconds") or 0)
+    live_fragment = st.fragment(run_every=refresh_seconds or None)
+    mnemo_layout = MnemoLayout.from_config(cfg)
+
+
+    @st.cache_resource
+    def _hierarchy_rollup(path: str) -> HierarchyRollup:
+        # сводки по заводу/цехам/линиям — общие для сессий, обновляются разницей по изменившимся станкам
+        return HierarchyRollup(HierarchySpec.from_config(load_config(path)))
+
+
+    hierarchy = _hierarchy_rollup(config_path)
+    _eco = cfg.get("economics", {})
+    # цена часа простоя станка: план в час × маржа (та же экономика, что в what-if)
+    loss_per_hour = float(_eco.get("planned_units_per_shift", 0) or 0) / float(_eco.get("shift_hours", 8) or 8) \
+        * float(_eco.get("margin_per_unit", 0) or 0)
+
+
+    @live_fragment
+    def live_mnemo():
+        fleet = provider.get_overview()
+        # тревоги по парку отдаёт фоновый сервис (provider: service), если он используется
+        fleet_alarms = getattr(provider, "get_fleet_alarms", None)
+        alarms = fleet_alarms() if fleet_alarms else None
+        hierarchy.sync(fleet, alarms, spec=HierarchySpec.from_config(cfg), loss_per_hour=loss_per_hour)
+        # завод -> цех -> линия: на схеме — станки выбранного узла (готовый список в дереве)
+        scope = render_hierarchy_nav(hierarchy)
+        in_scope = set(hierarchy.tree.node(scope).machines)
+        new_selected = render_mnemo_selectable(
+            [m for m in fleet if m.machine_id in in_scope],
+            st.session_state.selected_machine_id,
+            layout=mnemo_layout,
+            alarms=alarms,
+        )
+        if new_selected != st.session_state.selected_machine_id:
+            # выбор другого станка меняет всю правую панель — нужен полный rerun
+            st.session_state.selected_machine_id = new_selected
+            st.rerun()
+
+
+    left, right = st.columns([2, 1], gap="large")
+
+    with left:
+        st.subheader("Мнемосхема")
+        live_mnemo()
+        st.info(
+            "Легенда: 🟢 Работает | ⚪ Не в работе | 🔴 Ремонт/ТО. "
+            "Наведите курсор на станок для подсказки, щёлкните для выбора."
         )
-        st.session_state[cache_key] = df
-
-    # --- тот же cutoff, что и в UI: после него телеметрия "обрывается" ---
-    cutoff_ts = None
-
-    if state == "DOWN" and getattr(machine_obj, "down_start_ts", None):
-        cutoff_ts = pd.to_datetime(machine_obj.down_start_ts)
-
-    if state == "IDLE" and stops_list:
-        open_stop = next((s for s in stops_list if getattr(s, "end", None) is None), None)
-        if open_stop:
-            cutoff_ts = pd.to_datetime(open_stop.start)
-        else:
-            last_stop = max(stops_list, key=lambda s: s.start, default=None)
-            if last_stop:
-                cutoff_ts = pd.to_datetime(last_stop.start)
-
-    if cutoff_ts is not None:
-        df = df.copy()
-        df.loc[df.index >= cutoff_ts, ["vibration_mm_s", "bearing_temp_c", "motor_current_pu"]] = pd.NA
-
-    # если данных нет — честно
-    cols = ["vibration_mm_s", "bearing_temp_c", "motor_current_pu"]
-    if df[cols].dropna(how="all").empty:
+
+    selected_id = st.session_state.selected_machine_id
+    selected = next((m for m in machines if m.machine_id == selected_id), None)
+
+    if selected is None:
+        st.error(f"Не найден станок с id={selected_id}")
+        st.stop()
+
+    async def _load_selected(machine_id: str):
+        # OEE и остановки — параллельно, а не двумя последовательными запросами
+        return await asyncio.gather(
+            provider.aget_oee_timeseries(machine_id),
+            provider.aget_stops(machine_id),
+        )
+
+    df_oee, stops = asyncio.run_coroutine_threadsafe(_load_selected(selected_id), _event_loop()).result()
+
+    def actions_to_list(actions):
+        out = []
+        for a in actions or []:
+            if hasattr(a, "model_dump"):          # pydantic v2
+                out.append(a.model_dump())
+            elif isinstance(a, dict):
+                out.append(a)
+            else:
+                out.append({"title": str(a), "details": None})
+        return out
+
+
+    def render_ai_partial(box, partial: dict) -> None:
+        """Частичная рекомендация, пока модель ещё пишет (поля появляются по мере прихода)."""
+        decision = partial.get("decision")
+        risk = partial.get("risk")
+        lines = [
+            f"**Решение:** `{decision if decision in ('STOP', 'CONTINUE', 'MONITOR') else '…'}`",
+            f"**Риск:** `{risk if risk in ('LOW', 'MEDIUM', 'HIGH') else '…'}`",
+        ]
+        if partial.get("diagnosis"):
+            lines.append(f"\n**Диагностика:** {partial['diagnosis']}")
+        if partial.get("rationale"):
+            lines.append(f"\n**Обоснование:** {partial['rationale']}")
+        titles = [a.get("title") for a in partial.get("actions") or [] if isinstance(a, dict) and a.get("title")]
+        if titles:
+            lines.append("\n**Действия:** " + "; ".join(titles))
+        box.markdown("\n".join(lines) + " ▌")
+
+
+    def build_telemetry_hint(machine_obj, cfg: dict, stops_list, economics: dict | None):
+        """
+        Собираем реальные цифры телеметрии (last/max) + статусы alarm/warn/ok.
+        Берём df тем же get_telemetry_df, что использует render_telemetry_panel,
+        чтобы AI видел те же данные, что на графике.
+        economics — what-if цифры (можно None).
+        """
+        if not cfg.get("features", {}).get("telemetry", False):
+            return {"status": "DISABLED", "reason": "telemetry feature flag is off", "economics": economics}
+
+        state = getattr(machine_obj, "state", "RUN")
+        # то же представление (отсечка, сводка), что у панели телеметрии: расчёт один на версию данных
+        view = telemetry_view(machine_obj, get_telemetry_df(machine_obj, cfg, provider), stops_list)
+        cutoff_ts = view.cutoff_ts
+
+        # если данных нет — честно
+        if not view.has_data:
+            return {
+                "status": "NO_DATA",
+                "reason": "нет связи/данных или отсечка по состоянию",
+                "cutoff_ts": str(cutoff_ts) if cutoff_ts is not None else None,
+                "state": state,
+                "economics": economics,
+            }
+
+        thr = threshold_watcher.profiles().resolve(machine_obj.machine_id, machine_obj.kind)
+        summary = telemetry_summary(view, thr)
+        # компактные признаки окна (перцентили, наклон, выбросы, время выше порогов, спектр вибрации)
+        features = telemetry_features(view, thr)
+
         return {
-            "status": "NO_DATA",
-            "reason": "нет связи/данных или отсечка по состоянию",
-            "cutoff_ts": str(cutoff_ts) if cutoff_ts is not None else None,
+            "status": "OK",
             "state": state,
+            "cutoff_ts": str(cutoff_ts) if cutoff_ts is not None else None,
+            "last": dict(summary.last),
+            "max": dict(summary.max),
+            "alarms": dict(summary.alarms),
+            "thresholds": asdict(thr),
+            "features": features["channels"],
+            "window_minutes": features["window_minutes"],
+            "sample_step_sec": features["step_sec"],
             "economics": economics,
         }
 
-    thr = TelemetryThresholds()
-    alarms = compute_alarms(df, thr)
-    summary = summarize_telemetry(df)
-
-    vib_max = pd.to_numeric(df["vibration_mm_s"], errors="coerce").max()
-    tmp_max = pd.to_numeric(df["bearing_temp_c"], errors="coerce").max()
-    cur_max = pd.to_numeric(df["motor_current_pu"], errors="coerce").max()
-
-    vib_last = summary.get("vibration_last")
-    tmp_last = summary.get("temp_last")
-    cur_last = summary.get("current_last")
-
-    def _to_float(x):
-        return None if pd.isna(x) else float(x)
-
-    return {
-        "status": "OK",
-        "state": state,
-        "cutoff_ts": str(cutoff_ts) if cutoff_ts is not None else None,
-        "last": {
-            "vibration_mm_s": _to_float(vib_last),
-            "bearing_temp_c": _to_float(tmp_last),
-            "motor_current_pu": _to_float(cur_last),
-        },
-        "max": {
-            "vibration_mm_s": _to_float(vib_max),
-            "bearing_temp_c": _to_float(tmp_max),
-            "motor_current_pu": _to_float(cur_max),
-        },
-        "alarms": alarms,
-        "thresholds": {
-            "vibration_warn": thr.vibration_warn,
-            "vibration_alarm": thr.vibration_alarm,
-            "temp_warn": thr.temp_warn,
-            "temp_alarm": thr.temp_alarm,
-            "current_warn": thr.current_warn,
-            "current_alarm": thr.current_alarm,
-        },
-        "window_minutes": 240,
-        "sample_step_sec": 30,
-        "economics": economics,
-    }
-@dataclass
-class MaintenanceRequest:
-    request_id: str
-    created_at: str
-    machine_id: str
-    machine_name: str
-    priority: str
-    recommended_action: str
-    reason: str
-    oee_percent: float | None
-    stops_count: int | None
-    telemetry_status: str
-    telemetry_last: dict
-    telemetry_max: dict
-    alarms: dict
-    estimated_loss: float | None
-    currency: str | None
-    ai: dict
-    payload_for_erp: dict
-
-
-def _infer_priority(telemetry_hint: dict | None, rec) -> str:
-    # CRITICAL если есть alarm, иначе HIGH если warn, иначе MEDIUM
-    if not telemetry_hint or telemetry_hint.get("status") != "OK":
+
+    def _infer_priority(telemetry_hint: dict | None, rec) -> str:
+        # CRITICAL если есть alarm, иначе HIGH если warn, иначе MEDIUM
+        if not telemetry_hint or telemetry_hint.get("status") != "OK":
+            return "MEDIUM"
+        alarms = telemetry_hint.get("alarms", {})
+        if any(v == "alarm" for v in alarms.values()):
+            return "CRITICAL"
+        if any(v == "warn" for v in alarms.values()):
+            return "HIGH"
         return "MEDIUM"
-    alarms = telemetry_hint.get("alarms", {})
-    if any(v == "alarm" for v in alarms.values()):
-        return "CRITICAL"
-    if any(v == "warn" for v in alarms.values()):
-        return "HIGH"
-    return "MEDIUM"
 
 
-with right:
-    st.subheader("Панель анализа")
-    render_machine_panel(selected, df_oee, stops)
+    with right:
+        st.subheader("Панель анализа")
+        render_machine_panel(selected, df_oee, stops)
+
+        # телеметрия (если включена) — обновляется вместе с мнемосхемой
+        if cfg.get("features", {}).get("telemetry", False):
+            st.divider()
+
+            @live_fragment
+            def live_telemetry():
+                machine_now = provider.get_overview_many([selected_id])[0]
+                stops_now = provider.get_stops(selected_id)
+                thr_now = threshold_watcher.profiles().resolve(machine_now.machine_id, machine_now.kind)
+                view_now = telemetry_view(machine_now, get_telemetry_df(machine_now, cfg, provider), stops_now)
+                render_telemetry_panel(machine_now, cfg, stops_now, thresholds=thr_now, view=view_now)
 
-    # телеметрия (если включена)
-    if cfg.get("features", {}).get("telemetry", False):
+            live_telemetry()
+
+        # --- AI ---
         st.divider()
-        render_telemetry_panel(selected, cfg, stops)
+        st.subheader("AI-рекомендации (DEMO)")
 
-    # --- AI ---
-    st.divider()
-    st.subheader("AI-рекомендации (DEMO)")
-
-    if "ai_result" not in st.session_state:
-        st.session_state.ai_result = None
-    if "ai_error" not in st.session_state:
-        st.session_state.ai_error = None
-
-    st.subheader("What-if: простой / потери")
-
-    eco = cfg.get("economics", {})
-    planned_units = float(eco.get("planned_units_per_shift", 0) or 0)
-    shift_hours = float(eco.get("shift_hours", 8) or 8)
-    margin = float(eco.get("margin_per_unit", 0) or 0)
-    currency = eco.get("currency", "USD")
-
-    hours_stop = st.number_input("Если остановить на (часов)", min_value=0.0, value=2.0, step=0.5)
-    units_per_hour = (planned_units / shift_hours) if shift_hours > 0 else 0.0
-    estimated_loss = units_per_hour * margin * hours_stop
-
-    c1, c2, c3 = st.columns(3)
-    c1.metric("План/смена", f"{planned_units:,.0f} шт")
-    c2.metric("Производительность", f"{units_per_hour:,.0f} шт/ч")
-    c3.metric("Потери (what-if)", f"{estimated_loss:,.2f} {currency}")
-
-    economics = {
-        "planned_units_per_shift": planned_units,
-        "shift_hours": shift_hours,
-        "margin_per_unit": margin,
-        "currency": currency,
-        "what_if_stop_hours": hours_stop,
-        "units_per_hour": units_per_hour,
-        "estimated_loss": estimated_loss,
-    }
-
-    if st.button("Сгенерировать рекомендации", use_container_width=True):
-        st.session_state.ai_error = None
-        try:
-            telemetry_hint = build_telemetry_hint(selected, cfg, stops, economics)
-
-            st.session_state.ai_result = generate_recommendation(
-                machine=selected,
-                df_oee=df_oee,
-                stops=stops,
-                cfg=cfg,
-                telemetry_hint=telemetry_hint,  # ✅ реальные цифры + экономика
-            )
-        except Exception as e:
+        if "ai_result" not in st.session_state:
             st.session_state.ai_result = None
-            st.session_state.ai_error = str(e)
+        if "ai_error" not in st.session_state:
+            st.session_state.ai_error = None
+
+        st.subheader("What-if: простой / потери")
+
+        eco = cfg.get("economics", {})
+        planned_units = float(eco.get("planned_units_per_shift", 0) or 0)
+        shift_hours = float(eco.get("shift_hours", 8) or 8)
+        margin = float(eco.get("margin_per_unit", 0) or 0)
+        currency = eco.get("currency", "USD")
+
+        hours_stop = st.number_input("Если остановить на (часов)", min_value=0.0, value=2.0, step=0.5)
+        units_per_hour = (planned_units / shift_hours) if shift_hours > 0 else 0.0
+        estimated_loss = units_per_hour * margin * hours_stop
+
+        c1, c2, c3 = st.columns(3)
+        c1.metric("План/смена", f"{planned_units:,.0f} шт")
+        c2.metric("Производительность", f"{units_per_hour:,.0f} шт/ч")
+        c3.metric("Потери (what-if)", f"{estimated_loss:,.2f} {currency}")
+
+        economics = {
+            "planned_units_per_shift": planned_units,
+            "shift_hours": shift_hours,
+            "margin_per_unit": margin,
+            "currency": currency,
+            "what_if_stop_hours": hours_stop,
+            "units_per_hour": units_per_hour,
+            "estimated_loss": estimated_loss,
+        }
 
-    if st.session_state.ai_error:
-        st.error(st.session_state.ai_error)
+        # очередь общая на процесс: ключи задач ИИ этой сессии начинаются с её id
+        ai_key_prefix = f"ai:{st.session_state.setdefault('session_id', uuid4().hex)}:"
 
-    if st.session_state.ai_result:
-        rec = st.session_state.ai_result
-        st.markdown(
-            f"""**Решение:** `{rec.decision}`
+        # рекомендация относится к станку, для которого её запросили: при смене станка —
+        # сброс и отмена незаконченной генерации (воркер закроет поток к API)
+        if st.session_state.get("ai_machine_id") != selected_id:
+            old_job = jobs.get(st.session_state.ai_job_id) if st.session_state.get("ai_job_id") else None
+            if old_job is not None and (old_job.dedup_key or "").startswith(ai_key_prefix):
+                jobs.cancel(old_job.job_id)
+            st.session_state.ai_job_id = None
+            st.session_state.ai_result = None
+            st.session_state.ai_error = None
+            st.session_state.ai_machine_id = selected_id
+
+        if st.button("Сгенерировать рекомендации", use_container_width=True):
+            st.session_state.ai_error = None
+            st.session_state.ai_result = None
+            try:
+                telemetry_hint = build_telemetry_hint(selected, cfg, stops, economics)
+                payload = {
+                    "machine_id": selected_id,
+                    "input": build_recommendation_input(selected, df_oee, stops, cfg, telemetry_hint),
+                    "stream": cfg.get("features", {}).get("ai_streaming", True),
+                }
+                digest = hashlib.sha1(json.dumps(payload, sort_keys=True, default=str).encode("utf-8")).hexdigest()
+                job = jobs.enqueue(
+                    AI_RECOMMENDATION,
+                    payload,
+                    # повторный щелчок с теми же входами — та же задача; другие сессии и what-if — свои
+                    dedup_key=f"{ai_key_prefix}{selected_id}:{digest[:16]}",
+                    priority=PRIORITY_INTERACTIVE,
+                    max_attempts=2,
+                )
+                st.session_state.ai_job_id = job.job_id
+            except Exception as e:
+                st.session_state.ai_error = str(e)
+
+        ai_job = jobs.get(st.session_state.ai_job_id) if st.session_state.get("ai_job_id") else None
+        if ai_job is not None and not ai_job.active:
+            # задача завершилась — результат в состояние сессии (заявка на ТО берёт его отсюда)
+            if ai_job.status == "DONE":
+                st.session_state.ai_result = AiRecommendation.model_validate(ai_job.result)
+            elif ai_job.status == "FAILED":
+                st.session_state.ai_error = ai_job.error
+            elif ai_job.status == "CANCELLED":
+                st.session_state.ai_error = "Генерация рекомендаций отменена. Нажмите кнопку ещё раз."
+            st.session_state.ai_job_id = None
+        elif ai_job is not None:
+            @st.fragment(run_every=JOB_POLL_SECONDS)
+            def ai_job_progress():
+                job = jobs.get(st.session_state.ai_job_id)
+                if job is None or not job.active:
+                    st.rerun()  # готово — полная перерисовка (рекомендация, заявка на ТО)
+                if job.partial:
+                    render_ai_partial(st.empty(), job.partial)
+                else:
+                    attempt = f" (попытка {job.attempts + 1}/{job.max_attempts})" if job.error else ""
+                    st.caption(("⏳ Генерация рекомендаций…" if job.status == "RUNNING" else "⏳ В очереди…") + attempt)
+
+            ai_job_progress()
+
+        if st.session_state.ai_error:
+            st.error(st.session_state.ai_error)
+
+        if st.session_state.ai_result:
+            rec = st.session_state.ai_result
+            st.markdown(
+                f"""**Решение:** `{rec.decision}`
 **Риск:** `{rec.risk}`
 
 **Диагностика:** {rec.diagnosis}
 
 **Обоснование:** {rec.rationale}
 """
-        )
+            )
 
-        if rec.cost_impact:
-            st.info(rec.cost_impact)
-
-        if rec.actions:
-            st.write("**Действия:**")
-            for a in rec.actions:
-                st.write(f"- **{a.title}**" + (f": {a.details}" if a.details else ""))
-
-        if rec.next_check:
-            st.caption(f"Если продолжаем: {rec.next_check}")
-
-st.divider()
-st.subheader("Заявка на ТО (DEMO)")
-
-if "maintenance_requests" not in st.session_state:
-    st.session_state.maintenance_requests = []
-
-can_create = st.session_state.get("ai_result") is not None
-
-if not can_create:
-    st.info("Сначала сгенерируйте AI-рекомендации — они попадут в заявку.")
-else:
-    rec = st.session_state.ai_result
-
-    # telemetry_hint уже считали при генерации рекомендаций, но на всякий случай пересчитаем так же
-    telemetry_hint = build_telemetry_hint(selected, cfg, stops, economics)
-
-    default_priority = _infer_priority(telemetry_hint, rec)
-
-    with st.form("maintenance_request_form"):
-        priority = st.selectbox("Приоритет", ["LOW", "MEDIUM", "HIGH", "CRITICAL"],
-                                index=["LOW","MEDIUM","HIGH","CRITICAL"].index(default_priority))
-        work_type = st.selectbox("Тип работ", ["Диагностика", "Плановое ТО", "Ремонт", "Замена подшипника", "Проверка вибрации"])
-        comment = st.text_area("Комментарий мастера (опционально)", placeholder="Например: проверить крепёж/подшипник, снять тренд вибрации...")
-
-        submit = st.form_submit_button("Создать заявку ТО", use_container_width=True)
-
-    if submit:
-        req = MaintenanceRequest(
-            request_id=f"MR-{uuid4().hex[:8].upper()}",
-            created_at=datetime.now().isoformat(timespec="seconds"),
-            machine_id=selected.machine_id,
-            machine_name=getattr(selected, "name", selected.machine_id),
-            priority=priority,
-            recommended_action=getattr(rec, "decision", "SCHEDULE_MAINTENANCE"),
-            reason=f"{work_type}. {comment}".strip(),
-            oee_percent=getattr(selected, "oee_percent", None),
-            stops_count=getattr(selected, "stops_count", None),
-            telemetry_status=telemetry_hint.get("status") if telemetry_hint else "UNKNOWN",
-            telemetry_last=(telemetry_hint.get("last") if telemetry_hint else {}),
-            telemetry_max=(telemetry_hint.get("max") if telemetry_hint else {}),
-            alarms=(telemetry_hint.get("alarms") if telemetry_hint else {}),
-            estimated_loss=(economics.get("estimated_loss") if economics else None),
-            currency=(economics.get("currency") if economics else None),
-            ai={
-                "decision": getattr(rec, "decision", None),
-                "risk": getattr(rec, "risk", None),
-                "diagnosis": getattr(rec, "diagnosis", None),
-                "rationale": getattr(rec, "rationale", None),
-                "actions": [a.model_dump() for a in getattr(rec, "actions", [])],
-                "next_check": getattr(rec, "next_check", None),
-                "cost_impact": getattr(rec, "cost_impact", None),
-            },
-            payload_for_erp={
-                "system": "1C",
-                "doc_type": "maintenance_request",
-                "machine_id": selected.machine_id,
-                "priority": priority,
-                "work_type": work_type,
-                "comment": comment,
-                "telemetry": telemetry_hint,
-                "economics": economics,
-            }
-        )
+            if rec.cost_impact:
+                st.info(rec.cost_impact)
+
+            if rec.actions:
+                st.write("**Действия:**")
+                for a in rec.actions:
+                    st.write(f"- **{a.title}**" + (f": {a.details}" if a.details else ""))
+
+            if rec.next_check:
+                st.caption(f"Если продолжаем: {rec.next_check}")
+
+    st.divider()
+    st.subheader("Заявка на ТО (DEMO)")
 
-        st.session_state.maintenance_requests.insert(0, req)
+    # в сессии — только id заявок, созданных здесь; сами заявки — в общем реестре
+    if "maintenance_requests" not in st.session_state:
+        st.session_state.maintenance_requests = []
 
-        st.success(f"Заявка создана: {req.request_id}")
+    can_create = st.session_state.get("ai_result") is not None
 
-    if st.session_state.maintenance_requests:
-        last_req = st.session_state.maintenance_requests[0]
-        st.markdown(f"**Последняя заявка:** `{last_req.request_id}` • {last_req.created_at}")
+    if not can_create:
+        st.info("Сначала сгенерируйте AI-рекомендации — они попадут в заявку.")
+    else:
+        rec = st.session_state.ai_result
 
-        st.write("**Кратко:**")
-        st.write(f"- Станок: **{last_req.machine_name}** (`{last_req.machine_id}`)")
-        st.write(f"- Приоритет: **{last_req.priority}**")
-        st.write(f"- Решение: `{last_req.recommended_action}` • Риск: `{last_req.ai.get('risk')}`")
-        if last_req.estimated_loss is not None and last_req.currency:
-            st.write(f"- What-if потери: **{last_req.estimated_loss:,.2f} {last_req.currency}**")
+        # telemetry_hint уже считали при генерации рекомендаций, но на всякий случай пересчитаем так же
+        telemetry_hint = build_telemetry_hint(selected, cfg, stops, economics)
 
-        with st.expander("JSON заявки (для интеграции/1С)"):
-            st.code(json.dumps(asdict(last_req), ensure_ascii=False, indent=2), language="json")
+        default_priority = _infer_priority(telemetry_hint, rec)
 
-ERP_URL = os.environ.get("ERP_URL", "http://127.0.0.1:8008")
+        with st.form("maintenance_request_form"):
+            priority = st.selectbox("Приоритет", list(PRIORITIES), index=PRIORITIES.index(default_priority))
+            work_type = st.selectbox(
+                "Тип работ", ["Диагностика", "Плановое ТО", "Ремонт", "Замена подшипника", "Проверка вибрации"]
+            )
+            comment = st.text_area(
+                "Комментарий мастера (опционально)",
+                placeholder="Например: проверить крепёж/подшипник, снять тренд вибрации...",
+            )
 
-st.divider()
-st.subheader("Интеграция с ERP/1С (MOCK API)")
+            submit = st.form_submit_button("Создать заявку ТО", use_container_width=True)
+
+        if submit:
+            req = MaintenanceRequest(
+                request_id=f"MR-{uuid4().hex[:8].upper()}",
+                created_at=datetime.now().isoformat(timespec="seconds"),
+                machine_id=selected.machine_id,
+                machine_name=getattr(selected, "name", selected.machine_id),
+                priority=priority,
+                recommended_action=getattr(rec, "decision", "SCHEDULE_MAINTENANCE"),
+                reason=f"{work_type}. {comment}".strip(),
+                oee_percent=getattr(selected, "oee_percent", None),
+                stops_count=getattr(selected, "stops_count", None),
+                telemetry_status=telemetry_hint.get("status") if telemetry_hint else "UNKNOWN",
+                telemetry_last=(telemetry_hint.get("last") if telemetry_hint else {}),
+                telemetry_max=(telemetry_hint.get("max") if telemetry_hint else {}),
+                alarms=(telemetry_hint.get("alarms") if telemetry_hint else {}),
+                estimated_loss=(economics.get("estimated_loss") if economics else None),
+                currency=(economics.get("currency") if economics else None),
+                ai={
+                    "decision": getattr(rec, "decision", None),
+                    "risk": getattr(rec, "risk", None),
+                    "diagnosis": getattr(rec, "diagnosis", None),
+                    "rationale": getattr(rec, "rationale", None),
+                    "actions": [a.model_dump() for a in getattr(rec, "actions", [])],
+                    "next_check": getattr(rec, "next_check", None),
+                    "cost_impact": getattr(rec, "cost_impact", None),
+                },
+                payload_for_erp={
+                    "system": "1C",
+                    "doc_type": "maintenance_request",
+                    "machine_id": selected.machine_id,
+                    "priority": priority,
+                    "work_type": work_type,
+                    "comment": comment,
+                    "telemetry": telemetry_hint,
+                    "economics": economics,
+                }
+            )
 
-st.caption(f"ERP endpoint: {ERP_URL}")
+            request_store.add(req, line_id=getattr(selected, "line_id", None))
+            st.session_state.maintenance_requests.insert(0, req.request_id)
+            # в ERP заявка уйдёт синхронизацией реестра (фоновая задача, с повторами)
+            jobs.enqueue(ERP_SYNC, {}, dedup_key="erp.sync", priority=PRIORITY_INTERACTIVE, max_attempts=5)
 
-if st.session_state.get("maintenance_requests"):
-    last_req = st.session_state.maintenance_requests[0]
+            st.success(f"Заявка создана: {req.request_id}")
 
-    colA, colB = st.columns([1, 1])
-    with colA:
-        send = st.button("Отправить заявку в ERP", use_container_width=True)
+        if st.session_state.maintenance_requests:
+            last_req = request_store.get(st.session_state.maintenance_requests[0])
+            st.markdown(f"**Последняя заявка:** `{last_req.request_id}` • {last_req.created_at}")
 
-    if send:
-        try:
-            payload = last_req.payload_for_erp  # dict
-
-            # минимально приведём к ожидаемому формату API:
-            body = {
-                "request_id": last_req.request_id,
-                "created_at": last_req.created_at,
-                "machine_id": last_req.machine_id,
-                "priority": last_req.priority,
-                "work_type": payload.get("work_type", "Диагностика"),
-                "comment": payload.get("comment", ""),
-                "telemetry": payload.get("telemetry", {}),
-                "economics": payload.get("economics", {}),
-                "ai": last_req.ai,
-            }
+            st.write("**Кратко:**")
+            st.write(f"- Станок: **{last_req.machine_name}** (`{last_req.machine_id}`)")
+            st.write(f"- Приоритет: **{last_req.priority}**")
+            st.write(f"- Решение: `{last_req.recommended_action}` • Риск: `{last_req.ai.get('risk')}`")
+            if last_req.estimated_loss is not None and last_req.currency:
+                st.write(f"- What-if потери: **{last_req.estimated_loss:,.2f} {last_req.currency}**")
 
-            r = requests.post(f"{ERP_URL}/api/v1/maintenance_requests", json=body, timeout=8)
-            r.raise_for_status()
-            resp = r.json()
+            with st.expander("JSON заявки (для интеграции/1С)"):
+                st.code(json.dumps(asdict(last_req), ensure_ascii=False, indent=2), language="json")
 
-            st.success(f"Отправлено в ERP ✅ ERP_ID = {resp.get('erp_id')}")
-        except Exception as e:
-            st.error(f"Не удалось отправить в ERP: {e}")
+    st.divider()
+    st.subheader("Реестр заявок (все станки)")
+
+    # счётчики и выборки считает SQLite по индексам реестра — без загрузки всех заявок в память
+    open_critical = request_store.open_critical_by_line()
+    if open_critical:
+        cols = st.columns(min(len(open_critical), 6))
+        for col, (line_id, n) in zip(cols, sorted(open_critical.items(), key=lambda kv: str(kv[0]))):
+            col.metric(f"Открытые CRITICAL • {line_id or 'без линии'}", n)
+    else:
+        st.caption("Открытых CRITICAL-заявок нет.")
+
+    f1, f2, f3, f4 = st.columns(4)
+    # станок — полем ввода: список всех machine_id парка пересылался бы в браузер на каждом rerun
+    flt_text = f1.text_input("Станок", key="mr_filter_machine", placeholder="machine_id через запятую")
+    flt_machines = [m.strip() for m in flt_text.split(",") if m.strip()]
+    flt_priority = f2.multiselect("Приоритет", list(PRIORITIES), key="mr_filter_priority")
+    flt_status = f3.multiselect("Статус", list(STATUSES), default=list(OPEN_STATUSES), key="mr_filter_status")
+    flt_limit = f4.selectbox("Показать", [20, 50, 200], key="mr_filter_limit")
+    registry = request_store.listing(
+        machine_id=flt_machines or None,
+        priority=flt_priority or None,
+        status=flt_status or None,
+        limit=flt_limit,
+    )
+    if registry.empty:
+        st.caption("По фильтрам заявок нет.")
+    else:
+        st.dataframe(
+            registry[["request_id", "created_at", "machine_name", "line_id", "priority", "status",
+                      "recommended_action", "estimated_loss", "erp_id", "sync_state"]],
+            hide_index=True, use_container_width=True,
+        )
+
+    st.divider()
+    st.subheader("Интеграция с ERP/1С (MOCK API)")
+
+    st.caption(f"ERP endpoint: {ERP_URL}")
+
+    ERP_REFRESH_SECONDS = 10.0
+    # задачи ERP этой отрисовки, которые ещё выполняются, — их ждёт опрос внизу секции
+    erp_pending = []
+
+
+    def _erp_job_state(job, done, failed: str) -> None:
+        """Состояние задачи ERP: результат, ошибка или «выполняется»."""
+        if job is None:
+            return
+        if job.status == "DONE":
+            done(job.result)
+        elif job.status == "FAILED":
+            st.error(f"{failed}: {job.error}")
+        elif job.active:
+            erp_pending.append(job)
+            retry = f" (повтор {job.attempts + 1}/{job.max_attempts}: {job.error})" if job.error else ""
+            st.caption(f"⏳ {'выполняется' if job.status == 'RUNNING' else 'в очереди'}…{retry}")
+
+
+    # синхронизация реестра с ERP: после создания заявки, по кнопке и фоном не реже раза в ERP_REFRESH_SECONDS
+    sync_job = jobs.latest("erp.sync")
+    sync_counts = request_store.sync_summary()
+    if (sync_counts["PENDING"] or sync_counts["ERROR"] or sync_counts["OPEN_SYNCED"]) and (
+        sync_job is None or (not sync_job.active and sync_job.created_at < time.time() - ERP_REFRESH_SECONDS)
+    ):
+        sync_job = jobs.enqueue(ERP_SYNC, {}, dedup_key="erp.sync", priority=PRIORITY_BACKGROUND, max_attempts=3)
+
+    colA, colB = st.columns([1, 1])
+    with colA:
+        st.write(
+            f"Реестр: открыто в ERP **{sync_counts['OPEN_SYNCED']}**, "
+            f"ждут отправки **{sync_counts['PENDING']}**, с ошибкой **{sync_counts['ERROR']}**"
+        )
+        if st.button("Синхронизировать с ERP", use_container_width=True):
+            sync_job = jobs.enqueue(ERP_SYNC, {}, dedup_key="erp.sync", priority=PRIORITY_INTERACTIVE, max_attempts=5)
+        _erp_job_state(
+            sync_job,
+            lambda res: st.caption(
+                f"Последняя синхронизация: отправлено {res['pushed']}, ошибок {res['failed']}, "
+                f"сверено статусов {res['refreshed']}"
+            ),
+            "Синхронизация с ERP не удалась",
+        )
 
     with colB:
         if st.button("Показать inbox ERP", use_container_width=True):
+            st.session_state.erp_inbox_job = jobs.enqueue(
+                ERP_INBOX, {}, dedup_key="erp.inbox", priority=PRIORITY_INTERACTIVE, max_attempts=1
+            ).job_id
+        if st.session_state.get("erp_inbox_job"):
+            _erp_job_state(jobs.get(st.session_state.erp_inbox_job), st.json, "Не удалось прочитать inbox")
+
+    if not st.session_state.get("maintenance_requests"):
+        st.info("Заявок ещё нет — сначала создайте заявку ТО.")
+
+    # статус, смена статуса и история — только когда есть заявка этой сессии
+    last_req = (
+        request_store.get(st.session_state.maintenance_requests[0])
+        if st.session_state.maintenance_requests else None
+    )
+    if last_req is not None:
+        st.subheader("Статус заявки (в ERP)")
+
+        # статус — из реестра: его сверяет с ERP синхронизация и смена статуса
+        try:
+            if last_req.sync_state == "SYNCED":
+                current_status = last_req.status
+                st.write(f"Текущий статус: **{current_status}** (ERP_ID: `{last_req.erp_id}`)")
+            elif last_req.sync_state == "ERROR":
+                raise RuntimeError(last_req.sync_error)
+            else:
+                current_status = "—"
+                st.caption("⏳ Заявка ждёт отправки в ERP…")
+        except Exception as e:
+            current_status = "—"
+            st.error(f"ERP недоступен: {e}")
+
+        # смена статуса
+        new_status = st.selectbox("Установить статус", ["NEW", "IN_PROGRESS", "DONE", "CANCELLED"], index=0)
+        note = st.text_input("Комментарий к статусу (опционально)", value="")
+
+        if st.button("Обновить статус в ERP", use_container_width=True):
             try:
-                r = requests.get(f"{ERP_URL}/api/v1/inbox", timeout=6)
-                r.raise_for_status()
-                st.json(r.json())
+                job = jobs.enqueue(
+                    ERP_UPDATE_STATUS,
+                    {"request_id": last_req.request_id, "status": new_status, "note": note or None},
+                    dedup_key=f"erp.update_status:{last_req.request_id}",
+                    priority=PRIORITY_INTERACTIVE,
+                    max_attempts=3,
+                )
+                if job.payload.get("status") != new_status:
+                    st.warning(f"Предыдущая смена статуса ({job.payload.get('status')}) ещё выполняется")
+                st.session_state.erp_update_job = job.job_id
             except Exception as e:
-                st.error(f"Не удалось прочитать inbox: {e}")
-else:
-    st.info("Заявок ещё нет — сначала создайте заявку ТО.")
-
-if st.session_state.maintenance_requests:
-    last_req = st.session_state.maintenance_requests[0]
-
-st.subheader("Статус заявки (в ERP)")
-
-# подтянуть текущий статус из ERP
-try:
-    r = requests.get(f"{ERP_URL}/api/v1/maintenance_requests/{last_req.request_id}", timeout=6)
-    if r.status_code == 200:
-        doc = r.json()
-        current_status = doc.get("status", "NEW")
-        st.write(f"Текущий статус: **{current_status}** (ERP_ID: `{doc.get('erp_id')}`)")
-    else:
-        current_status = "—"
-        st.caption("Заявка ещё не отправлена в ERP (или не найдена).")
-        doc = None
-except Exception as e:
-    current_status = "—"
-    doc = None
-    st.error(f"ERP недоступен: {e}")
-
-# смена статуса
-new_status = st.selectbox("Установить статус", ["NEW", "IN_PROGRESS", "DONE", "CANCELLED"], index=0)
-note = st.text_input("Комментарий к статусу (опционально)", value="")
-
-if st.button("Обновить статус в ERP", use_container_width=True):
-    try:
-        rr = requests.patch(
-            f"{ERP_URL}/api/v1/maintenance_requests/{last_req.request_id}/status",
-            json={"status": new_status, "note": note or None},
-            timeout=6,
-        )
-        rr.raise_for_status()
-        st.success(f"Статус обновлён: {new_status}")
-    except Exception as e:
-        st.error(f"Не удалось обновить статус: {e}")
+                st.error(f"Не удалось обновить статус: {e}")
 
-# история
-if st.button("Показать историю статусов", use_container_width=True):
-    try:
-        rr = requests.get(f"{ERP_URL}/api/v1/maintenance_requests/{last_req.request_id}/history", timeout=6)
-        rr.raise_for_status()
-        st.json(rr.json())
-    except Exception as e:
-        st.error(f"Не удалось получить историю: {e}")
+        if st.session_state.get("erp_update_job"):
+            _erp_job_state(
+                jobs.get(st.session_state.erp_update_job),
+                lambda doc: st.success(f"Статус обновлён: {(doc or {}).get('status', new_status)}"),
+                "Не удалось обновить статус",
+            )
+
+        # история
+        if st.button("Показать историю статусов", use_container_width=True):
+            try:
+                st.session_state.erp_history_job = jobs.enqueue(
+                    ERP_HISTORY, {"request_id": last_req.request_id}, dedup_key=f"erp.history:{last_req.request_id}",
+                    priority=PRIORITY_INTERACTIVE, max_attempts=1,
+                ).job_id
+            except Exception as e:
+                st.error(f"Не удалось получить историю: {e}")
 
+        if st.session_state.get("erp_history_job"):
+            _erp_job_state(jobs.get(st.session_state.erp_history_job), st.json, "Не удалось получить историю")
 
+    if erp_pending:
+        @st.fragment(run_every=JOB_POLL_SECONDS)
+        def erp_jobs_progress():
+            # ждём задачи ERP без блокировки страницы; все завершились — полная перерисовка
+            if not any(job is not None and job.active for job in (jobs.get(j.job_id) for j in erp_pending)):
+                st.rerun()
 
+        erp_jobs_progress()
 
+if render_trace.path is not None:
+    st.caption(f"Профиль отрисовки: {render_trace.path}")
@@ -0,0 +1,159 @@
+"""
+Сборка входа модели для 1000 станков: прежний путь (копия DataFrame, iterrows,
+getattr на каждое поле, stdlib json) против src/ai/payload (хвост до копии,
+to_dict, кэш карточек, orjson) — с проверкой, что превью совпадают.
+
+    python benchmarks/bench_ai_payload.py [--payloads 1000] [--budget 3000]
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import sys
+import time
+from pathlib import Path
+from typing import Any, Dict, List
+
+ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(ROOT))
+# src.ai.service создаёт клиента OpenAI при импорте; запросов к API здесь нет
+os.environ.setdefault("OPENAI_API_KEY", "offline-benchmark")
+
+import pandas as pd  # noqa: E402
+
+from src.ai import payload as fast  # noqa: E402
+from src.ai.prompts import build_input_payload  # noqa: E402
+from src.providers.simulated import SimulatedFleetProvider  # noqa: E402
+from src.tables import StopTable  # noqa: E402
+
+
+# ---------------------------------------------------------------------- прежняя реализация (эталон)
+
+
+def legacy_machine_to_dict(machine: Any) -> Dict[str, Any]:
+    return {
+        "machine_id": getattr(machine, "machine_id", None),
+        "name": getattr(machine, "name", None),
+        "kind": getattr(machine, "kind", None),
+        "state": getattr(machine, "state", None),
+        "oee_percent": getattr(machine, "oee_percent", None),
+        "stops_count": getattr(machine, "stops_count", None),
+        "run_time_hours": getattr(machine, "run_time_hours", None),
+        "planned_time_hours": getattr(machine, "planned_time_hours", None),
+        "down_start_ts": str(getattr(machine, "down_start_ts", None)) if getattr(machine, "down_start_ts", None) else None,
+        "down_reason": getattr(machine, "down_reason", None),
+        "shift": {
+            "start": str(getattr(getattr(machine, "shift", None), "start", None)),
+            "end": str(getattr(getattr(machine, "shift", None), "end", None)),
+        },
+    }
+
+
+def legacy_df_preview(df_oee: Any, max_rows: int = 12) -> List[Dict[str, Any]]:
+    if isinstance(df_oee, (dict, list)):
+        df = pd.DataFrame(df_oee)
+    elif isinstance(df_oee, pd.DataFrame):
+        df = df_oee.copy()
+    else:
+        return []
+    if "timestamp" in df.columns:
+        df["timestamp"] = pd.to_datetime(df["timestamp"], errors="coerce")
+        df = df.sort_values("timestamp")
+    else:
+        df = df.reset_index().rename(columns={"index": "timestamp"})
+    oee_col = next((c for c in ["oee_percent", "OEE_percent", "oee", "OEE"] if c in df.columns), None)
+    if oee_col and oee_col != "oee_percent":
+        df = df.rename(columns={oee_col: "oee_percent"})
+    cols = [c for c in ["timestamp", "oee_percent"] if c in df.columns] or list(df.columns)[:2]
+    tail = df[cols].tail(max_rows)
+    return [{k: (str(row[k]) if k == "timestamp" else row[k]) for k in cols} for _, row in tail.iterrows()]
+
+
+def legacy_stops_preview(stops: Any, max_rows: int = 12) -> List[Dict[str, Any]]:
+    table = stops if isinstance(stops, StopTable) else StopTable.from_events(stops or [])
+    latest = table.latest(max_rows)
+    return [
+        {"start": str(s.start), "end": str(s.end) if s.end else None, "reason": s.reason,
+         "duration_min": dur, "note": s.note}
+        for s, dur in zip(latest.to_events(), latest.duration_min.tolist())
+    ]
+
+
+# ---------------------------------------------------------------------- замер
+
+
+def best_of(fn, repeat: int = 3) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - t0)
+    return best
+
+
+def main() -> None:
+    p = argparse.ArgumentParser(description=__doc__)
+    p.add_argument("--payloads", type=int, default=1000)
+    p.add_argument("--budget", type=int, default=fast.DEFAULT_TOKEN_BUDGET)
+    args = p.parse_args()
+
+    provider = SimulatedFleetProvider("ADVANCED", n_machines=args.payloads, seed=1)
+    machines = provider.get_overview()
+    series = {m.machine_id: provider.get_oee_timeseries(m.machine_id) for m in machines}
+    stops = {m.machine_id: provider.get_stops(m.machine_id) for m in machines}
+    hint = {"status": "OK", "last": {"vibration_mm_s": 6.1}, "max": {"vibration_mm_s": 8.4},
+            "alarms": {"vibration": "ok"}, "thresholds": {"vibration_warn": 7.1}}
+    cfg = {"level": "ADVANCED"}
+
+    # превью должны совпадать: и для DataFrame, и для записей dict/list, и для StopTable
+    for m in machines[:50]:
+        df = series[m.machine_id]
+        assert fast.oee_preview(df) == legacy_df_preview(df), m.machine_id
+        records = df.reset_index().assign(timestamp=lambda d: d["timestamp"].astype(str)).to_dict("records")
+        assert fast.oee_preview(records) == legacy_df_preview(records), m.machine_id
+        assert fast.stops_preview(stops[m.machine_id]) == legacy_stops_preview(stops[m.machine_id])
+        table = StopTable.from_events(stops[m.machine_id])
+        assert fast.stops_preview(table) == legacy_stops_preview(table)
+        assert fast.machine_dict(m) == legacy_machine_to_dict(m)
+
+    def legacy() -> None:
+        for m in machines:
+            build_input_payload(legacy_machine_to_dict(m), legacy_df_preview(series[m.machine_id]),
+                                legacy_stops_preview(stops[m.machine_id]), hint, cfg)
+
+    builder = fast.PayloadBuilder(cfg, token_budget=args.budget)
+
+    def current() -> None:
+        for m in machines:
+            builder.build(m, series[m.machine_id], stops[m.machine_id], hint)
+
+    n = len(machines)
+    print(f"payloads={n} json={'orjson' if fast.orjson is not None else 'stdlib'} budget={args.budget} tokens")
+    t_old, t_new = best_of(legacy), best_of(current)
+    print(f"  legacy (iterrows, getattr, json)   {t_old * 1000:8.1f} ms  {t_old / n * 1e6:7.1f} µs/payload")
+    print(f"  payload.PayloadBuilder             {t_new * 1000:8.1f} ms  {t_new / n * 1e6:7.1f} µs/payload"
+          f"  x{t_old / t_new:.1f}")
+    parts = [
+        ("oee preview", lambda: [legacy_df_preview(series[m.machine_id]) for m in machines],
+         lambda: [fast.oee_preview(series[m.machine_id]) for m in machines]),
+        ("stops preview", lambda: [legacy_stops_preview(stops[m.machine_id]) for m in machines],
+         lambda: [fast.stops_preview(stops[m.machine_id]) for m in machines]),
+        ("machine dict", lambda: [legacy_machine_to_dict(m) for m in machines],
+         lambda: [builder.machines.get(m) for m in machines]),
+    ]
+    for label, old, new in parts:
+        print(f"    {label:<16} {best_of(old) * 1000:8.1f} ms -> {best_of(new) * 1000:8.1f} ms")
+
+    sample = builder.payload(machines[0], series[machines[0].machine_id], stops[machines[0].machine_id], hint)
+    print(f"    {'json encode':<16} {best_of(lambda: [json.dumps(sample, ensure_ascii=False) for _ in machines]) * 1000:8.1f} ms"
+          f" -> {best_of(lambda: [fast.dumps(sample) for _ in machines]) * 1000:8.1f} ms")
+
+    # бюджет: тот же вход с длинными превью и маленьким бюджетом
+    small = fast.PayloadBuilder(cfg, token_budget=600, preview_rows=48)
+    text = small.build(machines[0], series[machines[0].machine_id], stops[machines[0].machine_id], hint)
+    print(f"  budget 600: {small.last_tokens} tokens (est.), truncated={json.loads(text).get('truncated')}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,58 @@
+"""
+Холодный старт: время импорта и создания провайдера в свежем процессе.
+
+    python benchmarks/bench_cold_start.py [--repeat 7]
+
+Каждый замер — отдельный интерпретатор, чтобы кэш модулей не влиял на результат.
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import statistics
+import subprocess
+import sys
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parents[1]
+
+SNIPPETS = {
+    # что делает app.py до первого рендера (без streamlit)
+    "import_providers": "import src.providers",
+    "get_provider": "from src.providers import get_provider; get_provider('{provider}')",
+    # CLI-инструменты, которым провайдер не нужен
+    "import_config_loader": "import src.config_loader",
+}
+
+_TEMPLATE = """
+import time, json
+t0 = time.perf_counter()
+{body}
+print(json.dumps(time.perf_counter() - t0))
+"""
+
+
+def measure(body: str, repeat: int) -> float:
+    runs = []
+    for _ in range(repeat):
+        out = subprocess.run(
+            [sys.executable, "-c", _TEMPLATE.format(body=body)],
+            cwd=ROOT, capture_output=True, text=True, check=True,
+        )
+        runs.append(json.loads(out.stdout.strip().splitlines()[-1]))
+    return statistics.median(runs)
+
+
+def main() -> None:
+    p = argparse.ArgumentParser(description=__doc__)
+    p.add_argument("--repeat", type=int, default=7)
+    p.add_argument("--provider", default="iot_advanced_stub")
+    args = p.parse_args()
+
+    for name, body in SNIPPETS.items():
+        sec = measure(body.format(provider=args.provider), args.repeat)
+        print(f"{name:<24} {sec * 1000:8.1f} ms (median of {args.repeat})")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,130 @@
+"""
+Выгрузка в Parquet против CSV: время записи, размер на диске, чтение целиком и
+выборка «один станок за час» (Parquet отсекает даты и row group'ы по статистике,
+CSV приходится читать целиком).
+
+    python benchmarks/bench_export.py --machines 500 --hours 8
+
+Данные — симулируемый парк (профиль ADVANCED) с начала смены; CSV пишется теми же
+пачками станков через DataFrame.to_csv (дозапись в один файл на набор).
+"""
+from __future__ import annotations
+
+import argparse
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+from pathlib import Path
+from typing import Callable, Dict, List
+
+import pandas as pd
+
+ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(ROOT))
+
+from src.export.parquet import DATASETS, ParquetExporter, query  # noqa: E402
+from src.providers.simulated import SimulatedFleetProvider  # noqa: E402
+from src.tables import STOP_REASONS  # noqa: E402
+from src.telemetry.fleet import CHANNELS  # noqa: E402
+
+
+def _median(fn: Callable[[], object], repeat: int) -> float:
+    times = []
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        fn()
+        times.append(time.perf_counter() - t0)
+    return statistics.median(times)
+
+
+def _csv_export(provider: SimulatedFleetProvider, out: Path, since: datetime, batch: int) -> Dict[str, float]:
+    """Базовая линия: те же пачки станков, DataFrame на пачку, дозапись CSV."""
+    ids = sorted(m.machine_id for m in provider.get_overview())
+    lines = {m.machine_id: m.line_id or "" for m in provider.get_overview()}
+    out.mkdir(parents=True, exist_ok=True)
+    seconds = {}
+    for name in DATASETS:
+        path = out / f"{name}.csv"
+        t0 = time.perf_counter()
+        for i in range(0, len(ids), batch):
+            part = ids[i:i + batch]
+            if name == "stops":
+                t = provider.get_stop_table(part, since, None)
+                machine = [t.machine_ids[c] for c in t.machine]
+                df = pd.DataFrame({
+                    "start": t.start, "end": t.end, "machine_id": machine,
+                    "line_id": [lines[m] for m in machine],
+                    "reason": [STOP_REASONS[r] for r in t.reason],
+                    "duration_min": ((t.end - t.start) / pd.Timedelta(minutes=1)).round(1),
+                    "note": [t.notes[n] if n >= 0 else "" for n in t.note],
+                })
+            else:
+                many = (provider.get_oee_timeseries_many if name == "oee" else provider.get_telemetry_many)
+                frames = many(part, since, None)
+                cols = ["oee_percent"] if name == "oee" else list(CHANNELS)
+                df = pd.concat(
+                    [f[cols].assign(machine_id=mid, line_id=lines[mid]).rename_axis("ts").reset_index()
+                     for mid, f in frames.items() if f is not None and len(f)],
+                    ignore_index=True,
+                )
+            df.to_csv(path, mode="a", header=i == 0, index=False)
+        seconds[name] = time.perf_counter() - t0
+    return seconds
+
+
+def main() -> None:
+    p = argparse.ArgumentParser()
+    p.add_argument("--machines", type=int, default=500)
+    p.add_argument("--hours", type=float, default=8.0, help="hours since shift start")
+    p.add_argument("--batch", type=int, default=256, help="machines per write batch")
+    p.add_argument("--repeat", type=int, default=3)
+    args = p.parse_args()
+
+    shift_start = datetime.now().replace(microsecond=0) - timedelta(hours=args.hours)
+    provider = SimulatedFleetProvider("ADVANCED", n_machines=args.machines, seed=1, shift_start=shift_start)
+    ids = sorted(m.machine_id for m in provider.get_overview())
+    probe = ids[len(ids) // 2]
+    window = (shift_start + timedelta(hours=args.hours / 2), shift_start + timedelta(hours=args.hours / 2 + 1))
+
+    tmp = Path(tempfile.mkdtemp(prefix="oee-export-"))
+    try:
+        pq_stats = {s.dataset: s for s in ParquetExporter(str(tmp / "parquet"), batch_machines=args.batch)
+                    .export_all(provider, since=shift_start)}
+        csv_seconds = _csv_export(provider, tmp / "csv", shift_start, args.batch)
+
+        print(f"fleet={args.machines} hours={args.hours} probe={probe} window={window[0]:%H:%M}-{window[1]:%H:%M}")
+        header = (f"{'dataset':10s} {'rows':>10s} {'write pq/csv, s':>17s} {'size pq/csv, KiB':>21s} "
+                  f"{'read all pq/csv, ms':>21s} {'1 machine x 1h pq/csv, ms':>27s}")
+        print(header)
+        rows: List[str] = []
+        for name, time_col in DATASETS.items():
+            st = pq_stats[name]
+            csv_path = tmp / "csv" / f"{name}.csv"
+            root = str(tmp / "parquet")
+
+            def csv_filtered() -> pd.DataFrame:
+                df = pd.read_csv(csv_path, parse_dates=[time_col])
+                t = df[time_col]
+                return df[(df["machine_id"] == probe) & (t >= window[0]) & (t < window[1])]
+
+            read_pq = _median(lambda: query(root, name), args.repeat)
+            read_csv = _median(lambda: pd.read_csv(csv_path, parse_dates=[time_col]), args.repeat)
+            sel_pq = _median(lambda: query(root, name, [probe], *window), args.repeat)
+            sel_csv = _median(csv_filtered, args.repeat)
+            n_pq = query(root, name, [probe], *window).num_rows
+            assert n_pq == len(csv_filtered()), f"{name}: выборки Parquet и CSV расходятся"
+            rows.append(
+                f"{name:10s} {st.rows:>10d} {st.seconds:>8.2f}/{csv_seconds[name]:<8.2f} "
+                f"{st.bytes / 1024:>10.0f}/{csv_path.stat().st_size / 1024:<10.0f} "
+                f"{read_pq * 1e3:>10.1f}/{read_csv * 1e3:<10.1f} {sel_pq * 1e3:>13.1f}/{sel_csv * 1e3:<13.1f}"
+            )
+        print("\n".join(rows))
+    finally:
+        shutil.rmtree(tmp, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
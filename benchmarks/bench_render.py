@@ -0,0 +1,184 @@
+"""
+Полная отрисовка app.py без браузера (Streamlit AppTest) по уровням конфига и
+размерам парка, с проверкой бюджетов из benchmarks/budgets.yaml.
+
+    python benchmarks/bench_render.py                           # basic/standard/advanced, парк 3 и 100
+    python benchmarks/bench_render.py --level advanced --fleet 1000 --reruns 5
+    python benchmarks/bench_render.py --json render.json        # результаты в файл
+
+Каждый замер — отдельный интерпретатор: холодная отрисовка (первый run, с кэшами
+провайдера и т.п.), затем --reruns повторных (медиана) и ещё одна под tracemalloc
+ради пика памяти повтора (плюс пиковый RSS процесса). Элементы считаются по дереву
+AppTest после первой и после повторной отрисовки (cold_* / rerun_*): всего,
+HTML-компоненты (мнемосхема), графики (vega-lite) и размер их protobuf. Размер парка задаётся
+слоем конфига OEE__PROVIDER_OPTIONS__N_MACHINES. Код выхода 1 — бюджет превышен,
+отрисовка упала с исключением или вывела st.error.
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import resource
+import statistics
+import subprocess
+import sys
+import time
+import tracemalloc
+from collections import Counter
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+ROOT = Path(__file__).resolve().parents[1]
+BUDGETS = ROOT / "benchmarks" / "budgets.yaml"
+LEVELS = ("basic", "standard", "advanced")
+
+# типы узлов дерева AppTest
+HTML_TYPES = ("component_instance", "iframe", "html")
+CHART_TYPES = ("vega_lite_chart", "arrow_vega_lite_chart", "line_chart")
+
+
+def _walk(node: Any, counts: Counter, sizes: Counter) -> None:
+    kind = getattr(node, "type", type(node).__name__)
+    counts[kind] += 1
+    proto = getattr(node, "proto", None)
+    if proto is not None and hasattr(proto, "ByteSize"):
+        sizes[kind] += proto.ByteSize()
+    children = getattr(node, "children", None)
+    if isinstance(children, dict):
+        for child in children.values():
+            _walk(child, counts, sizes)
+
+
+def measure_one(level: str, fleet: int, reruns: int, timeout: float) -> Dict[str, Any]:
+    """Один уровень и размер парка в текущем процессе."""
+    os.environ["OEE_CONFIG"] = str(ROOT / "config" / f"{level}.yaml")
+    os.environ["OEE__PROVIDER_OPTIONS__N_MACHINES"] = str(fleet)
+    # src.ai.service создаёт клиента OpenAI при импорте; рекомендации в отрисовке не запрашиваются
+    os.environ.setdefault("OPENAI_API_KEY", "offline-benchmark")
+    from streamlit.testing.v1 import AppTest
+
+    at = AppTest.from_file(str(ROOT / "app.py"), default_timeout=timeout)
+    t0 = time.perf_counter()
+    at.run()
+    cold = time.perf_counter() - t0
+    row: Dict[str, Any] = {"level": level, "fleet": fleet, "cold_s": round(cold, 3)}
+    row.update(_elements(at, "cold_"))
+
+    times = []
+    for _ in range(reruns):
+        t0 = time.perf_counter()
+        at.run()
+        times.append(time.perf_counter() - t0)
+
+    tracemalloc.start()
+    at.run()
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+
+    row.update({
+        "rerun_s": round(statistics.median(times), 3) if times else None,
+        "rerun_peak_mib": round(peak / 2**20, 1),
+        "rss_mib": round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1),
+    })
+    row.update(_elements(at, "rerun_"))
+    row["exceptions"] = [str(e.value)[:200] for e in at.exception]
+    row["errors"] = [str(e.value)[:200] for e in at.error]
+    return row
+
+
+def _elements(at: Any, prefix: str) -> Dict[str, Any]:
+    counts: Counter = Counter()
+    sizes: Counter = Counter()
+    _walk(at._tree, counts, sizes)
+    return {
+        f"{prefix}elements": sum(counts.values()),
+        f"{prefix}html_components": sum(counts[t] for t in HTML_TYPES),
+        f"{prefix}html_kib": round(sum(sizes[t] for t in HTML_TYPES) / 1024, 1),
+        f"{prefix}line_charts": sum(counts[t] for t in CHART_TYPES),
+        f"{prefix}chart_kib": round(sum(sizes[t] for t in CHART_TYPES) / 1024, 1),
+        f"{prefix}payload_kib": round(sum(sizes.values()) / 1024, 1),
+    }
+
+
+def run_isolated(level: str, fleet: int, reruns: int, timeout: float) -> Dict[str, Any]:
+    out = subprocess.run(
+        [sys.executable, __file__, "--one", level, str(fleet), "--reruns", str(reruns), "--timeout", str(timeout)],
+        cwd=ROOT, capture_output=True, text=True,
+    )
+    if out.returncode != 0:
+        return {"level": level, "fleet": fleet, "exceptions": [out.stderr.strip()[-500:]], "errors": []}
+    return json.loads(out.stdout.strip().splitlines()[-1])
+
+
+def load_budgets(path: Path) -> Dict[str, Dict[int, Dict[str, float]]]:
+    import yaml
+
+    if not path.exists():
+        return {}
+    data = yaml.safe_load(path.read_text(encoding="utf-8")) or {}
+    return {level: {int(k): v for k, v in (per_fleet or {}).items()} for level, per_fleet in data.items()}
+
+
+def check(row: Dict[str, Any], budget: Optional[Dict[str, float]]) -> List[str]:
+    """Нарушения бюджета, исключения и st.error отрисовки (ошибка на странице — тоже провал) строками."""
+    problems = [f"exception: {e}" for e in row.get("exceptions", [])]
+    problems += [f"error: {e}" for e in row.get("errors", [])]
+    for key, limit in (budget or {}).items():
+        value = row.get(key)
+        if value is not None and value > limit:
+            problems.append(f"{key} {value} > {limit}")
+    return problems
+
+
+def main() -> None:
+    p = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    p.add_argument("--level", action="append", choices=LEVELS, help="уровень конфига (по умолчанию все)")
+    p.add_argument("--fleet", default="3,100", help="размеры парка через запятую")
+    p.add_argument("--reruns", type=int, default=3)
+    p.add_argument("--timeout", type=float, default=300.0, help="секунд на одну отрисовку")
+    p.add_argument("--budgets", type=Path, default=BUDGETS)
+    p.add_argument("--json", type=Path, help="сохранить результаты в файл")
+    p.add_argument("--one", nargs=2, metavar=("LEVEL", "FLEET"), help=argparse.SUPPRESS)
+    args = p.parse_args()
+
+    if args.one:
+        print(json.dumps(measure_one(args.one[0], int(args.one[1]), args.reruns, args.timeout)))
+        return
+
+    budgets = load_budgets(args.budgets)
+    fleets = [int(x) for x in args.fleet.split(",") if x.strip()]
+    rows, failed = [], 0
+    print(f"{'level':<9} {'fleet':>6} {'cold':>7} {'rerun':>7} {'rss':>9} {'peak':>8} {'elem':>5} "
+          f"{'html KiB':>15} {'charts':>6} {'chart KiB':>9} {'total KiB':>15}  budget")
+    for level in args.level or LEVELS:
+        for fleet in fleets:
+            row = run_isolated(level, fleet, args.reruns, args.timeout)
+            budget = budgets.get(level, {}).get(fleet)
+            problems = check(row, budget)
+            row["budget"] = budget
+            row["problems"] = problems
+            rows.append(row)
+            failed += bool(problems)
+            verdict = "FAIL" if problems else ("ok" if budget else "no budget")
+            if "cold_s" in row:
+                # KiB: первая отрисовка / повторная (мнемосхема на повторах шлёт только изменения)
+                print(f"{level:<9} {fleet:>6} {row['cold_s']:6.2f}s {row['rerun_s'] or 0:6.2f}s "
+                      f"{row['rss_mib']:6.1f}MiB {row['rerun_peak_mib']:5.1f}MiB {row['cold_elements']:>5} "
+                      f"{row['cold_html_kib']:>7}/{row['rerun_html_kib']:<7} {row['cold_line_charts']:>6} "
+                      f"{row['cold_chart_kib']:>9} {row['cold_payload_kib']:>7}/{row['rerun_payload_kib']:<7}  "
+                      f"{verdict}", flush=True)
+            else:
+                print(f"{level:<9} {fleet:>6} {'render failed':>40}  {verdict}", flush=True)
+            for msg in problems:
+                print(f"    {msg}")
+
+    if args.json:
+        args.json.write_text(json.dumps(rows, indent=2, ensure_ascii=False), encoding="utf-8")
+    if failed:
+        print(f"\n{failed} run(s) over budget")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
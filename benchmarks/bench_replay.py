@@ -0,0 +1,83 @@
+"""
+Пропускная способность прогона журнала MES (events/s) в зависимости от числа процессов.
+
+    python benchmarks/bench_replay.py --machines 500 --days 5 --workers 1 2 4
+
+Журнал генерируется симулятором парка во временный каталог; каждый прогон —
+в новое хранилище сводок. В конце — проверка: тот же журнал, разрезанный на два файла
+и прогнанный подряд, даёт те же итоги (плановое/рабочее время, выпуск, остановки).
+"""
+from __future__ import annotations
+
+import argparse
+import math
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(ROOT))
+
+from src.replay.engine import ReplayEngine  # noqa: E402
+from src.replay.events import read_event_log, write_fleet_log  # noqa: E402
+from src.replay.store import RollupStore  # noqa: E402
+
+
+def _totals(store: RollupStore) -> dict:
+    roll = store.rollup()
+    return {
+        "planned_s": float(roll["planned_s"].sum()), "run_s": float(roll["run_s"].sum()),
+        "parts": int(roll["parts"].sum()), "good": int(roll["good"].sum()), "stops": len(store.stop_table()),
+    }
+
+
+def check_split(log_path: str, tmp: str, workers: int, chunk_rows: int) -> None:
+    """Журнал целиком и он же двумя файлами подряд — одинаковые итоги (состояние станков переходит между файлами)."""
+    df = next(read_event_log(log_path, chunk_rows=10**9))
+    suffix = Path(log_path).suffix
+    halves = [str(Path(tmp) / f"split_{k}{suffix}") for k in (1, 2)]
+    for part, path in zip((df.iloc[: len(df) // 2], df.iloc[len(df) // 2:]), halves):
+        part.to_parquet(path, index=False) if suffix == ".parquet" else part.to_csv(path, index=False)
+    whole = RollupStore(str(Path(tmp) / "check_whole.sqlite"))
+    ReplayEngine(whole, workers=workers, chunk_rows=chunk_rows).run(log_path)
+    split = RollupStore(str(Path(tmp) / "check_split.sqlite"))
+    for path in halves:
+        ReplayEngine(split, workers=workers, chunk_rows=chunk_rows).run(path)
+    a, b = _totals(whole), _totals(split)
+    whole.close()
+    split.close()
+    bad = {k: (a[k], b[k]) for k in a if not math.isclose(a[k], b[k], rel_tol=1e-9, abs_tol=1e-6)}
+    if bad:
+        raise SystemExit(f"split check FAILED (whole vs split): {bad}")
+    print(f"split check: ok ({a})")
+
+
+def main() -> None:
+    p = argparse.ArgumentParser(description=__doc__)
+    p.add_argument("--machines", type=int, default=500)
+    p.add_argument("--days", type=int, default=5)
+    p.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4])
+    p.add_argument("--chunk-rows", type=int, default=200_000)
+    p.add_argument("--format", choices=["csv", "parquet"], default="csv")
+    args = p.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        log_path = str(Path(tmp) / f"mes_log.{args.format}")
+        t0 = time.perf_counter()
+        n = write_fleet_log(log_path, n_machines=args.machines, days=args.days)
+        size = Path(log_path).stat().st_size / 2**20
+        print(f"log: {n:,} events, {size:.1f} MiB ({time.perf_counter() - t0:.1f}s to generate)")
+
+        for w in args.workers:
+            store = RollupStore(str(Path(tmp) / f"rollup_{w}.sqlite"))
+            stats = ReplayEngine(store, workers=w, chunk_rows=args.chunk_rows).run(log_path)
+            store.close()
+            print(f"workers={w:<3} {stats.seconds:7.2f}s  {stats.events_per_s:>12,.0f} events/s  "
+                  f"chunks={stats.chunks} stops={stats.stops:,}")
+
+        check_split(log_path, tmp, max(args.workers), args.chunk_rows)
+
+
+if __name__ == "__main__":
+    main()
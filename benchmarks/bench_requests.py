@@ -0,0 +1,106 @@
+"""
+Реестр заявок на ТО: выборки и счётчики на большом реестре и их планы запросов.
+
+    python benchmarks/bench_requests.py --requests 100000 --machines 500 --lines 20
+
+Реестр заполняется синтетическими заявками во временный файл; для каждого запроса —
+медиана из --repeat прогонов и EXPLAIN QUERY PLAN (ожидается поиск по индексу, без SCAN
+всей таблицы).
+"""
+from __future__ import annotations
+
+import argparse
+import random
+import statistics
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(ROOT))
+
+from src.maintenance.requests import (  # noqa: E402
+    OPEN_STATUSES, PRIORITIES, STATUSES, MaintenanceRequest, RequestStore,
+)
+
+
+def _requests(n: int, machines: int, lines: int, seed: int):
+    rnd = random.Random(seed)
+    t0 = datetime(2026, 1, 1)
+    for i in range(n):
+        m = rnd.randrange(machines)
+        yield MaintenanceRequest(
+            request_id=f"MR-{i:08d}", created_at=(t0 + timedelta(minutes=i)).isoformat(timespec="seconds"),
+            machine_id=f"M{m:04d}", machine_name=f"Станок {m}", priority=rnd.choice(PRIORITIES),
+            recommended_action="SCHEDULE_MAINTENANCE", reason="Диагностика.", oee_percent=rnd.uniform(40, 90),
+            stops_count=rnd.randrange(10), telemetry_status="OK", telemetry_last={}, telemetry_max={}, alarms={},
+            estimated_loss=rnd.uniform(0, 1e5), currency="RUB", ai={"risk": "MEDIUM"}, payload_for_erp={},
+            line_id=f"L{m % lines:02d}", status=rnd.choice(STATUSES),
+            sync_state="SYNCED" if rnd.random() < 0.98 else "PENDING",
+        )
+
+
+def _timed(fn, repeat: int) -> float:
+    times = []
+    for _ in range(repeat):
+        t = time.perf_counter()
+        fn()
+        times.append(time.perf_counter() - t)
+    return statistics.median(times) * 1e3
+
+
+def main() -> None:
+    p = argparse.ArgumentParser(description=__doc__)
+    p.add_argument("--requests", type=int, default=100_000)
+    p.add_argument("--machines", type=int, default=500)
+    p.add_argument("--lines", type=int, default=20)
+    p.add_argument("--repeat", type=int, default=20)
+    p.add_argument("--seed", type=int, default=7)
+    args = p.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        store = RequestStore(str(Path(tmp) / "maintenance.sqlite"))
+        t = time.perf_counter()
+        batch = []
+        for req in _requests(args.requests, args.machines, args.lines, args.seed):
+            batch.append(req)
+            if len(batch) == 10_000:
+                store.add_many(batch)
+                batch.clear()
+        store.add_many(batch)
+        print(f"fill: {store.count():,} requests in {time.perf_counter() - t:.1f}s")
+
+        critical = PRIORITIES.index("CRITICAL")
+        cases = {
+            "listing machine": (lambda: store.listing(machine_id="M0007", limit=50),
+                                "SELECT * FROM maintenance_requests WHERE machine_id = ? ORDER BY created_at DESC",
+                                ("M0007",)),
+            "listing CRITICAL open": (lambda: store.listing(priority="CRITICAL", status=OPEN_STATUSES, limit=50),
+                                      "SELECT * FROM maintenance_requests WHERE priority_rank = ? "
+                                      "AND status IN ('NEW', 'IN_PROGRESS') ORDER BY created_at DESC",
+                                      (critical,)),
+            "listing newest": (lambda: store.listing(limit=50),
+                               "SELECT * FROM maintenance_requests ORDER BY created_at DESC LIMIT 50", ()),
+            "open CRITICAL by line": (store.open_critical_by_line,
+                                      "SELECT line_id, count(*) FROM maintenance_requests INDEXED BY mr_open_critical "
+                                      "WHERE priority_rank = 3 "
+                                      "AND status IN ('NEW', 'IN_PROGRESS') GROUP BY line_id", ()),
+            "sync summary": (store.sync_summary,
+                             "SELECT count(*) FROM maintenance_requests INDEXED BY mr_open_synced "
+                             "WHERE sync_state = 'SYNCED' AND status IN ('NEW', 'IN_PROGRESS')", ()),
+            "pending sync": (lambda: store.pending_sync(100),
+                             "SELECT doc FROM maintenance_requests INDEXED BY mr_sync "
+                             "WHERE sync_state != 'SYNCED' AND sync_state = 'PENDING' "
+                             "ORDER BY priority_rank DESC, created_at LIMIT 100", ()),
+        }
+        for name, (fn, sql, params) in cases.items():
+            ms = _timed(fn, args.repeat)
+            plan = "; ".join(store.explain(sql, params))
+            print(f"{name:<24} {ms:8.2f} ms   {plan}")
+        store.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,103 @@
+"""
+CPU фонового сервиса в зависимости от числа зрителей.
+
+    python benchmarks/bench_service_viewers.py --machines 100 --viewers 0 1 10 50
+
+Сервис запускается отдельным процессом; каждый «зритель» — поток, который
+с периодом refresh читает снимок парка и телеметрию выбранного станка,
+как это делает страница Streamlit с provider: service. CPU сервиса берётся
+из /proc/<pid>/stat (Linux).
+"""
+from __future__ import annotations
+
+import argparse
+import os
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from pathlib import Path
+
+import yaml
+
+ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(ROOT))
+
+from src.providers.service_client import ServiceProvider  # noqa: E402
+
+
+def cpu_seconds(pid: int) -> float:
+    fields = Path(f"/proc/{pid}/stat").read_text().rsplit(")", 1)[1].split()
+    return (int(fields[11]) + int(fields[12])) / os.sysconf("SC_CLK_TCK")
+
+
+def viewer(url: str, period: float, stop: threading.Event, machine_id: str, offset: float, errors: list) -> None:
+    client = ServiceProvider(url=url)
+    stop.wait(offset)  # зрители открывают страницу не одновременно
+    while not stop.is_set():
+        try:
+            client.get_overview()
+            client.get_telemetry(machine_id)
+        except Exception as e:
+            errors.append(e)
+        stop.wait(period)
+
+
+def main() -> None:
+    p = argparse.ArgumentParser(description=__doc__)
+    p.add_argument("--machines", type=int, default=100)
+    p.add_argument("--viewers", type=int, nargs="+", default=[0, 1, 10, 50])
+    p.add_argument("--duration", type=float, default=15.0)
+    p.add_argument("--refresh", type=float, default=5.0)
+    p.add_argument("--port", type=int, default=8019)
+    args = p.parse_args()
+
+    cfg = {
+        "level": "ADVANCED",
+        "provider": "iot_advanced_stub",
+        "provider_options": {"n_machines": args.machines},
+        "refresh_seconds": args.refresh,
+    }
+    with tempfile.NamedTemporaryFile("w", suffix=".yaml", delete=False) as f:
+        yaml.safe_dump(cfg, f)
+    url = f"http://127.0.0.1:{args.port}"
+    proc = subprocess.Popen(
+        [sys.executable, "-m", "src.service", "--config", f.name, "--port", str(args.port)], cwd=ROOT
+    )
+    try:
+        client = ServiceProvider(url=url)
+        for _ in range(100):
+            try:
+                machine_id = client.get_overview()[0].machine_id
+                break
+            except Exception:
+                time.sleep(0.2)
+        else:
+            raise SystemExit("service did not start")
+
+        print(f"machines={args.machines} refresh={args.refresh}s duration={args.duration}s")
+        for n in args.viewers:
+            stop = threading.Event()
+            errors: list = []
+            threads = [
+                threading.Thread(target=viewer, args=(url, args.refresh, stop, machine_id, i * args.refresh / n, errors))
+                for i in range(n)
+            ]
+            c0, t0 = cpu_seconds(proc.pid), time.perf_counter()
+            for t in threads:
+                t.start()
+            time.sleep(args.duration)
+            stop.set()
+            for t in threads:
+                t.join()
+            cpu = (cpu_seconds(proc.pid) - c0) / (time.perf_counter() - t0)
+            print(f"viewers={n:<4} service CPU {cpu * 100:6.1f} %  errors={len(errors)}")
+    finally:
+        proc.terminate()
+        proc.wait()
+        os.unlink(f.name)
+
+
+if __name__ == "__main__":
+    main()
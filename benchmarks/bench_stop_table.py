@@ -0,0 +1,84 @@
+"""
+Память и скорость: список StopEvent против колоночной StopTable.
+
+    python benchmarks/bench_stop_table.py --stops 200000
+
+Таблица берётся у провайдера симулятора (get_stop_table — тот же путь, что у
+приложения), за смену целиком. Список pydantic-моделей строится только на
+выборке (--sample): память меряется tracemalloc, время операций над списком и
+таблицей сравнивается на ней же и пересчитывается на 1M.
+"""
+from __future__ import annotations
+
+import argparse
+import sys
+import time
+import tracemalloc
+from datetime import datetime
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(ROOT))
+
+from src.providers.simulated import SimulatedFleetProvider  # noqa: E402
+from src.tables import StopTable  # noqa: E402
+
+
+def timed(fn, repeat: int = 3) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - t0)
+    return best
+
+
+def main() -> None:
+    p = argparse.ArgumentParser(description=__doc__)
+    p.add_argument("--stops", type=int, default=200_000)
+    p.add_argument("--sample", type=int, default=100_000, help="размер выборки для списка StopEvent")
+    args = p.parse_args()
+
+    # ~4.9 остановки на станок за смену; «сейчас» вне смены — провайдер отдаёт смену целиком
+    t0 = time.perf_counter()
+    provider = SimulatedFleetProvider(n_machines=max(1, args.stops * 10 // 49), seed=1, clock=lambda: datetime.max)
+    print(f"provider: {time.perf_counter() - t0:.1f}s to build")
+    full = provider.get_stop_table()
+    table = full.take(slice(0, args.stops))
+    n = len(table)
+    print(f"stops={n:,} machines={len(table.machine_ids):,}")
+
+    sample = table.take(slice(0, min(args.sample, n)))
+    tracemalloc.start()
+    events = sample.to_events()
+    list_bytes = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    scale = 1e6 / len(events)
+    # те же станки, что в выборке, — списками StopEvent от провайдера
+    sample_ids = [sample.machine_ids[i] for i in sorted(set(sample.machine.tolist()))]
+    list_scale = 1e6 / sum(len(v) for v in provider.get_stops_many(sample_ids).values())
+
+    print("memory per 1M stops")
+    print(f"  StopTable                          {table.nbytes / n * 1e6 / 2**20:9.1f} MiB")
+    print(f"  List[StopEvent]                    {list_bytes * scale / 2**20:9.1f} MiB")
+
+    print(f"time per 1M stops (list: measured on {len(events):,}, scaled)")
+    cases = [
+        ("sort by start, desc", lambda: table.latest(),
+         lambda: sorted(events, key=lambda s: s.start, reverse=True)),
+        ("filter reason == FAULT", lambda: table.select(reasons=["FAULT"]),
+         lambda: [s for s in events if s.reason == "FAULT"]),
+        ("duration_min", lambda: table.duration_min,
+         lambda: [s.duration_min for s in events]),
+    ]
+    print(f"  {'':<26} {'StopTable':>12} {'List':>12}")
+    print(f"  {'from provider':<26} {timed(provider.get_stop_table) * 1e6 / len(full) * 1000:9.1f} ms "
+          f"{timed(lambda: provider.get_stops_many(sample_ids)) * list_scale * 1000:9.1f} ms")
+    for label, fast, slow in cases:
+        print(f"  {label:<26} {timed(fast) * 1e6 / n * 1000:9.1f} ms {timed(slow) * scale * 1000:9.1f} ms")
+    print(f"  {'to_events / from_events':<26} {timed(lambda: sample.to_events(), 1) * scale * 1000:9.1f} ms "
+          f"{timed(lambda: StopTable.from_events(events), 1) * scale * 1000:9.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,413 @@
+"""
+Набор бенчмарков пути данных цеха (в духе asv): телеметрия, тревоги, провайдер,
+превью для ИИ, OEE пачкой, вызовы ERP. Всё офлайн — симулятор парка и mock ERP
+в процессе (FastAPI TestClient), сеть не нужна.
+
+    python benchmarks/bench_suite.py                          # все кейсы, парк 3/100/1000/10000
+    python benchmarks/bench_suite.py --fleet 3,100 --case telemetry
+    python benchmarks/bench_suite.py --save main              # -> benchmarks/results/main.json
+    python benchmarks/bench_suite.py --compare benchmarks/results/main.json --fail-on-regression
+
+Параметры: размер парка (--fleet) и окно в минутах (--window; телеметрия, ряд OEE,
+остановки). Время кейса — лучший из повторов (--repeat, но не дольше --budget секунд
+на кейс). В сравнении регрессия — лучший прогон медленнее базы больше чем на --tolerance.
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import time
+import warnings
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(ROOT))
+# src.ai.service создаёт клиента OpenAI при импорте; превью строятся без обращений к API
+os.environ.setdefault("OPENAI_API_KEY", "offline-benchmark")
+
+import numpy as np  # noqa: E402
+import pandas as pd  # noqa: E402
+
+from src.ai.service import _df_preview, _stops_preview  # noqa: E402
+from src.hierarchy import HierarchyRollup, HierarchySpec  # noqa: E402
+from src.oee import calc_oee_percent  # noqa: E402
+from src.providers.simulated import SimulatedFleetProvider  # noqa: E402
+from src.telemetry.features import compute_features  # noqa: E402
+from src.telemetry.fleet import CHANNELS  # noqa: E402
+from src.telemetry.simulator import (  # noqa: E402
+    TelemetryThresholds, compute_alarms, compute_alarms_many, generate_telemetry_df, summarize_telemetry,
+)
+from src.telemetry.view import clear_cache, telemetry_summary, telemetry_view  # noqa: E402
+
+RESULTS_DIR = ROOT / "benchmarks" / "results"
+
+# кейс получает фикстуры, размер парка и окно; возвращает (замеряемая функция, число элементов)
+Setup = Callable[["Fixtures", int, int], Tuple[Callable[[], Any], int]]
+
+
+@dataclass(frozen=True)
+class Case:
+    name: str
+    setup: Setup
+    windowed: bool  # зависит ли от окна (иначе прогоняется один раз на размер парка)
+    unit: str       # что считается элементом: machine / call / value
+
+
+CASES: Dict[str, Case] = {}
+
+
+def case(name: str, unit: str = "machine", windowed: bool = False) -> Callable[[Setup], Setup]:
+    def register(fn: Setup) -> Setup:
+        CASES[name] = Case(name, fn, windowed, unit)
+        return fn
+
+    return register
+
+
+class Fixtures:
+    """Общие для кейсов данные: провайдер, кадры телеметрии, mock ERP — по размеру парка."""
+
+    def __init__(self) -> None:
+        self._providers: Dict[int, SimulatedFleetProvider] = {}
+        self._frames: Dict[Tuple[int, int], List[pd.DataFrame]] = {}
+        self._erp: Any = None
+
+    def provider(self, fleet: int) -> SimulatedFleetProvider:
+        if fleet not in self._providers:
+            self._providers.clear()  # держим в памяти один парк
+            self._frames.clear()
+            self._providers[fleet] = SimulatedFleetProvider("ADVANCED", n_machines=fleet, seed=1)
+        return self._providers[fleet]
+
+    def frames(self, fleet: int, window: int) -> List[pd.DataFrame]:
+        key = (fleet, window)
+        if key not in self._frames:
+            self._frames.clear()
+            self._frames[key] = [
+                generate_telemetry_df(m.machine_id, "ADVANCED", m.state, minutes=window)
+                for m in self.provider(fleet).get_overview()
+            ]
+        return self._frames[key]
+
+    def erp(self, store_size: int) -> Any:
+        """ErpClient поверх mock_api в процессе; хранилище заполнено store_size заявками."""
+        from fastapi.testclient import TestClient
+
+        from src.erp import mock_api
+        from src.erp.client import ErpClient
+
+        if self._erp is None:
+            # ErpClient передаёт timeout на каждый вызов; TestClient его игнорирует и предупреждает
+            warnings.filterwarnings("ignore", message=".*'timeout' argument with the TestClient")
+            self._erp = ErpClient("http://testserver", session=TestClient(mock_api.app))
+        mock_api.STORE.clear()
+        mock_api.HISTORY.clear()
+        ts = datetime.now().isoformat(timespec="seconds")
+        for i in range(store_size):
+            rid = f"BENCH-{i:06d}"
+            mock_api.STORE[rid] = {**_erp_body(rid), "erp_id": f"ERP-{i + 1:06d}", "received_at": ts, "status": "NEW"}
+            mock_api.HISTORY[rid] = [{"ts": ts, "event": "CREATED", "status": "NEW"}]
+        return self._erp
+
+
+def _erp_body(request_id: str) -> Dict[str, Any]:
+    return {
+        "request_id": request_id, "created_at": datetime.now().isoformat(timespec="seconds"),
+        "machine_id": "M-0001", "priority": "P2", "work_type": "INSPECTION", "comment": "bench",
+        "telemetry": {"vibration_mm_s": 7.1}, "economics": {"loss_rub": 1200.0}, "ai": {},
+    }
+
+
+# ---------------------------------------------------------------------- кейсы
+
+
+@case("provider.build")
+def _provider_build(fx: Fixtures, fleet: int, window: int):
+    return (lambda: SimulatedFleetProvider("ADVANCED", n_machines=fleet, seed=1)), fleet
+
+
+@case("telemetry.generate_df", windowed=True)
+def _generate(fx: Fixtures, fleet: int, window: int):
+    overview = fx.provider(fleet).get_overview()
+
+    def run() -> None:
+        for m in overview:
+            generate_telemetry_df(m.machine_id, "ADVANCED", m.state, minutes=window)
+
+    return run, fleet
+
+
+@case("telemetry.compute_alarms", windowed=True)
+def _alarms(fx: Fixtures, fleet: int, window: int):
+    frames, thr = fx.frames(fleet, window), TelemetryThresholds()
+    return (lambda: [compute_alarms(df, thr) for df in frames]), fleet
+
+
+@case("telemetry.compute_alarms_many", windowed=True)
+def _alarms_many(fx: Fixtures, fleet: int, window: int):
+    # векторный вариант для сравнения: последние значения всего парка одной матрицей
+    frames, thr = fx.frames(fleet, window), TelemetryThresholds()
+    last = np.stack([df[list(CHANNELS)].iloc[-1].to_numpy(dtype=np.float64) for df in frames])
+    return (lambda: compute_alarms_many(last, thr)), fleet
+
+
+@case("telemetry.features", windowed=True)
+def _features(fx: Fixtures, fleet: int, window: int):
+    # признаки окна для промпта — сразу по всему парку (станки × время × каналы)
+    frames, thr = fx.frames(fleet, window), TelemetryThresholds()
+    values = np.stack([df[list(CHANNELS)].to_numpy(dtype=np.float64) for df in frames])
+    return (lambda: compute_features(values, 30.0, thr.warn, thr.alarm)), fleet
+
+
+@case("telemetry.summarize", windowed=True)
+def _summarize(fx: Fixtures, fleet: int, window: int):
+    frames = fx.frames(fleet, window)
+    return (lambda: [summarize_telemetry(df) for df in frames]), fleet
+
+
+@case("telemetry.view_summary", windowed=True)
+def _view_summary(fx: Fixtures, fleet: int, window: int):
+    # отсечка + alarms/last/max без кэша: то, что раньше делалось дважды (панель и подсказка модели)
+    overview, frames, thr = fx.provider(fleet).get_overview(), fx.frames(fleet, window), TelemetryThresholds()
+
+    def run() -> None:
+        clear_cache()
+        for m, df in zip(overview, frames):
+            telemetry_summary(telemetry_view(m, df), thr)
+
+    return run, fleet
+
+
+@case("hierarchy.sync_one_change")
+def _hierarchy_sync(fx: Fixtures, fleet: int, window: int):
+    # обновление сводок завод/цех/линия, когда у одного станка сменилось состояние
+    machines = fx.provider(fleet).get_overview()
+    rollup = HierarchyRollup(HierarchySpec(), machines)
+    rollup.sync(machines)
+    flipped = list(machines)
+    states = [flipped[0].model_copy(update={"state": st}) for st in ("DOWN", flipped[0].state)]
+    step = iter(range(1 << 62))
+
+    def run() -> None:
+        flipped[0] = states[next(step) % 2]
+        rollup.sync(flipped)
+
+    return run, fleet
+
+
+@case("hierarchy.rebuild")
+def _hierarchy_rebuild(fx: Fixtures, fleet: int, window: int):
+    # то же без приращений: дерево и сводки с нуля
+    machines = fx.provider(fleet).get_overview()
+
+    def run() -> None:
+        HierarchyRollup(HierarchySpec(), machines).sync(machines)
+
+    return run, fleet
+
+
+@case("provider.get_overview")
+def _overview(fx: Fixtures, fleet: int, window: int):
+    p = fx.provider(fleet)
+
+    def run() -> None:
+        p._overview_step = None  # без кэша на шаг — полная сборка обзора
+        p.get_overview()
+
+    return run, fleet
+
+
+@case("provider.get_oee_timeseries", windowed=True)
+def _oee_ts(fx: Fixtures, fleet: int, window: int):
+    p = fx.provider(fleet)
+    ids = [m.machine_id for m in p.sim.machines]
+    since = datetime.now() - timedelta(minutes=window)
+    return (lambda: [p.get_oee_timeseries(mid, since) for mid in ids]), fleet
+
+
+@case("provider.get_stops", windowed=True)
+def _stops(fx: Fixtures, fleet: int, window: int):
+    p = fx.provider(fleet)
+    ids = [m.machine_id for m in p.sim.machines]
+    since = datetime.now() - timedelta(minutes=window)
+    return (lambda: [p.get_stops(mid, since) for mid in ids]), fleet
+
+
+@case("ai.df_preview", windowed=True)
+def _df_prev(fx: Fixtures, fleet: int, window: int):
+    p = fx.provider(fleet)
+    since = datetime.now() - timedelta(minutes=window)
+    series = [p.get_oee_timeseries(m.machine_id, since) for m in p.sim.machines]
+    return (lambda: [_df_preview(df) for df in series]), fleet
+
+
+@case("ai.stops_preview")
+def _stops_prev(fx: Fixtures, fleet: int, window: int):
+    p = fx.provider(fleet)
+    stops = [p.get_stops(m.machine_id) for m in p.sim.machines]
+    return (lambda: [_stops_preview(s) for s in stops]), fleet
+
+
+@case("oee.calc_oee_percent", unit="value", windowed=True)
+def _calc_oee(fx: Fixtures, fleet: int, window: int):
+    # по значению на 15-минутный интервал окна для каждого станка
+    n = fleet * max(1, window // 15)
+    rng = np.random.default_rng(0)
+    a, pf, q = (rng.uniform(0.5, 1.0, n).tolist() for _ in range(3))
+    return (lambda: [calc_oee_percent(x, y, z) for x, y, z in zip(a, pf, q)]), n
+
+
+@case("erp.create_request", unit="call")
+def _erp_create(fx: Fixtures, fleet: int, window: int):
+    erp, calls = fx.erp(fleet), 50
+    seq = iter(range(10**9))
+
+    def run() -> None:
+        for _ in range(calls):
+            erp.create_request(_erp_body(f"NEW-{next(seq):09d}"))
+
+    return run, calls
+
+
+@case("erp.get_request", unit="call")
+def _erp_get(fx: Fixtures, fleet: int, window: int):
+    erp, calls = fx.erp(fleet), 50
+    ids = [f"BENCH-{i % fleet:06d}" for i in range(calls)]
+    return (lambda: [erp.get_request(rid) for rid in ids]), calls
+
+
+@case("erp.inbox", unit="call")
+def _erp_inbox(fx: Fixtures, fleet: int, window: int):
+    # inbox сортирует всё хранилище: стоимость растёт с размером парка (= числом заявок)
+    erp, calls = fx.erp(fleet), 5
+    return (lambda: [erp.inbox() for _ in range(calls)]), calls
+
+
+# ---------------------------------------------------------------------- прогон и сравнение
+
+
+def measure(fn: Callable[[], Any], repeat: int, budget: float) -> List[float]:
+    runs: List[float] = []
+    started = time.perf_counter()
+    while len(runs) < repeat:
+        t0 = time.perf_counter()
+        fn()
+        runs.append(time.perf_counter() - t0)
+        if time.perf_counter() - started > budget:
+            break
+    return runs
+
+
+def _git_revision() -> Optional[str]:
+    try:
+        out = subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT, capture_output=True, text=True)
+    except OSError:
+        return None
+    return out.stdout.strip() or None
+
+
+def run_suite(fleets: List[int], windows: List[int], selected: List[Case], repeat: int,
+              budget: float) -> List[Dict[str, Any]]:
+    fx = Fixtures()
+    results = []
+    print(f"{'case':<32} {'fleet':>6} {'window':>6} {'best':>11} {'median':>11} {'per item':>12}")
+    for fleet in fleets:
+        for c in selected:
+            for window in (windows if c.windowed else [None]):
+                fn, items = c.setup(fx, fleet, window or windows[0])
+                runs = measure(fn, repeat, budget)
+                best, median = min(runs), statistics.median(runs)
+                row = {
+                    "case": c.name, "fleet": fleet, "window": window, "items": items, "unit": c.unit,
+                    "best_s": best, "median_s": median, "runs": len(runs),
+                    "per_item_us": best / max(1, items) * 1e6,
+                }
+                results.append(row)
+                print(f"{c.name:<32} {fleet:>6} {window or '-':>6} {best * 1000:9.2f}ms {median * 1000:9.2f}ms "
+                      f"{row['per_item_us']:9.2f}µs/{c.unit}", flush=True)
+    return results
+
+
+def _key(row: Dict[str, Any]) -> Tuple[Any, ...]:
+    return row["case"], row["fleet"], row["window"]
+
+
+def compare(results: List[Dict[str, Any]], baseline_path: Path, tolerance: float) -> int:
+    """Печатает отношение к базе; возвращает число регрессий."""
+    base = {_key(r): r for r in json.loads(baseline_path.read_text(encoding="utf-8"))["results"]}
+    regressions = 0
+    print(f"\ncompared with {baseline_path} (tolerance {tolerance:.0%})")
+    for row in results:
+        old = base.get(_key(row))
+        if old is None:
+            continue
+        ratio = row["best_s"] / old["best_s"] if old["best_s"] else float("inf")
+        mark = ""
+        if ratio > 1 + tolerance:
+            mark, regressions = "REGRESSION", regressions + 1
+        elif ratio < 1 / (1 + tolerance):
+            mark = "faster"
+        if mark:
+            print(f"  {row['case']:<32} fleet={row['fleet']:<6} window={row['window'] or '-':<5} "
+                  f"{old['best_s'] * 1000:9.2f}ms -> {row['best_s'] * 1000:9.2f}ms  x{ratio:.2f} {mark}")
+    if not regressions:
+        print("  no regressions")
+    return regressions
+
+
+def _ints(text: str) -> List[int]:
+    return [int(x) for x in text.split(",") if x.strip()]
+
+
+def main() -> None:
+    p = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    p.add_argument("--fleet", default="3,100,1000,10000", help="размеры парка через запятую")
+    p.add_argument("--window", default="60,240,480", help="окна в минутах через запятую")
+    p.add_argument("--case", action="append", default=[], help="префикс имени кейса (можно несколько)")
+    p.add_argument("--repeat", type=int, default=5)
+    p.add_argument("--budget", type=float, default=3.0, help="секунд на кейс, не больше")
+    p.add_argument("--save", help="имя файла результатов в benchmarks/results/ (по умолчанию — ревизия git)")
+    p.add_argument("--no-save", action="store_true")
+    p.add_argument("--compare", type=Path, help="JSON прошлого прогона для сравнения")
+    p.add_argument("--tolerance", type=float, default=0.25)
+    p.add_argument("--fail-on-regression", action="store_true")
+    p.add_argument("--list", action="store_true", help="только список кейсов")
+    args = p.parse_args()
+
+    if args.list:
+        for c in CASES.values():
+            print(f"{c.name:<32} per {c.unit}{'  (windowed)' if c.windowed else ''}")
+        return
+    selected = [c for c in CASES.values() if not args.case or any(c.name.startswith(x) for x in args.case)]
+    if not selected:
+        p.error(f"no cases match {args.case}; see --list")
+
+    results = run_suite(_ints(args.fleet), _ints(args.window), selected, args.repeat, args.budget)
+
+    if not args.no_save:
+        revision = _git_revision()
+        RESULTS_DIR.mkdir(parents=True, exist_ok=True)
+        path = RESULTS_DIR / f"{args.save or revision or datetime.now().strftime('%Y%m%d-%H%M%S')}.json"
+        meta = {
+            "ts": datetime.now().isoformat(timespec="seconds"), "git": revision,
+            "python": platform.python_version(), "platform": platform.platform(), "machine": platform.machine(),
+            "numpy": np.__version__, "pandas": pd.__version__,
+        }
+        path.write_text(json.dumps({"meta": meta, "results": results}, indent=2), encoding="utf-8")
+        print(f"\nsaved {path}")
+
+    if args.compare:
+        if compare(results, args.compare, args.tolerance) and args.fail_on_regression:
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,262 @@
+"""
+Сборка входа для модели (превью OEE, остановки, карточка станка) без лишних копий:
+хвост ряда берётся до преобразований, строки — векторно (to_dict), карточки
+станков кэшируются, JSON — через orjson, если он установлен (иначе stdlib json).
+
+    builder = PayloadBuilder(cfg, token_budget=3000)
+    text = builder.build(machine, df_oee, stops, telemetry_hint)
+
+Если вход не влезает в token_budget (оценка по символам), превью укорачиваются
+по шагам; что урезано — видно модели в поле "truncated".
+"""
+from __future__ import annotations
+
+import heapq
+import json
+from operator import attrgetter
+from typing import Any, Dict, List, Mapping, Optional, Sequence, Tuple, Union
+
+import numpy as np
+import pandas as pd
+from pydantic import BaseModel
+
+from ..tables import STOP_REASONS, StopTable
+from ..telemetry.features import infer_step_sec, series_features
+from .prompts import payload_dict
+
+try:
+    import orjson
+except ImportError:  # необязательная зависимость
+    orjson = None
+
+DEFAULT_PREVIEW_ROWS = 12
+DEFAULT_TOKEN_BUDGET = 3000
+MIN_PREVIEW_ROWS = 3
+OEE_COLUMNS = ("oee_percent", "OEE_percent", "oee", "OEE")
+# без этих ключей подсказка по телеметрии ещё полезна модели
+HINT_CORE_KEYS = ("status", "last", "max", "alarms", "thresholds", "features", "economics", "anomalies")
+
+
+# ---------------------------------------------------------------------- превью
+
+
+def oee_preview(df_oee: Any, max_rows: int = DEFAULT_PREVIEW_ROWS) -> List[Dict[str, Any]]:
+    """Последние max_rows точек ряда OEE: [{"timestamp": str, "oee_percent": float}, ...]."""
+    if isinstance(df_oee, (dict, list)):
+        df = pd.DataFrame(df_oee)
+    elif isinstance(df_oee, pd.DataFrame):
+        df = df_oee  # без копии: берём только хвост
+    else:
+        return []
+    if df.empty:
+        return []
+    oee_col = next((c for c in OEE_COLUMNS if c in df.columns), None)
+
+    # обычные формы (индекс-время или колонка timestamp) — позициями NumPy, без промежуточных DataFrame
+    if "timestamp" in df.columns:
+        ts = df["timestamp"]
+        if not pd.api.types.is_datetime64_any_dtype(ts):
+            ts = pd.to_datetime(ts, errors="coerce")
+        n = len(ts)
+        if ts.is_monotonic_increasing:
+            pos = np.arange(max(0, n - max_rows), n)
+        else:
+            pos = np.argsort(ts.to_numpy(), kind="stable")[-max_rows:]
+        stamps = ts.iloc[pos]
+    elif oee_col is not None and df.index.name in (None, "index", "timestamp") and "index" not in df.columns:
+        n = len(df)
+        pos = np.arange(max(0, n - max_rows), n)
+        stamps = df.index[pos]
+    else:
+        return _oee_preview_frame(df, max_rows)
+
+    stamps = [str(t) for t in stamps]
+    if oee_col is None:
+        return [{"timestamp": t} for t in stamps]
+    values = df[oee_col].to_numpy()[pos].tolist()
+    return [{"timestamp": t, "oee_percent": v} for t, v in zip(stamps, values)]
+
+
+def _oee_preview_frame(df: pd.DataFrame, max_rows: int) -> List[Dict[str, Any]]:
+    # редкие формы (именованный индекс без OEE и т.п.) — как раньше, но только по хвосту
+    tail = df.iloc[-max_rows:].reset_index().rename(columns={"index": "timestamp"})
+    oee_col = next((c for c in OEE_COLUMNS if c in tail.columns), None)
+    if oee_col and oee_col != "oee_percent":
+        tail = tail.rename(columns={oee_col: "oee_percent"})
+    cols = [c for c in ("timestamp", "oee_percent") if c in tail.columns] or list(tail.columns)[:2]
+    out = tail[cols]
+    if "timestamp" in cols:
+        out = out.assign(timestamp=out["timestamp"].astype(str))
+    return out.to_dict("records")
+
+
+def oee_features(df_oee: Any) -> Optional[Dict[str, Any]]:
+    """Сводка всего ряда OEE (а не только хвоста из превью): mean/min/p10/наклон в час."""
+    if isinstance(df_oee, (dict, list)):
+        df = pd.DataFrame(df_oee)
+    elif isinstance(df_oee, pd.DataFrame):
+        df = df_oee
+    else:
+        return None
+    oee_col = next((c for c in OEE_COLUMNS if c in df.columns), None)
+    if oee_col is None or df.empty:
+        return None
+    if "timestamp" in df.columns:
+        ts = pd.DatetimeIndex(pd.to_datetime(df["timestamp"], errors="coerce"))
+        order = np.argsort(ts.to_numpy(), kind="stable")
+        values, index = df[oee_col].to_numpy()[order], ts[order]
+    else:
+        values, index = df[oee_col].to_numpy(), df.index
+    step = infer_step_sec(index, default=900.0)
+    return series_features(pd.to_numeric(pd.Series(values), errors="coerce").to_numpy(dtype=np.float64), step)
+
+
+def stops_preview(stops: Union[Sequence[Any], StopTable, None],
+                  max_rows: int = DEFAULT_PREVIEW_ROWS) -> List[Dict[str, Any]]:
+    """Последние max_rows остановок (новые сверху) — только то, что уйдёт в промпт."""
+    if isinstance(stops, StopTable):
+        latest = stops.latest(max_rows)
+        starts = latest.start.astype("datetime64[us]").tolist()
+        ends = latest.end.astype("datetime64[us]").tolist()
+        reasons = [STOP_REASONS[r] for r in latest.reason.tolist()]
+        notes = [latest.notes[n] if n >= 0 else None for n in latest.note.tolist()]
+        rows = zip(starts, ends, reasons, latest.duration_min.tolist(), notes)
+    else:
+        events = heapq.nlargest(max_rows, stops or [], key=attrgetter("start"))
+        rows = ((s.start, s.end, s.reason, s.duration_min, s.note) for s in events)
+    return [
+        {"start": str(start), "end": str(end) if end else None, "reason": reason, "duration_min": dur, "note": note}
+        for start, end, reason, dur, note in rows
+    ]
+
+
+# ---------------------------------------------------------------------- карточка станка
+
+_MACHINE_FIELDS = (
+    "machine_id", "name", "kind", "state", "oee_percent", "stops_count", "run_time_hours", "planned_time_hours",
+)
+
+
+def machine_dict(machine: Any) -> Dict[str, Any]:
+    """MachineOverview (или похожий объект) -> dict для промпта."""
+    if isinstance(machine, BaseModel):
+        get = machine.__dict__.get  # поля модели — без getattr на каждое
+    else:
+        get = lambda k: getattr(machine, k, None)  # noqa: E731
+    out = {k: get(k) for k in _MACHINE_FIELDS}
+    down = get("down_start_ts")
+    shift = get("shift")
+    out["down_start_ts"] = str(down) if down else None
+    out["down_reason"] = get("down_reason")
+    out["shift"] = {"start": str(getattr(shift, "start", None)), "end": str(getattr(shift, "end", None))}
+    return out
+
+
+class MachineDictCache:
+    """
+    Карточки станков по machine_id. Провайдер отдаёт одни и те же объекты, пока
+    не сменился шаг обзора, — пока объект тот же, карточка берётся из кэша.
+    """
+
+    def __init__(self) -> None:
+        self._cache: Dict[str, Tuple[Any, Dict[str, Any]]] = {}
+
+    def get(self, machine: Any) -> Dict[str, Any]:
+        key = getattr(machine, "machine_id", None)
+        hit = self._cache.get(key) if key is not None else None
+        if hit is not None and hit[0] is machine:
+            return hit[1]
+        out = machine_dict(machine)
+        if key is not None:
+            self._cache[key] = (machine, out)  # ссылка на объект: id не переиспользуется, пока он в кэше
+        return out
+
+    def __len__(self) -> int:
+        return len(self._cache)
+
+
+# ---------------------------------------------------------------------- JSON и бюджет
+
+
+def _default(obj: Any) -> Any:
+    if isinstance(obj, np.generic):
+        return obj.item()
+    if isinstance(obj, Mapping):
+        return dict(obj)
+    if isinstance(obj, (tuple, set, frozenset)):
+        return list(obj)
+    return str(obj)
+
+
+def dumps(payload: Any) -> str:
+    """JSON без экранирования кириллицы; NaN -> null (orjson) / NaN (stdlib)."""
+    if orjson is not None:
+        return orjson.dumps(payload, default=_default, option=orjson.OPT_SERIALIZE_NUMPY).decode("utf-8")
+    return json.dumps(payload, ensure_ascii=False, default=_default)
+
+
+def estimate_tokens(text: str) -> int:
+    """
+    Грубая оценка без токенизатора: ~4 символа ASCII на токен, кириллица и прочее —
+    ~2 символа на токен. С запасом для бюджета, точный счёт не нужен.
+    """
+    ascii_chars = len(text.encode("ascii", "ignore"))
+    return ascii_chars // 4 + (len(text) - ascii_chars) // 2 + 1
+
+
+def fit_budget(payload: Dict[str, Any], token_budget: int) -> Tuple[str, int]:
+    """
+    Укоротить payload до token_budget: превью OEE и остановок — вдвое за шаг
+    (не меньше MIN_PREVIEW_ROWS), затем подсказка по телеметрии — до основных ключей.
+    Возвращает (JSON, оценка токенов).
+    """
+    text = dumps(payload)
+    tokens = estimate_tokens(text)
+    truncated: Dict[str, Any] = {}
+    while tokens > token_budget:
+        oee, stops = payload.get("oee_timeseries_preview") or [], payload.get("stops_preview") or []
+        hint = payload.get("telemetry_hint")
+        if max(len(oee), len(stops)) > MIN_PREVIEW_ROWS:
+            # самое длинное превью — первым; в ряду OEE оставляем последние точки
+            if len(oee) >= len(stops):
+                payload["oee_timeseries_preview"] = oee[-max(MIN_PREVIEW_ROWS, len(oee) // 2):]
+                truncated["oee_timeseries_preview"] = len(payload["oee_timeseries_preview"])
+            else:
+                payload["stops_preview"] = stops[:max(MIN_PREVIEW_ROWS, len(stops) // 2)]
+                truncated["stops_preview"] = len(payload["stops_preview"])
+        elif isinstance(hint, Mapping) and set(hint) - set(HINT_CORE_KEYS):
+            payload["telemetry_hint"] = {k: v for k, v in hint.items() if k in HINT_CORE_KEYS}
+            truncated["telemetry_hint"] = sorted(payload["telemetry_hint"])
+        else:
+            break  # дальше урезать нечего — отдаём как есть
+        payload["truncated"] = truncated
+        text = dumps(payload)
+        tokens = estimate_tokens(text)
+    return text, tokens
+
+
+class PayloadBuilder:
+    """Сборщик входа модели для серии станков (оценка парка, отчёт смены)."""
+
+    def __init__(self, cfg: Mapping[str, Any], token_budget: int = DEFAULT_TOKEN_BUDGET,
+                 preview_rows: int = DEFAULT_PREVIEW_ROWS):
+        self.cfg = cfg
+        self.token_budget = token_budget
+        self.preview_rows = preview_rows
+        self.machines = MachineDictCache()
+        self.last_tokens = 0
+
+    def payload(self, machine: Any, df_oee: Any, stops: Any,
+                telemetry_hint: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+        return payload_dict(
+            machine=self.machines.get(machine),
+            oee_df_preview=oee_preview(df_oee, self.preview_rows),
+            stops_preview=stops_preview(stops, self.preview_rows),
+            telemetry_hint=telemetry_hint,
+            cfg=self.cfg,
+            oee_features=oee_features(df_oee),
+        )
+
+    def build(self, machine: Any, df_oee: Any, stops: Any, telemetry_hint: Optional[Dict[str, Any]] = None) -> str:
+        text, self.last_tokens = fit_budget(self.payload(machine, df_oee, stops, telemetry_hint), self.token_budget)
+        return text
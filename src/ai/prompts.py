@@ -1,12 +1,16 @@
 from __future__ import annotations
 import json
-from typing import Any, Dict, List
+from typing import Any, Dict, List, Mapping
 
 SYSTEM_INSTRUCTIONS = """Ты — инженер по надежности (RME) и OEE-аналитик.
 Тебе дан JSON с: состоянием станка, OEE (превью), остановками и telemetry_hint.
 
 Правила:
 - Используй telemetry_hint.last / telemetry_hint.max / telemetry_hint.alarms / thresholds как основу диагностики.
+- telemetry_hint.features — признаки окна по каналам: p05/p50/p95, slope_per_h (тренд в час),
+  spikes/spike_events (выбросы), above_warn_min/above_alarm_min (минут выше порогов), coverage (доля точек);
+  для вибрации band_energy — доли энергии колебаний по полосам (циклов в час) и dominant_period_min.
+  oee_features — сводка ряда OEE (mean/min/p10/slope_per_h). Тренды и время выше порогов важнее одиночных значений.
 - Если telemetry_hint.status == "NO_DATA" — не делай выводы по датчикам, явно напиши "нет данных".
 - Не выдумывай чисел. Если цифры отсутствуют — ставь "—" и поясняй.
 - Если есть telemetry_hint.economics.estimated_loss — используй это число в cost_impact.
@@ -17,17 +21,19 @@ SYSTEM_INSTRUCTIONS = """Ты — инженер по надежности (RME)
 - Не пересчитывай самостоятельно, не выдумывай валюту/маржу.
 - Ответ строго JSON (без markdown) по указанной схеме.
 """
-def build_input_payload(
+def payload_dict(
     machine: Dict[str, Any],
     oee_df_preview: List[Dict[str, Any]],
     stops_preview: List[Dict[str, Any]],
     telemetry_hint: Dict[str, Any] | None,
-    cfg: Dict[str, Any],
-) -> str:
-    payload = {
+    cfg: Mapping[str, Any],
+    oee_features: Dict[str, Any] | None = None,
+) -> Dict[str, Any]:
+    return {
         "level": cfg.get("level"),
         "machine": machine,
         "oee_timeseries_preview": oee_df_preview,
+        "oee_features": oee_features,
         "stops_preview": stops_preview,
         "telemetry_hint": telemetry_hint,
         "goal": "Дать решение STOP/CONTINUE/MONITOR, риск и шаги (ТО/ремонт/запчасти/план).",
@@ -41,4 +47,16 @@ def build_input_payload(
             "next_check": "string|null",
         },
     }
-    return json.dumps(payload, ensure_ascii=False)
+
+
+def build_input_payload(
+    machine: Dict[str, Any],
+    oee_df_preview: List[Dict[str, Any]],
+    stops_preview: List[Dict[str, Any]],
+    telemetry_hint: Dict[str, Any] | None,
+    cfg: Mapping[str, Any],
+    oee_features: Dict[str, Any] | None = None,
+) -> str:
+    return json.dumps(
+        payload_dict(machine, oee_df_preview, stops_preview, telemetry_hint, cfg, oee_features), ensure_ascii=False
+    )
@@ -1,13 +1,16 @@
 from __future__ import annotations
 
 import json
-from typing import Any, Dict, List, Optional
-
-import pandas as pd
+import time
+from typing import Any, Callable, Dict, List, Optional, Union
 
 from .client import get_openai_client, get_model_name
-from .prompts import SYSTEM_INSTRUCTIONS, build_input_payload
+from .payload import DEFAULT_TOKEN_BUDGET, MachineDictCache, fit_budget, oee_features, oee_preview, stops_preview
+from .prompts import SYSTEM_INSTRUCTIONS, payload_dict
 from .schemas import AiRecommendation
+from .streaming import AiCancelled, PartialJson
+from ..observability.metrics import observe, span, timed
+from ..tables import StopTable
 from dotenv import load_dotenv
 from openai import OpenAI
 
@@ -15,107 +18,44 @@ load_dotenv()
 
 client = OpenAI()
 
+# карточки станков общие на процесс: серия рекомендаций по парку не пересобирает их
+_MACHINES = MachineDictCache()
+
+
 def _machine_to_dict(machine: Any) -> Dict[str, Any]:
-    # MachineOverview -> dict (бережно, без зависимости от точных полей)
-    return {
-        "machine_id": getattr(machine, "machine_id", None),
-        "name": getattr(machine, "name", None),
-        "kind": getattr(machine, "kind", None),
-        "state": getattr(machine, "state", None),
-        "oee_percent": getattr(machine, "oee_percent", None),
-        "stops_count": getattr(machine, "stops_count", None),
-        "run_time_hours": getattr(machine, "run_time_hours", None),
-        "planned_time_hours": getattr(machine, "planned_time_hours", None),
-        "down_start_ts": str(getattr(machine, "down_start_ts", None)) if getattr(machine, "down_start_ts", None) else None,
-        "down_reason": getattr(machine, "down_reason", None),
-        "shift": {
-            "start": str(getattr(getattr(machine, "shift", None), "start", None)),
-            "end": str(getattr(getattr(machine, "shift", None), "end", None)),
-        },
-    }
+    return _MACHINES.get(machine)
 
 
 def _df_preview(df_oee: Any, max_rows: int = 12) -> List[Dict[str, Any]]:
     # df_oee может быть DataFrame / dict / list
-    if isinstance(df_oee, dict):
-        df = pd.DataFrame(df_oee)
-    elif isinstance(df_oee, list):
-        df = pd.DataFrame(df_oee)
-    elif isinstance(df_oee, pd.DataFrame):
-        df = df_oee.copy()
-    else:
-        return []
-
-    if "timestamp" in df.columns:
-        df["timestamp"] = pd.to_datetime(df["timestamp"], errors="coerce")
-        df = df.sort_values("timestamp")
-    else:
-        df = df.reset_index().rename(columns={"index": "timestamp"})
-
-    # нормализуем имя колонки OEE
-    col_candidates = ["oee_percent", "OEE_percent", "oee", "OEE"]
-    oee_col = next((c for c in col_candidates if c in df.columns), None)
-    if oee_col and oee_col != "oee_percent":
-        df = df.rename(columns={oee_col: "oee_percent"})
-
-    cols = [c for c in ["timestamp", "oee_percent"] if c in df.columns]
-    if not cols:
-        cols = list(df.columns)[:2]
-
-    tail = df[cols].tail(max_rows)
-    # timestamp -> строка
-    out = []
-    for _, row in tail.iterrows():
-        rec = {k: (str(row[k]) if k == "timestamp" else row[k]) for k in cols}
-        out.append(rec)
-    return out
-
-
-def _stops_preview(stops: List[Any], max_rows: int = 12) -> List[Dict[str, Any]]:
-    out = []
-    # последние сверху
-    stops_sorted = sorted(stops or [], key=lambda s: getattr(s, "start", None) or 0, reverse=True)
-    for s in stops_sorted[:max_rows]:
-        out.append(
-            {
-                "start": str(getattr(s, "start", None)),
-                "end": str(getattr(s, "end", None)) if getattr(s, "end", None) else None,
-                "reason": getattr(s, "reason", None),
-                "duration_min": getattr(s, "duration_min", None),
-                "note": getattr(s, "note", None),
-            }
-        )
-    return out
+    return oee_preview(df_oee, max_rows)
 
 
-def generate_recommendation(
-    machine: Any,
-    df_oee: Any,
-    stops: List[Any],
-    cfg: Dict[str, Any],
-    telemetry_hint: Optional[Dict[str, Any]] = None,
-) -> AiRecommendation:
-    client = get_openai_client()
-    model = get_model_name()
+def _stops_preview(stops: Union[List[Any], StopTable], max_rows: int = 12) -> List[Dict[str, Any]]:
+    return stops_preview(stops, max_rows)
 
-    input_text = build_input_payload(
-        machine=_machine_to_dict(machine),
-        oee_df_preview=_df_preview(df_oee),
-        stops_preview=_stops_preview(stops),
-        telemetry_hint=telemetry_hint,
-        cfg=cfg,
-    )
 
-    # Responses API — рекомендованный путь для новых интеграций :contentReference[oaicite:2]{index=2}
-    resp = client.responses.create(
-        model=model,
-        instructions=SYSTEM_INSTRUCTIONS,
-        input=input_text,
-    )
+def build_recommendation_input(machine: Any, df_oee: Any, stops: Any, cfg: Dict[str, Any],
+                               telemetry_hint: Optional[Dict[str, Any]] = None,
+                               token_budget: int = DEFAULT_TOKEN_BUDGET) -> str:
+    """JSON-вход модели (в бюджете токенов) — его же кладёт в задачу очередь (src/jobs)."""
+    with span("ai.payload"):
+        payload = payload_dict(
+            machine=_machine_to_dict(machine),
+            oee_df_preview=_df_preview(df_oee),
+            stops_preview=_stops_preview(stops),
+            telemetry_hint=telemetry_hint,
+            cfg=cfg,
+            oee_features=oee_features(df_oee),
+        )
+        # длинные превью укорачиваются под бюджет токенов входа
+        input_text, _ = fit_budget(payload, token_budget)
+    return input_text
 
-    text = resp.output_text.strip()
 
+def _parse_text(text: str) -> AiRecommendation:
     # Модель обязана вернуть JSON; если вернёт мусор — пытаемся извлечь JSON
+    text = text.strip()
     try:
         data = json.loads(text)
     except Exception:
@@ -128,3 +68,93 @@ def generate_recommendation(
             raise
 
     return AiRecommendation.model_validate(data)
+
+
+@timed("ai.generate_recommendation")
+def generate_recommendation(
+    machine: Any,
+    df_oee: Any,
+    stops: List[Any],
+    cfg: Dict[str, Any],
+    telemetry_hint: Optional[Dict[str, Any]] = None,
+    token_budget: int = DEFAULT_TOKEN_BUDGET,
+) -> AiRecommendation:
+    input_text = build_recommendation_input(machine, df_oee, stops, cfg, telemetry_hint, token_budget)
+    return recommend_from_input(input_text)
+
+
+def recommend_from_input(input_text: str) -> AiRecommendation:
+    client = get_openai_client()
+    model = get_model_name()
+
+    # Responses API — рекомендованный путь для новых интеграций :contentReference[oaicite:2]{index=2}
+    with span("ai.llm_call"):
+        resp = client.responses.create(
+            model=model,
+            instructions=SYSTEM_INSTRUCTIONS,
+            input=input_text,
+        )
+
+    return _parse_text(resp.output_text)
+
+
+@timed("ai.stream_recommendation")
+def stream_recommendation(
+    machine: Any,
+    df_oee: Any,
+    stops: List[Any],
+    cfg: Dict[str, Any],
+    telemetry_hint: Optional[Dict[str, Any]] = None,
+    token_budget: int = DEFAULT_TOKEN_BUDGET,
+    on_partial: Optional[Callable[[Dict[str, Any]], None]] = None,
+    cancelled: Optional[Callable[[], bool]] = None,
+) -> AiRecommendation:
+    """
+    То же, что generate_recommendation, но потоком со structured output (схема
+    AiRecommendation): on_partial получает частичный dict по мере прихода токенов,
+    cancelled() проверяется на каждом событии — True закрывает соединение и
+    поднимает AiCancelled.
+    """
+    input_text = build_recommendation_input(machine, df_oee, stops, cfg, telemetry_hint, token_budget)
+    return stream_from_input(input_text, on_partial, cancelled)
+
+
+def stream_from_input(
+    input_text: str,
+    on_partial: Optional[Callable[[Dict[str, Any]], None]] = None,
+    cancelled: Optional[Callable[[], bool]] = None,
+) -> AiRecommendation:
+    client = get_openai_client()
+    model = get_model_name()
+    parser = PartialJson()
+    started, first = time.perf_counter(), True
+
+    with span("ai.llm_call"):
+        with client.responses.stream(
+            model=model,
+            instructions=SYSTEM_INSTRUCTIONS,
+            input=input_text,
+            text_format=AiRecommendation,
+        ) as stream:
+            for event in stream:
+                if cancelled is not None and cancelled():
+                    stream.close()
+                    raise AiCancelled("генерация отменена")
+                if event.type == "response.output_text.delta":
+                    parser.feed(event.delta)
+                    partial = parser.value()
+                    if partial and first:
+                        # воспринимаемая задержка: до первого видимого фрагмента ответа
+                        observe("ai.first_partial", time.perf_counter() - started)
+                        first = False
+                    if on_partial is not None and partial:
+                        on_partial(partial)
+                elif event.type in ("error", "response.failed"):
+                    raise RuntimeError(f"AI: {getattr(event, 'message', None) or event.type}")
+            final = stream.get_final_response()
+
+    parsed = final.output_parsed
+    if isinstance(parsed, AiRecommendation):
+        return parsed
+    # отказ модели / неполный ответ — тот же разбор текста, что и без потока
+    return _parse_text(final.output_text or parser.text)
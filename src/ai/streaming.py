@@ -0,0 +1,97 @@
+"""
+Разбор JSON рекомендации по мере прихода токенов: незакрытые строки и скобки
+достраиваются, недописанный ключ/число отбрасывается — в UI уже видны
+decision/risk и растущие diagnosis/rationale.
+
+    parser = PartialJson()
+    for delta in deltas:
+        parser.feed(delta)
+        partial = parser.value()   # dict или None, пока нечего показать
+"""
+from __future__ import annotations
+
+import json
+from typing import Any, Dict, List, Optional, Tuple
+
+_CLOSERS = {"{": "}", "[": "]"}
+
+
+class AiCancelled(Exception):
+    """Генерация прервана (сменили станок, задачу отменили)."""
+
+
+class PartialJson:
+    """
+    Инкрементальный сканер: каждая дельта просматривается один раз, помнится
+    последняя позиция, где префикс — законченное значение (safe), и стек скобок в ней.
+    """
+
+    def __init__(self) -> None:
+        self.text = ""
+        self._stack: List[str] = []
+        self._in_str = False
+        self._esc = False
+        self._str_is_key = False
+        self._expect_key = False
+        self._safe: Tuple[int, Tuple[str, ...]] = (0, ())
+        self._last: Optional[Dict[str, Any]] = None
+        self._parsed_len = -1
+
+    def feed(self, delta: str) -> None:
+        start = len(self.text)
+        self.text += delta
+        stack = self._stack
+        for i in range(start, len(self.text)):
+            ch = self.text[i]
+            if self._in_str:
+                if self._esc:
+                    self._esc = False
+                elif ch == "\\":
+                    self._esc = True
+                elif ch == '"':
+                    self._in_str = False
+                    if not self._str_is_key:
+                        self._safe = (i + 1, tuple(stack))
+                continue
+            if ch == '"':
+                self._in_str = True
+                self._str_is_key = bool(stack) and stack[-1] == "{" and self._expect_key
+            elif ch in "{[":
+                stack.append(ch)
+                self._expect_key = ch == "{"
+                self._safe = (i + 1, tuple(stack))
+            elif ch in "}]":
+                if stack:
+                    stack.pop()
+                self._safe = (i + 1, tuple(stack))
+            elif ch == ":":
+                self._expect_key = False
+            elif ch == ",":
+                self._expect_key = bool(stack) and stack[-1] == "{"
+            # числа и литералы становятся законченными только на следующей , } ]
+
+    def _candidates(self) -> List[str]:
+        """Префикс, дополненный до JSON: с недописанной строкой-значением и по безопасной границе."""
+        out = []
+        if self._in_str and not self._str_is_key:
+            body = self.text[:-1] if self._esc else self.text  # обрезанный escape
+            out.append(body + '"' + "".join(_CLOSERS[c] for c in reversed(self._stack)))
+        cut, stack = self._safe
+        if cut:
+            out.append(self.text[:cut] + "".join(_CLOSERS[c] for c in reversed(stack)))
+        return out
+
+    def value(self) -> Optional[Dict[str, Any]]:
+        """Текущий частичный объект; разбирается заново только если пришли новые символы."""
+        if len(self.text) == self._parsed_len:
+            return self._last
+        self._parsed_len = len(self.text)
+        for candidate in self._candidates():
+            try:
+                data = json.loads(candidate)
+            except ValueError:
+                continue  # например, недописанный \u-escape — берём безопасную границу
+            if isinstance(data, dict):
+                self._last = data
+                break
+        return self._last
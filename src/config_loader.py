@@ -1,9 +1,239 @@
+"""
+Конфиг приложения слоями (каждый следующий перекрывает предыдущий, словари — поглубже):
+
+    config/base.yaml        — общее для всех уровней (экономика, раскладка)
+    config/<level>.yaml     — файл из OEE_CONFIG / --config
+    config/site.yaml        — настройки площадки (или путь из OEE_SITE_CONFIG); необязателен
+    OEE__<KEY>__<SUBKEY>=…  — переменные окружения, значение разбирается как YAML
+
+Результат проверяется схемой (config_schema.AppConfig) и отдаётся неизменяемым
+снимком ConfigSnapshot — одним на процесс. Повторный load_config() не читает диски,
+пока не изменился mtime какого-либо слоя; при изменении подписчики получают новый снимок.
+"""
 from __future__ import annotations
+
+import logging
+import os
+import threading
+import time
+from collections.abc import Mapping
 from pathlib import Path
+from types import MappingProxyType
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
+
 import yaml
+from pydantic import ValidationError
+
+from .config_schema import AppConfig
+
+log = logging.getLogger(__name__)
+
+ENV_PREFIX = "OEE__"
+BASE_NAME = "base.yaml"
+SITE_NAME = "site.yaml"
+
+
+class ConfigError(ValueError):
+    """Конфиг не читается или не проходит схему (с указанием файлов-слоёв)."""
+
+
+def _freeze(value: Any) -> Any:
+    if isinstance(value, Mapping):
+        return MappingProxyType({k: _freeze(v) for k, v in value.items()})
+    if isinstance(value, list):
+        return tuple(_freeze(v) for v in value)
+    return value
+
+
+def _merge(base: Dict[str, Any], over: Mapping[str, Any]) -> Dict[str, Any]:
+    out = dict(base)
+    for k, v in over.items():
+        if isinstance(v, Mapping) and isinstance(out.get(k), Mapping):
+            out[k] = _merge(dict(out[k]), v)
+        else:
+            out[k] = v
+    return out
+
+
+class ConfigSnapshot(Mapping):
+    """
+    Неизменяемый снимок конфига. config — проверенная модель (AppConfig);
+    сам снимок — read-only Mapping того же содержимого для кода, читающего cfg.get(...).
+    """
+
+    __slots__ = ("config", "sources", "version", "_data")
+
+    def __init__(self, config: AppConfig, sources: Tuple[str, ...], version: int):
+        self.config = config
+        self.sources = sources
+        self.version = version
+        self._data = _freeze(config.model_dump())
+
+    def __getitem__(self, key: str) -> Any:
+        return self._data[key]
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self._data)
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def __repr__(self) -> str:
+        return f"ConfigSnapshot(v{self.version}, level={self.config.level}, sources={list(self.sources)})"
+
+    def to_dict(self) -> Dict[str, Any]:
+        """Изменяемая копия (для сериализации и экспериментов)."""
+        return self.config.model_dump()
 
-def load_config(config_path: str) -> dict:
+
+def layer_paths(config_path: str) -> List[Path]:
+    """Существующие файлы-слои для файла уровня, в порядке наложения."""
     p = Path(config_path)
-    if not p.exists():
-        raise FileNotFoundError(f"Config not found: {config_path}")
-    return yaml.safe_load(p.read_text(encoding="utf-8"))
+    base = p.with_name(BASE_NAME)
+    site = Path(os.environ["OEE_SITE_CONFIG"]) if os.environ.get("OEE_SITE_CONFIG") else p.with_name(SITE_NAME)
+    layers = [base] if base.exists() and base.resolve() != p.resolve() else []
+    layers.append(p)
+    if site.exists() and site.resolve() != p.resolve():
+        layers.append(site)
+    return layers
+
+
+def env_overrides(environ: Optional[Mapping[str, str]] = None) -> Dict[str, Any]:
+    """OEE__ECONOMICS__MARGIN_PER_UNIT=0.2 -> {"economics": {"margin_per_unit": 0.2}}."""
+    out: Dict[str, Any] = {}
+    for name, raw in sorted((environ if environ is not None else os.environ).items()):
+        if not name.startswith(ENV_PREFIX):
+            continue
+        keys = [k.lower() for k in name[len(ENV_PREFIX):].split("__") if k]
+        if not keys:
+            continue
+        node = out
+        for k in keys[:-1]:
+            node = node.setdefault(k, {})
+            if not isinstance(node, dict):
+                raise ConfigError(f"{name}: conflicts with a scalar override")
+        node[keys[-1]] = yaml.safe_load(raw)
+    return out
+
+
+def _read_yaml(path: Path) -> Dict[str, Any]:
+    try:
+        data = yaml.safe_load(path.read_text(encoding="utf-8"))
+    except yaml.YAMLError as e:
+        raise ConfigError(f"{path}: YAML syntax error: {e}") from None
+    if data is None:
+        return {}
+    if not isinstance(data, dict):
+        raise ConfigError(f"{path}: top level must be a mapping")
+    return data
+
+
+class ConfigStore:
+    """
+    Конфиг одного файла уровня со всеми слоями. current() не чаще раза в
+    check_seconds сверяет mtime слоёв и набор OEE__-переменных; при изменении
+    перечитывает, проверяет и оповещает подписчиков. Битая правка не ломает
+    работу: остаётся прежний снимок (с предупреждением в лог).
+    """
+
+    def __init__(self, config_path: str, check_seconds: float = 1.0):
+        self.path = config_path
+        self.check_seconds = check_seconds
+        self._lock = threading.Lock()
+        self._subscribers: List[Callable[[ConfigSnapshot], None]] = []
+        self._key: Optional[Tuple[Any, ...]] = None
+        self._checked_at = 0.0
+        self._version = 0
+        self._snapshot: Optional[ConfigSnapshot] = None
+        self.refresh()  # первая загрузка — с исключением, если конфиг неверен
+
+    def _state(self) -> Tuple[List[Path], Tuple[Any, ...]]:
+        if not Path(self.path).exists():
+            raise ConfigError(f"Config not found: {self.path}")
+        layers = layer_paths(self.path)
+        env = tuple(sorted((k, v) for k, v in os.environ.items() if k.startswith(ENV_PREFIX)))
+        key = tuple((str(p), p.stat().st_mtime_ns) for p in layers) + env
+        return layers, key
+
+    def _load(self, layers: List[Path]) -> ConfigSnapshot:
+        data: Dict[str, Any] = {}
+        for p in layers:
+            data = _merge(data, _read_yaml(p))
+        data = _merge(data, env_overrides())
+        sources = tuple(str(p) for p in layers)
+        try:
+            config = AppConfig.model_validate(data)
+        except ValidationError as e:
+            raise ConfigError(f"Invalid config ({' + '.join(sources)}):\n{e}") from None
+        return ConfigSnapshot(config, sources, self._version + 1)
+
+    def refresh(self) -> bool:
+        """Перечитать, если слои изменились. True — появился новый снимок."""
+        with self._lock:
+            self._checked_at = time.monotonic()
+            key = self._key
+            try:
+                layers, key = self._state()
+                if key == self._key:
+                    return False
+                snapshot = self._load(layers)
+            except (ConfigError, OSError) as e:
+                if self._snapshot is None:
+                    raise ConfigError(str(e)) from None
+                log.warning("Config reload failed, keeping v%d: %s", self._version, e)
+                self._key = key  # ту же битую правку повторно не разбираем
+                return False
+            self._key = key
+            self._version = snapshot.version
+            first = self._snapshot is None
+            self._snapshot = snapshot
+            subscribers = list(self._subscribers)
+        if not first:
+            log.info("Config reloaded: %r", snapshot)
+        for fn in subscribers:
+            try:
+                fn(snapshot)
+            except Exception:
+                log.exception("Config subscriber failed")
+        return True
+
+    def current(self) -> ConfigSnapshot:
+        if time.monotonic() - self._checked_at >= self.check_seconds:
+            self.refresh()
+        assert self._snapshot is not None
+        return self._snapshot
+
+    def subscribe(self, fn: Callable[[ConfigSnapshot], None]) -> Callable[[], None]:
+        """fn(snapshot) — на каждый новый снимок. Возвращает функцию отписки."""
+        with self._lock:
+            self._subscribers.append(fn)
+
+        def unsubscribe() -> None:
+            with self._lock:
+                if fn in self._subscribers:
+                    self._subscribers.remove(fn)
+
+        return unsubscribe
+
+
+_STORES: Dict[str, ConfigStore] = {}
+_STORES_LOCK = threading.Lock()
+
+
+def config_store(config_path: str) -> ConfigStore:
+    """Общий на процесс ConfigStore для файла уровня."""
+    store = _STORES.get(config_path)
+    if store is not None:
+        return store
+    key = str(Path(config_path).resolve())
+    with _STORES_LOCK:
+        store = _STORES.get(key)
+        if store is None:
+            store = ConfigStore(config_path)
+        _STORES[key] = _STORES[config_path] = store
+        return store
+
+
+def load_config(config_path: str) -> ConfigSnapshot:
+    """Текущий снимок конфига (разбор YAML — только при изменении файлов)."""
+    return config_store(config_path).current()
@@ -0,0 +1,98 @@
+"""
+Схема конфига приложения (после наложения слоёв base + уровень + site + env).
+Опечатка в имени ключа или неверный тип — ошибка при загрузке с путём до поля,
+а не KeyError в глубине app.py.
+"""
+from __future__ import annotations
+
+from typing import Any, Dict, List, Literal
+
+from pydantic import BaseModel, ConfigDict, Field, field_validator, model_validator
+
+
+class _Section(BaseModel):
+    model_config = ConfigDict(extra="forbid", frozen=True)
+
+
+class LayoutGroup(_Section):
+    title: str = ""
+    machines: List[str] = []
+
+
+class LayoutConfig(_Section):
+    columns: int = Field(6, ge=1, le=24)
+    tile_height: int = Field(150, ge=60, le=600)
+    groups: List[LayoutGroup] = []
+
+
+class HierarchyLine(_Section):
+    id: str
+    title: str = ""
+    machines: List[str] = []  # пусто — станки по их line_id
+
+
+class HierarchyShop(_Section):
+    id: str
+    title: str = ""
+    lines: List[HierarchyLine] = []
+
+
+class HierarchyConfig(_Section):
+    plant_id: str = "PLANT"
+    plant_title: str = "Завод"
+    shops: List[HierarchyShop] = []  # линии, не попавшие ни в один цех, — в цех «Прочее»
+
+    @model_validator(mode="after")
+    def _check_unique(self) -> "HierarchyConfig":
+        ids = [self.plant_id] + [s.id for s in self.shops] + [ln.id for s in self.shops for ln in s.lines]
+        dup = sorted({i for i in ids if ids.count(i) > 1})
+        if dup:
+            raise ValueError(f"повторяются id узлов иерархии: {dup}")
+        machines = [m for s in self.shops for ln in s.lines for m in ln.machines]
+        dup = sorted({m for m in machines if machines.count(m) > 1})
+        if dup:
+            raise ValueError(f"станок указан в нескольких линиях: {dup}")
+        return self
+
+
+class FeaturesConfig(_Section):
+    telemetry: bool = False
+    ai_streaming: bool = True  # рекомендации потоком (частичный ответ в панели); False — одним запросом
+
+
+class EconomicsConfig(_Section):
+    planned_units_per_shift: float = Field(0, ge=0)
+    shift_hours: float = Field(8, gt=0, le=24)
+    margin_per_unit: float = Field(0, ge=0)
+    currency: str = "USD"
+
+
+class AppConfig(_Section):
+    level: Literal["BASIC", "STANDARD", "ADVANCED"]
+    provider: str
+    provider_options: Dict[str, Any] = {}
+    layout: LayoutConfig = LayoutConfig()
+    hierarchy: HierarchyConfig = HierarchyConfig()
+    oee_granularity: str = "shift_15min"
+    refresh_seconds: float = Field(0, ge=0)
+    enable_ai: bool = False
+    features: FeaturesConfig = FeaturesConfig()
+    economics: EconomicsConfig = EconomicsConfig()
+    thresholds: Dict[str, Any] = {}
+
+    @field_validator("thresholds")
+    @classmethod
+    def _check_thresholds(cls, v: Dict[str, Any]) -> Dict[str, Any]:
+        from .telemetry.thresholds import ThresholdProfiles
+
+        ThresholdProfiles.from_config({"thresholds": v})
+        return v
+
+    @model_validator(mode="after")
+    def _check_provider(self) -> "AppConfig":
+        # опции — по схеме выбранного провайдера; в снимке остаются нормализованными
+        from .providers import validate_provider_options
+
+        options = validate_provider_options(self.provider, self.provider_options)
+        object.__setattr__(self, "provider_options", options)
+        return self
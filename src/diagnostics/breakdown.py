@@ -0,0 +1,38 @@
+from __future__ import annotations
+
+from typing import Tuple
+
+import numpy as np
+import pandas as pd
+
+from ..tables import STOP_REASONS, StopTable
+from .microstops import MICROSTOP_MAX_MIN
+
+# отказы оборудования (в отличие от наладок и планового ТО)
+BREAKDOWN_REASONS: Tuple[str, ...] = ("FAULT", "REPAIR")
+
+
+def breakdown_mask(table: StopTable, min_minutes: float = MICROSTOP_MAX_MIN) -> np.ndarray:
+    codes = [STOP_REASONS.index(r) for r in BREAKDOWN_REASONS]
+    return np.isin(table.reason, codes) & (table.duration_min > min_minutes)
+
+
+def breakdowns_daily(table: StopTable, min_minutes: float = MICROSTOP_MAX_MIN) -> pd.DataFrame:
+    """Отказы по станкам и суткам: machine_id, day, breakdowns, breakdown_min (аддитивно)."""
+    sel = table.take(breakdown_mask(table, min_minutes))
+    df = pd.DataFrame({
+        "machine_id": np.asarray(table.machine_ids, dtype=object)[sel.machine],
+        "day": sel.start.astype("datetime64[D]"),
+        "breakdowns": 1,
+        "breakdown_min": sel.duration_min,
+    })
+    return df.groupby(["machine_id", "day"], as_index=False, sort=False).sum()
+
+
+def mtbf_mttr(run_hours: np.ndarray, breakdowns: np.ndarray, breakdown_min: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """MTBF (ч работы на отказ) и MTTR (мин на отказ); NaN, если отказов не было."""
+    n = np.asarray(breakdowns, dtype=np.float64)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        mtbf = np.where(n > 0, np.asarray(run_hours, dtype=np.float64) / n, np.nan)
+        mttr = np.where(n > 0, np.asarray(breakdown_min, dtype=np.float64) / n, np.nan)
+    return mtbf, mttr
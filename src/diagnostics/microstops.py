@@ -0,0 +1,28 @@
+from __future__ import annotations
+
+import numpy as np
+import pandas as pd
+
+from ..tables import STOP_REASONS, StopTable
+
+# короче этого любая остановка считается микростопом, даже если MES записал её как FAULT
+MICROSTOP_MAX_MIN = 2.0
+
+
+def microstop_mask(table: StopTable, max_minutes: float = MICROSTOP_MAX_MIN) -> np.ndarray:
+    return (table.reason == STOP_REASONS.index("MICROSTOP")) | (table.duration_min <= max_minutes)
+
+
+def microstops_daily(table: StopTable, max_minutes: float = MICROSTOP_MAX_MIN) -> pd.DataFrame:
+    """
+    Микростопы по станкам и суткам (по началу остановки):
+    machine_id, day, microstops, microstop_min. Суммы аддитивны — их можно копить по частям журнала.
+    """
+    sel = table.take(microstop_mask(table, max_minutes))
+    df = pd.DataFrame({
+        "machine_id": np.asarray(table.machine_ids, dtype=object)[sel.machine],
+        "day": sel.start.astype("datetime64[D]"),
+        "microstops": 1,
+        "microstop_min": sel.duration_min,
+    })
+    return df.groupby(["machine_id", "day"], as_index=False, sort=False).sum()
@@ -0,0 +1,33 @@
+from __future__ import annotations
+
+from typing import Dict
+
+import numpy as np
+
+
+def oee_components(
+    planned_s: np.ndarray,
+    run_s: np.ndarray,
+    parts: np.ndarray,
+    good: np.ndarray,
+    ideal_per_hour: np.ndarray,
+) -> Dict[str, np.ndarray]:
+    """
+    OEE из аддитивных сумм (время, выпуск) — годится для любых окон сводки.
+    Availability = run / planned, Performance = parts / (ideal * run), Quality = good / parts.
+    NaN там, где знаменатель нулевой.
+    """
+    planned_s, run_s = np.asarray(planned_s, np.float64), np.asarray(run_s, np.float64)
+    parts, good = np.asarray(parts, np.float64), np.asarray(good, np.float64)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        availability = np.where(planned_s > 0, run_s / planned_s, np.nan)
+        ideal = np.asarray(ideal_per_hour, np.float64) * run_s / 3600.0
+        performance = np.where(ideal > 0, np.minimum(parts / ideal, 1.0), np.nan)
+        quality = np.where(parts > 0, good / parts, np.nan)
+    oee = availability * np.nan_to_num(performance, nan=0.0) * np.nan_to_num(quality, nan=1.0) * 100.0
+    return {
+        "availability": availability,
+        "performance": performance,
+        "quality": quality,
+        "oee_percent": np.round(oee, 1),
+    }
@@ -0,0 +1,58 @@
+"""
+HTTP-клиент ERP/1С (mock_api.py и совместимые): одна сессия requests с keep-alive
+на процесс, каждый вызов — отдельный этап в метриках (erp.<операция>).
+"""
+from __future__ import annotations
+
+from typing import Any, Dict, Optional
+
+import requests
+
+from ..observability.metrics import span
+
+
+class ErpClient:
+    def __init__(self, base_url: str, timeout: float = 6.0, session: Optional[requests.Session] = None):
+        self.base_url = base_url.rstrip("/")
+        self.timeout = timeout
+        self.session = session or requests.Session()
+
+    def _url(self, path: str) -> str:
+        return f"{self.base_url}/api/v1/{path}"
+
+    def create_request(self, body: Dict[str, Any], timeout: float = 8.0) -> Dict[str, Any]:
+        """Регистрация заявки на ТО. Ответ: {ok, erp_id, received_at, status}."""
+        with span("erp.create_request"):
+            r = self.session.post(self._url("maintenance_requests"), json=body, timeout=timeout)
+            r.raise_for_status()
+            return r.json()
+
+    def get_request(self, request_id: str) -> Optional[Dict[str, Any]]:
+        """Документ заявки; None — ERP такой заявки не знает."""
+        with span("erp.get_request"):
+            r = self.session.get(self._url(f"maintenance_requests/{request_id}"), timeout=self.timeout)
+            if r.status_code != 200:
+                return None
+            return r.json()
+
+    def update_status(self, request_id: str, status: str, note: Optional[str] = None) -> Dict[str, Any]:
+        with span("erp.update_status"):
+            r = self.session.patch(
+                self._url(f"maintenance_requests/{request_id}/status"),
+                json={"status": status, "note": note},
+                timeout=self.timeout,
+            )
+            r.raise_for_status()
+            return r.json()
+
+    def history(self, request_id: str) -> Any:
+        with span("erp.history"):
+            r = self.session.get(self._url(f"maintenance_requests/{request_id}/history"), timeout=self.timeout)
+            r.raise_for_status()
+            return r.json()
+
+    def inbox(self) -> Dict[str, Any]:
+        with span("erp.inbox"):
+            r = self.session.get(self._url("inbox"), timeout=self.timeout)
+            r.raise_for_status()
+            return r.json()
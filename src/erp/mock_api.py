@@ -1,10 +1,12 @@
 from __future__ import annotations
 
 from datetime import datetime
-from typing import Any, Dict, List, Literal, Optional
+from typing import Any, Dict, List, Literal, Optional, get_args
 from fastapi import FastAPI, HTTPException
 from pydantic import BaseModel, Field
 
+from ..observability.http import instrument_app
+
 app = FastAPI(title="Mock ERP API", version="0.2")
 
 Status = Literal["NEW", "IN_PROGRESS", "DONE", "CANCELLED"]
@@ -16,6 +18,22 @@ HISTORY: Dict[str, List[Dict[str, Any]]] = {}  # request_id -> events
 INBOX: List[Dict[str, Any]] = []
 
 
+def _by_status() -> Dict[str, int]:
+    out = {s: 0 for s in get_args(Status)}
+    for doc in list(STORE.values()):
+        out[doc["status"]] = out.get(doc["status"], 0) + 1
+    return out
+
+
+# GET /metrics: запросы/задержки по маршрутам + размер хранилища и истории
+METRICS = instrument_app(app, "erp")
+METRICS.gauge("oee_erp_store_requests", "Maintenance requests in the store.", lambda: len(STORE))
+METRICS.gauge("oee_erp_history_events", "Status history events across all requests.",
+              lambda: sum(len(v) for v in list(HISTORY.values())))
+METRICS.gauge("oee_erp_requests_by_status", "Maintenance requests by current status.", _by_status, ("status",))
+METRICS.gauge("oee_erp_inbox_queue", "Items waiting in the inbox queue.", lambda: len(INBOX))
+
+
 class MaintenanceRequestIn(BaseModel):
     request_id: str
     created_at: str
@@ -115,6 +133,6 @@ def root():
     return {
         "service": "Mock ERP API",
         "ok": True,
-        "endpoints": ["/health", "/api/v1/maintenance_requests", "/api/v1/inbox"],
+        "endpoints": ["/health", "/metrics", "/api/v1/maintenance_requests", "/api/v1/inbox"],
     }
 
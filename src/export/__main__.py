@@ -0,0 +1,46 @@
+"""
+Выгрузка смены в Parquet (src/export/parquet.py):
+
+    python -m src.export --config config/advanced.yaml --out data/export
+    python -m src.export --since 2026-01-15T08:00 --until 2026-01-15T20:00 --datasets oee stops
+
+Без --since/--until — окна провайдера по умолчанию (OEE и остановки — с начала смены,
+телеметрия — последние telemetry_window_minutes).
+"""
+from __future__ import annotations
+
+import argparse
+import os
+from datetime import datetime
+
+from ..config_loader import ConfigError, load_config
+from ..providers import get_provider
+from .parquet import DATASETS, ParquetExporter
+
+
+def main() -> None:
+    p = argparse.ArgumentParser(description="Export OEE, stops and telemetry to partitioned Parquet")
+    p.add_argument("--config", default=os.environ.get("OEE_CONFIG", "config/advanced.yaml"))
+    p.add_argument("--out", default="data/export")
+    p.add_argument("--since", type=datetime.fromisoformat)
+    p.add_argument("--until", type=datetime.fromisoformat)
+    p.add_argument("--machines", nargs="*", help="machine ids (default: whole fleet)")
+    p.add_argument("--datasets", nargs="*", choices=sorted(DATASETS), default=list(DATASETS))
+    p.add_argument("--compression", default="zstd")
+    args = p.parse_args()
+
+    try:
+        cfg = load_config(args.config)
+    except ConfigError as e:
+        raise SystemExit(str(e))
+    provider = get_provider(cfg["provider"], cfg.get("provider_options"), batch=True)
+    exporter = ParquetExporter(args.out, compression=args.compression)
+    write = {"oee": exporter.write_oee, "stops": exporter.write_stops, "telemetry": exporter.write_telemetry}
+    for name in args.datasets:
+        s = write[name](provider, args.machines or None, args.since, args.until)
+        print(f"{s.dataset:10s} rows={s.rows:>10d} files={s.files:>3d} size={s.bytes / 1024:>9.1f} KiB "
+              f"time={s.seconds:.2f}s")
+
+
+if __name__ == "__main__":
+    main()
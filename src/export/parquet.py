@@ -0,0 +1,284 @@
+"""
+Выгрузка данных цеха в Parquet (через Arrow) и запросы к выгрузке.
+
+Наборы: oee (интервалы OEE), stops (остановки), telemetry (датчики). Каждый набор —
+каталог с hive-разбиением по дате: <root>/<набор>/date=YYYY-MM-DD/part-0.parquet.
+Данные пишутся пачками станков прямо из массивов провайдера в таблицы Arrow — общий
+DataFrame на весь парк не собирается. Станки идут в порядке machine_id, поэтому
+у каждой row group узкий диапазон machine_id в статистике, и запрос по станку
+читает только свои группы; фильтр по времени отсекает и каталоги дат.
+
+    exporter = ParquetExporter("data/export")
+    exporter.export_all(provider, since=shift_start)
+    table = query("data/export", "telemetry", machine_ids=["CNC-MILL-1"], since=t0, until=t1)
+    df = table.to_pandas()
+"""
+from __future__ import annotations
+
+import shutil
+import time
+from dataclasses import dataclass
+from datetime import date, datetime
+from pathlib import Path
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Sequence, Tuple
+
+import numpy as np
+import pandas as pd
+
+from ..observability.metrics import span
+from ..providers.base import ShopfloorProvider
+from ..tables import STOP_REASONS
+from ..telemetry.fleet import CHANNELS
+
+# набор -> колонка времени (по ней разбиение на даты и фильтр since/until)
+DATASETS: Dict[str, str] = {"oee": "ts", "stops": "start", "telemetry": "ts"}
+
+
+def _pyarrow() -> Tuple[Any, Any, Any]:
+    try:
+        import pyarrow as pa
+        import pyarrow.dataset as ds
+        import pyarrow.parquet as pq
+    except ImportError:
+        raise ImportError("Parquet export needs pyarrow: pip install pyarrow") from None
+    return pa, ds, pq
+
+
+def _schemas(pa: Any) -> Dict[str, Any]:
+    ts = pa.timestamp("us")
+    text = pa.string()  # повторы machine_id/line_id/reason Parquet сам сожмёт словарём
+    return {
+        "oee": pa.schema([("ts", ts), ("machine_id", text), ("line_id", text), ("oee_percent", pa.float64())]),
+        "stops": pa.schema([
+            ("start", ts), ("end", ts), ("machine_id", text), ("line_id", text), ("reason", text),
+            ("duration_min", pa.float64()), ("note", pa.string()),
+        ]),
+        "telemetry": pa.schema(
+            [("ts", ts), ("machine_id", text), ("line_id", text)] + [(ch, pa.float64()) for ch in CHANNELS]
+        ),
+    }
+
+
+@dataclass(frozen=True)
+class ExportStats:
+    dataset: str
+    rows: int
+    files: int
+    bytes: int
+    seconds: float
+
+
+def _frame_columns(df: pd.DataFrame, columns: Sequence[str]) -> Tuple[np.ndarray, List[np.ndarray]]:
+    """Время и колонки кадра провайдера массивами (без копий, где dtype уже подходит)."""
+    if "timestamp" in df.columns:
+        ts = pd.to_datetime(df["timestamp"]).to_numpy(dtype="datetime64[us]")
+    else:
+        ts = df.index.to_numpy(dtype="datetime64[us]")
+    return ts, [df[c].to_numpy(dtype=np.float64, na_value=np.nan) for c in columns]
+
+
+class _PartitionedWriter:
+    """ParquetWriter на каждую дату набора; пачка раскладывается по датам колонки времени."""
+
+    def __init__(self, root: Path, schema: Any, time_col: str, compression: str, row_group_rows: int):
+        self.pa, _, self.pq = _pyarrow()
+        self.root = root
+        self.schema = schema
+        self.time_col = time_col
+        self.compression = compression
+        self.row_group_rows = row_group_rows
+        self._writers: Dict[np.datetime64, Any] = {}
+        self.rows = 0
+
+    def write(self, columns: Dict[str, Any]) -> None:
+        day = np.asarray(columns[self.time_col]).astype("datetime64[D]")
+        if not len(day):
+            return
+        days = np.unique(day)
+        for d in days:
+            mask = None if len(days) == 1 else day == d
+            arrays = [self._array(columns[f.name], f.type, mask) for f in self.schema]
+            table = self.pa.Table.from_arrays(arrays, schema=self.schema)
+            self._writer(d).write_table(table, row_group_size=self.row_group_rows)
+            self.rows += table.num_rows
+
+    def _array(self, values: Any, type_: Any, mask: Optional[np.ndarray]) -> Any:
+        values = np.asarray(values)
+        if mask is not None:
+            values = values[mask]
+        return self.pa.array(values, type=type_, from_pandas=True)  # NaN/None -> null
+
+    def _writer(self, day: np.datetime64) -> Any:
+        if day not in self._writers:
+            path = self.root / f"date={day}" / "part-0.parquet"
+            path.parent.mkdir(parents=True, exist_ok=True)
+            self._writers[day] = self.pq.ParquetWriter(path, self.schema, compression=self.compression)
+        return self._writers[day]
+
+    def close(self) -> int:
+        for w in self._writers.values():
+            w.close()
+        files = len(self._writers)
+        self._writers.clear()
+        return files
+
+
+class ParquetExporter:
+    def __init__(self, root: str = "data/export", compression: str = "zstd", batch_machines: int = 256,
+                 row_group_rows: int = 64_000):
+        self.root = Path(root)
+        self.compression = compression
+        self.batch_machines = batch_machines
+        self.row_group_rows = row_group_rows
+
+    def _batches(self, provider: ShopfloorProvider,
+                 machine_ids: Optional[Iterable[str]]) -> Iterator[Tuple[List[str], Dict[str, str]]]:
+        lines = {m.machine_id: m.line_id or "" for m in provider.get_overview()}
+        # порядок machine_id: row group'ы получают непересекающиеся диапазоны станков
+        ids = sorted(lines if machine_ids is None else machine_ids)
+        for i in range(0, len(ids), self.batch_machines):
+            yield ids[i:i + self.batch_machines], lines
+
+    def _run(self, dataset: str, fill: Any) -> ExportStats:
+        pa, _, _ = _pyarrow()
+        target = self.root / dataset
+        if target.exists():
+            shutil.rmtree(target)  # выгрузка — снимок: набор перезаписывается целиком
+        writer = _PartitionedWriter(target, _schemas(pa)[dataset], DATASETS[dataset], self.compression,
+                                    self.row_group_rows)
+        t0 = time.perf_counter()
+        with span(f"export.{dataset}"):
+            try:
+                fill(writer)
+            finally:
+                files = writer.close()
+        size = sum(p.stat().st_size for p in target.rglob("*.parquet")) if target.exists() else 0
+        return ExportStats(dataset, writer.rows, files, size, time.perf_counter() - t0)
+
+    def write_oee(self, provider: ShopfloorProvider, machine_ids: Optional[Iterable[str]] = None,
+                  since: Optional[datetime] = None, until: Optional[datetime] = None) -> ExportStats:
+        def fill(writer: _PartitionedWriter) -> None:
+            for ids, lines in self._batches(provider, machine_ids):
+                frames = provider.get_oee_timeseries_many(ids, since, until)
+                ts, mids, oee = [], [], []
+                for mid in ids:
+                    df = frames.get(mid)
+                    if df is None or not len(df):
+                        continue
+                    t, (v,) = _frame_columns(df, ["oee_percent"])
+                    ts.append(t)
+                    oee.append(v)
+                    mids.append(np.full(len(t), mid, dtype=object))
+                if ts:
+                    mid_col = np.concatenate(mids)
+                    writer.write({
+                        "ts": np.concatenate(ts), "machine_id": mid_col,
+                        "line_id": np.array([lines.get(m, "") for m in mid_col], dtype=object),
+                        "oee_percent": np.concatenate(oee),
+                    })
+
+        return self._run("oee", fill)
+
+    def write_stops(self, provider: ShopfloorProvider, machine_ids: Optional[Iterable[str]] = None,
+                    since: Optional[datetime] = None, until: Optional[datetime] = None) -> ExportStats:
+        def fill(writer: _PartitionedWriter) -> None:
+            for ids, lines in self._batches(provider, machine_ids):
+                t = provider.get_stop_table(ids, since, until)
+                if not len(t.start):
+                    continue
+                order = np.lexsort((t.start, t.machine))
+                machine = np.asarray(t.machine_ids, dtype=object)[t.machine[order]]
+                notes = np.asarray(t.notes + (None,), dtype=object)  # код -1 — без примечания
+                start, end = t.start[order], t.end[order]
+                writer.write({
+                    "start": start.astype("datetime64[us]"), "end": end.astype("datetime64[us]"),
+                    "machine_id": machine,
+                    "line_id": np.array([lines.get(m, "") for m in machine], dtype=object),
+                    "reason": np.asarray(STOP_REASONS, dtype=object)[t.reason[order]],
+                    "duration_min": np.round((end - start) / np.timedelta64(1, "m"), 1),
+                    "note": notes[t.note[order]],
+                })
+
+        return self._run("stops", fill)
+
+    def write_telemetry(self, provider: ShopfloorProvider, machine_ids: Optional[Iterable[str]] = None,
+                        since: Optional[datetime] = None, until: Optional[datetime] = None) -> ExportStats:
+        def fill(writer: _PartitionedWriter) -> None:
+            for ids, lines in self._batches(provider, machine_ids):
+                frames = provider.get_telemetry_many(ids, since, until)
+                ts: List[np.ndarray] = []
+                mids: List[np.ndarray] = []
+                cols: List[List[np.ndarray]] = [[] for _ in CHANNELS]
+                for mid in ids:
+                    df = frames.get(mid)
+                    if df is None or not len(df):
+                        continue  # провайдер не отдаёт телеметрию станка
+                    t, values = _frame_columns(df, CHANNELS)
+                    ts.append(t)
+                    mids.append(np.full(len(t), mid, dtype=object))
+                    for acc, v in zip(cols, values):
+                        acc.append(v)
+                if ts:
+                    mid_col = np.concatenate(mids)
+                    out = {"ts": np.concatenate(ts), "machine_id": mid_col,
+                           "line_id": np.array([lines.get(m, "") for m in mid_col], dtype=object)}
+                    out.update({ch: np.concatenate(acc) for ch, acc in zip(CHANNELS, cols)})
+                    writer.write(out)
+
+        return self._run("telemetry", fill)
+
+    def export_all(self, provider: ShopfloorProvider, machine_ids: Optional[Iterable[str]] = None,
+                   since: Optional[datetime] = None, until: Optional[datetime] = None) -> List[ExportStats]:
+        ids = None if machine_ids is None else list(machine_ids)
+        return [
+            self.write_oee(provider, ids, since, until),
+            self.write_stops(provider, ids, since, until),
+            self.write_telemetry(provider, ids, since, until),
+        ]
+
+
+def _day(ts: datetime) -> date:
+    return ts.date() if isinstance(ts, datetime) else ts
+
+
+def query(root: str, dataset: str, machine_ids: Optional[Iterable[str]] = None,
+          since: Optional[datetime] = None, until: Optional[datetime] = None,
+          columns: Optional[Sequence[str]] = None) -> Any:
+    """
+    Строки набора за [since, until) по станкам — pyarrow.Table. Фильтр уходит в чтение:
+    каталоги date= вне интервала не открываются, row group'ы отсекаются по статистике
+    колонки времени и machine_id.
+    """
+    if dataset not in DATASETS:
+        raise ValueError(f"неизвестный набор {dataset!r}; есть: {sorted(DATASETS)}")
+    pa, ds, _ = _pyarrow()
+    time_col = DATASETS[dataset]
+    data = ds.dataset(
+        str(Path(root) / dataset), format="parquet",
+        partitioning=ds.partitioning(pa.schema([("date", pa.date32())]), flavor="hive"),
+    )
+    expr = None
+
+    def both(e: Any) -> None:
+        nonlocal expr
+        expr = e if expr is None else expr & e
+
+    if since is not None:
+        both(ds.field("date") >= pa.scalar(_day(since), pa.date32()))
+        both(ds.field(time_col) >= pa.scalar(pd.Timestamp(since).to_pydatetime(), pa.timestamp("us")))
+    if until is not None:
+        # until — исключая; дата until ещё может содержать строки раньше until
+        both(ds.field("date") <= pa.scalar(_day(until), pa.date32()))
+        both(ds.field(time_col) < pa.scalar(pd.Timestamp(until).to_pydatetime(), pa.timestamp("us")))
+    if machine_ids is not None:
+        both(ds.field("machine_id").isin(list(machine_ids)))
+    with span(f"export.query.{dataset}"):
+        return data.to_table(columns=list(columns) if columns else None, filter=expr)
+
+
+def query_df(root: str, dataset: str, machine_ids: Optional[Iterable[str]] = None,
+             since: Optional[datetime] = None, until: Optional[datetime] = None,
+             columns: Optional[Sequence[str]] = None) -> pd.DataFrame:
+    """То же, что query(), сразу DataFrame."""
+    return query(root, dataset, machine_ids, since, until, columns).to_pandas()
+
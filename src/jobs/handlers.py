@@ -0,0 +1,133 @@
+"""
+Обработчики задач приложения: AI-рекомендация и вызовы ERP. Все данные задачи —
+в payload (JSON), поэтому задача переживает rerun и перезапуск процесса.
+
+    ai.recommendation   {"input": <JSON-вход модели>, "stream": bool}  -> AiRecommendation (dict)
+    erp.submit          {"body": {...}}                                 -> ответ ERP {ok, erp_id, ...}
+    erp.refresh         {"request_id": ...}                             -> документ заявки или None
+    erp.update_status   {"request_id", "status", "note"}                -> документ заявки после смены
+    erp.history         {"request_id": ...}                             -> история статусов
+    erp.inbox           {}                                              -> inbox ERP
+    erp.sync            {"limit": n}                                    -> {pushed, failed, refreshed}
+
+erp.sync — синхронизация реестра заявок (src/maintenance/requests.py) с ERP:
+неотправленные заявки уходят POST-ом, у открытых отправленных сверяется статус.
+"""
+from __future__ import annotations
+
+from typing import Any, Callable, Dict, Optional
+
+import requests
+
+from ..erp.client import ErpClient
+from ..maintenance.requests import RequestStore
+from .worker import Handler, JobCancelled, JobContext, PermanentError
+
+AI_RECOMMENDATION = "ai.recommendation"
+ERP_SUBMIT = "erp.submit"
+ERP_REFRESH = "erp.refresh"
+ERP_UPDATE_STATUS = "erp.update_status"
+ERP_HISTORY = "erp.history"
+ERP_INBOX = "erp.inbox"
+ERP_SYNC = "erp.sync"
+
+# действие пользователя — раньше фонового опроса
+PRIORITY_INTERACTIVE = 10
+PRIORITY_BACKGROUND = 0
+
+
+def _erp_call(fn: Callable[[], Any]) -> Any:
+    # 4xx (кроме 408/429) повторять бессмысленно — ошибка в данных заявки
+    try:
+        return fn()
+    except requests.HTTPError as e:
+        code = e.response.status_code if e.response is not None else None
+        if code is not None and 400 <= code < 500 and code not in (408, 429):
+            raise PermanentError(f"ERP {code}: {e.response.text[:200]}") from e
+        raise
+
+
+def ai_recommendation(ctx: JobContext) -> Dict[str, Any]:
+    # импорт здесь: src.ai.service создаёт клиента OpenAI при импорте
+    from ..ai.service import recommend_from_input, stream_from_input
+    from ..ai.streaming import AiCancelled
+
+    payload = ctx.payload
+    if not payload.get("stream", True):
+        return recommend_from_input(payload["input"]).model_dump()
+    try:
+        rec = stream_from_input(payload["input"], on_partial=ctx.partial, cancelled=ctx.cancelled)
+    except AiCancelled as e:
+        raise JobCancelled(str(e)) from e
+    return rec.model_dump()
+
+
+def sync_requests(erp: ErpClient, store: RequestStore, ctx: Optional[JobContext] = None,
+                  limit: int = 100) -> Dict[str, int]:
+    """Один проход синхронизации: отправить PENDING/ERROR, затем сверить статусы открытых."""
+    pushed = failed = refreshed = 0
+    for req in store.pending_sync(limit):
+        if ctx is not None and ctx.cancelled():
+            raise JobCancelled("синхронизация отменена")
+        try:
+            resp = _erp_call(lambda: erp.create_request(req.erp_body()))
+        except PermanentError as e:
+            store.mark_sync_error(req.request_id, str(e))  # битая заявка не держит остальные
+            failed += 1
+            continue
+        except requests.RequestException as e:
+            store.mark_sync_error(req.request_id, f"{type(e).__name__}: {e}")
+            raise  # ERP недоступен — повтор всей задачи с паузой
+        store.mark_synced(req.request_id, resp.get("erp_id"), resp.get("status"))
+        pushed += 1
+    checked = []
+    for request_id in store.open_synced(limit):
+        if ctx is not None and ctx.cancelled():
+            raise JobCancelled("синхронизация отменена")
+        doc = erp.get_request(request_id)
+        if doc is not None and doc.get("status"):
+            store.set_status(request_id, doc["status"])
+            refreshed += 1
+        checked.append(request_id)
+    store.touch_synced(checked)
+    return {"pushed": pushed, "failed": failed, "refreshed": refreshed}
+
+
+def make_handlers(erp: ErpClient, store: Optional[RequestStore] = None) -> Dict[str, Handler]:
+    def submit(ctx: JobContext) -> Any:
+        return _erp_call(lambda: erp.create_request(ctx.payload["body"]))
+
+    def refresh(ctx: JobContext) -> Any:
+        doc = erp.get_request(ctx.payload["request_id"])
+        if store is not None and doc is not None:
+            store.set_status(ctx.payload["request_id"], doc["status"])
+        return doc
+
+    def update_status(ctx: JobContext) -> Any:
+        p = ctx.payload
+        _erp_call(lambda: erp.update_status(p["request_id"], p["status"], p.get("note")))
+        doc = erp.get_request(p["request_id"])
+        if store is not None and doc is not None:
+            store.set_status(p["request_id"], doc["status"])
+        return doc
+
+    def history(ctx: JobContext) -> Any:
+        return _erp_call(lambda: erp.history(ctx.payload["request_id"]))
+
+    def inbox(ctx: JobContext) -> Any:
+        return erp.inbox()
+
+    def sync(ctx: JobContext) -> Any:
+        return sync_requests(erp, store, ctx, limit=int(ctx.payload.get("limit", 100)))
+
+    handlers = {
+        AI_RECOMMENDATION: ai_recommendation,
+        ERP_SUBMIT: submit,
+        ERP_REFRESH: refresh,
+        ERP_UPDATE_STATUS: update_status,
+        ERP_HISTORY: history,
+        ERP_INBOX: inbox,
+    }
+    if store is not None:
+        handlers[ERP_SYNC] = sync
+    return handlers
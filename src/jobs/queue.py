@@ -0,0 +1,308 @@
+"""
+Очередь фоновых задач (SQLite): AI-рекомендации, отправка заявок в ERP, опрос
+статусов. UI только ставит задачу и читает её состояние — сетевые вызовы идут
+в пуле воркеров (worker.py) и не теряются при rerun.
+
+- дедупликация: пока задача с тем же dedup_key в очереди или выполняется,
+  enqueue возвращает её же;
+- приоритет: больше — раньше, при равном — по времени постановки;
+- повторы: ошибка -> снова в очередь с экспоненциальной паузой, пока не
+  исчерпаны max_attempts;
+- отмена: из очереди — сразу, выполняющаяся — флагом, который проверяет обработчик;
+- зависшие (воркер умер, heartbeat устарел) возвращаются в очередь (requeue_stale),
+  а исчерпавшие попытки — FAILED.
+"""
+from __future__ import annotations
+
+import json
+import sqlite3
+import threading
+import time
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any, Dict, Literal, Optional, Sequence, Union
+from uuid import uuid4
+
+JobStatus = Literal["QUEUED", "RUNNING", "DONE", "FAILED", "CANCELLED"]
+ACTIVE: Sequence[str] = ("QUEUED", "RUNNING")
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    job_id TEXT PRIMARY KEY, kind TEXT NOT NULL, dedup_key TEXT, priority INTEGER NOT NULL DEFAULT 0,
+    status TEXT NOT NULL, payload TEXT, result TEXT, partial TEXT, error TEXT,
+    attempts INTEGER NOT NULL DEFAULT 0, max_attempts INTEGER NOT NULL DEFAULT 3,
+    cancel_requested INTEGER NOT NULL DEFAULT 0,
+    run_after REAL NOT NULL, created_at REAL NOT NULL, started_at REAL, finished_at REAL,
+    worker TEXT, heartbeat REAL
+);
+-- не больше одной активной задачи на ключ
+CREATE UNIQUE INDEX IF NOT EXISTS jobs_active_dedup ON jobs (dedup_key)
+    WHERE dedup_key IS NOT NULL AND status IN ('QUEUED', 'RUNNING');
+CREATE INDEX IF NOT EXISTS jobs_ready ON jobs (status, priority DESC, created_at);
+CREATE INDEX IF NOT EXISTS jobs_key ON jobs (dedup_key, created_at);
+"""
+
+
+@dataclass(frozen=True)
+class Job:
+    job_id: str
+    kind: str
+    dedup_key: Optional[str]
+    priority: int
+    status: JobStatus
+    payload: Any
+    result: Any
+    partial: Any
+    error: Optional[str]
+    attempts: int
+    max_attempts: int
+    cancel_requested: bool
+    run_after: float
+    created_at: float
+    started_at: Optional[float]
+    finished_at: Optional[float]
+
+    @property
+    def active(self) -> bool:
+        return self.status in ACTIVE
+
+    @property
+    def age_s(self) -> float:
+        return time.time() - self.created_at
+
+
+_COLUMNS = (
+    "job_id, kind, dedup_key, priority, status, payload, result, partial, error, attempts, max_attempts, "
+    "cancel_requested, run_after, created_at, started_at, finished_at"
+)
+
+
+def _loads(raw: Optional[str]) -> Any:
+    return None if raw is None else json.loads(raw)
+
+
+def _row_to_job(row: Sequence[Any]) -> Job:
+    (job_id, kind, key, prio, status, payload, result, partial, error, attempts, max_attempts,
+     cancel, run_after, created, started, finished) = row
+    return Job(job_id, kind, key, int(prio), status, _loads(payload), _loads(result), _loads(partial), error,
+               int(attempts), int(max_attempts), bool(cancel), run_after, created, started, finished)
+
+
+def _dumps(value: Any) -> Optional[str]:
+    return None if value is None else json.dumps(value, ensure_ascii=False, default=str)
+
+
+class JobQueue:
+    def __init__(self, path: str = "data/jobs.sqlite", retry_base_s: float = 2.0, retry_max_s: float = 60.0):
+        self.path = path
+        self.retry_base_s = retry_base_s
+        self.retry_max_s = retry_max_s
+        if path != ":memory:":
+            Path(path).parent.mkdir(parents=True, exist_ok=True)
+        # один коннект на процесс (UI и воркеры — потоки одного процесса) — под замком
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._lock = threading.Lock()
+        self._wakeup = threading.Condition(threading.Lock())
+        with self._lock:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute("PRAGMA busy_timeout=5000")
+            self._conn.executescript(_SCHEMA)
+
+    def close(self) -> None:
+        self._conn.close()
+
+    # ------------------------------------------------------------------ постановка (UI)
+
+    def enqueue(
+        self,
+        kind: str,
+        payload: Any = None,
+        dedup_key: Optional[str] = None,
+        priority: int = 0,
+        max_attempts: int = 3,
+        delay_s: float = 0.0,
+    ) -> Job:
+        """Новая задача или уже активная с тем же dedup_key."""
+        now = time.time()
+        job_id = uuid4().hex
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                if dedup_key is not None:
+                    row = self._conn.execute(
+                        f"SELECT {_COLUMNS} FROM jobs WHERE dedup_key = ? AND status IN ('QUEUED', 'RUNNING')",
+                        (dedup_key,),
+                    ).fetchone()
+                    if row is not None:
+                        self._conn.execute("COMMIT")
+                        return _row_to_job(row)
+                self._conn.execute(
+                    "INSERT INTO jobs (job_id, kind, dedup_key, priority, status, payload, max_attempts, "
+                    "run_after, created_at) VALUES (?, ?, ?, ?, 'QUEUED', ?, ?, ?, ?)",
+                    (job_id, kind, dedup_key, priority, _dumps(payload), max_attempts, now + delay_s, now),
+                )
+                row = self._conn.execute(f"SELECT {_COLUMNS} FROM jobs WHERE job_id = ?", (job_id,)).fetchone()
+                self._conn.execute("COMMIT")
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                raise
+        self._notify()
+        return _row_to_job(row)
+
+    def cancel(self, job_id: str) -> Optional[Job]:
+        """Из очереди — сразу CANCELLED; выполняющейся ставится флаг (см. cancel_requested)."""
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                "UPDATE jobs SET status = 'CANCELLED', finished_at = ? WHERE job_id = ? AND status = 'QUEUED'",
+                (now, job_id),
+            )
+            self._conn.execute(
+                "UPDATE jobs SET cancel_requested = 1 WHERE job_id = ? AND status = 'RUNNING'", (job_id,)
+            )
+        return self.get(job_id)
+
+    # ------------------------------------------------------------------ чтение (UI)
+
+    def get(self, job_id: str) -> Optional[Job]:
+        with self._lock:
+            row = self._conn.execute(f"SELECT {_COLUMNS} FROM jobs WHERE job_id = ?", (job_id,)).fetchone()
+        return None if row is None else _row_to_job(row)
+
+    def latest(self, dedup_key: Union[str, Sequence[str]], status: Optional[Sequence[str]] = None) -> Optional[Job]:
+        """
+        Последняя задача по ключу (или любому из ключей) — например, самый свежий
+        документ заявки из опроса статуса или смены статуса. Завершённые — по времени завершения.
+        """
+        keys = [dedup_key] if isinstance(dedup_key, str) else list(dedup_key)
+        where, args = f"dedup_key IN ({','.join('?' * len(keys))})", keys
+        if status:
+            where += f" AND status IN ({','.join('?' * len(status))})"
+            args += list(status)
+        with self._lock:
+            row = self._conn.execute(
+                f"SELECT {_COLUMNS} FROM jobs WHERE {where} ORDER BY coalesce(finished_at, created_at) DESC LIMIT 1",
+                args,
+            ).fetchone()
+        return None if row is None else _row_to_job(row)
+
+    def counts(self) -> Dict[str, Dict[str, int]]:
+        """{kind: {status: n}} — для метрик и отладки."""
+        with self._lock:
+            rows = self._conn.execute("SELECT kind, status, count(*) FROM jobs GROUP BY kind, status").fetchall()
+        out: Dict[str, Dict[str, int]] = {}
+        for kind, status, n in rows:
+            out.setdefault(kind, {})[status] = int(n)
+        return out
+
+    # ------------------------------------------------------------------ выполнение (воркеры)
+
+    def claim(self, worker: str, kinds: Optional[Sequence[str]] = None) -> Optional[Job]:
+        """Взять самую приоритетную готовую задачу (атомарно: QUEUED -> RUNNING)."""
+        now = time.time()
+        where, args = "status = 'QUEUED' AND run_after <= ?", [now]
+        if kinds:
+            where += f" AND kind IN ({','.join('?' * len(kinds))})"
+            args += list(kinds)
+        with self._lock:
+            row = self._conn.execute(
+                f"UPDATE jobs SET status = 'RUNNING', attempts = attempts + 1, started_at = ?, worker = ?, "
+                f"heartbeat = ? WHERE job_id = (SELECT job_id FROM jobs WHERE {where} "
+                f"ORDER BY priority DESC, created_at LIMIT 1) RETURNING {_COLUMNS}",
+                [now, worker, now] + args,
+            ).fetchone()
+        return None if row is None else _row_to_job(row)
+
+    def heartbeat(self, job_id: str, partial: Any = None) -> bool:
+        """Отметка «жив» (и частичный результат); False — задачу попросили отменить."""
+        now = time.time()
+        with self._lock:
+            if partial is None:
+                row = self._conn.execute(
+                    "UPDATE jobs SET heartbeat = ? WHERE job_id = ? RETURNING cancel_requested", (now, job_id)
+                ).fetchone()
+            else:
+                row = self._conn.execute(
+                    "UPDATE jobs SET heartbeat = ?, partial = ? WHERE job_id = ? RETURNING cancel_requested",
+                    (now, _dumps(partial), job_id),
+                ).fetchone()
+        return not (row is None or row[0])
+
+    def complete(self, job_id: str, result: Any = None) -> None:
+        with self._lock:
+            self._conn.execute(
+                "UPDATE jobs SET status = 'DONE', result = ?, error = NULL, finished_at = ? "
+                "WHERE job_id = ? AND status = 'RUNNING'",
+                (_dumps(result), time.time(), job_id),
+            )
+
+    def fail(self, job_id: str, error: str, retry: bool = True) -> Optional[Job]:
+        """Ошибка: повтор с паузой retry_base_s * 2^(попытка-1), если попытки не исчерпаны, иначе FAILED."""
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT attempts, max_attempts, cancel_requested FROM jobs WHERE job_id = ?", (job_id,)
+            ).fetchone()
+            if row is None:
+                return None
+            attempts, max_attempts, cancel = row
+            if retry and not cancel and attempts < max_attempts:
+                pause = min(self.retry_max_s, self.retry_base_s * 2 ** (attempts - 1))
+                self._conn.execute(
+                    "UPDATE jobs SET status = 'QUEUED', error = ?, run_after = ?, worker = NULL WHERE job_id = ?",
+                    (error, now + pause, job_id),
+                )
+            else:
+                self._conn.execute(
+                    "UPDATE jobs SET status = ?, error = ?, finished_at = ? WHERE job_id = ?",
+                    ("CANCELLED" if cancel else "FAILED", error, now, job_id),
+                )
+        return self.get(job_id)
+
+    def mark_cancelled(self, job_id: str) -> None:
+        with self._lock:
+            self._conn.execute(
+                "UPDATE jobs SET status = 'CANCELLED', finished_at = ? WHERE job_id = ? AND status = 'RUNNING'",
+                (time.time(), job_id),
+            )
+
+    def requeue_stale(self, timeout_s: float = 120.0) -> int:
+        """
+        RUNNING без heartbeat дольше timeout_s (процесс упал) — обратно в очередь;
+        если попытки исчерпаны — FAILED (задача, роняющая воркер, не крутится вечно).
+        """
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                "UPDATE jobs SET status = 'FAILED', error = 'worker lost (no heartbeat)', finished_at = ? "
+                "WHERE status = 'RUNNING' AND heartbeat < ? AND attempts >= max_attempts",
+                (now, now - timeout_s),
+            )
+            cur = self._conn.execute(
+                "UPDATE jobs SET status = 'QUEUED', worker = NULL, run_after = ? "
+                "WHERE status = 'RUNNING' AND heartbeat < ?",
+                (now, now - timeout_s),
+            )
+        if cur.rowcount:
+            self._notify()
+        return cur.rowcount
+
+    def purge(self, older_than_s: float = 7 * 86400) -> int:
+        """Удалить завершённые задачи старше older_than_s."""
+        with self._lock:
+            cur = self._conn.execute(
+                "DELETE FROM jobs WHERE status NOT IN ('QUEUED', 'RUNNING') AND created_at < ?",
+                (time.time() - older_than_s,),
+            )
+        return cur.rowcount
+
+    # ------------------------------------------------------------------ ожидание новых задач
+
+    def _notify(self) -> None:
+        with self._wakeup:
+            self._wakeup.notify_all()
+
+    def wait(self, timeout: float) -> None:
+        """Воркеры ждут здесь: будит enqueue этого процесса, иначе — опрос по таймауту."""
+        with self._wakeup:
+            self._wakeup.wait(timeout)
@@ -0,0 +1,145 @@
+"""
+Пул воркеров очереди: потоки забирают задачи (claim) и вызывают обработчик по
+kind. Обработчик получает JobContext: payload, partial() для промежуточного
+результата (поток AI) и cancelled() — попросили ли отменить задачу.
+
+    pool = WorkerPool(queue, {"erp.submit": submit_handler}, workers=2).start()
+"""
+from __future__ import annotations
+
+import logging
+import threading
+import time
+from typing import Any, Callable, Dict, List, Optional
+
+from ..observability.counters import ShardedCounter
+from ..observability.metrics import observe
+from .queue import Job, JobQueue
+
+log = logging.getLogger(__name__)
+
+
+class JobCancelled(Exception):
+    """Обработчик прерван по запросу отмены."""
+
+
+class PermanentError(Exception):
+    """Ошибка, которую бессмысленно повторять (неверные данные и т.п.)."""
+
+
+class JobContext:
+    def __init__(self, queue: JobQueue, job: Job, partial_every_s: float = 0.25):
+        self.queue = queue
+        self.job = job
+        self.partial_every_s = partial_every_s
+        self._cancelled = False
+        self._last_beat = 0.0
+
+    @property
+    def payload(self) -> Any:
+        return self.job.payload
+
+    def cancelled(self) -> bool:
+        """Флаг отмены (читается из базы не чаще partial_every_s — заодно heartbeat)."""
+        self._beat(None, force=False)
+        return self._cancelled
+
+    def partial(self, value: Any) -> None:
+        """Промежуточный результат — UI читает его опросом; запись не чаще partial_every_s."""
+        self._beat(value, force=False)
+
+    def _beat(self, partial: Any, force: bool) -> None:
+        now = time.monotonic()
+        if not force and now - self._last_beat < self.partial_every_s:
+            return
+        self._last_beat = now
+        if not self.queue.heartbeat(self.job.job_id, partial):
+            self._cancelled = True
+
+
+Handler = Callable[[JobContext], Any]
+
+
+class WorkerPool:
+    def __init__(self, queue: JobQueue, handlers: Dict[str, Handler], workers: int = 2,
+                 poll_s: float = 0.5, stale_s: float = 120.0, name: str = "jobs"):
+        self.queue = queue
+        self.handlers = dict(handlers)
+        self.workers = workers
+        self.poll_s = poll_s
+        self.stale_s = stale_s
+        self.name = name
+        self.events = ShardedCounter("oee_jobs_total", "Задачи очереди по виду и исходу", ("kind", "outcome"))
+        self._stop = threading.Event()
+        self._threads: List[threading.Thread] = []
+
+    def start(self) -> "WorkerPool":
+        if self._threads:
+            return self
+        self.queue.requeue_stale(self.stale_s)  # остались RUNNING от прошлого процесса
+        for i in range(self.workers):
+            t = threading.Thread(target=self._loop, args=(f"{self.name}-{i}",), name=f"{self.name}-{i}", daemon=True)
+            t.start()
+            self._threads.append(t)
+        return self
+
+    def stop(self, timeout: float = 5.0) -> None:
+        self._stop.set()
+        self.queue._notify()
+        for t in self._threads:
+            t.join(timeout)
+        self._threads.clear()
+
+    def run_once(self, worker: str = "inline") -> Optional[Job]:
+        """Выполнить одну готовую задачу в текущем потоке (скрипты, отладка)."""
+        job = self.queue.claim(worker, list(self.handlers))
+        if job is not None:
+            self._run(job)
+        return job
+
+    def _loop(self, worker: str) -> None:
+        last_sweep = time.monotonic()
+        while not self._stop.is_set():
+            job = self.queue.claim(worker, list(self.handlers))
+            if job is None:
+                self.queue.wait(self.poll_s)
+                if time.monotonic() - last_sweep > self.stale_s:
+                    last_sweep = time.monotonic()
+                    self.queue.requeue_stale(self.stale_s)
+                continue
+            self._run(job)
+
+    def _keepalive(self, ctx: JobContext, done: threading.Event) -> None:
+        """Heartbeat из отдельного потока: блокирующий обработчик (долгий вызов ERP) не считается зависшим."""
+        while not done.wait(self.stale_s / 4):
+            if not self.queue.heartbeat(ctx.job.job_id):
+                ctx._cancelled = True
+
+    def _run(self, job: Job) -> None:
+        ctx = JobContext(self.queue, job)
+        started = time.perf_counter()
+        outcome = "done"
+        done = threading.Event()
+        threading.Thread(target=self._keepalive, args=(ctx, done), name=f"{self.name}-beat", daemon=True).start()
+        try:
+            result = self.handlers[job.kind](ctx)
+        except JobCancelled:
+            self.queue.mark_cancelled(job.job_id)
+            outcome = "cancelled"
+        except PermanentError as e:
+            self.queue.fail(job.job_id, str(e), retry=False)
+            outcome = "failed"
+        except Exception as e:  # сеть, 5xx, таймауты — повтор с паузой
+            log.warning("job %s (%s) attempt %d failed: %s", job.job_id, job.kind, job.attempts, e)
+            after = self.queue.fail(job.job_id, f"{type(e).__name__}: {e}")
+            outcome = "retry" if after is not None and after.status == "QUEUED" else "failed"
+        else:
+            if ctx._cancelled:
+                self.queue.mark_cancelled(job.job_id)
+                outcome = "cancelled"
+            else:
+                self.queue.complete(job.job_id, result)
+        finally:
+            done.set()
+        observe(f"jobs.{job.kind}", time.perf_counter() - started)
+        self.events.inc((job.kind, outcome))
@@ -0,0 +1,349 @@
+"""
+Реестр заявок на ТО (SQLite), общий для всех сессий и переживающий перезапуск.
+Выборки и счётчики идут по индексам (станок, приоритет, статус, created_at,
+линия), а не перебором списка в Python. Отправка в ERP — синхронизация реестра:
+несинхронизированные заявки уходят фоновой задачей erp.sync, статусы из ERP
+возвращаются в реестр.
+
+    store = RequestStore("data/maintenance.sqlite")
+    store.add(req, line_id="L1")
+    store.listing(priority="CRITICAL", status=OPEN_STATUSES, limit=50)
+    store.open_critical_by_line()              # {line_id: n}
+"""
+from __future__ import annotations
+
+import json
+import sqlite3
+import threading
+from dataclasses import asdict, dataclass, field
+from datetime import datetime, timedelta
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Sequence, Tuple, Union
+
+import pandas as pd
+
+PRIORITIES = ("LOW", "MEDIUM", "HIGH", "CRITICAL")
+STATUSES = ("NEW", "IN_PROGRESS", "DONE", "CANCELLED")
+OPEN_STATUSES = ("NEW", "IN_PROGRESS")
+# синхронизация с ERP: PENDING — ещё не отправлена, SYNCED — есть erp_id, ERROR — последняя попытка не удалась
+SYNC_STATES = ("PENDING", "SYNCED", "ERROR")
+# повтор после ошибки отправки: пауза удваивается с каждой попыткой, но не больше часа
+SYNC_RETRY_BASE_S = 60
+SYNC_RETRY_MAX_S = 3600
+
+
+@dataclass
+class MaintenanceRequest:
+    request_id: str
+    created_at: str
+    machine_id: str
+    machine_name: str
+    priority: str
+    recommended_action: str
+    reason: str
+    oee_percent: float | None
+    stops_count: int | None
+    telemetry_status: str
+    telemetry_last: dict
+    telemetry_max: dict
+    alarms: dict
+    estimated_loss: float | None
+    currency: str | None
+    ai: dict
+    payload_for_erp: dict
+    line_id: Optional[str] = None
+    status: str = "NEW"
+    erp_id: Optional[str] = None
+    sync_state: str = "PENDING"
+    sync_error: Optional[str] = None
+    extra: Dict[str, Any] = field(default_factory=dict)
+
+    def erp_body(self) -> Dict[str, Any]:
+        """Тело POST /api/v1/maintenance_requests (минимально приводим к формату API)."""
+        payload = self.payload_for_erp or {}
+        return {
+            "request_id": self.request_id,
+            "created_at": self.created_at,
+            "machine_id": self.machine_id,
+            "priority": self.priority,
+            "work_type": payload.get("work_type", "Диагностика"),
+            "comment": payload.get("comment", ""),
+            "telemetry": payload.get("telemetry", {}),
+            "economics": payload.get("economics", {}),
+            "ai": self.ai,
+        }
+
+
+# поля заявки, которые живут в колонках (по ним фильтры/сортировки), остальное — в doc (JSON)
+_COLUMNS = (
+    "request_id", "created_at", "machine_id", "machine_name", "line_id", "priority", "status",
+    "recommended_action", "reason", "oee_percent", "stops_count", "telemetry_status",
+    "estimated_loss", "currency", "erp_id", "sync_state", "sync_error",
+)
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS maintenance_requests (
+    request_id TEXT PRIMARY KEY, created_at TEXT NOT NULL,
+    machine_id TEXT NOT NULL, machine_name TEXT, line_id TEXT,
+    priority TEXT NOT NULL, priority_rank INTEGER NOT NULL, status TEXT NOT NULL DEFAULT 'NEW',
+    recommended_action TEXT, reason TEXT, oee_percent REAL, stops_count INTEGER, telemetry_status TEXT,
+    estimated_loss REAL, currency TEXT,
+    erp_id TEXT, sync_state TEXT NOT NULL DEFAULT 'PENDING', sync_error TEXT, synced_at TEXT,
+    sync_attempts INTEGER NOT NULL DEFAULT 0, next_sync_at TEXT,
+    updated_at TEXT NOT NULL, doc TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS mr_machine ON maintenance_requests (machine_id, created_at);
+CREATE INDEX IF NOT EXISTS mr_priority ON maintenance_requests (priority_rank, created_at);
+CREATE INDEX IF NOT EXISTS mr_status ON maintenance_requests (status, created_at);
+CREATE INDEX IF NOT EXISTS mr_created ON maintenance_requests (created_at);
+CREATE INDEX IF NOT EXISTS mr_line ON maintenance_requests (line_id, status, priority_rank);
+-- открытые CRITICAL по линиям (плитки над реестром): частичный индекс только по ним, без чтения строк
+CREATE INDEX IF NOT EXISTS mr_open_critical ON maintenance_requests (line_id)
+    WHERE priority_rank = 3 AND status IN ('NEW', 'IN_PROGRESS');
+-- очередь синхронизации с ERP маленькая: частичный индекс только по несинхронизированным
+CREATE INDEX IF NOT EXISTS mr_sync ON maintenance_requests (priority_rank DESC, created_at)
+    WHERE sync_state != 'SYNCED';
+CREATE INDEX IF NOT EXISTS mr_open_synced ON maintenance_requests (synced_at)
+    WHERE sync_state = 'SYNCED' AND status IN ('NEW', 'IN_PROGRESS');
+"""
+# колонки, добавленные после первой версии схемы (реестры, созданные раньше, догоняются ALTER TABLE)
+_ADDED_COLUMNS = {"sync_attempts": "INTEGER NOT NULL DEFAULT 0", "next_sync_at": "TEXT"}
+
+Filter = Union[None, str, Sequence[str]]
+
+
+def _in(column: str, value: Filter) -> Tuple[str, List[Any]]:
+    if value is None:
+        return "", []
+    values = [value] if isinstance(value, str) else list(value)
+    return f" AND {column} IN ({','.join('?' * len(values))})", values
+
+
+def _now() -> str:
+    return datetime.now().isoformat(timespec="seconds")
+
+
+class RequestStore:
+    def __init__(self, path: str = "data/maintenance.sqlite"):
+        self.path = path
+        if path != ":memory:":
+            Path(path).parent.mkdir(parents=True, exist_ok=True)
+        # один коннект на процесс (сессии Streamlit и воркеры очереди — потоки) — под замком
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._lock = threading.Lock()
+        with self._lock:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.executescript(_SCHEMA)
+            have = {r[1] for r in self._conn.execute("PRAGMA table_info(maintenance_requests)")}
+            with self._conn:
+                for name, decl in _ADDED_COLUMNS.items():
+                    if name not in have:
+                        self._conn.execute(f"ALTER TABLE maintenance_requests ADD COLUMN {name} {decl}")
+
+    def close(self) -> None:
+        self._conn.close()
+
+    # ------------------------------------------------------------------ запись
+
+    def add(self, req: MaintenanceRequest, line_id: Optional[str] = None) -> MaintenanceRequest:
+        if line_id is not None:
+            req.line_id = line_id
+        self.add_many([req])
+        return req
+
+    def add_many(self, reqs: Sequence[MaintenanceRequest]) -> int:
+        """Пачка заявок одной транзакцией (импорт, нагрузочные замеры)."""
+        now = _now()
+        rows = []
+        for req in reqs:
+            doc = asdict(req)
+            rows.append([doc[c] for c in _COLUMNS]
+                        + [PRIORITIES.index(req.priority), now, json.dumps(doc, ensure_ascii=False, default=str)])
+        with self._lock, self._conn:
+            self._conn.executemany(
+                f"INSERT INTO maintenance_requests ({', '.join(_COLUMNS)}, priority_rank, updated_at, doc) "
+                f"VALUES ({', '.join('?' * (len(_COLUMNS) + 3))})",
+                rows,
+            )
+        return len(rows)
+
+    def set_status(self, request_id: str, status: str) -> None:
+        """Статус из ERP (опрос/смена статуса) — в реестр."""
+        if status not in STATUSES:
+            raise ValueError(f"Unknown request status {status!r}; allowed: {list(STATUSES)}")
+        with self._lock, self._conn:
+            self._conn.execute(
+                "UPDATE maintenance_requests SET status = ?, updated_at = ? WHERE request_id = ? AND status != ?",
+                (status, _now(), request_id, status),
+            )
+
+    def mark_synced(self, request_id: str, erp_id: Optional[str], status: Optional[str] = None) -> None:
+        with self._lock, self._conn:
+            self._conn.execute(
+                "UPDATE maintenance_requests SET sync_state = 'SYNCED', sync_error = NULL, sync_attempts = 0, "
+                "next_sync_at = NULL, erp_id = ?, "
+                "status = coalesce(?, status), synced_at = ?, updated_at = ? WHERE request_id = ?",
+                (erp_id, status, _now(), _now(), request_id),
+            )
+
+    def mark_sync_error(self, request_id: str, error: str) -> None:
+        """Неудачная отправка: следующая попытка — не раньше чем через SYNC_RETRY_BASE_S * 2^(попытки-1)."""
+        now = datetime.now()
+        with self._lock, self._conn:
+            row = self._conn.execute(
+                "SELECT sync_attempts FROM maintenance_requests WHERE request_id = ?", (request_id,)
+            ).fetchone()
+            attempts = (row[0] if row else 0) + 1
+            delay = min(SYNC_RETRY_BASE_S * 2 ** min(attempts - 1, 16), SYNC_RETRY_MAX_S)
+            self._conn.execute(
+                "UPDATE maintenance_requests SET sync_state = 'ERROR', sync_error = ?, sync_attempts = ?, "
+                "next_sync_at = ?, updated_at = ? WHERE request_id = ?",
+                (error[:500], attempts, (now + timedelta(seconds=delay)).isoformat(timespec="seconds"),
+                 now.isoformat(timespec="seconds"), request_id),
+            )
+
+    def touch_synced(self, request_ids: Sequence[str]) -> None:
+        """Отметить, что статусы этих заявок только что сверены с ERP (очередь сверки — по synced_at)."""
+        with self._lock, self._conn:
+            self._conn.executemany(
+                "UPDATE maintenance_requests SET synced_at = ? WHERE request_id = ?",
+                [(_now(), rid) for rid in request_ids],
+            )
+
+    # ------------------------------------------------------------------ чтение
+
+    def get(self, request_id: str) -> Optional[MaintenanceRequest]:
+        with self._lock:
+            row = self._conn.execute(
+                f"SELECT doc, {', '.join(_COLUMNS)} FROM maintenance_requests WHERE request_id = ?", (request_id,)
+            ).fetchone()
+        return None if row is None else self._from_row(row)
+
+    def latest(self, machine_id: Optional[str] = None) -> Optional[MaintenanceRequest]:
+        where, args = _in("machine_id", machine_id)
+        with self._lock:
+            row = self._conn.execute(
+                f"SELECT doc, {', '.join(_COLUMNS)} FROM maintenance_requests WHERE 1 = 1{where} "
+                "ORDER BY created_at DESC LIMIT 1",
+                args,
+            ).fetchone()
+        return None if row is None else self._from_row(row)
+
+    def count(self) -> int:
+        with self._lock:
+            return int(self._conn.execute("SELECT count(*) FROM maintenance_requests").fetchone()[0])
+
+    def _where(self, machine_id: Filter = None, line_id: Filter = None, priority: Filter = None,
+               status: Filter = None, since: Optional[str] = None, until: Optional[str] = None,
+               sync_state: Filter = None) -> Tuple[str, List[Any]]:
+        where, args = "", []
+        ranks = None if priority is None else [
+            PRIORITIES.index(p) for p in ([priority] if isinstance(priority, str) else priority)
+        ]
+        for column, value in (("machine_id", machine_id), ("line_id", line_id), ("priority_rank", ranks),
+                              ("status", status), ("sync_state", sync_state)):
+            clause, values = _in(column, value)
+            where, args = where + clause, args + values
+        if since is not None:
+            where, args = where + " AND created_at >= ?", args + [since]
+        if until is not None:
+            where, args = where + " AND created_at < ?", args + [until]
+        return where, args
+
+    def listing(self, machine_id: Filter = None, line_id: Filter = None, priority: Filter = None,
+                status: Filter = None, since: Optional[str] = None, until: Optional[str] = None,
+                sync_state: Filter = None, limit: int = 50, offset: int = 0) -> pd.DataFrame:
+        """Заявки по фильтрам, новые сверху — только колонки реестра, без разбора JSON."""
+        where, args = self._where(machine_id, line_id, priority, status, since, until, sync_state)
+        with self._lock:
+            return pd.read_sql_query(
+                f"SELECT {', '.join(_COLUMNS)} FROM maintenance_requests WHERE 1 = 1{where} "
+                "ORDER BY created_at DESC LIMIT ? OFFSET ?",
+                self._conn, params=args + [limit, offset],
+            )
+
+    def counts(self, by: Sequence[str] = ("status",), **filters: Any) -> pd.DataFrame:
+        """Счётчики по колонкам (line_id / machine_id / priority / status / sync_state) с фильтрами listing()."""
+        allowed = {"line_id", "machine_id", "priority", "status", "sync_state"}
+        if not set(by) <= allowed:
+            raise ValueError(f"группировка только по {sorted(allowed)}")
+        cols = ", ".join(by)
+        where, args = self._where(**filters)
+        with self._lock:
+            return pd.read_sql_query(
+                f"SELECT {cols}, count(*) AS n FROM maintenance_requests WHERE 1 = 1{where} "
+                f"GROUP BY {cols} ORDER BY {cols}",
+                self._conn, params=args,
+            )
+
+    def open_critical_by_line(self) -> Dict[Optional[str], int]:
+        """Открытые (NEW/IN_PROGRESS) CRITICAL по линиям — из частичного индекса mr_open_critical."""
+        with self._lock:
+            # условие буквально совпадает с WHERE индекса (без параметров); INDEXED BY —
+            # чтобы план не зависел от статистики ANALYZE
+            rows = self._conn.execute(
+                "SELECT line_id, count(*) FROM maintenance_requests INDEXED BY mr_open_critical "
+                "WHERE priority_rank = 3 AND status IN ('NEW', 'IN_PROGRESS') GROUP BY line_id"
+            ).fetchall()
+        return {line: int(n) for line, n in rows}
+
+    def sync_summary(self) -> Dict[str, int]:
+        """Сколько заявок ждёт отправки / с ошибкой / открыто в ERP — по частичным индексам."""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT sync_state, count(*) FROM maintenance_requests WHERE sync_state != 'SYNCED' "
+                "GROUP BY sync_state"
+            ).fetchall()
+            open_synced = self._conn.execute(
+                "SELECT count(*) FROM maintenance_requests INDEXED BY mr_open_synced "
+                "WHERE sync_state = 'SYNCED' AND status IN ('NEW', 'IN_PROGRESS')"
+            ).fetchone()[0]
+        out = {"PENDING": 0, "ERROR": 0}
+        out.update({state: int(n) for state, n in rows})
+        out["OPEN_SYNCED"] = int(open_synced)
+        return out
+
+    # ------------------------------------------------------------------ синхронизация с ERP
+
+    def pending_sync(self, limit: int = 100) -> List[MaintenanceRequest]:
+        """
+        Ещё не отправленные, затем те, у которых подошёл срок повтора после ошибки;
+        внутри — CRITICAL первыми, затем по времени. Заявки с ошибкой не вытесняют новые из LIMIT.
+        """
+        select = f"SELECT doc, {', '.join(_COLUMNS)} FROM maintenance_requests INDEXED BY mr_sync "
+        with self._lock:
+            rows = self._conn.execute(
+                select + "WHERE sync_state != 'SYNCED' AND sync_state = 'PENDING' "
+                "ORDER BY priority_rank DESC, created_at LIMIT ?",
+                (limit,),
+            ).fetchall()
+            if len(rows) < limit:
+                rows += self._conn.execute(
+                    select + "WHERE sync_state != 'SYNCED' AND sync_state = 'ERROR' "
+                    "AND coalesce(next_sync_at, '') <= ? "
+                    "ORDER BY priority_rank DESC, created_at LIMIT ?",
+                    (_now(), limit - len(rows)),
+                ).fetchall()
+        return [self._from_row(r) for r in rows]
+
+    def open_synced(self, limit: int = 100) -> List[str]:
+        """Открытые отправленные заявки, дольше всех не сверявшиеся со статусом ERP."""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT request_id FROM maintenance_requests INDEXED BY mr_open_synced "
+                "WHERE sync_state = 'SYNCED' AND status IN ('NEW', 'IN_PROGRESS') ORDER BY synced_at LIMIT ?",
+                (limit,),
+            ).fetchall()
+        return [r[0] for r in rows]
+
+    def explain(self, sql: str, params: Sequence[Any] = ()) -> List[str]:
+        """План запроса (EXPLAIN QUERY PLAN) — проверить, что выборка идёт по индексу."""
+        with self._lock:
+            return [r[-1] for r in self._conn.execute("EXPLAIN QUERY PLAN " + sql, params).fetchall()]
+
+    @staticmethod
+    def _from_row(row: Sequence[Any]) -> MaintenanceRequest:
+        doc = json.loads(row[0])
+        doc.update(zip(_COLUMNS, row[1:]))  # изменяемые поля (статус, синхронизация) — из колонок
+        known = MaintenanceRequest.__dataclass_fields__
+        return MaintenanceRequest(**{k: v for k, v in doc.items() if k in known})
@@ -0,0 +1,90 @@
+from __future__ import annotations
+
+from dataclasses import dataclass, field
+from functools import lru_cache
+from pathlib import Path
+from typing import Any, Dict, List, Mapping, Optional, Tuple
+
+from .models import MachineOverview
+
+BASE_DIR = Path(__file__).resolve().parents[1]
+
+SVG_MAP = {
+    "Фрезерный ЧПУ": "cnc_mill.svg",
+    "Токарный ЧПУ": "cnc_lathe.svg",
+    "Крой металла": "cnc_cut.svg",
+}
+DEFAULT_SVG = "cnc_mill.svg"  # для видов оборудования из внешних журналов без своего силуэта
+
+
+@lru_cache(maxsize=None)
+def svg_template(kind: str) -> str:
+    """Силуэт станка (с плейсхолдером CURRENT_COLOR) — читается с диска один раз на процесс."""
+    svg_file = BASE_DIR / "assets" / "silhouettes" / SVG_MAP.get(kind, DEFAULT_SVG)
+    return svg_file.read_text(encoding="utf-8")
+
+
+@dataclass(frozen=True)
+class MnemoLayout:
+    """
+    Раскладка плиток мнемосхемы (секция layout в YAML):
+      columns: 6            # плиток в ряд
+      tile_height: 150
+      groups:               # необязательно; иначе — группировка по line_id
+        - title: "Линия 1"
+          machines: [CNC-MILL-1, CNC-LATHE-1]
+    """
+    columns: int = 6
+    tile_height: int = 150
+    groups: Tuple[Tuple[str, Tuple[str, ...]], ...] = field(default_factory=tuple)
+
+    @classmethod
+    def from_config(cls, cfg: Mapping[str, Any]) -> "MnemoLayout":
+        raw = cfg.get("layout") or {}
+        groups = tuple(
+            (str(g.get("title", "")), tuple(str(mid) for mid in g.get("machines", [])))
+            for g in raw.get("groups") or []
+        )
+        return cls(
+            columns=int(raw.get("columns", cls.columns)),
+            tile_height=int(raw.get("tile_height", cls.tile_height)),
+            groups=groups,
+        )
+
+    def arrange(self, machines: List[MachineOverview]) -> List[Dict[str, Any]]:
+        """Группы плиток [{title, machines: [machine_id]}] в порядке отображения."""
+        present = [m.machine_id for m in machines]
+        if self.groups:
+            known = set(present)
+            placed: set = set()
+            out = []
+            for title, ids in self.groups:
+                ids = [mid for mid in ids if mid in known]
+                placed.update(ids)
+                out.append({"title": title, "machines": ids})
+            rest = [mid for mid in present if mid not in placed]
+            if rest:
+                out.append({"title": "Прочее", "machines": rest})
+            return out
+
+        by_line: Dict[str, List[str]] = {}
+        for m in machines:
+            by_line.setdefault(m.line_id or "", []).append(m.machine_id)
+        return [{"title": line, "machines": ids} for line, ids in by_line.items()]
+
+
+def tile_state(m: MachineOverview, tooltip: str, alarm: Optional[str] = None) -> Dict[str, Any]:
+    """Всё, что может измениться у плитки между обновлениями."""
+    return {
+        "state": m.state,
+        "oee": m.oee_percent,
+        "alarm": alarm or "ok",
+        "tooltip": tooltip,
+    }
+
+
+def diff_tiles(
+    previous: Mapping[str, Dict[str, Any]], current: Mapping[str, Dict[str, Any]]
+) -> Dict[str, Dict[str, Any]]:
+    """Только изменившиеся плитки (machine_id -> новое состояние)."""
+    return {mid: tile for mid, tile in current.items() if previous.get(mid) != tile}
@@ -1,20 +1,26 @@
 from __future__ import annotations
-from pydantic import BaseModel
-from typing import Optional, Literal
+from pydantic import BaseModel, ConfigDict
+from typing import List, Optional, Literal
 from datetime import datetime
 
 MachineState = Literal["RUN", "IDLE", "DOWN"]
 DownReason = Optional[Literal["MAINT", "REPAIR"]]
 
+# провайдеры кэшируют обзор и остановки и отдают одни и те же объекты всем сессиям — поэтому неизменяемые
 class ShiftInfo(BaseModel):
+    model_config = ConfigDict(frozen=True)
+
     start: datetime
     end: datetime
 
 class MachineOverview(BaseModel):
+    model_config = ConfigDict(frozen=True)
+
     machine_id: str
     name: str
     kind: str  # "Фрезерный ЧПУ", "Токарный ЧПУ", "Крой металла"
     state: MachineState
+    line_id: Optional[str] = None
 
     # RUN/IDLE
     shift: ShiftInfo
@@ -22,6 +28,10 @@ class MachineOverview(BaseModel):
     run_time_hours: float = 0.0
     planned_time_hours: float = 0.0
     oee_percent: Optional[float] = None
+    # составляющие OEE, доли 0..1 (если провайдер их отдаёт)
+    availability: Optional[float] = None
+    performance: Optional[float] = None
+    quality: Optional[float] = None
 
     # DOWN
     down_start_ts: Optional[datetime] = None
@@ -33,6 +43,8 @@ from datetime import datetime
 StopReason = Literal["MICROSTOP", "SETUP", "FAULT", "MAINT", "REPAIR"]
 
 class StopEvent(BaseModel):
+    model_config = ConfigDict(frozen=True)
+
     start: datetime
     end: datetime
     reason: StopReason
@@ -41,3 +53,13 @@ class StopEvent(BaseModel):
     @property
     def duration_min(self) -> float:
         return round((self.end - self.start).total_seconds() / 60.0, 1)
+
+class AnomalyEvent(BaseModel):
+    """Отклонение канала телеметрии от выученной нормы станка (end=None — ещё продолжается)."""
+    machine_id: str
+    channel: str  # vibration_mm_s / bearing_temp_c / motor_current_pu
+    start: datetime
+    end: Optional[datetime] = None
+    detectors: List[str] = []  # zscore / ewma / cusum
+    peak_score: float = 0.0  # 1.0 — на пороге
+    peak_value: Optional[float] = None
@@ -0,0 +1,294 @@
+"""
+Счётчики и гистограммы с метками без блокировок на горячем пути. Каждый поток
+пишет только в свой шард (обычный dict), поэтому инкремент — это поиск в словаре
+и сложение, без lock. Чтение (/metrics) под замком суммирует шарды. Шарды
+завершившихся потоков при этом сворачиваются в общий итог, так что память не
+растёт с числом потоков (потоки сессий Streamlit, пул to_thread и т.п.).
+
+    REQUESTS = ShardedCounter("http_requests_total", "HTTP requests.", ("route", "method", "status"))
+    REQUESTS.inc(("/health", "GET", "200"))
+
+MetricSet собирает метрики одного процесса/сервиса и отдаёт текст Prometheus и JSON.
+"""
+from __future__ import annotations
+
+import threading
+import weakref
+from abc import ABC, abstractmethod
+from bisect import bisect_left
+from typing import Any, Callable, Dict, Iterable, List, Optional, Sequence, Tuple, Union
+
+Labels = Tuple[str, ...]
+
+# верхние границы корзин, секунды (+Inf — последняя корзина)
+BUCKETS: Tuple[float, ...] = (
+    0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0,
+)
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _labels_text(names: Sequence[str], values: Sequence[str], extra: str = "") -> str:
+    parts = [f'{n}="{_escape(str(v))}"' for n, v in zip(names, values)]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+
+class _Sharded(ABC):
+    """Общая часть: шард на поток + свёртка шардов умерших потоков."""
+
+    kind = ""
+
+    def __init__(self, name: str, help: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.help = help
+        self.labelnames: Labels = tuple(labelnames)
+        self._local = threading.local()
+        self._shards: List[Tuple[Any, Dict[Labels, Any]]] = []  # (weakref на поток, шард)
+        self._retired: Dict[Labels, Any] = {}
+        self._lock = threading.Lock()  # только регистрация шарда и чтение
+
+    def _new_shard(self) -> Dict[Labels, Any]:
+        shard: Dict[Labels, Any] = {}
+        with self._lock:
+            self._compact()
+            self._shards.append((weakref.ref(threading.current_thread()), shard))
+        self._local.shard = shard
+        return shard
+
+    def _compact(self) -> None:
+        alive = []
+        for ref, shard in self._shards:
+            thread = ref()
+            if thread is None or not thread.is_alive():
+                # поток больше не пишет — его шард можно безопасно слить
+                self._fold(self._retired, shard)
+            else:
+                alive.append((ref, shard))
+        self._shards = alive
+
+    @abstractmethod
+    def _fold(self, into: Dict[Labels, Any], shard: Dict[Labels, Any]) -> None:
+        """Прибавить шард к into (свой способ сложения у счётчика и гистограммы)."""
+
+    def collect(self) -> Dict[Labels, Any]:
+        """Сумма по всем шардам: {значения меток: значение}."""
+        with self._lock:
+            self._compact()
+            out: Dict[Labels, Any] = {}
+            self._fold(out, self._retired)
+            for _, shard in self._shards:
+                self._fold(out, dict(shard))  # копия dict атомарна под GIL
+        return out
+
+    def reset(self) -> None:
+        with self._lock:
+            self._retired.clear()
+            for _, shard in self._shards:
+                shard.clear()
+
+    def shards(self) -> int:
+        return len(self._shards)
+
+
+class ShardedCounter(_Sharded):
+    """Монотонный счётчик (или up/down-счётчик для «в работе» при inc(-1))."""
+
+    kind = "counter"
+
+    def inc(self, labels: Labels = (), n: Union[int, float] = 1) -> None:
+        try:
+            shard = self._local.shard
+        except AttributeError:
+            shard = self._new_shard()
+        shard[labels] = shard.get(labels, 0) + n
+
+    def _fold(self, into: Dict[Labels, Any], shard: Dict[Labels, Any]) -> None:
+        for key, n in shard.items():
+            into[key] = into.get(key, 0) + n
+
+    def value(self, labels: Labels = ()) -> Union[int, float]:
+        return self.collect().get(labels, 0)
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}"]
+        for key, n in sorted(self.collect().items()):
+            lines.append(f"{self.name}{_labels_text(self.labelnames, key)} {n}")
+        return lines
+
+    def to_json(self) -> Any:
+        return [{**dict(zip(self.labelnames, key)), "value": n} for key, n in sorted(self.collect().items())]
+
+
+def quantile(counts: Sequence[int], q: float, buckets: Sequence[float], top: float) -> Optional[float]:
+    """Оценка квантиля по корзинам (линейно внутри корзины, как histogram_quantile)."""
+    total = sum(counts)
+    if not total:
+        return None
+    rank = q * total
+    seen = 0
+    for i, n in enumerate(counts):
+        if seen + n >= rank and n:
+            lo = buckets[i - 1] if i else 0.0
+            hi = buckets[i] if i < len(buckets) else top
+            return min(lo + (hi - lo) * (rank - seen) / n, top)
+        seen += n
+    return top
+
+
+class ShardedHistogram(_Sharded):
+    """
+    Гистограмма длительностей. Строка шарда на набор меток:
+    [корзины..., +Inf, сумма, число, максимум, ошибки].
+    """
+
+    kind = "histogram"
+
+    def __init__(self, name: str, help: str, labelnames: Sequence[str] = (), buckets: Sequence[float] = BUCKETS):
+        super().__init__(name, help, labelnames)
+        self.buckets: Tuple[float, ...] = tuple(buckets)
+        nb = len(self.buckets) + 1
+        self._sum, self._count, self._max, self._err = nb, nb + 1, nb + 2, nb + 3
+        self._width = nb + 4
+
+    def observe(self, labels: Labels, seconds: float, error: bool = False) -> None:
+        try:
+            shard = self._local.shard
+        except AttributeError:
+            shard = self._new_shard()
+        row = shard.get(labels)
+        if row is None:
+            row = shard[labels] = [0] * self._width
+            row[self._sum] = row[self._max] = 0.0
+        row[bisect_left(self.buckets, seconds)] += 1
+        row[self._sum] += seconds
+        row[self._count] += 1
+        if seconds > row[self._max]:
+            row[self._max] = seconds
+        if error:
+            row[self._err] += 1
+
+    def _fold(self, into: Dict[Labels, Any], shard: Dict[Labels, Any]) -> None:
+        for key, row in shard.items():
+            row = list(row)
+            acc = into.get(key)
+            if acc is None:
+                into[key] = row
+                continue
+            for i in range(self._width):
+                if i == self._max:
+                    acc[i] = max(acc[i], row[i])
+                else:
+                    acc[i] += row[i]
+
+    def summary(self, row: Sequence[Any]) -> Dict[str, Any]:
+        count = row[self._count]
+        counts = row[: len(self.buckets) + 1]
+        out: Dict[str, Any] = {
+            "count": count, "errors": row[self._err],
+            "sum_s": round(row[self._sum], 6), "max_s": round(row[self._max], 6),
+            "mean_s": round(row[self._sum] / count, 6) if count else None,
+        }
+        for q in (0.5, 0.95, 0.99):
+            v = quantile(counts, q, self.buckets, row[self._max])
+            out[f"p{int(q * 100)}_s"] = None if v is None else round(v, 6)
+        out["buckets"] = dict(zip([str(b) for b in self.buckets] + ["+Inf"], counts))
+        return out
+
+    def render(self, errors_name: Optional[str] = None) -> List[str]:
+        """Текст Prometheus; errors_name — ещё и счётчик наблюдений с ошибкой."""
+        data = sorted(self.collect().items())
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}"]
+        les = [repr(b) for b in self.buckets] + ["+Inf"]
+        for key, row in data:
+            cumulative = 0
+            for le, n in zip(les, row):
+                cumulative += n
+                bucket = _labels_text(self.labelnames, key, 'le="' + le + '"')
+                lines.append(f"{self.name}_bucket{bucket} {cumulative}")
+            labels = _labels_text(self.labelnames, key)
+            lines.append(f"{self.name}_sum{labels} {row[self._sum]!r}")
+            lines.append(f"{self.name}_count{labels} {row[self._count]}")
+        if errors_name and data:
+            lines += [f"# HELP {errors_name} Observations that ended with an error.", f"# TYPE {errors_name} counter"]
+            lines += [f"{errors_name}{_labels_text(self.labelnames, key)} {row[self._err]}" for key, row in data]
+        return lines
+
+    def to_json(self) -> Any:
+        return [{**dict(zip(self.labelnames, key)), **self.summary(row)} for key, row in sorted(self.collect().items())]
+
+
+class CallbackGauge:
+    """Значение снимается при чтении: fn() -> число или {значения меток: число}."""
+
+    kind = "gauge"
+
+    def __init__(self, name: str, help: str, fn: Callable[[], Any], labelnames: Sequence[str] = ()):
+        self.name = name
+        self.help = help
+        self.fn = fn
+        self.labelnames: Labels = tuple(labelnames)
+
+    def collect(self) -> Dict[Labels, float]:
+        value = self.fn()
+        if isinstance(value, dict):
+            return {tuple(k) if isinstance(k, tuple) else (k,): float(v) for k, v in value.items()}
+        return {(): float(value)}
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}"]
+        for key, v in sorted(self.collect().items()):
+            lines.append(f"{self.name}{_labels_text(self.labelnames, key)} {v!r}")
+        return lines
+
+    def to_json(self) -> Any:
+        data = self.collect()
+        if not self.labelnames:
+            return data.get((), None)
+        return [{**dict(zip(self.labelnames, key)), "value": v} for key, v in sorted(data.items())]
+
+
+Metric = Union[ShardedCounter, ShardedHistogram, CallbackGauge]
+
+
+class MetricSet:
+    """Метрики одного сервиса: регистрация, текст Prometheus, JSON."""
+
+    def __init__(self, metrics: Iterable[Metric] = ()):
+        self._metrics: Dict[str, Metric] = {}
+        self._extra: List[Callable[[], str]] = []
+        for m in metrics:
+            self.register(m)
+
+    def register(self, metric: Metric) -> Metric:
+        if metric.name in self._metrics and self._metrics[metric.name] is not metric:
+            raise ValueError(f"Metric {metric.name!r} is already registered")
+        self._metrics[metric.name] = metric
+        return metric
+
+    def counter(self, name: str, help: str, labelnames: Sequence[str] = ()) -> ShardedCounter:
+        return self.register(ShardedCounter(name, help, labelnames))  # type: ignore[return-value]
+
+    def histogram(self, name: str, help: str, labelnames: Sequence[str] = (),
+                  buckets: Sequence[float] = BUCKETS) -> ShardedHistogram:
+        return self.register(ShardedHistogram(name, help, labelnames, buckets))  # type: ignore[return-value]
+
+    def gauge(self, name: str, help: str, fn: Callable[[], Any], labelnames: Sequence[str] = ()) -> CallbackGauge:
+        return self.register(CallbackGauge(name, help, fn, labelnames))  # type: ignore[return-value]
+
+    def include(self, render: Callable[[], str]) -> None:
+        """Дописывать в /metrics чужой готовый текст (например, этапы metrics.render_prometheus)."""
+        self._extra.append(render)
+
+    def render_prometheus(self) -> str:
+        lines: List[str] = []
+        for m in self._metrics.values():
+            lines += m.render()
+        text = "\n".join(lines) + "\n" if lines else ""
+        return text + "".join(render() for render in self._extra)
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {name: m.to_json() for name, m in self._metrics.items()}
@@ -0,0 +1,111 @@
+"""
+Общая поверхность метрик для FastAPI-сервисов (mock ERP, сервис данных цеха):
+
+    metrics = instrument_app(app, "erp")
+    metrics.gauge("oee_erp_store_requests", "Requests in the store.", lambda: len(STORE))
+
+    GET /metrics        — текст Prometheus: запросы, задержки по маршрутам, ошибки,
+                          запросы «в работе», gauges сервиса и этапы (metrics.span)
+    GET /metrics?format=json — то же в JSON
+
+Маршрут в метках — шаблон пути (/api/v1/maintenance_requests/{request_id}), а не
+сам путь, чтобы число рядов не росло с числом заявок. Замер — чистый ASGI-слой:
+два perf_counter и инкременты в шард потока (counters), без lock.
+"""
+from __future__ import annotations
+
+import json
+import time
+from typing import Any, Callable, Dict, Optional
+
+from fastapi import FastAPI, Request, Response
+
+from . import metrics as stages
+from .counters import CallbackGauge, MetricSet
+
+PROMETHEUS_CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+UNMATCHED = "<unmatched>"
+
+
+class HttpMetrics:
+    """Метрики HTTP одного сервиса + его собственные gauges/счётчики."""
+
+    def __init__(self, service: str):
+        self.service = service
+        self.set = MetricSet()
+        self.requests = self.set.counter(
+            "oee_http_requests_total", "HTTP requests by route, method and status.", ("route", "method", "status"))
+        self.latency = self.set.histogram(
+            "oee_http_request_seconds", "HTTP request latency by route.", ("route", "method"))
+        self.errors = self.set.counter(
+            "oee_http_errors_total", "HTTP requests that failed (5xx or exception).", ("route", "method"))
+        self.in_flight = self.set.counter("oee_http_in_flight", "HTTP requests being served now.")
+        self.in_flight.kind = "gauge"
+        self.started = time.time()
+        self.set.gauge("oee_uptime_seconds", "Seconds since the service started.",
+                       lambda: time.time() - self.started)
+        self.set.include(stages.render_prometheus)
+
+    def gauge(self, name: str, help: str, fn: Callable[[], Any], labelnames: tuple = ()) -> CallbackGauge:
+        return self.set.gauge(name, help, fn, labelnames)
+
+    def counter(self, name: str, help: str, labelnames: tuple = ()):
+        return self.set.counter(name, help, labelnames)
+
+    def render_prometheus(self) -> str:
+        return self.set.render_prometheus()
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {"service": self.service, "ts": time.time(), **self.set.snapshot(), "stages": stages.snapshot()}
+
+
+class MetricsMiddleware:
+    """ASGI-слой: задержка, статус и ошибки каждого HTTP-запроса по шаблону маршрута."""
+
+    def __init__(self, app: Any, metrics: HttpMetrics):
+        self.app = app
+        self.metrics = metrics
+
+    async def __call__(self, scope: Dict[str, Any], receive: Any, send: Any) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        m = self.metrics
+        status = 500
+
+        async def send_wrapper(message: Dict[str, Any]) -> None:
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        m.in_flight.inc()
+        t0 = time.perf_counter()
+        failed = True
+        try:
+            await self.app(scope, receive, send_wrapper)
+            failed = status >= 500
+        finally:
+            elapsed = time.perf_counter() - t0
+            m.in_flight.inc(n=-1)
+            route = scope.get("route")
+            key = (getattr(route, "path", None) or UNMATCHED, scope["method"])
+            m.latency.observe(key, elapsed, failed)
+            m.requests.inc(key + (str(status),))
+            if failed:
+                m.errors.inc(key)
+
+
+def instrument_app(app: FastAPI, service: str, metrics: Optional[HttpMetrics] = None) -> HttpMetrics:
+    """Подключить замеры к приложению и добавить GET /metrics. Возвращает HttpMetrics для gauges."""
+    metrics = metrics or HttpMetrics(service)
+    app.add_middleware(MetricsMiddleware, metrics=metrics)
+    app.state.metrics = metrics
+
+    @app.get("/metrics", include_in_schema=False)
+    def metrics_endpoint(request: Request) -> Response:
+        if request.query_params.get("format") == "json":
+            return Response(json.dumps(metrics.snapshot(), default=str), media_type="application/json")
+        return Response(metrics.render_prometheus(), media_type=PROMETHEUS_CONTENT_TYPE)
+
+    return metrics
@@ -0,0 +1,151 @@
+"""
+Замеры времени по этапам отрисовки и опроса:
+
+    with span("provider.get_overview"):
+        ...
+
+    @timed("telemetry.alarms")
+    def compute_alarms(...): ...
+
+По умолчанию выключено: span() отдаёт общий пустой контекст, @timed вызывает
+функцию напрямую — цена одна проверка флага. Включается OEE_METRICS=1 (или enable()).
+Каждый этап — гистограмма длительностей (counters.ShardedHistogram, без lock
+на горячем пути); экспорт в текст Prometheus
+(render_prometheus) и JSON (snapshot / dump_json).
+"""
+from __future__ import annotations
+
+import functools
+import inspect
+import json
+import os
+import time
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, TypeVar
+
+from .counters import ShardedHistogram
+
+F = TypeVar("F", bound=Callable[..., Any])
+
+METRIC = "oee_stage_seconds"
+
+
+class Registry:
+    """Этапы — одна гистограмма с меткой stage (шард на поток, без lock при замере)."""
+
+    def __init__(self) -> None:
+        self.hist = ShardedHistogram(METRIC, "Time spent per render/ingest stage.", ("stage",))
+
+    def observe(self, stage: str, seconds: float, error: bool = False) -> None:
+        self.hist.observe((stage,), seconds, error)
+
+    def stages(self) -> List[str]:
+        return sorted(key[0] for key in self.hist.collect())
+
+    def reset(self) -> None:
+        self.hist.reset()
+
+    def snapshot(self) -> Dict[str, Dict[str, Any]]:
+        return {key[0]: self.hist.summary(row) for key, row in sorted(self.hist.collect().items())}
+
+    def render_prometheus(self) -> str:
+        return "\n".join(self.hist.render(errors_name="oee_stage_errors_total")) + "\n"
+
+
+REGISTRY = Registry()
+
+
+class _State:
+    enabled = os.environ.get("OEE_METRICS", "").lower() not in ("", "0", "false", "no")
+
+
+def enabled() -> bool:
+    return _State.enabled
+
+
+def enable(on: bool = True) -> None:
+    _State.enabled = on
+
+
+class _NoopSpan:
+    __slots__ = ()
+
+    def __enter__(self) -> "_NoopSpan":
+        return self
+
+    def __exit__(self, *exc: Any) -> None:
+        return None
+
+
+_NOOP = _NoopSpan()
+
+
+class _Span:
+    __slots__ = ("key", "t0")
+
+    def __init__(self, stage: str):
+        self.key = (stage,)
+
+    def __enter__(self) -> "_Span":
+        self.t0 = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type: Any, *exc: Any) -> None:
+        REGISTRY.hist.observe(self.key, time.perf_counter() - self.t0, exc_type is not None)
+
+
+def span(stage: str):
+    """Контекст-замер этапа; при выключенных метриках — пустой общий объект."""
+    if not _State.enabled:
+        return _NOOP
+    return _Span(stage)
+
+
+def observe(stage: str, seconds: float) -> None:
+    """Длительность, измеренная снаружи (например, целиком запрос)."""
+    if _State.enabled:
+        REGISTRY.observe(stage, seconds)
+
+
+def timed(stage: Optional[str] = None) -> Callable[[F], F]:
+    """Декоратор: каждый вызов функции (в т.ч. async) — замер этапа stage (по умолчанию module.qualname)."""
+
+    def wrap(fn: F) -> F:
+        name = stage or f"{fn.__module__}.{fn.__qualname__}"
+
+        if inspect.iscoroutinefunction(fn):
+            @functools.wraps(fn)
+            async def async_wrapper(*args: Any, **kwargs: Any) -> Any:
+                if not _State.enabled:
+                    return await fn(*args, **kwargs)
+                with _Span(name):
+                    return await fn(*args, **kwargs)
+
+            return async_wrapper  # type: ignore[return-value]
+
+        @functools.wraps(fn)
+        def wrapper(*args: Any, **kwargs: Any) -> Any:
+            if not _State.enabled:
+                return fn(*args, **kwargs)
+            with _Span(name):
+                return fn(*args, **kwargs)
+
+        return wrapper  # type: ignore[return-value]
+
+    return wrap
+
+
+def render_prometheus() -> str:
+    return REGISTRY.render_prometheus()
+
+
+def snapshot() -> Dict[str, Dict[str, Any]]:
+    return REGISTRY.snapshot()
+
+
+def dump_json(path: str) -> Path:
+    """Сводка по этапам в JSON-файл (для сравнения прогонов)."""
+    p = Path(path)
+    p.parent.mkdir(parents=True, exist_ok=True)
+    p.write_text(json.dumps({"ts": time.time(), "stages": snapshot()}, indent=2), encoding="utf-8")
+    return p
@@ -0,0 +1,88 @@
+"""
+Замер и (по желанию) профиль одного запроса — например, одной отрисовки app.py:
+
+    trace = begin_request("app.render", mode="cprofile")   # или OEE_PROFILE=cprofile|pyinstrument
+    ...
+    path = trace.finish()    # data/profiles/app.render-<время>.prof (.html для pyinstrument)
+
+Длительность запроса идёт в гистограмму этапа name. Профиль .prof смотрится
+snakeviz / `python -m pstats`; pyinstrument — необязательная зависимость.
+"""
+from __future__ import annotations
+
+import logging
+import os
+import time
+from contextlib import contextmanager
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Iterator, Optional
+
+from . import metrics
+
+log = logging.getLogger(__name__)
+
+PROFILE_MODES = ("cprofile", "pyinstrument")
+
+
+class RequestTrace:
+    def __init__(self, name: str, mode: Optional[str] = None, out_dir: Optional[str] = None):
+        self.name = name
+        self.mode = (mode or "").lower() or None
+        self.out_dir = Path(out_dir or os.environ.get("OEE_PROFILE_DIR", "data/profiles"))
+        self.path: Optional[Path] = None
+        self._profiler: Any = None
+        if self.mode and self.mode not in PROFILE_MODES:
+            log.warning("Unknown profile mode %r (expected one of %s)", self.mode, PROFILE_MODES)
+            self.mode = None
+        if self.mode == "pyinstrument":
+            try:
+                from pyinstrument import Profiler
+            except ImportError:
+                log.warning("pyinstrument is not installed (pip install pyinstrument); using cProfile")
+                self.mode = "cprofile"
+            else:
+                self._profiler = Profiler()
+        if self.mode == "cprofile":
+            import cProfile
+
+            self._profiler = cProfile.Profile()
+        self._t0 = time.perf_counter()
+        if self.mode == "pyinstrument":
+            self._profiler.start()
+        elif self.mode == "cprofile":
+            self._profiler.enable()
+
+    def finish(self) -> Optional[Path]:
+        """Завершить замер; путь к файлу профиля, если он снимался."""
+        elapsed = time.perf_counter() - self._t0
+        metrics.observe(self.name, elapsed)
+        if self._profiler is None:
+            return None
+        stamp = datetime.now().strftime("%Y%m%d-%H%M%S-%f")
+        self.out_dir.mkdir(parents=True, exist_ok=True)
+        if self.mode == "pyinstrument":
+            self._profiler.stop()
+            self.path = self.out_dir / f"{self.name}-{stamp}.html"
+            self.path.write_text(self._profiler.output_html(), encoding="utf-8")
+        else:
+            self._profiler.disable()
+            self.path = self.out_dir / f"{self.name}-{stamp}.prof"
+            self._profiler.dump_stats(str(self.path))
+        self._profiler = None
+        log.info("Profile of %s (%.0f ms): %s", self.name, elapsed * 1000, self.path)
+        return self.path
+
+
+def begin_request(name: str, mode: Optional[str] = None) -> RequestTrace:
+    """mode: cprofile / pyinstrument / None (по умолчанию — из OEE_PROFILE)."""
+    return RequestTrace(name, mode or os.environ.get("OEE_PROFILE"))
+
+
+@contextmanager
+def profile_request(name: str, mode: Optional[str] = None) -> Iterator[RequestTrace]:
+    trace = begin_request(name, mode)
+    try:
+        yield trace
+    finally:
+        trace.finish()
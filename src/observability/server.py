@@ -0,0 +1,71 @@
+"""
+Локальный эндпоинт метрик без внешних зависимостей (поток-демон на http.server):
+
+    GET /metrics       — текст Prometheus
+    GET /metrics.json  — та же сводка в JSON (count, mean, p50/p95/p99, max)
+
+Поднимается из приложения/сервиса, если задан OEE_METRICS_PORT (метрики при этом включаются).
+"""
+from __future__ import annotations
+
+import json
+import logging
+import os
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, Optional
+
+from . import metrics
+
+log = logging.getLogger(__name__)
+
+_SERVERS: Dict[int, ThreadingHTTPServer] = {}
+_LOCK = threading.Lock()
+
+
+class _Handler(BaseHTTPRequestHandler):
+    def do_GET(self) -> None:  # noqa: N802
+        path = self.path.split("?", 1)[0]
+        if path == "/metrics":
+            body = metrics.render_prometheus().encode("utf-8")
+            ctype = "text/plain; version=0.0.4; charset=utf-8"
+        elif path == "/metrics.json":
+            body = json.dumps(metrics.snapshot()).encode("utf-8")
+            ctype = "application/json"
+        else:
+            self.send_error(404)
+            return
+        self.send_response(200)
+        self.send_header("Content-Type", ctype)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args) -> None:
+        return None
+
+
+def start_metrics_server(port: int, host: str = "127.0.0.1") -> ThreadingHTTPServer:
+    """Один сервер на порт и процесс (повторный вызов — тот же сервер); включает метрики."""
+    with _LOCK:
+        server = _SERVERS.get(port)
+        if server is None:
+            server = ThreadingHTTPServer((host, port), _Handler)
+            threading.Thread(target=server.serve_forever, name=f"metrics:{port}", daemon=True).start()
+            _SERVERS[port] = server
+            log.info("Metrics on http://%s:%d/metrics", host, server.server_address[1])
+    metrics.enable()
+    return server
+
+
+def serve_from_env() -> Optional[ThreadingHTTPServer]:
+    port = os.environ.get("OEE_METRICS_PORT")
+    if not port:
+        return None
+    try:
+        return start_metrics_server(int(port))
+    except OSError as e:
+        # второй процесс на том же порту — без эндпоинта, но с замерами
+        log.warning("Metrics endpoint on port %s unavailable: %s", port, e)
+        metrics.enable()
+        return None
@@ -1,13 +1,26 @@
 from __future__ import annotations
-from .mock_basic import MockBasicProvider
-from .mes_standard_stub import MesStandardStubProvider
-from .iot_advanced_stub import IotAdvancedStubProvider
+from typing import Any, Mapping, Optional
 
-def get_provider(provider_name: str):
-    if provider_name == "mock_basic":
-        return MockBasicProvider()
-    if provider_name == "mes_standard_stub":
-        return MesStandardStubProvider()
-    if provider_name == "iot_advanced_stub":
-        return IotAdvancedStubProvider()
-    raise ValueError(f"Unknown provider: {provider_name}")
+from .registry import (
+    available_providers,
+    create_provider,
+    register_provider,
+    validate_provider_options,
+)
+
+def get_provider(
+    provider_name: str,
+    options: Optional[Mapping[str, Any]] = None,
+    batch: bool = False,
+    max_workers: int = 8,
+):
+    """
+    Модуль провайдера импортируется только здесь — когда он выбран в конфиге.
+    batch=True — обернуть в BatchProviderAdapter (параллельные пакетные/async вызовы).
+    """
+    provider = create_provider(provider_name, options)
+    if batch:
+        from .batch import BatchProviderAdapter
+
+        return BatchProviderAdapter(provider, max_workers=max_workers)
+    return provider
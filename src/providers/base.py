@@ -1,18 +1,147 @@
 from __future__ import annotations
+import asyncio
 from abc import ABC, abstractmethod
-from typing import List
+from datetime import datetime
+from typing import Dict, Iterable, List, Optional
 import pandas as pd
 from ..models import MachineOverview, StopEvent
+from ..tables import StopTable
+
+
+def slice_timeseries(df: pd.DataFrame, since: Optional[datetime], until: Optional[datetime]) -> pd.DataFrame:
+    """Ряд с DatetimeIndex -> интервал [since, until)."""
+    if since is None and until is None:
+        return df
+    mask = pd.Series(True, index=df.index)
+    if since is not None:
+        mask &= df.index >= since
+    if until is not None:
+        mask &= df.index < until
+    return df[mask.to_numpy()]
+
+
+def filter_stops(stops: List[StopEvent], since: Optional[datetime], until: Optional[datetime]) -> List[StopEvent]:
+    """Остановки, пересекающиеся с интервалом [since, until)."""
+    if since is None and until is None:
+        return stops
+    return [
+        s for s in stops
+        if (since is None or s.end > since) and (until is None or s.start < until)
+    ]
+
 
 class ShopfloorProvider(ABC):
+    """
+    Контракт источника данных цеха.
+    Обязательны только методы по одному станку; пакетные (*_many) и async (a*)
+    варианты имеют реализацию по умолчанию. Провайдер, который умеет отдавать
+    весь парк одним запросом, переопределяет *_many.
+    since/until — полуинтервал [since, until); None — без ограничения.
+    """
+
     @abstractmethod
     def get_overview(self) -> List[MachineOverview]:
         ...
 
     @abstractmethod
-    def get_oee_timeseries(self, machine_id: str) -> pd.DataFrame:
+    def get_oee_timeseries(
+        self, machine_id: str, since: Optional[datetime] = None, until: Optional[datetime] = None
+    ) -> pd.DataFrame:
         ...
 
     @abstractmethod
-    def get_stops(self, machine_id: str) -> List[StopEvent]:
+    def get_stops(
+        self, machine_id: str, since: Optional[datetime] = None, until: Optional[datetime] = None
+    ) -> List[StopEvent]:
         ...
+
+    def get_telemetry(
+        self, machine_id: str, since: Optional[datetime] = None, until: Optional[datetime] = None
+    ) -> Optional[pd.DataFrame]:
+        """
+        Телеметрия станка (vibration_mm_s, bearing_temp_c, motor_current_pu) с DatetimeIndex.
+        None — провайдер телеметрию не отдаёт (UI использует демо-симулятор).
+        """
+        return None
+
+    # --- пакетные методы (по умолчанию — последовательно)
+
+    def get_overview_many(self, machine_ids: Optional[Iterable[str]] = None) -> List[MachineOverview]:
+        overview = self.get_overview()
+        if machine_ids is None:
+            return overview
+        by_id = {m.machine_id: m for m in overview}
+        return [by_id[mid] for mid in machine_ids]
+
+    def get_oee_timeseries_many(
+        self, machine_ids: Iterable[str], since: Optional[datetime] = None, until: Optional[datetime] = None
+    ) -> Dict[str, pd.DataFrame]:
+        return {mid: self.get_oee_timeseries(mid, since, until) for mid in machine_ids}
+
+    def get_stops_many(
+        self, machine_ids: Iterable[str], since: Optional[datetime] = None, until: Optional[datetime] = None
+    ) -> Dict[str, List[StopEvent]]:
+        return {mid: self.get_stops(mid, since, until) for mid in machine_ids}
+
+    def get_telemetry_many(
+        self, machine_ids: Iterable[str], since: Optional[datetime] = None, until: Optional[datetime] = None
+    ) -> Dict[str, Optional[pd.DataFrame]]:
+        return {mid: self.get_telemetry(mid, since, until) for mid in machine_ids}
+
+    def get_stop_table(
+        self,
+        machine_ids: Optional[Iterable[str]] = None,
+        since: Optional[datetime] = None,
+        until: Optional[datetime] = None,
+    ) -> StopTable:
+        """Остановки станков (None — всего парка) одной колоночной таблицей."""
+        if machine_ids is None:
+            machine_ids = [m.machine_id for m in self.get_overview()]
+        return StopTable.from_events_many(self.get_stops_many(machine_ids, since, until))
+
+    # --- async варианты (по умолчанию — синхронный метод в потоке)
+
+    async def aget_overview(self) -> List[MachineOverview]:
+        return await asyncio.to_thread(self.get_overview)
+
+    async def aget_oee_timeseries(
+        self, machine_id: str, since: Optional[datetime] = None, until: Optional[datetime] = None
+    ) -> pd.DataFrame:
+        return await asyncio.to_thread(self.get_oee_timeseries, machine_id, since, until)
+
+    async def aget_stops(
+        self, machine_id: str, since: Optional[datetime] = None, until: Optional[datetime] = None
+    ) -> List[StopEvent]:
+        return await asyncio.to_thread(self.get_stops, machine_id, since, until)
+
+    async def aget_telemetry(
+        self, machine_id: str, since: Optional[datetime] = None, until: Optional[datetime] = None
+    ) -> Optional[pd.DataFrame]:
+        return await asyncio.to_thread(self.get_telemetry, machine_id, since, until)
+
+    async def aget_overview_many(self, machine_ids: Optional[Iterable[str]] = None) -> List[MachineOverview]:
+        return await asyncio.to_thread(self.get_overview_many, machine_ids)
+
+    async def aget_oee_timeseries_many(
+        self, machine_ids: Iterable[str], since: Optional[datetime] = None, until: Optional[datetime] = None
+    ) -> Dict[str, pd.DataFrame]:
+        return await asyncio.to_thread(self.get_oee_timeseries_many, list(machine_ids), since, until)
+
+    async def aget_stops_many(
+        self, machine_ids: Iterable[str], since: Optional[datetime] = None, until: Optional[datetime] = None
+    ) -> Dict[str, List[StopEvent]]:
+        return await asyncio.to_thread(self.get_stops_many, list(machine_ids), since, until)
+
+    async def aget_telemetry_many(
+        self, machine_ids: Iterable[str], since: Optional[datetime] = None, until: Optional[datetime] = None
+    ) -> Dict[str, Optional[pd.DataFrame]]:
+        return await asyncio.to_thread(self.get_telemetry_many, list(machine_ids), since, until)
+
+    async def aget_stop_table(
+        self,
+        machine_ids: Optional[Iterable[str]] = None,
+        since: Optional[datetime] = None,
+        until: Optional[datetime] = None,
+    ) -> StopTable:
+        ids = None if machine_ids is None else list(machine_ids)
+        return await asyncio.to_thread(self.get_stop_table, ids, since, until)
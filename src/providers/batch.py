@@ -0,0 +1,199 @@
+from __future__ import annotations
+
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from functools import partial
+from typing import Any, Awaitable, Callable, Dict, Iterable, List, Optional, TypeVar
+
+import pandas as pd
+
+from .base import ShopfloorProvider
+from ..observability.metrics import timed
+from ..models import MachineOverview, StopEvent
+from ..tables import StopTable
+
+T = TypeVar("T")
+
+
+class BatchProviderAdapter(ShopfloorProvider):
+    """
+    Обёртка над любым провайдером: пакетные методы, которые провайдер
+    не реализует сам, выполняются параллельно (N запросов одновременно, а не подряд).
+    Если провайдер переопределил *_many (умеет весь парк одним вызовом) — вызываем его.
+    Каждый публичный вызов — этап provider.<метод> в метриках (src/observability).
+    """
+
+    def __init__(self, inner: ShopfloorProvider, max_workers: int = 8):
+        self.inner = inner
+        self.max_workers = max_workers
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="provider")
+
+    def __getattr__(self, name: str) -> Any:
+        # profile, sim и прочие атрибуты конкретного провайдера
+        return getattr(self.inner, name)
+
+    def _overrides(self, name: str) -> bool:
+        return getattr(type(self.inner), name) is not getattr(ShopfloorProvider, name)
+
+    def _fan_out(self, fn: Callable[[str], T], machine_ids: Iterable[str]) -> Dict[str, T]:
+        ids = list(machine_ids)
+        return dict(zip(ids, self._executor.map(fn, ids)))
+
+    async def _afan_out(self, fn: Callable[[str], Awaitable[T]], machine_ids: Iterable[str]) -> Dict[str, T]:
+        ids = list(machine_ids)
+        sem = asyncio.Semaphore(self.max_workers)
+
+        async def one(mid: str) -> T:
+            async with sem:
+                return await fn(mid)
+
+        return dict(zip(ids, await asyncio.gather(*(one(mid) for mid in ids))))
+
+    async def _in_executor(self, fn: Callable[..., T], *args: Any) -> T:
+        return await asyncio.get_running_loop().run_in_executor(self._executor, partial(fn, *args))
+
+    # --- по одному станку: как есть
+
+    @timed("provider.get_overview")
+    def get_overview(self) -> List[MachineOverview]:
+        return self.inner.get_overview()
+
+    @timed("provider.get_oee_timeseries")
+    def get_oee_timeseries(
+        self, machine_id: str, since: Optional[datetime] = None, until: Optional[datetime] = None
+    ) -> pd.DataFrame:
+        return self.inner.get_oee_timeseries(machine_id, since, until)
+
+    @timed("provider.get_stops")
+    def get_stops(
+        self, machine_id: str, since: Optional[datetime] = None, until: Optional[datetime] = None
+    ) -> List[StopEvent]:
+        return self.inner.get_stops(machine_id, since, until)
+
+    @timed("provider.get_telemetry")
+    def get_telemetry(
+        self, machine_id: str, since: Optional[datetime] = None, until: Optional[datetime] = None
+    ) -> Optional[pd.DataFrame]:
+        return self.inner.get_telemetry(machine_id, since, until)
+
+    # --- пакетные
+
+    @timed("provider.get_overview_many")
+    def get_overview_many(self, machine_ids: Optional[Iterable[str]] = None) -> List[MachineOverview]:
+        return self.inner.get_overview_many(machine_ids)
+
+    @timed("provider.get_oee_timeseries_many")
+    def get_oee_timeseries_many(
+        self, machine_ids: Iterable[str], since: Optional[datetime] = None, until: Optional[datetime] = None
+    ) -> Dict[str, pd.DataFrame]:
+        if self._overrides("get_oee_timeseries_many"):
+            return self.inner.get_oee_timeseries_many(machine_ids, since, until)
+        return self._fan_out(lambda mid: self.inner.get_oee_timeseries(mid, since, until), machine_ids)
+
+    @timed("provider.get_stops_many")
+    def get_stops_many(
+        self, machine_ids: Iterable[str], since: Optional[datetime] = None, until: Optional[datetime] = None
+    ) -> Dict[str, List[StopEvent]]:
+        if self._overrides("get_stops_many"):
+            return self.inner.get_stops_many(machine_ids, since, until)
+        return self._fan_out(lambda mid: self.inner.get_stops(mid, since, until), machine_ids)
+
+    @timed("provider.get_telemetry_many")
+    def get_telemetry_many(
+        self, machine_ids: Iterable[str], since: Optional[datetime] = None, until: Optional[datetime] = None
+    ) -> Dict[str, Optional[pd.DataFrame]]:
+        if self._overrides("get_telemetry_many"):
+            return self.inner.get_telemetry_many(machine_ids, since, until)
+        return self._fan_out(lambda mid: self.inner.get_telemetry(mid, since, until), machine_ids)
+
+    @timed("provider.get_stop_table")
+    def get_stop_table(
+        self,
+        machine_ids: Optional[Iterable[str]] = None,
+        since: Optional[datetime] = None,
+        until: Optional[datetime] = None,
+    ) -> StopTable:
+        if self._overrides("get_stop_table"):
+            return self.inner.get_stop_table(machine_ids, since, until)
+        return super().get_stop_table(machine_ids, since, until)
+
+    # --- async: нативные методы провайдера, иначе — общий пул потоков адаптера
+
+    @timed("provider.aget_overview")
+    async def aget_overview(self) -> List[MachineOverview]:
+        if self._overrides("aget_overview"):
+            return await self.inner.aget_overview()
+        return await self._in_executor(self.inner.get_overview)
+
+    @timed("provider.aget_oee_timeseries")
+    async def aget_oee_timeseries(
+        self, machine_id: str, since: Optional[datetime] = None, until: Optional[datetime] = None
+    ) -> pd.DataFrame:
+        if self._overrides("aget_oee_timeseries"):
+            return await self.inner.aget_oee_timeseries(machine_id, since, until)
+        return await self._in_executor(self.inner.get_oee_timeseries, machine_id, since, until)
+
+    @timed("provider.aget_stops")
+    async def aget_stops(
+        self, machine_id: str, since: Optional[datetime] = None, until: Optional[datetime] = None
+    ) -> List[StopEvent]:
+        if self._overrides("aget_stops"):
+            return await self.inner.aget_stops(machine_id, since, until)
+        return await self._in_executor(self.inner.get_stops, machine_id, since, until)
+
+    @timed("provider.aget_telemetry")
+    async def aget_telemetry(
+        self, machine_id: str, since: Optional[datetime] = None, until: Optional[datetime] = None
+    ) -> Optional[pd.DataFrame]:
+        if self._overrides("aget_telemetry"):
+            return await self.inner.aget_telemetry(machine_id, since, until)
+        return await self._in_executor(self.inner.get_telemetry, machine_id, since, until)
+
+    @timed("provider.aget_overview_many")
+    async def aget_overview_many(self, machine_ids: Optional[Iterable[str]] = None) -> List[MachineOverview]:
+        if self._overrides("aget_overview_many"):
+            return await self.inner.aget_overview_many(machine_ids)
+        return await self._in_executor(self.inner.get_overview_many, machine_ids)
+
+    @timed("provider.aget_oee_timeseries_many")
+    async def aget_oee_timeseries_many(
+        self, machine_ids: Iterable[str], since: Optional[datetime] = None, until: Optional[datetime] = None
+    ) -> Dict[str, pd.DataFrame]:
+        if self._overrides("aget_oee_timeseries_many"):
+            return await self.inner.aget_oee_timeseries_many(machine_ids, since, until)
+        if self._overrides("get_oee_timeseries_many"):
+            return await self._in_executor(self.inner.get_oee_timeseries_many, list(machine_ids), since, until)
+        return await self._afan_out(lambda mid: self.aget_oee_timeseries(mid, since, until), machine_ids)
+
+    @timed("provider.aget_stops_many")
+    async def aget_stops_many(
+        self, machine_ids: Iterable[str], since: Optional[datetime] = None, until: Optional[datetime] = None
+    ) -> Dict[str, List[StopEvent]]:
+        if self._overrides("aget_stops_many"):
+            return await self.inner.aget_stops_many(machine_ids, since, until)
+        if self._overrides("get_stops_many"):
+            return await self._in_executor(self.inner.get_stops_many, list(machine_ids), since, until)
+        return await self._afan_out(lambda mid: self.aget_stops(mid, since, until), machine_ids)
+
+    @timed("provider.aget_telemetry_many")
+    async def aget_telemetry_many(
+        self, machine_ids: Iterable[str], since: Optional[datetime] = None, until: Optional[datetime] = None
+    ) -> Dict[str, Optional[pd.DataFrame]]:
+        if self._overrides("aget_telemetry_many"):
+            return await self.inner.aget_telemetry_many(machine_ids, since, until)
+        if self._overrides("get_telemetry_many"):
+            return await self._in_executor(self.inner.get_telemetry_many, list(machine_ids), since, until)
+        return await self._afan_out(lambda mid: self.aget_telemetry(mid, since, until), machine_ids)
+
+    @timed("provider.aget_stop_table")
+    async def aget_stop_table(
+        self,
+        machine_ids: Optional[Iterable[str]] = None,
+        since: Optional[datetime] = None,
+        until: Optional[datetime] = None,
+    ) -> StopTable:
+        if self._overrides("aget_stop_table"):
+            return await self.inner.aget_stop_table(machine_ids, since, until)
+        ids = None if machine_ids is None else list(machine_ids)
+        return await self._in_executor(self.get_stop_table, ids, since, until)
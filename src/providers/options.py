@@ -0,0 +1,27 @@
+from __future__ import annotations
+from datetime import date
+from typing import Dict, Optional
+from pydantic import BaseModel, ConfigDict, Field
+
+class SimulatedProviderOptions(BaseModel):
+    """provider_options для провайдеров на симуляторе парка."""
+    model_config = ConfigDict(extra="forbid")
+
+    n_machines: int = Field(3, ge=1, le=100_000)
+    seed: int = 0
+
+class ServiceProviderOptions(BaseModel):
+    """provider_options для чтения из фонового сервиса данных (python -m src.service)."""
+    model_config = ConfigDict(extra="forbid")
+
+    url: str = "http://127.0.0.1:8010"
+    timeout: float = Field(6.0, gt=0)
+    shm_name: Optional[str] = None  # имя сегмента shared memory (python -m src.service --shm ...)
+
+class ReplayProviderOptions(BaseModel):
+    """provider_options для просмотра прогнанных журналов MES (python -m src.replay)."""
+    model_config = ConfigDict(extra="forbid")
+
+    db: str = "data/replay.sqlite"
+    day: Optional[date] = None  # по умолчанию — последние сутки в хранилище
+    ideal_per_hour: Dict[str, float] = {}  # kind -> шт/ч, поверх темпов симулятора
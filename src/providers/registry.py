@@ -0,0 +1,96 @@
+from __future__ import annotations
+
+import importlib
+from dataclasses import dataclass
+from importlib.metadata import entry_points
+from typing import Any, Dict, List, Mapping, Optional
+
+# сторонние провайдеры регистрируются в своём пакете:
+#   [project.entry-points."oee_shopfloor.providers"]
+#   my_mes = "my_pkg.provider:MyMesProvider"
+ENTRY_POINT_GROUP = "oee_shopfloor.providers"
+
+
+@dataclass(frozen=True)
+class ProviderSpec:
+    name: str
+    target: str                          # "module:Class" — импортируется только при выборе
+    options_schema: Optional[str] = None  # "module:Model" (pydantic) для provider_options
+
+
+_REGISTRY: Dict[str, ProviderSpec] = {}
+_entry_points_loaded = False
+
+
+def register_provider(name: str, target: str, options_schema: Optional[str] = None) -> None:
+    _REGISTRY[name] = ProviderSpec(name=name, target=target, options_schema=options_schema)
+
+
+register_provider("mock_basic", "src.providers.mock_basic:MockBasicProvider",
+                  "src.providers.options:SimulatedProviderOptions")
+register_provider("mes_standard_stub", "src.providers.mes_standard_stub:MesStandardStubProvider",
+                  "src.providers.options:SimulatedProviderOptions")
+register_provider("iot_advanced_stub", "src.providers.iot_advanced_stub:IotAdvancedStubProvider",
+                  "src.providers.options:SimulatedProviderOptions")
+register_provider("service", "src.providers.service_client:ServiceProvider",
+                  "src.providers.options:ServiceProviderOptions")
+register_provider("replay", "src.providers.replay:ReplayProvider",
+                  "src.providers.options:ReplayProviderOptions")
+
+
+def _load_entry_points() -> None:
+    global _entry_points_loaded
+    if _entry_points_loaded:
+        return
+    for ep in entry_points(group=ENTRY_POINT_GROUP):
+        # встроенные имена плагином не перекрываются; схема — атрибут options_model класса
+        _REGISTRY.setdefault(ep.name, ProviderSpec(name=ep.name, target=ep.value))
+    _entry_points_loaded = True
+
+
+def _import(target: str) -> Any:
+    module_name, _, attr = target.partition(":")
+    return getattr(importlib.import_module(module_name), attr)
+
+
+def available_providers() -> List[str]:
+    _load_entry_points()
+    return sorted(_REGISTRY)
+
+
+def get_spec(name: str) -> ProviderSpec:
+    if name not in _REGISTRY:
+        _load_entry_points()
+    try:
+        return _REGISTRY[name]
+    except KeyError:
+        raise ValueError(
+            f"Unknown provider: {name}. Available: {', '.join(available_providers())}"
+        ) from None
+
+
+def validate_provider_options(name: str, options: Optional[Mapping[str, Any]] = None) -> Dict[str, Any]:
+    """
+    Проверка provider_options по схеме провайдера (на старте, а не в глубине app.py).
+    Возвращает нормализованные опции (с подставленными значениями по умолчанию).
+    """
+    spec = get_spec(name)
+    if spec.options_schema:
+        schema = _import(spec.options_schema)
+    else:
+        schema = getattr(_import(spec.target), "options_model", None)
+    options = dict(options or {})
+    if schema is None:
+        return options
+    from pydantic import ValidationError
+
+    try:
+        return schema.model_validate(options).model_dump()
+    except ValidationError as e:
+        raise ValueError(f"Invalid provider_options for '{name}':\n{e}") from None
+
+
+def create_provider(name: str, options: Optional[Mapping[str, Any]] = None):
+    spec = get_spec(name)
+    cls = _import(spec.target)
+    return cls(**validate_provider_options(name, options))
@@ -0,0 +1,140 @@
+from __future__ import annotations
+
+from datetime import date, datetime, time, timedelta
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+from .base import ShopfloorProvider
+from ..diagnostics.oee import oee_components
+from ..models import MachineOverview, ShiftInfo, StopEvent
+from ..replay.store import RollupStore
+from ..tables import StopTable
+from ..telemetry.fleet import IDEAL_RATE_PER_HOUR
+
+_DEFAULT_IDEAL_PER_HOUR = 60.0
+
+
+def _ns(ts: datetime) -> int:
+    return int(np.datetime64(ts, "ns").astype(np.int64))
+
+
+def _dt(ns: int) -> datetime:
+    return np.datetime64(int(ns), "ns").astype("datetime64[us]").item()
+
+
+class ReplayProvider(ShopfloorProvider):
+    """
+    Данные прогнанных журналов MES (хранилище сводок src/replay).
+    «Смена» — сутки day (по умолчанию последние в хранилище); состояние станка —
+    на момент последнего события журнала.
+    """
+
+    def __init__(
+        self,
+        db: str = "data/replay.sqlite",
+        day: Optional[date] = None,
+        ideal_per_hour: Optional[Dict[str, float]] = None,
+    ):
+        self.store = RollupStore(db)
+        self.day = day
+        self.ideal_per_hour = {**IDEAL_RATE_PER_HOUR, **(ideal_per_hour or {})}
+
+    def _window(self) -> Tuple[datetime, datetime]:
+        day = self.day
+        if day is None:
+            _, hi = self.store.time_range()
+            day = _dt(hi - 1).date() if hi is not None else date.today()
+        start = datetime.combine(day, time(0, 0))
+        return start, start + timedelta(days=1)
+
+    def _clip(self, since: Optional[datetime], until: Optional[datetime]) -> Tuple[int, int]:
+        start, end = self._window()
+        return _ns(max(since, start) if since else start), _ns(min(until, end) if until else end)
+
+    def get_overview(self) -> List[MachineOverview]:
+        start, end = self._window()
+        lo, hi = _ns(start), _ns(end)
+        catalog = self.store.machines()
+        cursors = self.store.cursors()
+        roll = self.store.rollup(since=lo, until=hi)
+        bucket_ns = self.store.bucket_sec() * 1_000_000_000
+
+        ids = catalog["machine_id"].tolist()
+        kinds = catalog["kind"].where(catalog["kind"].notna(), None).tolist()
+        sums = roll.groupby("machine_id")[["planned_s", "run_s", "parts", "good"]].sum().reindex(ids, fill_value=0)
+        active = roll[roll["planned_s"] > 0].groupby("machine_id")["bucket"].agg(["min", "max"]).reindex(ids)
+        ideal = np.array([self.ideal_per_hour.get(k, _DEFAULT_IDEAL_PER_HOUR) for k in kinds])
+        kpi = oee_components(sums["planned_s"], sums["run_s"], sums["parts"], sums["good"], ideal)
+        stops = self.store.stop_table(ids, lo, hi)
+        n_stops = np.bincount(stops.machine, minlength=len(ids))
+
+        out: List[MachineOverview] = []
+        for i, (mid, name, kind, line_id) in enumerate(catalog.itertuples(index=False, name=None)):
+            cur = cursors.get(mid, {})
+            state = cur.get("state") or "IDLE"
+            if state == "OFF":
+                state = "IDLE"
+            a, b = active.loc[mid, "min"], active.loc[mid, "max"]
+            shift = ShiftInfo(start=start, end=end) if pd.isna(a) else ShiftInfo(
+                start=_dt(a), end=_dt(b + bucket_ns))
+            common = dict(
+                machine_id=mid, name=name or mid, kind=kind or "—", state=state,
+                line_id=line_id if isinstance(line_id, str) else None, shift=shift,
+            )
+            if state == "DOWN" and cur.get("stop_start") is not None:
+                reason = cur.get("stop_reason")
+                out.append(MachineOverview(
+                    **common,
+                    down_start_ts=_dt(cur["stop_start"]),
+                    down_reason=reason if reason in ("MAINT", "REPAIR") else None,
+                ))
+                continue
+
+            def opt(x: float) -> Optional[float]:
+                return None if np.isnan(x) else round(float(x), 4)
+
+            out.append(MachineOverview(
+                **common,
+                stops_count=int(n_stops[i]),
+                run_time_hours=round(float(sums["run_s"].iloc[i]) / 3600.0, 2),
+                planned_time_hours=round(float(sums["planned_s"].iloc[i]) / 3600.0, 2),
+                oee_percent=None if np.isnan(kpi["oee_percent"][i]) else float(kpi["oee_percent"][i]),
+                availability=opt(kpi["availability"][i]),
+                performance=opt(kpi["performance"][i]),
+                quality=opt(kpi["quality"][i]),
+            ))
+        return out
+
+    def get_oee_timeseries(
+        self, machine_id: str, since: Optional[datetime] = None, until: Optional[datetime] = None
+    ) -> pd.DataFrame:
+        lo, hi = self._clip(since, until)
+        roll = self.store.rollup([machine_id], lo, hi)
+        roll = roll[roll["planned_s"] > 0]
+        catalog = self.store.machines().set_index("machine_id")
+        kind = catalog["kind"].get(machine_id)
+        ideal = self.ideal_per_hour.get(kind, _DEFAULT_IDEAL_PER_HOUR)
+        kpi = oee_components(roll["planned_s"], roll["run_s"], roll["parts"], roll["good"], ideal)
+        index = pd.DatetimeIndex(roll["bucket"].to_numpy(np.int64).view("datetime64[ns]"), name="timestamp")
+        return pd.DataFrame({"oee_percent": kpi["oee_percent"]}, index=index)
+
+    def get_stop_table(
+        self,
+        machine_ids: Optional[Iterable[str]] = None,
+        since: Optional[datetime] = None,
+        until: Optional[datetime] = None,
+    ) -> StopTable:
+        lo, hi = self._clip(since, until)
+        return self.store.stop_table(None if machine_ids is None else list(machine_ids), lo, hi)
+
+    def get_stops(
+        self, machine_id: str, since: Optional[datetime] = None, until: Optional[datetime] = None
+    ) -> List[StopEvent]:
+        return self.get_stop_table([machine_id], since, until).to_events()
+
+    def get_stops_many(
+        self, machine_ids: Iterable[str], since: Optional[datetime] = None, until: Optional[datetime] = None
+    ) -> Dict[str, List[StopEvent]]:
+        return self.get_stop_table(machine_ids, since, until).to_events_many()
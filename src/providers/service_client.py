@@ -0,0 +1,118 @@
+from __future__ import annotations
+
+import threading
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+
+import pandas as pd
+import requests
+
+from .base import ShopfloorProvider
+from ..models import MachineOverview, StopEvent
+from ..service.core import payload_to_df
+
+
+class ServiceProvider(ShopfloorProvider):
+    """
+    Тонкий клиент фонового сервиса данных: ничего не считает сам.
+    Снимок парка запрашивается с ETag — пока версия не изменилась, сервис отвечает 304.
+    С shm_name обзор и тревоги читаются из shared memory сервиса (тот же хост), без HTTP.
+    """
+
+    def __init__(self, url: str = "http://127.0.0.1:8010", timeout: float = 6.0, shm_name: Optional[str] = None):
+        self.url = url.rstrip("/")
+        self.timeout = timeout
+        self.shm_name = shm_name
+        self._shm = None
+        self._shm_seq = 0
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._etag: Optional[str] = None
+        self._snapshot: Dict[str, Any] = {}
+        self._machines: List[MachineOverview] = []
+
+    def _session(self) -> requests.Session:
+        # requests.Session не потокобезопасна — своя на поток (адаптер ходит параллельно)
+        s = getattr(self._local, "session", None)
+        if s is None:
+            s = self._local.session = requests.Session()
+        return s
+
+    def _get(self, path: str, **params: Any) -> Any:
+        params = {k: v.isoformat() for k, v in params.items() if v is not None}
+        r = self._session().get(f"{self.url}{path}", params=params, timeout=self.timeout)
+        if r.status_code == 404:
+            raise KeyError(path)
+        r.raise_for_status()
+        return r.json()
+
+    def get_snapshot(self) -> Dict[str, Any]:
+        headers = {"If-None-Match": self._etag} if self._etag else {}
+        r = self._session().get(f"{self.url}/api/v1/snapshot", headers=headers, timeout=self.timeout)
+        if r.status_code == 304:
+            return self._snapshot
+        r.raise_for_status()
+        snapshot = r.json()
+        with self._lock:
+            self._snapshot = snapshot
+            self._machines = [MachineOverview.model_validate(m) for m in snapshot.get("machines", [])]
+            self._etag = r.headers.get("ETag")
+        return snapshot
+
+    def _read_shm(self) -> bool:
+        """Обновить обзор из shared memory. False — сегмента нет (сервис не запущен с --shm)."""
+        if not self.shm_name:
+            return False
+        from ..service.shm import FleetShmReader
+
+        with self._lock:
+            if self._shm is None:
+                try:
+                    self._shm = FleetShmReader(self.shm_name)
+                except FileNotFoundError:
+                    return False
+            # объекты строятся прямо по представлениям seqlock, без промежуточной копии таблицы;
+            # версия и таблица — из одного чтения, которое затем проверяется valid()
+            for _ in range(10):
+                view = self._shm.read()
+                if view is None:
+                    return False
+                if view.seq == self._shm_seq:
+                    return True
+                machines = view.table.to_overviews()
+                levels = view.table.alarm_levels()
+                if view.valid():
+                    self._machines = machines
+                    self._snapshot = {"version": view.version, "alarm_level": levels}
+                    self._shm_seq = view.seq
+                    return True
+        raise RuntimeError("Fleet snapshot is being rewritten too fast to read consistently")
+
+    def get_fleet_alarms(self) -> Dict[str, str]:
+        """machine_id -> ok/warn/alarm (худший канал), как посчитал сервис."""
+        if self._read_shm():
+            return dict(self._snapshot["alarm_level"])
+        return dict(self.get_snapshot().get("alarm_level", {}))
+
+    def get_overview(self) -> List[MachineOverview]:
+        if not self._read_shm():
+            self.get_snapshot()
+        return list(self._machines)
+
+    def get_oee_timeseries(
+        self, machine_id: str, since: Optional[datetime] = None, until: Optional[datetime] = None
+    ) -> pd.DataFrame:
+        body = self._get(f"/api/v1/machines/{machine_id}/oee", since=since, until=until)
+        return payload_to_df(body["data"])
+
+    def get_stops(
+        self, machine_id: str, since: Optional[datetime] = None, until: Optional[datetime] = None
+    ) -> List[StopEvent]:
+        body = self._get(f"/api/v1/machines/{machine_id}/stops", since=since, until=until)
+        return [StopEvent.model_validate(s) for s in body["data"]]
+
+    def get_telemetry(
+        self, machine_id: str, since: Optional[datetime] = None, until: Optional[datetime] = None
+    ) -> Optional[pd.DataFrame]:
+        body = self._get(f"/api/v1/machines/{machine_id}/telemetry", since=since, until=until)
+        return payload_to_df(body["data"])
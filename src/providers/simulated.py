@@ -0,0 +1,284 @@
+from __future__ import annotations
+
+from bisect import bisect_left
+from datetime import datetime
+from typing import Callable, Dict, Iterable, List, Literal, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+from .base import ShopfloorProvider, filter_stops
+from ..models import MachineOverview, ShiftInfo, StopEvent
+from ..tables import StopTable
+from ..telemetry.fleet import CHANNELS, DOWN, STATE_CODES, STOP_REASONS, FleetSimulator, FleetSpec
+
+Profile = Literal["BASIC", "STANDARD", "ADVANCED"]
+
+# заметки к остановкам — как их заполнил бы оператор/MES/IoT
+_NOTES = {
+    "MICROSTOP": "Автодетект: краткая пауза",
+    "SETUP": "Переналадка",
+    "FAULT": "Кратковременная остановка",
+    "MAINT": "Плановое ТО",
+    "REPAIR": "Ремонт",
+}
+
+
+_CHANNEL_DECIMALS = (2, 1, 2)
+
+
+class SimulatedFleetProvider(ShopfloorProvider):
+    """
+    Провайдер поверх сгенерированного парка (FleetSimulator).
+    Профиль определяет «как видит» данные уровень оснащения:
+    - BASIC: только крупные остановки (ручной ввод), грубые значения OEE
+    - STANDARD: MES — микростопы уходят в FAULT, ряд OEE сглажен
+    - ADVANCED: IoT — все события, включая микростопы
+    Всё, что не зависит от текущего момента, считается один раз на смену.
+    """
+
+    profile: Profile = "ADVANCED"
+    telemetry_window_minutes: int = 240
+
+    def __init__(
+        self,
+        profile: Optional[Profile] = None,
+        n_machines: int = 3,
+        seed: int = 0,
+        shift_start: Optional[datetime] = None,
+        clock: Callable[[], datetime] = datetime.now,
+    ):
+        self.profile = profile or type(self).profile
+        self.clock = clock
+        self.sim = FleetSimulator(FleetSpec(n_machines=n_machines, seed=seed, shift_start=shift_start))
+        self._shift = ShiftInfo(start=self.sim.shift_start, end=self.sim.shift_end)
+        self._precompute()
+        # (шаг, обзор) — одним присваиванием: сессии читают его из разных потоков без замка
+        self._overview: Optional[Tuple[int, List[MachineOverview]]] = None
+
+    # ------------------------------------------------------------------ предрасчёт на смену
+
+    def _precompute(self) -> None:
+        sim = self.sim
+        ts, oee = sim.oee_buckets(bucket_min=15)
+        if self.profile == "BASIC":
+            oee = np.round(oee)
+        elif self.profile == "STANDARD":
+            # сглаживание (агрегация событий MES), как rolling(3, min_periods=1).mean()
+            csum = np.cumsum(oee, axis=1)
+            shifted = np.zeros_like(csum)
+            shifted[:, 3:] = csum[:, :-3]
+            window = np.minimum(np.arange(1, oee.shape[1] + 1), 3)
+            oee = (csum - shifted) / window
+        self._bucket_index = pd.DatetimeIndex(ts, name="timestamp")
+        self._bucket_oee = oee
+        # конец интервала в шагах: ряд показываем только по завершённым интервалам
+        per = max(1, 15 * 60 // sim.spec.step_sec)
+        self._bucket_end_step = (np.arange(oee.shape[1]) + 1) * per
+
+        # все остановки парка колонками (для get_stop_table); коды причин совпадают с STOP_REASONS
+        code = sim.stop_reason.copy()
+        keep = np.ones(len(code), dtype=bool)
+        if self.profile == "BASIC":
+            keep = code != STOP_REASONS.index("MICROSTOP")
+        elif self.profile == "STANDARD":
+            code[code == STOP_REASONS.index("MICROSTOP")] = STOP_REASONS.index("FAULT")
+        self._table_machine = sim.stop_machine[keep]
+        self._table_start = sim.stop_start[keep]
+        self._table_end = sim.stop_end[keep]
+        self._table_reason = code[keep]
+
+        reasons = np.array(STOP_REASONS)
+        self._stops: List[Tuple[StopEvent, ...]] = []
+        self._stop_starts: List[List[int]] = []
+        self._stop_ends: List[List[int]] = []
+        for m in sim.machines:
+            start, end, code = sim.stops_of(m.index)
+            names = reasons[code]
+            keep = np.ones(len(start), dtype=bool)
+            if self.profile == "BASIC":
+                keep = names != "MICROSTOP"
+            elif self.profile == "STANDARD":
+                names = np.where(names == "MICROSTOP", "FAULT", names)
+            start, end, names = start[keep], end[keep], names[keep]
+            self._stops.append(tuple(
+                StopEvent(
+                    start=sim.step_to_datetime(s),
+                    end=sim.step_to_datetime(e),
+                    reason=r,
+                    note=None if self.profile == "BASIC" else _NOTES[r],
+                )
+                for s, e, r in zip(start.tolist(), end.tolist(), names.tolist())
+            ))
+            self._stop_starts.append(start.tolist())
+            self._stop_ends.append(end.tolist())
+
+    # ------------------------------------------------------------------ «сейчас»
+
+    def _current_step(self) -> int:
+        now = self.clock()
+        # вне смены показываем итог смены целиком
+        if not (self.sim.shift_start <= now < self.sim.shift_end):
+            return self.sim.n_steps
+        return max(1, self.sim.step_at(now))
+
+    def _index(self, machine_id: str) -> int:
+        try:
+            return self.sim.index_of[machine_id]
+        except KeyError:
+            raise KeyError(f"Unknown machine_id: {machine_id}") from None
+
+    def _stops_upto(self, i: int, step: int) -> List[StopEvent]:
+        n = bisect_left(self._stop_starts[i], step)
+        out = list(self._stops[i][:n])
+        if n and self._stop_ends[i][n - 1] > step:
+            # остановка ещё идёт: конец = текущий момент
+            out[-1] = out[-1].model_copy(update={"end": self.sim.step_to_datetime(step)})
+        return out
+
+    def _build_overview(self, step: int) -> List[MachineOverview]:
+        sim = self.sim
+        kpi = sim.kpis(step)
+        state = sim.state_at(step)
+        oee = kpi["oee_percent"]
+        if self.profile == "BASIC":
+            oee = np.round(oee)
+        run_h = np.round(kpi["run_time_hours"], 2).tolist()
+        oee_l = oee.tolist()
+        parts_l = np.round(np.stack([kpi["availability"], kpi["performance"], kpi["quality"]], axis=1), 4).tolist()
+        if self.profile == "BASIC":
+            parts_l = [[None, None, None]] * len(sim.machines)  # BASIC знает только итоговый OEE
+        state_l = state.tolist()
+
+        out: List[MachineOverview] = []
+        for m in sim.machines:
+            i = m.index
+            st = STATE_CODES[state_l[i]]
+            n_stops = bisect_left(self._stop_starts[i], step)
+            if state_l[i] == DOWN:
+                open_stop = self._stops[i][n_stops - 1]
+                out.append(MachineOverview(
+                    machine_id=m.machine_id, name=m.name, kind=m.kind, state=st, line_id=m.line_id,
+                    shift=self._shift,
+                    down_start_ts=open_stop.start, down_reason=open_stop.reason,
+                ))
+                continue
+            out.append(MachineOverview(
+                machine_id=m.machine_id, name=m.name, kind=m.kind, state=st, line_id=m.line_id,
+                shift=self._shift,
+                stops_count=n_stops,
+                run_time_hours=run_h[i],
+                planned_time_hours=sim.spec.shift_hours,
+                oee_percent=oee_l[i],
+                availability=parts_l[i][0],
+                performance=parts_l[i][1],
+                quality=parts_l[i][2],
+            ))
+        return out
+
+    # ------------------------------------------------------------------ API
+
+    def get_overview(self) -> List[MachineOverview]:
+        step = self._current_step()
+        cached = self._overview
+        if cached is None or cached[0] != step:
+            cached = (step, self._build_overview(step))
+            self._overview = cached
+        return list(cached[1])
+
+    def get_overview_many(self, machine_ids: Optional[Iterable[str]] = None) -> List[MachineOverview]:
+        overview = self.get_overview()
+        if machine_ids is None:
+            return overview
+        return [overview[self._index(mid)] for mid in machine_ids]
+
+    def get_oee_timeseries(
+        self, machine_id: str, since: Optional[datetime] = None, until: Optional[datetime] = None
+    ) -> pd.DataFrame:
+        return self.get_oee_timeseries_many([machine_id], since, until)[machine_id]
+
+    def get_oee_timeseries_many(
+        self, machine_ids: Iterable[str], since: Optional[datetime] = None, until: Optional[datetime] = None
+    ) -> Dict[str, pd.DataFrame]:
+        n = int(np.searchsorted(self._bucket_end_step, self._current_step(), side="right"))
+        # сравнение в numpy: since/until с микросекундами не приводятся к секундному индексу pandas
+        ts = self._bucket_index.values[:n]
+        lo = 0 if since is None else int(np.searchsorted(ts, np.datetime64(since, "us"), side="left"))
+        hi = n if until is None else int(np.searchsorted(ts, np.datetime64(until, "us"), side="left"))
+        index = self._bucket_index[lo:hi]
+        return {
+            mid: pd.DataFrame({"oee_percent": self._bucket_oee[self._index(mid), lo:hi]}, index=index)
+            for mid in machine_ids
+        }
+
+    def get_stops(
+        self, machine_id: str, since: Optional[datetime] = None, until: Optional[datetime] = None
+    ) -> List[StopEvent]:
+        return filter_stops(self._stops_upto(self._index(machine_id), self._current_step()), since, until)
+
+    def get_stops_many(
+        self, machine_ids: Iterable[str], since: Optional[datetime] = None, until: Optional[datetime] = None
+    ) -> Dict[str, List[StopEvent]]:
+        step = self._current_step()
+        return {mid: filter_stops(self._stops_upto(self._index(mid), step), since, until) for mid in machine_ids}
+
+    def get_stop_table(
+        self,
+        machine_ids: Optional[Iterable[str]] = None,
+        since: Optional[datetime] = None,
+        until: Optional[datetime] = None,
+    ) -> StopTable:
+        """Без StopEvent: прямо из массивов симулятора (сотни тысяч остановок за миллисекунды)."""
+        sim = self.sim
+        step = self._current_step()
+        rows = self._table_start < step
+        if machine_ids is None:
+            ids = tuple(m.machine_id for m in sim.machines)
+            machine = self._table_machine
+        else:
+            ids = tuple(machine_ids)
+            pos = np.full(len(sim.machines), -1, dtype=np.int32)
+            pos[[self._index(mid) for mid in ids]] = np.arange(len(ids), dtype=np.int32)
+            machine = pos[self._table_machine]
+            rows &= machine >= 0
+        origin = np.datetime64(sim.shift_start, "ns")
+        step_ns = np.timedelta64(sim.spec.step_sec, "s").astype("timedelta64[ns]")
+        reason = self._table_reason[rows]
+        table = StopTable(
+            machine=machine[rows].astype(np.int32),
+            start=origin + self._table_start[rows].astype(np.int64) * step_ns,
+            # идущая остановка заканчивается «сейчас»
+            end=origin + np.minimum(self._table_end[rows], step).astype(np.int64) * step_ns,
+            reason=reason,
+            note=np.full(len(reason), -1, np.int32) if self.profile == "BASIC" else reason.astype(np.int32),
+            machine_ids=ids,
+            notes=tuple(_NOTES[r] for r in STOP_REASONS),
+        )
+        return table if since is None and until is None else table.select(since=since, until=until)
+
+    def get_telemetry(
+        self, machine_id: str, since: Optional[datetime] = None, until: Optional[datetime] = None
+    ) -> pd.DataFrame:
+        return self.get_telemetry_many([machine_id], since, until)[machine_id]
+
+    def get_telemetry_many(
+        self, machine_ids: Iterable[str], since: Optional[datetime] = None, until: Optional[datetime] = None
+    ) -> Dict[str, pd.DataFrame]:
+        """По умолчанию — последние telemetry_window_minutes до текущего момента."""
+        sim = self.sim
+        step = self._current_step()
+        ts = sim.timestamps[:step]
+        hi = step if until is None else int(np.searchsorted(ts, np.datetime64(until, "s"), side="left"))
+        if since is None:
+            lo = max(0, hi - self.telemetry_window_minutes * 60 // sim.spec.step_sec)
+        else:
+            lo = int(np.searchsorted(ts, np.datetime64(since, "s"), side="left"))
+        index = pd.DatetimeIndex(ts[lo:hi], name="timestamp")
+        out: Dict[str, pd.DataFrame] = {}
+        for mid in machine_ids:
+            block = sim.telemetry[self._index(mid), lo:hi]
+            out[mid] = pd.DataFrame(
+                {ch: np.round(block[:, k].astype(np.float64), _CHANNEL_DECIMALS[k]) for k, ch in enumerate(CHANNELS)},
+                index=index,
+            )
+        return out
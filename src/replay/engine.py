@@ -0,0 +1,262 @@
+"""
+Прогон журнала событий MES через расчёт OEE, диагностику и хранилище сводок.
+
+Журнал читается кусками; каждый кусок делится по станкам на шарды
+(stable_seed(machine_id) % workers), шарды считаются в пуле процессов.
+Состояние станка между кусками (текущее состояние, открытая остановка) —
+MachineCursor: он уходит в процесс вместе с шардом и возвращается обратно,
+поэтому главный процесс может сохранить его в контрольную точку вместе с результатами куска.
+"""
+from __future__ import annotations
+
+import logging
+import time
+from concurrent.futures import Executor, Future, ProcessPoolExecutor
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+from ..diagnostics.breakdown import breakdowns_daily
+from ..diagnostics.microstops import microstops_daily
+from ..tables import STOP_REASONS, StopTable
+from ..telemetry.fleet import stable_seed
+from .events import LOG_STATES, read_event_log
+from .store import RollupStore
+
+log = logging.getLogger(__name__)
+
+_NS = 1_000_000_000
+UNKNOWN_REASON = "FAULT"  # причина для кодов, которых нет в STOP_REASONS (и для остановок без причины)
+
+
+@dataclass
+class MachineCursor:
+    """Состояние станка на момент последнего обработанного события."""
+    state: Optional[str] = None
+    since: int = 0  # ns
+    stop_start: Optional[int] = None  # ns, открытая остановка
+    stop_reason: Optional[str] = None
+    stop_note: Optional[str] = None
+
+
+@dataclass
+class ShardResult:
+    rollup: pd.DataFrame  # machine_id, bucket, planned_s, run_s, parts, good
+    stops: StopTable
+    diagnostics: pd.DataFrame  # machine_id, day, microstops, microstop_min, breakdowns, breakdown_min
+    cursors: Dict[str, MachineCursor]
+
+
+@dataclass
+class ReplayStats:
+    events: int = 0
+    chunks: int = 0
+    seconds: float = 0.0
+    resumed_from: int = 0
+    stops: int = 0
+    by_chunk: List[float] = field(default_factory=list)
+
+    @property
+    def events_per_s(self) -> float:
+        return self.events / self.seconds if self.seconds else 0.0
+
+
+def _split_by_bucket(machine: np.ndarray, start: np.ndarray, end: np.ndarray, bucket_ns: int):
+    """Интервалы [start, end) -> куски по границам интервалов сводки: (machine, bucket, seconds, index)."""
+    first = start // bucket_ns
+    k = np.maximum((end - 1) // bucket_ns - first + 1, 0)
+    idx = np.repeat(np.arange(len(start)), k)
+    offset = np.arange(len(idx)) - np.repeat(np.cumsum(k) - k, k)
+    bucket = first[idx] + offset
+    lo = np.maximum(start[idx], bucket * bucket_ns)
+    hi = np.minimum(end[idx], (bucket + 1) * bucket_ns)
+    return machine[idx], bucket * bucket_ns, (hi - lo) / _NS, idx
+
+
+def process_shard(
+    chunk: pd.DataFrame, cursors: Dict[str, MachineCursor], bucket_sec: int
+) -> ShardResult:
+    """Один шард одного куска журнала. Чистая функция: всё состояние — в cursors."""
+    chunk = chunk.sort_values(["machine_id", "ts"], kind="stable")
+    bucket_ns = bucket_sec * _NS
+    cursors = dict(cursors)
+
+    # --- состояния: интервалы между событиями и остановки (цикл только по событиям STATE)
+    seg_m: List[str] = []
+    seg_s: List[int] = []
+    seg_e: List[int] = []
+    seg_state: List[str] = []
+    stops: Dict[str, List[Tuple[int, int, str, Optional[str]]]] = {}
+    st = chunk[chunk["event"].to_numpy() == "STATE"]
+    for mid, ts, state, reason, note in zip(
+        st["machine_id"].tolist(), st["ts"].to_numpy(np.int64).tolist(),
+        st["state"].tolist(), st["reason"].tolist(), st["note"].tolist(),
+    ):
+        if state not in LOG_STATES:
+            raise ValueError(f"Unknown state {state!r} for {mid} at {pd.Timestamp(ts)}")
+        if reason and reason not in STOP_REASONS:
+            # незнакомый код причины не роняет кусок: остановка — FAULT, исходный код — в примечании
+            note = f"{note} (reason {reason})" if note else f"reason {reason}"
+            reason = UNKNOWN_REASON
+        cur = cursors.get(mid)
+        if cur is None:
+            cur = cursors[mid] = MachineCursor()
+        if cur.state is not None and ts > cur.since:
+            seg_m.append(mid)
+            seg_s.append(cur.since)
+            seg_e.append(ts)
+            seg_state.append(cur.state)
+        stopped = state in ("IDLE", "DOWN")
+        if cur.stop_start is not None and (not stopped or (reason and reason != cur.stop_reason)):
+            if ts > cur.stop_start:
+                stops.setdefault(mid, []).append((cur.stop_start, ts, cur.stop_reason, cur.stop_note))
+            cur.stop_start = None
+        if stopped and cur.stop_start is None:
+            cur.stop_start, cur.stop_reason, cur.stop_note = ts, reason or UNKNOWN_REASON, note
+        cur.state, cur.since = state, ts
+
+    seg_state_a = np.array(seg_state, dtype=object)
+    m, bucket, sec, idx = _split_by_bucket(
+        np.array(seg_m, dtype=object), np.array(seg_s, dtype=np.int64), np.array(seg_e, dtype=np.int64), bucket_ns
+    )
+    piece_state = seg_state_a[idx]
+    time_df = pd.DataFrame({
+        "machine_id": m,
+        "bucket": bucket,
+        "planned_s": np.where(piece_state != "OFF", sec, 0.0),
+        "run_s": np.where(piece_state == "RUN", sec, 0.0),
+    })
+
+    # --- выпуск: векторно по всем событиям COUNT
+    cnt = chunk[chunk["event"].to_numpy() == "COUNT"]
+    count_df = pd.DataFrame({
+        "machine_id": cnt["machine_id"].to_numpy(),
+        "bucket": cnt["ts"].to_numpy(np.int64) // bucket_ns * bucket_ns,
+        "parts": cnt["parts"].to_numpy(np.int64),
+        "good": cnt["good"].to_numpy(np.int64),
+    })
+    rollup = (
+        pd.concat([time_df, count_df], ignore_index=True)
+        .fillna({"planned_s": 0.0, "run_s": 0.0, "parts": 0, "good": 0})
+        .groupby(["machine_id", "bucket"], as_index=False, sort=False)
+        .sum()
+    )
+    rollup[["parts", "good"]] = rollup[["parts", "good"]].astype(np.int64)
+
+    # --- закрытые остановки -> StopTable -> диагностика
+    ids = tuple(stops)
+    flat = [s for mid in ids for s in stops[mid]]
+    notes: Dict[str, int] = {}
+    table = StopTable(
+        machine=np.repeat(np.arange(len(ids), dtype=np.int32), [len(stops[mid]) for mid in ids]),
+        start=np.array([s[0] for s in flat], dtype=np.int64).view("datetime64[ns]"),
+        end=np.array([s[1] for s in flat], dtype=np.int64).view("datetime64[ns]"),
+        reason=np.array([STOP_REASONS.index(s[2]) for s in flat], dtype=np.int8),
+        note=np.array([-1 if s[3] is None else notes.setdefault(s[3], len(notes)) for s in flat], dtype=np.int32),
+        machine_ids=ids,
+        notes=tuple(notes),
+    )
+    diag = pd.merge(microstops_daily(table), breakdowns_daily(table), on=["machine_id", "day"], how="outer")
+    return ShardResult(rollup=rollup, stops=table, diagnostics=diag.fillna(0), cursors=cursors)
+
+
+def shard_of(machine_ids: np.ndarray, workers: int) -> np.ndarray:
+    """Номер шарда для каждого machine_id (одинаковый между запусками и процессами)."""
+    codes, uniques = pd.factorize(machine_ids)
+    return np.array([stable_seed(u) % workers for u in uniques], dtype=np.int32)[codes]
+
+
+class ReplayEngine:
+    def __init__(
+        self,
+        store: RollupStore,
+        workers: int = 4,
+        chunk_rows: int = 200_000,
+        bucket_min: int = 15,
+    ):
+        self.store = store
+        self.workers = max(1, workers)
+        self.chunk_rows = chunk_rows
+        self.bucket_sec = bucket_min * 60
+
+    def run(self, path: str, resume: bool = True, max_chunks: Optional[int] = None) -> ReplayStats:
+        """
+        Прогнать журнал целиком (или max_chunks кусков). С resume=True продолжает
+        с контрольной точки этого журнала: уже учтённые строки не читаются повторно.
+        Без контрольной точки состояние станков берётся с конца ранее прогнанных журналов.
+        """
+        source = str(Path(path).resolve())
+        if not resume:
+            self.store.reset_source(source)
+        rows_done, raw = self.store.load_checkpoint(source)
+        fresh = not rows_done and not raw
+        cursors = {mid: MachineCursor(**c) for mid, c in raw.items()}
+        stats = ReplayStats(resumed_from=rows_done)
+        t0 = time.perf_counter()
+        pool: Optional[Executor] = ProcessPoolExecutor(self.workers) if self.workers > 1 else None
+        chunks = read_event_log(path, self.chunk_rows, skip_rows=rows_done)
+        try:
+            chunk = next(chunks, None)
+            if fresh and chunk is not None:
+                cursors = self._seed_cursors(chunk)
+            while chunk is not None:
+                tc = time.perf_counter()
+                pending = self._submit(pool, chunk, cursors)
+                last = max_chunks is not None and stats.chunks + 1 >= max_chunks
+                # следующий кусок читаем, пока шарды текущего считаются
+                upcoming = None if last else next(chunks, None)
+                results = [f.result() for f in pending]
+                for r in results:
+                    cursors.update(r.cursors)
+                rows_done += len(chunk)
+                self.store.write_chunk(source, results, _catalog(chunk), rows_done, cursors, self.bucket_sec)
+                stats.events += len(chunk)
+                stats.chunks += 1
+                stats.stops += sum(len(r.stops) for r in results)
+                stats.by_chunk.append(len(chunk) / max(time.perf_counter() - tc, 1e-9))
+                log.info("replay %s: %d events (%.0f events/s)", Path(path).name, rows_done,
+                         stats.events / (time.perf_counter() - t0))
+                chunk = upcoming
+        finally:
+            chunks.close()
+            if pool is not None:
+                pool.shutdown()
+        stats.seconds = time.perf_counter() - t0
+        return stats
+
+    def _seed_cursors(self, chunk: pd.DataFrame) -> Dict[str, MachineCursor]:
+        """
+        Журнал без своей контрольной точки продолжает уже прогнанные (журналы идут по времени):
+        состояние станков берётся с конца прошлых журналов, иначе время между последним событием
+        прошлого журнала и первым событием этого (и открытые остановки) потерялось бы.
+        Состояния новее начала журнала не берутся — это более поздние журналы при перепрогоне.
+        """
+        start = int(chunk["ts"].to_numpy(np.int64).min())
+        return {mid: MachineCursor(**c) for mid, c in self.store.cursors().items() if c["since"] <= start}
+
+    def _submit(self, pool: Optional[Executor], chunk: pd.DataFrame,
+                cursors: Dict[str, MachineCursor]) -> List[Future]:
+        if pool is None:
+            done: Future = Future()
+            done.set_result(process_shard(chunk, cursors, self.bucket_sec))
+            return [done]
+        shard = shard_of(chunk["machine_id"].to_numpy(), self.workers)
+        futures = []
+        for k in range(self.workers):
+            part = chunk[shard == k]
+            if part.empty:
+                continue
+            ids = set(part["machine_id"].unique().tolist())
+            futures.append(pool.submit(
+                process_shard, part, {mid: c for mid, c in cursors.items() if mid in ids}, self.bucket_sec
+            ))
+        return futures
+
+
+def _catalog(chunk: pd.DataFrame) -> pd.DataFrame:
+    """Справочник станков из куска (строки, где он заполнен)."""
+    has = chunk["name"].notna() | chunk["kind"].notna() | chunk["line_id"].notna()
+    return chunk.loc[has, ["machine_id", "name", "kind", "line_id"]].drop_duplicates("machine_id", keep="last")
@@ -0,0 +1,173 @@
+"""
+Журнал событий MES (CSV или Parquet), одна строка — одно событие:
+
+    ts, machine_id, event, state, reason, note, parts, good[, name, kind, line_id]
+
+- event=STATE — смена состояния: state RUN/IDLE/DOWN/OFF (OFF — вне плана),
+  reason — причина остановки (StopReason) для IDLE/DOWN;
+- event=COUNT — выпуск с прошлой отметки: parts, good.
+name/kind/line_id — необязательный справочник станков (достаточно в первой строке станка).
+Журнал упорядочен по времени.
+"""
+from __future__ import annotations
+
+from datetime import datetime, timedelta
+from pathlib import Path
+from typing import Iterator, List, Tuple
+
+import numpy as np
+import pandas as pd
+
+from ..telemetry.fleet import RUN, STATE_CODES, STOP_REASONS, FleetSimulator, FleetSpec
+
+LOG_COLUMNS: Tuple[str, ...] = ("ts", "machine_id", "event", "state", "reason", "note", "parts", "good")
+CATALOG_COLUMNS: Tuple[str, ...] = ("name", "kind", "line_id")
+LOG_STATES: Tuple[str, ...] = STATE_CODES + ("OFF",)
+_REASON_STATE = {"MICROSTOP": "IDLE", "SETUP": "IDLE", "FAULT": "IDLE", "MAINT": "DOWN", "REPAIR": "DOWN"}
+
+
+def _normalize(df: pd.DataFrame) -> pd.DataFrame:
+    """Единые типы колонок: ts — datetime64[ns], текст — object с None, счётчики — int64."""
+    missing = [c for c in ("ts", "machine_id", "event") if c not in df.columns]
+    if missing:
+        raise ValueError(f"Event log is missing columns: {missing}")
+    out = pd.DataFrame({"ts": pd.to_datetime(df["ts"], format="ISO8601").astype("datetime64[ns]")})
+    for c in ("machine_id", "event", "state", "reason", "note") + CATALOG_COLUMNS:
+        col = df[c] if c in df.columns else pd.Series(None, index=df.index, dtype=object)
+        out[c] = col.astype(object).where(col.notna(), None)
+    for c in ("parts", "good"):
+        out[c] = df[c].fillna(0).astype(np.int64) if c in df.columns else 0
+    return out
+
+
+def read_event_log(path: str, chunk_rows: int = 200_000, skip_rows: int = 0) -> Iterator[pd.DataFrame]:
+    """
+    Журнал кусками по chunk_rows строк (память не зависит от размера файла).
+    skip_rows — сколько строк данных пропустить (продолжение с контрольной точки).
+    """
+    p = Path(path)
+    if p.suffix.lower() in (".parquet", ".pq"):
+        yield from _read_parquet(p, chunk_rows, skip_rows)
+        return
+    reader = pd.read_csv(
+        p,
+        chunksize=chunk_rows,
+        dtype={c: object for c in ("machine_id", "event", "state", "reason", "note") + CATALOG_COLUMNS},
+        skiprows=(lambda i: 0 < i <= skip_rows) if skip_rows else None,
+    )
+    for chunk in reader:
+        yield _normalize(chunk)
+
+
+def _read_parquet(p: Path, chunk_rows: int, skip_rows: int) -> Iterator[pd.DataFrame]:
+    try:
+        import pyarrow.parquet as pq
+    except ImportError:
+        raise ImportError("Parquet event logs need pyarrow: pip install pyarrow") from None
+    f = pq.ParquetFile(p)
+    # пропускаем целые row group'ы по метаданным, остаток — срезом первой пачки
+    groups, first = [], 0
+    for g in range(f.num_row_groups):
+        n = f.metadata.row_group(g).num_rows
+        if first + n <= skip_rows:
+            first += n
+            continue
+        groups.append(g)
+    skip = skip_rows - first
+    for batch in f.iter_batches(batch_size=chunk_rows, row_groups=groups):
+        if skip:
+            cut = min(skip, batch.num_rows)
+            batch, skip = batch.slice(cut), skip - cut
+            if not batch.num_rows:
+                continue
+        yield _normalize(batch.to_pandas())
+
+
+# ---------------------------------------------------------------------- синтетический журнал
+
+
+def fleet_events(sim: FleetSimulator, count_every_steps: int = 2) -> pd.DataFrame:
+    """Журнал одной смены симулятора: состояния по остановкам, выпуск — раз в count_every_steps шагов."""
+    M = sim.spec.n_machines
+    ids = np.array([m.machine_id for m in sim.machines], dtype=object)
+    origin = np.datetime64(sim.shift_start, "ns")
+    step_ns = np.timedelta64(sim.spec.step_sec, "s").astype("timedelta64[ns]")
+    reasons = np.array(STOP_REASONS, dtype=object)
+    stop_state = np.array([_REASON_STATE[r] for r in STOP_REASONS], dtype=object)
+
+    frames: List[pd.DataFrame] = []
+    # начало смены: все в работе (со справочником станков), конец смены — OFF
+    frames.append(pd.DataFrame({
+        "step": 0, "order": 0, "machine_id": ids, "event": "STATE", "state": STATE_CODES[RUN],
+        "name": [m.name for m in sim.machines], "kind": [m.kind for m in sim.machines],
+        "line_id": [m.line_id for m in sim.machines],
+    }))
+    frames.append(pd.DataFrame({
+        "step": sim.n_steps, "order": 3, "machine_id": ids, "event": "STATE", "state": "OFF",
+    }))
+    # остановки: начало -> IDLE/DOWN с причиной, конец -> RUN (конец раньше начала следующей)
+    frames.append(pd.DataFrame({
+        "step": sim.stop_start, "order": 2, "machine_id": ids[sim.stop_machine], "event": "STATE",
+        "state": stop_state[sim.stop_reason], "reason": reasons[sim.stop_reason],
+    }))
+    ends = sim.stop_end < sim.n_steps
+    frames.append(pd.DataFrame({
+        "step": sim.stop_end[ends], "order": 1, "machine_id": ids[sim.stop_machine[ends]], "event": "STATE",
+        "state": STATE_CODES[RUN],
+    }))
+    # выпуск: суммы за окно count_every_steps, отметка в конце окна
+    k = count_every_steps
+    T = sim.n_steps // k * k
+    parts = sim.parts[:, :T].reshape(M, -1, k).sum(axis=2, dtype=np.int64)
+    good = sim.good[:, :T].reshape(M, -1, k).sum(axis=2, dtype=np.int64)
+    mi, wi = np.nonzero(parts)
+    frames.append(pd.DataFrame({
+        "step": (wi + 1) * k, "order": 1, "machine_id": ids[mi], "event": "COUNT",
+        "parts": parts[mi, wi], "good": good[mi, wi],
+    }))
+
+    df = pd.concat(frames, ignore_index=True)
+    df = df.sort_values(["step", "order"], kind="stable").reset_index(drop=True)
+    df.insert(0, "ts", origin + df.pop("step").to_numpy(np.int64) * step_ns)
+    df = df.drop(columns="order")
+    df["parts"] = df["parts"].fillna(0).astype(np.int64)
+    df["good"] = df["good"].fillna(0).astype(np.int64)
+    return df.reindex(columns=list(LOG_COLUMNS + CATALOG_COLUMNS))
+
+
+def write_fleet_log(path: str, n_machines: int = 100, days: int = 1, seed: int = 0,
+                    start: datetime | None = None) -> int:
+    """Журнал нескольких смен симулятора (по смене в сутки) в CSV/Parquet. Возвращает число событий."""
+    start = start or datetime.now().replace(hour=8, minute=0, second=0, microsecond=0) - timedelta(days=days)
+    frames = [
+        fleet_events(FleetSimulator(FleetSpec(n_machines=n_machines, seed=seed + d,
+                                              shift_start=start + timedelta(days=d),
+                                              open_down_probability=0.0, open_idle_probability=0.0)))
+        for d in range(days)
+    ]
+    df = pd.concat(frames, ignore_index=True)
+    p = Path(path)
+    p.parent.mkdir(parents=True, exist_ok=True)
+    if p.suffix.lower() in (".parquet", ".pq"):
+        df.to_parquet(p, index=False, row_group_size=200_000)
+    else:
+        df.to_csv(p, index=False, date_format="%Y-%m-%dT%H:%M:%S")
+    return len(df)
+
+
+def main() -> None:
+    """Синтетический журнал MES из симулятора: python -m src.replay.events --out data/mes_log.csv."""
+    import argparse
+
+    p = argparse.ArgumentParser(description=main.__doc__)
+    p.add_argument("--out", default="data/mes_log.csv")
+    p.add_argument("--machines", type=int, default=100)
+    p.add_argument("--days", type=int, default=1)
+    p.add_argument("--seed", type=int, default=0)
+    args = p.parse_args()
+    n = write_fleet_log(args.out, n_machines=args.machines, days=args.days, seed=args.seed)
+    print(f"wrote {n:,} events to {args.out}")
+
+
+if __name__ == "__main__":
+    main()
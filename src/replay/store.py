@@ -0,0 +1,235 @@
+"""
+Хранилище сводок (SQLite): интервалы OEE, остановки, суточная диагностика и
+контрольные точки прогона. Всё аддитивно и помечено журналом-источником, поэтому
+кусок журнала и его контрольная точка пишутся одной транзакцией, а журнал
+можно перепрогнать начисто (reset_source).
+"""
+from __future__ import annotations
+
+import json
+import sqlite3
+import threading
+from dataclasses import asdict
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple
+
+import numpy as np
+import pandas as pd
+
+from ..tables import StopTable
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS machines (
+    machine_id TEXT PRIMARY KEY, name TEXT, kind TEXT, line_id TEXT
+);
+CREATE TABLE IF NOT EXISTS oee_rollup (
+    source TEXT, machine_id TEXT, bucket INTEGER,
+    planned_s REAL, run_s REAL, parts INTEGER, good INTEGER,
+    PRIMARY KEY (source, machine_id, bucket)
+);
+CREATE INDEX IF NOT EXISTS oee_rollup_machine ON oee_rollup (machine_id, bucket);
+CREATE TABLE IF NOT EXISTS stops (
+    source TEXT, machine_id TEXT, start INTEGER, "end" INTEGER, reason INTEGER, note TEXT
+);
+CREATE INDEX IF NOT EXISTS stops_machine ON stops (machine_id, start);
+CREATE TABLE IF NOT EXISTS diag_daily (
+    source TEXT, machine_id TEXT, day TEXT,
+    microstops INTEGER, microstop_min REAL, breakdowns INTEGER, breakdown_min REAL,
+    PRIMARY KEY (source, machine_id, day)
+);
+CREATE TABLE IF NOT EXISTS checkpoints (
+    source TEXT PRIMARY KEY, rows_done INTEGER, bucket_sec INTEGER, cursors TEXT, updated_at TEXT
+);
+"""
+
+
+def _ids_clause(column: str, machine_ids: Optional[Sequence[str]]) -> Tuple[str, List[Any]]:
+    if machine_ids is None:
+        return "", []
+    return f" AND {column} IN ({','.join('?' * len(machine_ids))})", list(machine_ids)
+
+
+class RollupStore:
+    def __init__(self, path: str = "data/replay.sqlite"):
+        self.path = path
+        if path != ":memory:":
+            Path(path).parent.mkdir(parents=True, exist_ok=True)
+        # один коннект на процесс; провайдер читает из потоков Streamlit — под замком
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._lock = threading.Lock()
+        with self._lock:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.executescript(_SCHEMA)
+
+    def close(self) -> None:
+        self._conn.close()
+
+    # ------------------------------------------------------------------ запись (движок прогона)
+
+    def load_checkpoint(self, source: str) -> Tuple[int, Dict[str, Dict[str, Any]]]:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT rows_done, cursors FROM checkpoints WHERE source = ?", (source,)
+            ).fetchone()
+        return (0, {}) if row is None else (int(row[0]), json.loads(row[1]))
+
+    def reset_source(self, source: str) -> None:
+        with self._lock, self._conn:
+            for table in ("oee_rollup", "stops", "diag_daily", "checkpoints"):
+                self._conn.execute(f"DELETE FROM {table} WHERE source = ?", (source,))
+
+    def write_chunk(
+        self,
+        source: str,
+        results: Iterable[Any],
+        catalog: pd.DataFrame,
+        rows_done: int,
+        cursors: Dict[str, Any],
+        bucket_sec: int,
+    ) -> None:
+        """Результаты одного куска (ShardResult) + контрольная точка — атомарно."""
+        with self._lock, self._conn:
+            c = self._conn
+            if len(catalog):
+                c.executemany(
+                    "INSERT INTO machines VALUES (?, ?, ?, ?) ON CONFLICT(machine_id) DO UPDATE SET "
+                    "name = coalesce(excluded.name, name), kind = coalesce(excluded.kind, kind), "
+                    "line_id = coalesce(excluded.line_id, line_id)",
+                    catalog[["machine_id", "name", "kind", "line_id"]].itertuples(index=False, name=None),
+                )
+            for r in results:
+                roll = r.rollup
+                c.executemany(
+                    "INSERT INTO oee_rollup VALUES (?, ?, ?, ?, ?, ?, ?) "
+                    "ON CONFLICT(source, machine_id, bucket) DO UPDATE SET "
+                    "planned_s = planned_s + excluded.planned_s, run_s = run_s + excluded.run_s, "
+                    "parts = parts + excluded.parts, good = good + excluded.good",
+                    zip([source] * len(roll), roll["machine_id"].tolist(), roll["bucket"].tolist(),
+                        roll["planned_s"].tolist(), roll["run_s"].tolist(),
+                        roll["parts"].tolist(), roll["good"].tolist()),
+                )
+                st = r.stops
+                ids = np.asarray(st.machine_ids, dtype=object)
+                notes = np.array(list(st.notes) + [None], dtype=object)
+                c.executemany(
+                    'INSERT INTO stops VALUES (?, ?, ?, ?, ?, ?)',
+                    zip([source] * len(st), ids[st.machine].tolist(), st.start.view(np.int64).tolist(),
+                        st.end.view(np.int64).tolist(), st.reason.tolist(), notes[st.note].tolist()),
+                )
+                d = r.diagnostics
+                c.executemany(
+                    "INSERT INTO diag_daily VALUES (?, ?, ?, ?, ?, ?, ?) "
+                    "ON CONFLICT(source, machine_id, day) DO UPDATE SET "
+                    "microstops = microstops + excluded.microstops, "
+                    "microstop_min = microstop_min + excluded.microstop_min, "
+                    "breakdowns = breakdowns + excluded.breakdowns, "
+                    "breakdown_min = breakdown_min + excluded.breakdown_min",
+                    zip([source] * len(d), d["machine_id"].tolist(), d["day"].astype(str).tolist(),
+                        d["microstops"].astype(int).tolist(), d["microstop_min"].astype(float).tolist(),
+                        d["breakdowns"].astype(int).tolist(), d["breakdown_min"].astype(float).tolist()),
+                )
+            c.execute(
+                "INSERT OR REPLACE INTO checkpoints VALUES (?, ?, ?, ?, ?)",
+                (source, rows_done, bucket_sec,
+                 json.dumps({mid: asdict(cur) for mid, cur in cursors.items()}),
+                 datetime.now().isoformat(timespec="seconds")),
+            )
+
+    # ------------------------------------------------------------------ чтение (провайдер, отчёты)
+
+    def bucket_sec(self) -> int:
+        with self._lock:
+            row = self._conn.execute("SELECT max(bucket_sec) FROM checkpoints").fetchone()
+        return int(row[0] or 900)
+
+    def machines(self) -> pd.DataFrame:
+        """Справочник: machine_id, name, kind, line_id (станки без справочника — только с id)."""
+        with self._lock:
+            return pd.read_sql_query(
+                "SELECT ids.machine_id, m.name, m.kind, m.line_id FROM "
+                "(SELECT DISTINCT machine_id FROM oee_rollup UNION SELECT machine_id FROM machines) ids "
+                "LEFT JOIN machines m USING (machine_id) ORDER BY ids.machine_id",
+                self._conn,
+            )
+
+    def cursors(self) -> Dict[str, Dict[str, Any]]:
+        """Последнее известное состояние станков (по всем журналам — самое свежее)."""
+        with self._lock:
+            rows = self._conn.execute("SELECT cursors FROM checkpoints").fetchall()
+        out: Dict[str, Dict[str, Any]] = {}
+        for (raw,) in rows:
+            for mid, cur in json.loads(raw).items():
+                if mid not in out or cur["since"] > out[mid]["since"]:
+                    out[mid] = cur
+        return out
+
+    def time_range(self) -> Tuple[Optional[int], Optional[int]]:
+        """[первый, последний) интервал сводки, ns."""
+        with self._lock:
+            lo, hi = self._conn.execute("SELECT min(bucket), max(bucket) FROM oee_rollup").fetchone()
+        return (None, None) if lo is None else (int(lo), int(hi) + self.bucket_sec() * 1_000_000_000)
+
+    def rollup(
+        self, machine_ids: Optional[Sequence[str]] = None, since: Optional[int] = None, until: Optional[int] = None
+    ) -> pd.DataFrame:
+        """Суммы по станкам и интервалам [since, until) (ns): machine_id, bucket, planned_s, run_s, parts, good."""
+        where, args = _ids_clause("machine_id", machine_ids)
+        if since is not None:
+            where, args = where + " AND bucket >= ?", args + [since]
+        if until is not None:
+            where, args = where + " AND bucket < ?", args + [until]
+        with self._lock:
+            return pd.read_sql_query(
+                "SELECT machine_id, bucket, sum(planned_s) AS planned_s, sum(run_s) AS run_s, "
+                "sum(parts) AS parts, sum(good) AS good FROM oee_rollup WHERE 1 = 1" + where +
+                " GROUP BY machine_id, bucket ORDER BY machine_id, bucket",
+                self._conn, params=args,
+            )
+
+    def stop_table(
+        self, machine_ids: Optional[Sequence[str]] = None, since: Optional[int] = None, until: Optional[int] = None
+    ) -> StopTable:
+        """Закрытые остановки, пересекающие [since, until) (ns)."""
+        where, args = _ids_clause("machine_id", machine_ids)
+        if since is not None:
+            where, args = where + ' AND "end" > ?', args + [since]
+        if until is not None:
+            where, args = where + " AND start < ?", args + [until]
+        with self._lock:
+            df = pd.read_sql_query(
+                'SELECT machine_id, start, "end", reason, note FROM stops WHERE 1 = 1' + where +
+                " ORDER BY machine_id, start", self._conn, params=args,
+            )
+        machine, uniques = pd.factorize(df["machine_id"])
+        note, notes = pd.factorize(df["note"])
+        ids = tuple(machine_ids) if machine_ids is not None else tuple(uniques)
+        if machine_ids is not None:
+            machine = pd.Index(ids).get_indexer(df["machine_id"])
+        return StopTable(
+            machine=np.asarray(machine, dtype=np.int32),
+            start=df["start"].to_numpy(np.int64).view("datetime64[ns]"),
+            end=df["end"].to_numpy(np.int64).view("datetime64[ns]"),
+            reason=df["reason"].to_numpy(np.int8),
+            note=np.asarray(note, dtype=np.int32),
+            machine_ids=ids,
+            notes=tuple(notes),
+        )
+
+    def diagnostics(
+        self, machine_ids: Optional[Sequence[str]] = None, since_day: Optional[str] = None,
+        until_day: Optional[str] = None,
+    ) -> pd.DataFrame:
+        """Суточные микростопы/отказы: machine_id, day, microstops, microstop_min, breakdowns, breakdown_min."""
+        where, args = _ids_clause("machine_id", machine_ids)
+        if since_day is not None:
+            where, args = where + " AND day >= ?", args + [since_day]
+        if until_day is not None:
+            where, args = where + " AND day < ?", args + [until_day]
+        with self._lock:
+            return pd.read_sql_query(
+                "SELECT machine_id, day, sum(microstops) AS microstops, sum(microstop_min) AS microstop_min, "
+                "sum(breakdowns) AS breakdowns, sum(breakdown_min) AS breakdown_min FROM diag_daily "
+                "WHERE 1 = 1" + where + " GROUP BY machine_id, day ORDER BY machine_id, day",
+                self._conn, params=args,
+            )
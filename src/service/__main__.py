@@ -0,0 +1,56 @@
+"""
+Фоновый сервис данных цеха (один процесс на хост):
+
+    python -m src.service --config config/advanced.yaml --port 8010
+
+Приложение Streamlit читает его снимки через provider: service
+(provider_options: {url: http://127.0.0.1:8010}). С --shm oee_fleet снимок парка
+дополнительно публикуется в shared memory (provider_options: {shm_name: oee_fleet}).
+"""
+from __future__ import annotations
+
+import argparse
+import logging
+import os
+
+import uvicorn
+
+from ..config_loader import ConfigError, load_config
+from ..providers import get_provider
+from ..observability.server import serve_from_env
+from ..telemetry.thresholds import ThresholdWatcher
+from .api import create_app
+from .core import DataService
+
+
+def main() -> None:
+    p = argparse.ArgumentParser(description="Shopfloor data service")
+    p.add_argument("--config", default=os.environ.get("OEE_CONFIG", "config/advanced.yaml"))
+    p.add_argument("--host", default="127.0.0.1")
+    p.add_argument("--port", type=int, default=8010)
+    p.add_argument("--erp-url", default=os.environ.get("ERP_URL"))
+    p.add_argument("--shm", default=os.environ.get("OEE_SHM"), help="shared memory segment name")
+    args = p.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    serve_from_env()  # OEE_METRICS_PORT — замеры этапов опроса на /metrics
+    try:
+        cfg = load_config(args.config)
+    except ConfigError as e:
+        raise SystemExit(str(e))
+    if cfg["provider"] == "service":
+        raise SystemExit("Service config must name a data provider, not 'service' itself")
+
+    provider = get_provider(cfg["provider"], cfg.get("provider_options"), batch=True)
+    service = DataService(
+        provider,
+        refresh_seconds=float(cfg.get("refresh_seconds") or 5),
+        thresholds=ThresholdWatcher(args.config),
+        erp_url=args.erp_url,
+        shm_name=args.shm,
+    )
+    uvicorn.run(create_app(service), host=args.host, port=args.port, log_level="warning")
+
+
+if __name__ == "__main__":
+    main()
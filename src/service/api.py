@@ -0,0 +1,96 @@
+from __future__ import annotations
+
+import asyncio
+import time
+from contextlib import asynccontextmanager
+from datetime import datetime
+from typing import Optional
+
+from fastapi import FastAPI, HTTPException, Request, Response
+
+from ..observability.http import instrument_app
+from .core import DataService
+
+
+def create_app(service: DataService) -> FastAPI:
+    @asynccontextmanager
+    async def lifespan(app: FastAPI):
+        await service.tick()  # первый снимок готов до первого запроса
+        task = asyncio.create_task(service.run())
+        try:
+            yield
+        finally:
+            task.cancel()
+            service.close()
+
+    app = FastAPI(title="Shopfloor Data Service", version="0.1", lifespan=lifespan)
+    app.state.service = service
+
+    # GET /metrics: HTTP по маршрутам + состояние ingest (версия снимка, кэши, очереди, ошибки циклов)
+    metrics = instrument_app(app, "data_service")
+    metrics.set.register(service.events)
+    metrics.gauge("oee_service_snapshot_version", "Current snapshot version.", lambda: service.version)
+    metrics.gauge("oee_service_snapshot_bytes", "Size of the serialized snapshot.", lambda: len(service.snapshot_bytes))
+    metrics.gauge("oee_service_machines", "Machines in the current snapshot.", lambda: len(service.machines))
+    metrics.gauge("oee_service_cache_entries", "Cached per-machine payloads for this version.",
+                  lambda: len(service._cache))
+    metrics.gauge("oee_service_anomalies_active", "Anomaly events in progress.",
+                  lambda: len(service._detector.active_events()) if service._detector is not None else 0)
+    metrics.gauge("oee_service_anomalies_recent", "Closed anomaly events kept in history.",
+                  lambda: len(service.anomalies))
+    metrics.gauge("oee_service_erp_requests", "Maintenance requests mirrored from ERP.",
+                  lambda: len(service.erp_requests))
+    metrics.gauge("oee_service_tick_age_seconds", "Seconds since the last successful ingest tick (-1: none yet).",
+                  lambda: time.time() - service.last_tick_at if service.last_tick_at else -1.0)
+
+    def _json(body: bytes, etag: str) -> Response:
+        return Response(content=body, media_type="application/json", headers={"ETag": etag})
+
+    @app.get("/health")
+    def health():
+        return {"ok": True, "version": service.version, "ts": datetime.now().isoformat(timespec="seconds")}
+
+    @app.get("/api/v1/snapshot")
+    def snapshot(request: Request):
+        # один и тот же снимок для всех зрителей; повторный запрос без изменений — 304
+        etag = f'"{service.version}"'
+        if request.headers.get("if-none-match") == etag:
+            return Response(status_code=304, headers={"ETag": etag})
+        return _json(service.snapshot_bytes, etag)
+
+    async def _machine(kind: str, machine_id: str, since: Optional[datetime], until: Optional[datetime]):
+        try:
+            body = await service.machine_payload(kind, machine_id, since, until)
+        except KeyError:
+            raise HTTPException(status_code=404, detail="machine_id not found")
+        return _json(body, f'"{service.version}"')
+
+    @app.get("/api/v1/machines/{machine_id}/oee")
+    async def machine_oee(machine_id: str, since: Optional[datetime] = None, until: Optional[datetime] = None):
+        return await _machine("oee", machine_id, since, until)
+
+    @app.get("/api/v1/machines/{machine_id}/stops")
+    async def machine_stops(machine_id: str, since: Optional[datetime] = None, until: Optional[datetime] = None):
+        return await _machine("stops", machine_id, since, until)
+
+    @app.get("/api/v1/machines/{machine_id}/telemetry")
+    async def machine_telemetry(machine_id: str, since: Optional[datetime] = None, until: Optional[datetime] = None):
+        return await _machine("telemetry", machine_id, since, until)
+
+    @app.get("/api/v1/erp/requests/{request_id}")
+    def erp_request(request_id: str):
+        doc = service.erp_requests.get(request_id)
+        if not doc:
+            raise HTTPException(status_code=404, detail="request_id not found")
+        return doc
+
+    @app.get("/")
+    def root():
+        return {
+            "service": "Shopfloor Data Service",
+            "ok": True,
+            "endpoints": ["/health", "/metrics", "/api/v1/snapshot", "/api/v1/machines/{machine_id}/oee",
+                          "/api/v1/machines/{machine_id}/stops", "/api/v1/machines/{machine_id}/telemetry"],
+        }
+
+    return app
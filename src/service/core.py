@@ -0,0 +1,268 @@
+from __future__ import annotations
+
+import asyncio
+import hashlib
+import json
+import logging
+import time
+from collections import deque
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Tuple, Union
+
+import numpy as np
+import pandas as pd
+
+from ..erp.client import ErpClient
+from ..models import MachineOverview
+from ..observability.counters import ShardedCounter
+from ..observability.metrics import timed
+from ..providers.base import ShopfloorProvider
+from ..tables import ALARM_CHANNELS, ALARM_LEVELS, FleetTable
+from ..telemetry.anomaly import AnomalyConfig, AnomalyDetector
+from ..telemetry.fleet import CHANNELS
+from ..telemetry.simulator import TelemetryThresholds, compute_alarms_many
+from ..telemetry.thresholds import ThresholdWatcher
+
+log = logging.getLogger(__name__)
+
+
+def df_to_payload(df: Optional[pd.DataFrame]) -> Optional[Dict[str, Any]]:
+    """DataFrame с DatetimeIndex -> JSON-совместимый dict (колонки списками)."""
+    if df is None:
+        return None
+    return {
+        "timestamp": [ts.isoformat() for ts in df.index],
+        "columns": {c: [None if pd.isna(v) else float(v) for v in df[c].tolist()] for c in df.columns},
+    }
+
+
+def payload_to_df(payload: Optional[Dict[str, Any]]) -> Optional[pd.DataFrame]:
+    if payload is None:
+        return None
+    index = pd.DatetimeIndex(pd.to_datetime(payload["timestamp"]), name="timestamp")
+    return pd.DataFrame(payload["columns"], index=index, dtype="float64")
+
+
+class DataService:
+    """
+    Единственный владелец данных цеха на хосте: опрос провайдера (ingest),
+    статусы тревог, опрос ERP и кэши. Сессии Streamlit только читают готовые снимки,
+    поэтому стоимость не растёт с числом зрителей.
+    """
+
+    def __init__(
+        self,
+        provider: ShopfloorProvider,
+        refresh_seconds: float = 5.0,
+        thresholds: Union[TelemetryThresholds, ThresholdWatcher] = TelemetryThresholds(),
+        erp_url: Optional[str] = None,
+        erp_poll_seconds: float = 15.0,
+        shm_name: Optional[str] = None,
+        anomaly: Optional[AnomalyConfig] = AnomalyConfig(),
+        anomaly_history: int = 200,
+    ):
+        self.provider = provider
+        self.refresh_seconds = refresh_seconds or 5.0
+        self.thresholds = thresholds  # ThresholdWatcher — пороги по видам/станкам с перечитыванием конфига
+        self.erp_url = erp_url
+        self.erp_poll_seconds = erp_poll_seconds
+        self._erp: Optional[ErpClient] = None
+        self.shm_name = shm_name
+        self._shm = None  # FleetShmWriter, создаётся при первой публикации
+        self.anomaly = anomaly  # None — только статические пороги
+        self._detector: Optional[AnomalyDetector] = None
+        self.anomalies: deque = deque(maxlen=anomaly_history)  # закрытые события, новые в конце
+
+        self.version = 0
+        self.snapshot: Dict[str, Any] = {}
+        self.snapshot_bytes: bytes = b"{}"
+        self.machines: List[MachineOverview] = []
+        self.erp_requests: Dict[str, Dict[str, Any]] = {}
+
+        self._digest = ""
+        self._last_ts: Dict[str, datetime] = {}  # последняя полученная точка телеметрии по станку
+        self._last_values: Dict[str, np.ndarray] = {}
+        # кэш ответов по станкам; сбрасывается с каждой новой версией снимка
+        self._cache: Dict[Tuple[Any, ...], bytes] = {}
+        # фоновые циклы: tick / tick_changed / tick_failed / erp_poll / erp_poll_failed
+        self.events = ShardedCounter("oee_service_events_total", "Background loop events.", ("event",))
+        self.last_tick_at: Optional[float] = None  # time.time() последнего успешного цикла
+
+    # ------------------------------------------------------------------ ingest
+
+    @timed("service.tick")
+    async def tick(self) -> bool:
+        """Один цикл опроса. True — снимок изменился (новая версия)."""
+        machines = await self.provider.aget_overview()
+        ids = [m.machine_id for m in machines]
+
+        # телеметрию забираем инкрементально: с самой старой «последней точки» по парку, чтобы
+        # станок, отстающий от остальных, не потерял свои точки; новый станок — всё окно
+        known = [self._last_ts.get(mid) for mid in ids]
+        since = None if not known or None in known else min(known)
+        frames = await self.provider.aget_telemetry_many(ids, since=since)
+        if self.anomaly is not None:
+            self._detect(ids, frames)
+        for mid, df in frames.items():
+            if df is None or df.empty:
+                continue
+            self._last_values[mid] = df[list(CHANNELS)].iloc[-1].to_numpy(dtype=np.float64)
+            ts = df.index[-1].to_pydatetime()
+            if mid not in self._last_ts or ts > self._last_ts[mid]:
+                self._last_ts[mid] = ts
+
+        nan = np.full(len(CHANNELS), np.nan)
+        last = np.array([self._last_values.get(mid, nan) for mid in ids]).reshape(len(ids), len(CHANNELS))
+        thr = self.thresholds
+        if isinstance(thr, ThresholdWatcher):
+            thr = thr.table(ids, [m.kind for m in machines])
+        codes = compute_alarms_many(last, thr)
+        active = []
+        if self._detector is not None:
+            # идущая аномалия — не ниже warn, даже если последняя точка в норме
+            codes = np.maximum(codes, self._detector.active_mask().astype(codes.dtype))
+            active = [e.model_dump(mode="json") for e in self._detector.active_events()]
+        worst = codes.max(axis=1) if len(ids) else codes.reshape(0)
+
+        states = [m.state for m in machines]
+        oee = [m.oee_percent for m in machines if m.oee_percent is not None]
+        body = {
+            "machines": [m.model_dump(mode="json") for m in machines],
+            "alarms": {
+                mid: dict(zip(ALARM_CHANNELS, (ALARM_LEVELS[c] for c in row)))
+                for mid, row in zip(ids, codes.tolist())
+            },
+            "alarm_level": {mid: ALARM_LEVELS[c] for mid, c in zip(ids, worst.tolist())},
+            "last": {
+                mid: dict(zip(CHANNELS, (None if np.isnan(v) else float(v) for v in row)))
+                for mid, row in zip(ids, last.tolist())
+            },
+            "anomalies": {
+                "active": active,
+                "recent": [e.model_dump(mode="json") for e in reversed(self.anomalies)],
+            },
+            "fleet": {
+                "machines": len(ids),
+                "by_state": {s: states.count(s) for s in ("RUN", "IDLE", "DOWN")},
+                "oee_avg": round(float(np.mean(oee)), 1) if oee else None,
+            },
+        }
+        digest = hashlib.sha1(json.dumps(body, sort_keys=True).encode("utf-8")).hexdigest()
+        if digest == self._digest:
+            return False
+
+        self.version += 1
+        self._digest = digest
+        self.machines = machines
+        self._cache.clear()
+        self.snapshot = {"version": self.version, "ts": datetime.now().isoformat(timespec="seconds"), **body}
+        self.snapshot_bytes = json.dumps(self.snapshot, ensure_ascii=False).encode("utf-8")
+        if self.shm_name:
+            self._publish_shm(machines, last, codes)
+        return True
+
+    def _detect(self, ids: List[str], frames: Dict[str, Optional[pd.DataFrame]]) -> None:
+        """Новые точки всех станков (после своей последней точки у каждого) — пачкой (M, k, 3) в детектор."""
+        if self._detector is None:
+            self._detector = AnomalyDetector(ids, self.anomaly)
+        else:
+            self._detector.align(ids)  # норма станков переживает смену состава и порядка парка
+        fresh: Dict[str, pd.DataFrame] = {}
+        for mid in ids:
+            df = frames.get(mid)
+            if df is None or df.empty:
+                continue
+            last = self._last_ts.get(mid)
+            df = df.loc[df.index > last] if last is not None else df
+            if not df.empty:
+                fresh[mid] = df
+        if not fresh:
+            return
+        frames_fresh = list(fresh.values())
+        index = frames_fresh[0].index
+        for df in frames_fresh[1:]:
+            if not df.index.equals(index):
+                index = index.union(df.index)
+        nan = np.full((len(index), len(CHANNELS)), np.nan)
+        values = np.stack([
+            fresh[mid][list(CHANNELS)].reindex(index).to_numpy(dtype=np.float64) if mid in fresh else nan
+            for mid in ids
+        ])
+        # строки, добавленные объединением отметок, — «точки нет», а не обрыв датчиков
+        observed = np.stack([
+            index.isin(fresh[mid].index) if mid in fresh else np.zeros(len(index), dtype=bool) for mid in ids
+        ])
+        self.anomalies.extend(self._detector.update(index.to_numpy(), values, observed=observed))
+
+    def _publish_shm(self, machines: List[MachineOverview], last: np.ndarray, codes: np.ndarray) -> None:
+        from .shm import FleetShmWriter
+
+        table = FleetTable.from_overviews(machines)
+        table.telemetry_last[:] = last
+        table.alarm[:] = codes
+        if self._shm is None or len(table) > self._shm.capacity:
+            if self._shm is not None:
+                self._shm.close()
+            self._shm = FleetShmWriter(self.shm_name, capacity=max(1024, 2 * len(table)))
+        self._shm.publish(table, version=self.version)
+
+    def close(self) -> None:
+        if self._shm is not None:
+            self._shm.close()
+            self._shm = None
+
+    async def poll_erp(self) -> None:
+        if not self.erp_url:
+            return
+        if self._erp is None:
+            self._erp = ErpClient(self.erp_url)
+        inbox = await asyncio.to_thread(self._erp.inbox)
+        self.erp_requests = {doc["request_id"]: doc for doc in inbox.get("items", [])}
+
+    async def run(self) -> None:
+        """Бесконечный цикл: провайдер — каждые refresh_seconds, ERP — каждые erp_poll_seconds."""
+        loop = asyncio.get_running_loop()
+        next_erp = loop.time()
+        while True:
+            started = loop.time()
+            try:
+                changed = await self.tick()
+            except Exception:
+                self.events.inc(("tick_failed",))
+                log.exception("ingest tick failed")
+            else:
+                self.events.inc(("tick_changed",) if changed else ("tick",))
+                self.last_tick_at = time.time()
+            if self.erp_url and started >= next_erp:
+                next_erp = started + self.erp_poll_seconds
+                try:
+                    await self.poll_erp()
+                except Exception as e:
+                    self.events.inc(("erp_poll_failed",))
+                    log.warning("ERP poll failed: %s", e)
+                else:
+                    self.events.inc(("erp_poll",))
+            await asyncio.sleep(max(0.0, self.refresh_seconds - (loop.time() - started)))
+
+    # ------------------------------------------------------------------ чтение (общий кэш на версию)
+
+    async def machine_payload(
+        self, kind: str, machine_id: str, since: Optional[datetime] = None, until: Optional[datetime] = None
+    ) -> bytes:
+        key = (kind, machine_id, since, until)
+        cached = self._cache.get(key)
+        if cached is not None:
+            return cached
+        if kind == "oee":
+            data: Any = df_to_payload(await self.provider.aget_oee_timeseries(machine_id, since, until))
+        elif kind == "stops":
+            stops = await self.provider.aget_stops(machine_id, since, until)
+            data = [s.model_dump(mode="json") for s in stops]
+        elif kind == "telemetry":
+            data = df_to_payload(await self.provider.aget_telemetry(machine_id, since, until))
+        else:
+            raise ValueError(f"Unknown payload kind: {kind}")
+        out = json.dumps({"version": self.version, "machine_id": machine_id, "data": data},
+                         ensure_ascii=False).encode("utf-8")
+        self._cache[key] = out
+        return out
@@ -0,0 +1,214 @@
+"""
+Снимок парка в shared memory: один писатель (сервис данных), сколько угодно
+читателей (воркеры Streamlit, CLI) на том же хосте.
+
+Раскладка сегмента фиксирована: заголовок + два слота, в каждом — колонки
+FLEET_COLUMNS на capacity станков. Писатель всегда пишет в слот, который
+читатели сейчас не используют (двойной буфер), и сдвигает счётчик seq:
+
+    seq нечётный  — идёт запись версии seq // 2 + 1 в слот (seq // 2 + 1) % 2
+    seq чётный    — последняя готовая версия v = seq // 2 лежит в слоте v % 2
+
+Читатель берёт NumPy-представления прямо поверх памяти (без копий и блокировок).
+Они остаются согласованными, пока писатель не начал версию v + 2 (seq <= 2v + 2):
+это проверяет FleetView.valid() после того, как данные использованы.
+"""
+from __future__ import annotations
+
+import time
+from dataclasses import dataclass
+from multiprocessing import resource_tracker, shared_memory
+from typing import Dict, Optional, Tuple
+
+import numpy as np
+
+from ..tables import FLEET_COLUMNS, FleetTable
+
+DEFAULT_NAME = "oee_fleet"
+MAGIC = 0x4F454546  # "OEEF"
+LAYOUT_VERSION = 1
+
+_HEADER = np.dtype([
+    ("magic", "<u4"),
+    ("layout", "<u4"),
+    ("capacity", "<u4"),
+    ("_pad", "<u4"),
+    ("seq", "<u8"),          # см. описание модуля
+    ("rows", "<u4", (2,)),   # число станков в слоте
+    ("version", "<u8", (2,)),  # версия снимка у источника (DataService.version)
+    ("ts_ns", "<i8", (2,)),  # время публикации слота
+])
+_HEADER_SIZE = 64
+assert _HEADER.itemsize <= _HEADER_SIZE
+
+
+# сегменты, созданные писателем в этом процессе (их учёт в resource_tracker не трогаем)
+_OWNED: set = set()
+
+
+def _align(n: int, to: int = 64) -> int:
+    return (n + to - 1) // to * to
+
+
+def _slot_layout(capacity: int) -> Tuple[Dict[str, int], int]:
+    """Смещения колонок внутри слота и размер слота."""
+    offsets: Dict[str, int] = {}
+    pos = 0
+    for name, (dtype, shape) in FLEET_COLUMNS.items():
+        offsets[name] = pos
+        pos += _align(capacity * np.dtype(dtype).itemsize * int(np.prod(shape, dtype=np.int64)))
+    return offsets, pos
+
+
+def segment_size(capacity: int) -> int:
+    return _HEADER_SIZE + 2 * _slot_layout(capacity)[1]
+
+
+class _Segment:
+    """Общая часть писателя и читателя: заголовок и представления колонок."""
+
+    def __init__(self, shm: shared_memory.SharedMemory):
+        self.shm = shm
+        self.header = np.ndarray((), dtype=_HEADER, buffer=shm.buf)
+        if int(self.header["magic"]) != MAGIC or int(self.header["layout"]) != LAYOUT_VERSION:
+            raise ValueError(f"Shared memory '{shm.name}' is not a fleet snapshot (layout {LAYOUT_VERSION})")
+        self.capacity = int(self.header["capacity"])
+        offsets, slot_size = _slot_layout(self.capacity)
+        self._slots = [self._columns(_HEADER_SIZE + k * slot_size, offsets) for k in range(2)]
+
+    def _columns(self, base: int, offsets: Dict[str, int]) -> Dict[str, np.ndarray]:
+        cols = {}
+        for name, (dtype, shape) in FLEET_COLUMNS.items():
+            cols[name] = np.ndarray(
+                (self.capacity,) + shape, dtype=dtype, buffer=self.shm.buf, offset=base + offsets[name]
+            )
+        return cols
+
+    @property
+    def seq(self) -> int:
+        return int(self.header["seq"])
+
+    def close(self) -> None:
+        # представления держат ссылки на буфер — отпускаем их до закрытия
+        self._slots = []
+        self.header = None
+        self.shm.close()
+
+
+class FleetShmWriter(_Segment):
+    """Публикация FleetTable в shared memory. Писатель на сегмент должен быть один."""
+
+    def __init__(self, name: str = DEFAULT_NAME, capacity: int = 1024):
+        size = segment_size(capacity)
+        try:
+            shm = shared_memory.SharedMemory(name=name, create=True, size=size)
+        except FileExistsError:
+            # сегмент остался от прошлого запуска: пересоздаём под текущую раскладку
+            old = shared_memory.SharedMemory(name=name)
+            old.close()
+            old.unlink()
+            shm = shared_memory.SharedMemory(name=name, create=True, size=size)
+        header = np.ndarray((), dtype=_HEADER, buffer=shm.buf)
+        header[()] = np.zeros((), dtype=_HEADER)
+        header["magic"], header["layout"], header["capacity"] = MAGIC, LAYOUT_VERSION, capacity
+        del header
+        _OWNED.add(name)
+        super().__init__(shm)
+
+    def publish(self, table: FleetTable, version: Optional[int] = None) -> int:
+        """Записать снимок в свободный слот. Возвращает номер версии в сегменте."""
+        n = len(table)
+        if n > self.capacity:
+            raise ValueError(f"Fleet of {n} machines does not fit capacity {self.capacity}")
+        committed = self.seq // 2
+        new = committed + 1
+        slot = new % 2
+        self.header["seq"] = 2 * committed + 1  # запись началась
+        cols = self._slots[slot]
+        for name, values in table.columns().items():
+            cols[name][:n] = values
+        self.header["rows"][slot] = n
+        self.header["version"][slot] = new if version is None else version
+        self.header["ts_ns"][slot] = time.time_ns()
+        self.header["seq"] = 2 * new  # версия готова
+        return new
+
+    def close(self, unlink: bool = True) -> None:
+        shm = self.shm
+        super().close()
+        if unlink:
+            shm.unlink()
+            _OWNED.discard(shm.name.lstrip("/"))
+
+
+@dataclass
+class FleetView:
+    """Снимок без копирования: колонки — представления поверх shared memory."""
+    seq: int  # номер версии в сегменте
+    version: int  # версия у источника
+    ts_ns: int
+    table: FleetTable
+    _reader: "FleetShmReader"
+
+    def valid(self) -> bool:
+        """True — писатель не трогал слот с момента read(); данные можно использовать."""
+        return self._reader.seq <= 2 * self.seq + 2
+
+
+class FleetShmReader(_Segment):
+    def __init__(self, name: str = DEFAULT_NAME):
+        shm = shared_memory.SharedMemory(name=name)
+        # до Python 3.13 читатель регистрируется в resource_tracker и при выходе удалил бы чужой сегмент
+        if name not in _OWNED:
+            resource_tracker.unregister(shm._name, "shared_memory")  # type: ignore[attr-defined]
+        super().__init__(shm)
+
+    def read(self) -> Optional[FleetView]:
+        """Последняя готовая версия или None, если писатель ещё ничего не опубликовал."""
+        v = self.seq // 2
+        if v == 0:
+            return None
+        slot = v % 2
+        n = int(self.header["rows"][slot])
+        cols = {name: arr[:n] for name, arr in self._slots[slot].items()}
+        return FleetView(
+            seq=v,
+            version=int(self.header["version"][slot]),
+            ts_ns=int(self.header["ts_ns"][slot]),
+            table=FleetTable.from_columns(cols),
+            _reader=self,
+        )
+
+    def snapshot(self, retries: int = 10) -> Optional[FleetTable]:
+        """Согласованная копия (для долгоживущих данных): перечитываем, если писатель обогнал."""
+        for _ in range(retries):
+            view = self.read()
+            if view is None:
+                return None
+            copy = FleetTable.from_columns({k: v.copy() for k, v in view.table.columns().items()})
+            if view.valid():
+                return copy
+        raise RuntimeError("Fleet snapshot is being rewritten too fast to read consistently")
+
+
+def main() -> None:
+    """Печать снимка из shared memory: python -m src.service.shm [--name oee_fleet]."""
+    import argparse
+
+    p = argparse.ArgumentParser(description=main.__doc__)
+    p.add_argument("--name", default=DEFAULT_NAME)
+    args = p.parse_args()
+
+    reader = FleetShmReader(args.name)
+    table = reader.snapshot()
+    if table is None:
+        raise SystemExit("No snapshot published yet")
+    levels = table.alarm_levels()
+    for m in table.to_overviews():
+        oee = "—" if m.oee_percent is None else f"{m.oee_percent:5.1f}%"
+        print(f"{m.machine_id:<16} {m.state:<5} OEE {oee:>6}  stops {m.stops_count:<3} alarm {levels[m.machine_id]}")
+    reader.close()
+
+
+if __name__ == "__main__":
+    main()
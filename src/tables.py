@@ -0,0 +1,320 @@
+"""
+Колоночные (NumPy) представления моделей из models.py.
+
+Pydantic-модели остаются форматом на границах API; внутри — массивы,
+по одному на поле, с кодами вместо строк-литералов. Сортировка, фильтры
+и длительности считаются над массивами целиком, в модели переводятся
+только строки, которые реально показываются.
+"""
+from __future__ import annotations
+
+from dataclasses import dataclass, replace
+from datetime import datetime
+from typing import Any, Dict, Iterable, List, Mapping, Optional, Sequence, Tuple, TypeVar, get_args
+
+import numpy as np
+import pandas as pd
+
+from .models import MachineOverview, MachineState, ShiftInfo, StopEvent, StopReason
+
+STATES: Tuple[str, ...] = get_args(MachineState)
+DOWN_REASONS: Tuple[str, ...] = ("MAINT", "REPAIR")
+STOP_REASONS: Tuple[str, ...] = get_args(StopReason)
+ALARM_LEVELS: Tuple[str, ...] = ("ok", "warn", "alarm")
+ALARM_CHANNELS: Tuple[str, ...] = ("vibration", "temperature", "current")
+TELEMETRY_CHANNELS: Tuple[str, ...] = ("vibration_mm_s", "bearing_temp_c", "motor_current_pu")
+
+NAT = np.iinfo(np.int64).min  # «нет времени» для колонок datetime (ns)
+
+# имя -> (dtype, форма на один станок); общий контракт для FleetTable и shared memory
+FLEET_COLUMNS: Dict[str, Tuple[str, Tuple[int, ...]]] = {
+    "machine_id": ("S32", ()),
+    "name": ("S96", ()),          # UTF-8
+    "kind": ("S48", ()),          # UTF-8
+    "line_id": ("S16", ()),
+    "state": ("i1", ()),          # индекс в STATES
+    "shift_start": ("i8", ()),    # ns
+    "shift_end": ("i8", ()),      # ns
+    "stops_count": ("i4", ()),
+    "run_time_hours": ("f4", ()),
+    "planned_time_hours": ("f4", ()),
+    "oee_percent": ("f4", ()),    # NaN — нет данных
+    "availability": ("f4", ()),
+    "performance": ("f4", ()),
+    "quality": ("f4", ()),
+    "down_start_ts": ("i8", ()),  # ns, NAT — нет
+    "down_reason": ("i1", ()),    # индекс в DOWN_REASONS, -1 — нет
+    "telemetry_last": ("f4", (len(TELEMETRY_CHANNELS),)),
+    "alarm": ("i1", (len(TELEMETRY_CHANNELS),)),  # индекс в ALARM_LEVELS
+}
+
+
+def _ns(ts: Optional[datetime]) -> int:
+    return NAT if ts is None else int(np.datetime64(ts, "ns").astype(np.int64))
+
+
+def _dt(ns: int) -> Optional[datetime]:
+    return None if ns == NAT else np.datetime64(int(ns), "ns").astype("datetime64[us]").item()
+
+
+def _encode(value: str, column: str, machine_id: str) -> bytes:
+    """UTF-8 под ширину колонки FLEET_COLUMNS: NumPy молча обрезал бы строку, в том числе посреди символа."""
+    raw = value.encode("utf-8")
+    width = np.dtype(FLEET_COLUMNS[column][0]).itemsize
+    if len(raw) > width:
+        raise ValueError(
+            f"{column} of machine {machine_id!r} is {len(raw)} bytes in UTF-8, "
+            f"fleet table allows {width} ({value!r})"
+        )
+    return raw
+
+
+def _nan(x: Optional[float]) -> float:
+    return np.nan if x is None else x
+
+
+def _opt(x: float) -> Optional[float]:
+    return None if np.isnan(x) else round(float(x), 4)
+
+
+def _codes(values: Iterable[Optional[str]], categories: Dict[str, int]) -> np.ndarray:
+    """Строки -> коды категорий (-1 для None); новые значения дописываются в categories."""
+    return np.fromiter(
+        (-1 if v is None else categories.setdefault(v, len(categories)) for v in values), dtype=np.int32
+    )
+
+
+TTable = TypeVar("TTable", bound="_ColumnTable")
+
+
+class _ColumnTable:
+    """Общие операции над колоночными таблицами: выборка строк по индексам/маске и сортировка."""
+    _COLUMNS: Tuple[str, ...] = ()
+
+    def __len__(self) -> int:
+        return len(getattr(self, self._COLUMNS[0]))
+
+    def columns(self) -> Dict[str, np.ndarray]:
+        return {name: getattr(self, name) for name in self._COLUMNS}
+
+    def take(self: TTable, rows: Any) -> TTable:
+        """Строки по индексам или булевой маске (категории сохраняются)."""
+        return replace(self, **{name: getattr(self, name)[rows] for name in self._COLUMNS})
+
+    def sort_by(self: TTable, column: str, descending: bool = False) -> TTable:
+        order = np.argsort(getattr(self, column), kind="stable")
+        return self.take(order[::-1] if descending else order)
+
+
+@dataclass
+class FleetTable(_ColumnTable):
+    """Состояние парка: одна строка на станок, колонки — FLEET_COLUMNS."""
+    _COLUMNS = tuple(FLEET_COLUMNS)
+
+    machine_id: np.ndarray
+    name: np.ndarray
+    kind: np.ndarray
+    line_id: np.ndarray
+    state: np.ndarray
+    shift_start: np.ndarray
+    shift_end: np.ndarray
+    stops_count: np.ndarray
+    run_time_hours: np.ndarray
+    planned_time_hours: np.ndarray
+    oee_percent: np.ndarray
+    availability: np.ndarray
+    performance: np.ndarray
+    quality: np.ndarray
+    down_start_ts: np.ndarray
+    down_reason: np.ndarray
+    telemetry_last: np.ndarray
+    alarm: np.ndarray
+
+    @classmethod
+    def empty(cls, n: int) -> "FleetTable":
+        cols = {name: np.zeros((n,) + shape, dtype=dtype) for name, (dtype, shape) in FLEET_COLUMNS.items()}
+        return cls(**cols)
+
+    @classmethod
+    def from_columns(cls, columns: Mapping[str, np.ndarray]) -> "FleetTable":
+        return cls(**{name: columns[name] for name in FLEET_COLUMNS})
+
+    @classmethod
+    def from_overviews(
+        cls,
+        machines: Sequence[MachineOverview],
+        telemetry_last: Optional[Mapping[str, Sequence[Optional[float]]]] = None,
+        alarms: Optional[Mapping[str, Mapping[str, str]]] = None,
+    ) -> "FleetTable":
+        """
+        telemetry_last: machine_id -> значения в порядке TELEMETRY_CHANNELS;
+        alarms: machine_id -> {канал ALARM_CHANNELS: ok/warn/alarm}, нет канала — ok.
+        Строки длиннее колонок FLEET_COLUMNS (в байтах UTF-8) — ValueError.
+        """
+        t = cls.empty(len(machines))
+        t.telemetry_last[:] = np.nan
+        telemetry_last = telemetry_last or {}
+        alarms = alarms or {}
+        for i, m in enumerate(machines):
+            t.machine_id[i] = _encode(m.machine_id, "machine_id", m.machine_id)
+            t.name[i] = _encode(m.name, "name", m.machine_id)
+            t.kind[i] = _encode(m.kind, "kind", m.machine_id)
+            t.line_id[i] = _encode(m.line_id or "", "line_id", m.machine_id)
+            t.state[i] = STATES.index(m.state)
+            t.shift_start[i] = _ns(m.shift.start)
+            t.shift_end[i] = _ns(m.shift.end)
+            t.stops_count[i] = m.stops_count
+            t.run_time_hours[i] = m.run_time_hours
+            t.planned_time_hours[i] = m.planned_time_hours
+            t.oee_percent[i] = _nan(m.oee_percent)
+            t.availability[i] = _nan(m.availability)
+            t.performance[i] = _nan(m.performance)
+            t.quality[i] = _nan(m.quality)
+            t.down_start_ts[i] = _ns(m.down_start_ts)
+            t.down_reason[i] = DOWN_REASONS.index(m.down_reason) if m.down_reason else -1
+            if m.machine_id in telemetry_last:
+                t.telemetry_last[i] = [_nan(v) for v in telemetry_last[m.machine_id]]
+            levels = alarms.get(m.machine_id) or {}
+            t.alarm[i] = [ALARM_LEVELS.index(levels.get(ch, "ok")) for ch in ALARM_CHANNELS]
+        return t
+
+    def to_overviews(self) -> List[MachineOverview]:
+        out: List[MachineOverview] = []
+        for i in range(len(self)):
+            reason = int(self.down_reason[i])
+            out.append(MachineOverview(
+                machine_id=self.machine_id[i].decode("utf-8"),
+                name=self.name[i].decode("utf-8"),
+                kind=self.kind[i].decode("utf-8"),
+                state=STATES[int(self.state[i])],
+                line_id=self.line_id[i].decode("utf-8") or None,
+                shift=ShiftInfo(start=_dt(self.shift_start[i]), end=_dt(self.shift_end[i])),
+                stops_count=int(self.stops_count[i]),
+                run_time_hours=round(float(self.run_time_hours[i]), 2),
+                planned_time_hours=round(float(self.planned_time_hours[i]), 2),
+                oee_percent=None if np.isnan(self.oee_percent[i]) else round(float(self.oee_percent[i]), 1),
+                availability=_opt(self.availability[i]),
+                performance=_opt(self.performance[i]),
+                quality=_opt(self.quality[i]),
+                down_start_ts=_dt(self.down_start_ts[i]),
+                down_reason=DOWN_REASONS[reason] if reason >= 0 else None,
+            ))
+        return out
+
+    def alarm_levels(self) -> Dict[str, str]:
+        """machine_id -> худший статус по каналам."""
+        worst = self.alarm.max(axis=1) if len(self) else self.alarm.reshape(0)
+        return {mid.decode("utf-8"): ALARM_LEVELS[int(c)] for mid, c in zip(self.machine_id, worst)}
+
+
+@dataclass
+class StopTable(_ColumnTable):
+    """
+    Остановки (любого числа станков) колонками:
+    machine — код в machine_ids, reason — индекс в STOP_REASONS, note — код в notes (-1 — нет).
+    ~25 байт на остановку против ~1 КБ у списка StopEvent.
+    """
+    machine: np.ndarray  # int32
+    start: np.ndarray  # datetime64[ns]
+    end: np.ndarray  # datetime64[ns]
+    reason: np.ndarray  # int8
+    note: np.ndarray  # int32
+    machine_ids: Tuple[str, ...] = ()
+    notes: Tuple[str, ...] = ()
+
+    _COLUMNS = ("machine", "start", "end", "reason", "note")
+
+    @classmethod
+    def empty(cls) -> "StopTable":
+        t = np.empty(0, dtype="datetime64[ns]")
+        return cls(np.empty(0, np.int32), t, t.copy(), np.empty(0, np.int8), np.empty(0, np.int32))
+
+    # ------------------------------------------------------------------ pydantic <-> колонки
+
+    @classmethod
+    def from_events(cls, events: Sequence[StopEvent], machine_id: str = "") -> "StopTable":
+        return cls.from_events_many({machine_id: events})
+
+    @classmethod
+    def from_events_many(cls, events: Mapping[str, Sequence[StopEvent]]) -> "StopTable":
+        machine_ids = tuple(events)
+        flat = [s for stops in events.values() for s in stops]
+        notes: Dict[str, int] = {}
+        return cls(
+            machine=np.repeat(np.arange(len(machine_ids), dtype=np.int32), [len(v) for v in events.values()]),
+            start=np.array([s.start for s in flat], dtype="datetime64[ns]"),
+            end=np.array([s.end for s in flat], dtype="datetime64[ns]"),
+            reason=np.array([STOP_REASONS.index(s.reason) for s in flat], dtype=np.int8),
+            note=_codes((s.note for s in flat), notes),
+            machine_ids=machine_ids,
+            notes=tuple(notes),
+        )
+
+    def to_events(self) -> List[StopEvent]:
+        starts = self.start.astype("datetime64[us]").tolist()
+        ends = self.end.astype("datetime64[us]").tolist()
+        return [
+            StopEvent.model_construct(
+                start=s, end=e, reason=STOP_REASONS[r], note=self.notes[n] if n >= 0 else None
+            )
+            for s, e, r, n in zip(starts, ends, self.reason.tolist(), self.note.tolist())
+        ]
+
+    def to_events_many(self) -> Dict[str, List[StopEvent]]:
+        order = np.argsort(self.machine, kind="stable")
+        bounds = np.searchsorted(self.machine[order], np.arange(len(self.machine_ids) + 1))
+        return {
+            mid: self.take(order[bounds[k]:bounds[k + 1]]).to_events()
+            for k, mid in enumerate(self.machine_ids)
+        }
+
+    def to_frame(self) -> pd.DataFrame:
+        """DataFrame с категориальными machine_id/reason (для выгрузок и группировок pandas)."""
+        return pd.DataFrame({
+            "machine_id": pd.Categorical.from_codes(self.machine, categories=list(self.machine_ids)),
+            "start": self.start,
+            "end": self.end,
+            "reason": pd.Categorical.from_codes(self.reason, categories=list(STOP_REASONS)),
+            "duration_min": self.duration_min,
+            "note": pd.Categorical.from_codes(self.note, categories=list(self.notes)),
+        })
+
+    # ------------------------------------------------------------------ векторные операции
+
+    @property
+    def duration_min(self) -> np.ndarray:
+        return np.round((self.end - self.start) / np.timedelta64(1, "m"), 1)
+
+    def select(
+        self,
+        machine_id: Optional[str] = None,
+        reasons: Optional[Iterable[str]] = None,
+        since: Optional[datetime] = None,
+        until: Optional[datetime] = None,
+    ) -> "StopTable":
+        """Фильтр; since/until — как filter_stops: остановки, пересекающие [since, until)."""
+        mask = np.ones(len(self), dtype=bool)
+        if machine_id is not None:
+            code = self.machine_ids.index(machine_id) if machine_id in self.machine_ids else -1
+            mask &= self.machine == code
+        if reasons is not None:
+            mask &= np.isin(self.reason, [STOP_REASONS.index(r) for r in reasons])
+        if since is not None:
+            mask &= self.end > np.datetime64(since, "ns")
+        if until is not None:
+            mask &= self.start < np.datetime64(until, "ns")
+        return self.take(mask)
+
+    def latest(self, n: Optional[int] = None) -> "StopTable":
+        """Последние n остановок по началу, новые сверху."""
+        out = self.sort_by("start", descending=True)
+        return out if n is None else out.take(slice(0, n))
+
+    def minutes_by_reason(self) -> Dict[str, float]:
+        """Суммарные минуты простоя по причинам (для Парето)."""
+        total = np.bincount(self.reason, weights=self.duration_min, minlength=len(STOP_REASONS))
+        return {r: round(float(v), 1) for r, v in zip(STOP_REASONS, total) if v}
+
+    @property
+    def nbytes(self) -> int:
+        return sum(a.nbytes for a in self.columns().values())
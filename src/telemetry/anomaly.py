@@ -0,0 +1,277 @@
+"""
+Потоковый детектор аномалий телеметрии (в дополнение к статическим порогам).
+
+На каждый станок, режим (RUN / IDLE) и канал держится выученная норма:
+экспоненциальные среднее/дисперсия и потоковые медиана/MAD. Каждая точка
+проверяется тремя способами:
+- robust z: |x - медиана| / (1.4826 · MAD) — одиночные выбросы (рывки вибрации);
+- EWMA-карта: сглаженное значение выходит за L·σ·√(λ/(2-λ)) — устойчивый сдвиг;
+- CUSUM: накопленное отклонение > h·σ — медленный дрейф (нагрев, износ).
+Норма учится на каждой точке, но выбросы при обучении обрезаются до порога.
+После смены режима карты перезапускаются, а канал settle точек молчит:
+нагрев подшипника после остановки — переходный процесс, а не аномалия. Все операции — массивами
+(станки × каналы); цикл только по времени внутри пачки.
+"""
+from __future__ import annotations
+
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+import pandas as pd
+
+from ..models import AnomalyEvent
+from ..observability.metrics import timed
+from .fleet import CHANNELS
+
+DETECTORS: Tuple[str, ...] = ("zscore", "ewma", "cusum")
+REGIMES: Tuple[str, ...] = ("RUN", "IDLE")
+
+
+@dataclass(frozen=True)
+class AnomalyConfig:
+    warmup: int = 30                 # точек на режим до первых оценок
+    alpha: float = 0.02              # скорость обучения нормы
+    z_threshold: float = 4.5
+    ewma_lambda: float = 0.2
+    ewma_l: float = 4.0
+    cusum_k: float = 0.5             # в σ
+    cusum_h: float = 8.0             # в σ
+    settle: Tuple[int, ...] = (3, 120, 3)  # точек после смены режима без сигналов, по каналам CHANNELS
+    end_hold: int = 3                # точек без аномалии, чтобы закрыть событие
+    run_current_pu: float = 0.2      # ток выше — режим RUN (если режим не передан)
+    noise_floor: Tuple[float, ...] = (0.1, 0.3, 0.02)  # минимальная σ по каналам CHANNELS
+
+
+class AnomalyDetector:
+    """
+    Детектор для списка станков (align() — сменить список, сохранив состояние по machine_id).
+    update() принимает пачку (M, k, 3) в порядке CHANNELS и возвращает события,
+    закончившиеся в пачке; идущие — active_events().
+    """
+
+    def __init__(self, machine_ids: Sequence[str], config: AnomalyConfig = AnomalyConfig()):
+        self.machine_ids = list(machine_ids)
+        self.config = config
+        self._floor = np.asarray(config.noise_floor, dtype=np.float64)
+        self._settle = np.asarray(config.settle, dtype=np.int64)
+        for name, arr in self._allocate(len(self.machine_ids)).items():
+            setattr(self, name, arr)
+        self._rows = np.arange(len(self.machine_ids))
+
+    @staticmethod
+    def _allocate(M: int) -> Dict[str, np.ndarray]:
+        """Состояние M станков «с нуля»; первая ось каждого массива — станок."""
+        R, C = len(REGIMES), len(CHANNELS)
+        return {
+            # норма: (M, R, C)
+            "n": np.zeros((M, R, C), dtype=np.int64),
+            "mean": np.zeros((M, R, C)),
+            "var": np.zeros((M, R, C)),
+            "med": np.zeros((M, R, C)),
+            "mad": np.zeros((M, R, C)),
+            # статистики карт и открытые события: (M, C)
+            "ewma": np.full((M, C), np.nan),
+            "cusum_pos": np.zeros((M, C)),
+            "cusum_neg": np.zeros((M, C)),
+            "active": np.zeros((M, C), dtype=bool),
+            "_start": np.zeros((M, C), dtype=np.int64),
+            "_last": np.zeros((M, C), dtype=np.int64),
+            "_quiet": np.zeros((M, C), dtype=np.int64),
+            "_peak": np.zeros((M, C)),
+            "_peak_value": np.full((M, C), np.nan),
+            "_fired": np.zeros((M, C, len(DETECTORS)), dtype=bool),
+            "_regime": np.full(M, -1, dtype=np.int64),
+            "_since": np.zeros(M, dtype=np.int64),   # точек в текущем режиме
+        }
+
+    def align(self, machine_ids: Sequence[str]) -> None:
+        """
+        Перейти на новый список станков (состав парка или порядок изменились): норма и карты
+        известных станков переносятся по machine_id, новые начинают с нуля, выбывшие забываются.
+        """
+        ids = list(machine_ids)
+        if ids == self.machine_ids:
+            return
+        old = {mid: i for i, mid in enumerate(self.machine_ids)}
+        src = np.array([old.get(mid, -1) for mid in ids], dtype=np.int64)
+        keep = src >= 0
+        for name, arr in self._allocate(len(ids)).items():
+            arr[keep] = getattr(self, name)[src[keep]]
+            setattr(self, name, arr)
+        self.machine_ids = ids
+        self._rows = np.arange(len(ids))
+
+    # ------------------------------------------------------------------ поток
+
+    def regimes(self, values: np.ndarray) -> np.ndarray:
+        """(M, k) индексы REGIMES по току двигателя; -1 — нет данных (DOWN/обрыв)."""
+        current = values[..., CHANNELS.index("motor_current_pu")]
+        with np.errstate(invalid="ignore"):
+            out = np.where(current > self.config.run_current_pu, 0, 1)
+        return np.where(np.isnan(current), -1, out)
+
+    @timed("telemetry.anomaly_update")
+    def update(
+        self, timestamps: np.ndarray, values: np.ndarray, regime: Optional[np.ndarray] = None,
+        observed: Optional[np.ndarray] = None,
+    ) -> List[AnomalyEvent]:
+        """
+        timestamps: (k,) datetime64; values: (M, k, 3) (NaN — нет данных);
+        regime: (M, k) индексы REGIMES, -1 — не учитывать (по умолчанию — по току);
+        observed: (M, k) — была ли у станка точка в этот момент. False — точки нет вовсе (пачка
+        собрана по объединению отметок времени парка): состояние станка не меняется, в отличие
+        от точки с NaN (датчик отключён — смена режима).
+        """
+        ts = np.asarray(timestamps, dtype="datetime64[ns]").astype(np.int64)
+        values = np.asarray(values, dtype=np.float64)
+        if regime is None:
+            regime = self.regimes(values)
+        if observed is None:
+            observed = np.ones(regime.shape, dtype=bool)
+        finished: List[AnomalyEvent] = []
+        for t in range(len(ts)):
+            finished.extend(self._step(int(ts[t]), values[:, t, :], regime[:, t], observed[:, t]))
+        return finished
+
+    def _step(self, ts: int, x: np.ndarray, regime: np.ndarray, obs: np.ndarray) -> List[AnomalyEvent]:
+        cfg = self.config
+        regime = np.where(obs, regime, self._regime)  # нет точки — режим прежний
+        r = np.maximum(regime, 0)
+        idx = (self._rows, r)
+        valid = ~np.isnan(x) & (regime >= 0)[:, None] & obs[:, None]
+        x0 = np.where(valid, x, 0.0)
+
+        # смена режима: карты заново, переходный процесс (прогрев/остывание) не сигналим
+        changed = regime != self._regime
+        self._regime = regime.copy()
+        self._since = np.where(changed, 0, self._since + obs)
+        self.ewma[changed] = np.nan
+        self.cusum_pos[changed] = 0.0
+        self.cusum_neg[changed] = 0.0
+        settled = self._since[:, None] >= self._settle
+
+        n, mean, var = self.n[idx], self.mean[idx], self.var[idx]
+        med, mad = self.med[idx], self.mad[idx]
+        sigma = np.maximum(np.sqrt(var), self._floor)
+        robust = np.maximum(1.4826 * mad, self._floor)
+        warm = n >= cfg.warmup
+
+        # --- три детектора
+        z = (x0 - med) / robust
+        lam = cfg.ewma_lambda
+        ewma = np.where(np.isnan(self.ewma), x0, lam * x0 + (1 - lam) * self.ewma)
+        ewma_z = (ewma - mean) / (sigma * np.sqrt(lam / (2 - lam)))
+        u = (x0 - mean) / sigma
+        cp = np.maximum(0.0, self.cusum_pos + u - cfg.cusum_k)
+        cn = np.maximum(0.0, self.cusum_neg - u - cfg.cusum_k)
+        scores = np.stack([
+            np.abs(z) / cfg.z_threshold,
+            np.abs(ewma_z) / cfg.ewma_l,
+            np.maximum(cp, cn) / cfg.cusum_h,
+        ], axis=-1)
+        fired = (scores > 1.0) & (valid & warm & settled)[..., None]
+        anomalous = fired.any(axis=-1)
+        score = scores.max(axis=-1)
+
+        # --- статистики карт: только по валидным точкам, после прогрева нормы и переходного процесса
+        on = valid & warm & settled
+        self.ewma = np.where(valid, ewma, self.ewma)
+        hold = ~obs[:, None]  # станок без точки — карты как были
+        self.cusum_pos = np.where(on, cp, np.where(hold, self.cusum_pos, 0.0))
+        self.cusum_neg = np.where(on, cn, np.where(hold, self.cusum_neg, 0.0))
+
+        # --- обучение нормы: на выбросах — с винсоризацией, чтобы аномалия не «становилась нормой»,
+        # но медленный дрейф режима (прогрев, износ) всё же догонялся
+        learn = valid
+        band = cfg.z_threshold * robust
+        xc = np.where(warm, np.clip(x0, med - band, med + band), x0)
+        a = np.where(warm, cfg.alpha, 1.0 / (n + 1))
+        d = xc - mean
+        new_mean = mean + a * d
+        new_var = (1 - a) * (var + a * d * d)
+        step = cfg.alpha * robust
+        new_med = np.where(warm, med + step * np.sign(x0 - med), new_mean)
+        new_mad = np.where(warm, mad + step * np.sign(np.abs(x0 - med) - mad), np.sqrt(new_var) / 1.4826)
+        self.mean[idx] = np.where(learn, new_mean, mean)
+        self.var[idx] = np.where(learn, new_var, var)
+        self.med[idx] = np.where(learn, new_med, med)
+        self.mad[idx] = np.where(learn, np.maximum(new_mad, 0.0), mad)
+        self.n[idx] = n + learn
+
+        return self._track(ts, x0, anomalous, fired, score, obs)
+
+    def _track(self, ts: int, x: np.ndarray, anomalous: np.ndarray, fired: np.ndarray,
+               score: np.ndarray, obs: np.ndarray) -> List[AnomalyEvent]:
+        started = anomalous & ~self.active
+        self._start[started] = ts
+        self._peak[started] = 0.0
+        self._fired[started] = False
+        self.active |= anomalous
+
+        hit = anomalous & (score > self._peak)
+        self._peak[hit] = score[hit]
+        self._peak_value[hit] = x[hit]
+        self._fired |= fired & anomalous[..., None]
+        self._last[anomalous] = ts
+        self._quiet = np.where(anomalous, 0, self._quiet + (self.active & obs[:, None]))
+
+        ended = self.active & (self._quiet >= self.config.end_hold)
+        if not ended.any():
+            return []
+        events = [self._event(i, c, end=int(self._last[i, c])) for i, c in zip(*np.nonzero(ended))]
+        self.active[ended] = False
+        self._quiet[ended] = 0
+        self.cusum_pos[ended] = 0.0
+        self.cusum_neg[ended] = 0.0
+        return events
+
+    def _event(self, i: int, c: int, end: Optional[int]) -> AnomalyEvent:
+        def dt(ns: int):
+            return pd.Timestamp(ns).to_pydatetime()
+
+        value = self._peak_value[i, c]
+        return AnomalyEvent(
+            machine_id=self.machine_ids[i],
+            channel=CHANNELS[c],
+            start=dt(int(self._start[i, c])),
+            end=None if end is None else dt(end),
+            detectors=[d for d, f in zip(DETECTORS, self._fired[i, c]) if f],
+            peak_score=round(float(self._peak[i, c]), 2),
+            peak_value=None if np.isnan(value) else round(float(value), 3),
+        )
+
+    def active_events(self) -> List[AnomalyEvent]:
+        return [self._event(i, c, end=None) for i, c in zip(*np.nonzero(self.active))]
+
+    def active_mask(self) -> np.ndarray:
+        """(M, 3) — по каким каналам сейчас идёт аномалия."""
+        return self.active.copy()
+
+    def baseline(self, machine_id: str) -> Dict[str, Dict[str, Dict[str, float]]]:
+        """Выученная норма станка: режим -> канал -> {mean, sigma, median, mad, n}."""
+        i = self.machine_ids.index(machine_id)
+        return {
+            reg: {
+                ch: {
+                    "mean": round(float(self.mean[i, r, c]), 3),
+                    "sigma": round(float(np.sqrt(self.var[i, r, c])), 3),
+                    "median": round(float(self.med[i, r, c]), 3),
+                    "mad": round(float(self.mad[i, r, c]), 3),
+                    "n": int(self.n[i, r, c]),
+                }
+                for c, ch in enumerate(CHANNELS)
+            }
+            for r, reg in enumerate(REGIMES)
+        }
+
+
+@timed("telemetry.anomalies")
+def detect_anomalies(
+    df: pd.DataFrame, machine_id: str = "", config: AnomalyConfig = AnomalyConfig()
+) -> List[AnomalyEvent]:
+    """Прогон истории одного станка (DataFrame с колонками CHANNELS): закрытые и идущие события."""
+    det = AnomalyDetector([machine_id], config)
+    values = df[list(CHANNELS)].to_numpy(dtype=np.float64)[None, :, :]
+    events = det.update(df.index.to_numpy(), values)
+    return events + det.active_events()
@@ -0,0 +1,209 @@
+"""
+Компактные признаки телеметрии за окно — вместо сырых рядов во входе модели.
+
+По каждому каналу: покрытие, среднее/σ, перцентили, наклон (в час), выбросы
+(robust z по медиане/MAD: точки и эпизоды), время выше warn/alarm; для вибрации —
+доли энергии спектра по полосам (циклов в час) и доминирующий период. Всё считается
+массивами (станки × время × каналы), NaN (нет связи, отсечка) пропускаются.
+
+    feats = extract_features(df, thresholds)             # один станок -> dict для промпта
+    arrays = compute_features(values, step_sec, warn, alarm)   # (M, T, C) -> массивы (M, C)
+"""
+from __future__ import annotations
+
+from dataclasses import dataclass
+from typing import Any, Dict, Optional, Sequence, Tuple
+
+import numpy as np
+import pandas as pd
+
+from ..observability.metrics import timed
+from .fleet import CHANNELS
+
+VIBRATION = CHANNELS.index("vibration_mm_s")
+
+
+@dataclass(frozen=True)
+class FeatureConfig:
+    percentiles: Tuple[float, ...] = (5.0, 50.0, 95.0)
+    spike_z: float = 3.5               # robust z, выше — выброс
+    # полосы спектра вибрации, циклов в час: медленный тренд / колебания режима / частые рывки
+    vib_bands: Tuple[Tuple[str, float, float], ...] = (("lt2ph", 0.0, 2.0), ("2_12ph", 2.0, 12.0),
+                                                       ("gt12ph", 12.0, float("inf")))
+    min_coverage: float = 0.5          # меньше — спектр не считаем
+    decimals: int = 3
+
+
+def _slope_per_hour(values: np.ndarray, step_sec: float) -> np.ndarray:
+    """МНК-наклон по валидным точкам: (M, T, C) -> (M, C), единиц канала в час."""
+    t = values.shape[-2]
+    x = (np.arange(t, dtype=np.float64) * step_sec / 3600.0)[None, :, None]
+    mask = ~np.isnan(values)
+    n = mask.sum(axis=-2)
+    v = np.where(mask, values, 0.0)
+    xm = np.where(mask, x, 0.0)
+    sx, sy = xm.sum(axis=-2), v.sum(axis=-2)
+    sxx, sxy = (xm * xm).sum(axis=-2), (xm * v).sum(axis=-2)
+    den = n * sxx - sx * sx
+    with np.errstate(invalid="ignore", divide="ignore"):
+        return np.where((n >= 3) & (den > 0), (n * sxy - sx * sy) / den, np.nan)
+
+
+def _quantiles(ordered: np.ndarray, n: np.ndarray, qs: Sequence[float]) -> np.ndarray:
+    """
+    Квантили (линейная интерполяция, как np.percentile) по отсортированному по оси 1
+    массиву, где NaN в конце: (M, T, C) и n (M, C) -> (Q, M, C). Без nan*-функций.
+    """
+    if not ordered.shape[1]:
+        return np.full((len(qs),) + n.shape, np.nan)
+    last = np.maximum(n - 1, 0)
+    out = []
+    for q in qs:
+        pos = last * (q / 100.0)
+        lo = np.floor(pos).astype(np.intp)
+        hi = np.minimum(lo + 1, last)
+        a = np.take_along_axis(ordered, lo[:, None, :], axis=1)[:, 0, :]
+        b = np.take_along_axis(ordered, hi[:, None, :], axis=1)[:, 0, :]
+        out.append(np.where(n > 0, a + (b - a) * (pos - lo), np.nan))
+    return np.stack(out) if out else np.empty((0,) + n.shape)
+
+
+def _band_energy(series: np.ndarray, step_sec: float, cfg: FeatureConfig) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    (M, T) -> доли энергии по полосам (M, B) и доминирующий период, мин (M,).
+    Пропуски заполняются средним, линейный тренд снимается (иначе он весь уходит в низкую полосу).
+    """
+    m, t = series.shape
+    if t < 8:  # слишком короткое окно для спектра
+        return np.full((m, len(cfg.vib_bands)), np.nan), np.full(m, np.nan)
+    mask = ~np.isnan(series)
+    coverage = mask.mean(axis=1)
+    cnt = mask.sum(axis=1)
+    mean = np.where(cnt > 0, np.where(mask, series, 0.0).sum(axis=1) / np.maximum(cnt, 1), 0.0)
+    filled = np.where(mask, series, mean[:, None])
+    x = np.arange(t, dtype=np.float64) - (t - 1) / 2.0
+    denom = float((x * x).sum()) or 1.0
+    slope = ((filled - mean[:, None]) * x).sum(axis=1) / denom
+    detrended = filled - mean[:, None] - slope[:, None] * x
+
+    power = np.abs(np.fft.rfft(detrended, axis=1)) ** 2
+    freq_ph = np.fft.rfftfreq(t, d=step_sec) * 3600.0
+    power, freq_ph = power[:, 1:], freq_ph[1:]  # без постоянной составляющей
+    total = power.sum(axis=1)
+    bands = np.stack([power[:, (freq_ph > lo) & (freq_ph <= hi)].sum(axis=1) for _, lo, hi in cfg.vib_bands], axis=1)
+    ok = (coverage >= cfg.min_coverage) & (total > 0)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        fractions = np.where(ok[:, None], bands / total[:, None], np.nan)
+        peak = freq_ph[np.argmax(power, axis=1)]
+        dominant = np.where(ok, 60.0 / peak, np.nan)
+    return fractions, dominant
+
+
+@timed("telemetry.features")
+def compute_features(
+    values: np.ndarray,
+    step_sec: float,
+    warn: Optional[np.ndarray] = None,
+    alarm: Optional[np.ndarray] = None,
+    config: FeatureConfig = FeatureConfig(),
+) -> Dict[str, np.ndarray]:
+    """
+    values: (M, T, C) — окно телеметрии парка (NaN — нет данных); warn/alarm: (C,) или (M, C).
+    Возвращает массивы (M, C) (перцентили — (M, C) на каждый p<q>), vib_* — (M, B) и (M,).
+    """
+    values = np.asarray(values, dtype=np.float64)
+    m, t, c = values.shape
+    valid = ~np.isnan(values)
+    n = valid.sum(axis=1)
+    out: Dict[str, np.ndarray] = {"n": n, "coverage": n / t if t else np.zeros((m, c))}
+    with np.errstate(invalid="ignore", divide="ignore"):
+        cnt = np.where(n > 0, n, np.nan)
+        filled = np.where(valid, values, 0.0)
+        out["mean"] = filled.sum(axis=1) / cnt
+        dev = np.where(valid, values - out["mean"][:, None, :], 0.0)
+        out["std"] = np.sqrt((dev * dev).sum(axis=1) / cnt)
+        ordered = np.sort(values, axis=1)  # NaN уходят в конец — квантили по первым n
+        pct = _quantiles(ordered, n, config.percentiles)
+        median = _quantiles(ordered, n, (50.0,))[0]
+        mad = _quantiles(np.sort(np.abs(values - median[:, None, :]), axis=1), n, (50.0,))[0]
+        for q, arr in zip(config.percentiles, pct):
+            out[f"p{int(q):02d}"] = arr
+        out["slope_per_h"] = _slope_per_hour(values, step_sec)
+
+        # выбросы: robust z; σ из MAD, но не меньше 1% медианы (ровный сигнал без шума)
+        scale = np.maximum(1.4826 * mad, 0.01 * np.abs(median))
+        z = np.abs(values - median[:, None, :]) / np.where(scale > 0, scale, np.nan)[:, None, :]
+        spike = z > config.spike_z
+        out["spikes"] = spike.sum(axis=1)
+        out["spike_events"] = (spike[:, 1:] & ~spike[:, :-1]).sum(axis=1) + spike[:, :1].sum(axis=1)
+
+        step_min = step_sec / 60.0
+        if warn is not None:
+            out["above_warn_min"] = (values >= np.broadcast_to(warn, (m, c))[:, None, :]).sum(axis=1) * step_min
+        if alarm is not None:
+            out["above_alarm_min"] = (values >= np.broadcast_to(alarm, (m, c))[:, None, :]).sum(axis=1) * step_min
+
+    out["vib_bands"], out["vib_dominant_period_min"] = _band_energy(values[:, :, VIBRATION], step_sec, config)
+    return out
+
+
+def _num(x: Any, decimals: int) -> Any:
+    if isinstance(x, (np.integer, int)):
+        return int(x)
+    x = float(x)
+    return None if np.isnan(x) else round(x, decimals)
+
+
+def features_to_dict(arrays: Dict[str, np.ndarray], row: int = 0,
+                     channels: Sequence[str] = CHANNELS, config: FeatureConfig = FeatureConfig()) -> Dict[str, Any]:
+    """Признаки одного станка (строка row) -> {канал: {признак: число}} для промпта."""
+    per_channel = [k for k, v in arrays.items() if not k.startswith("vib_")]
+    out: Dict[str, Any] = {}
+    for j, ch in enumerate(channels):
+        out[ch] = {k: _num(arrays[k][row, j], config.decimals) for k in per_channel}
+    vib = out[channels[VIBRATION]]
+    vib["band_energy"] = {
+        name: _num(v, config.decimals) for (name, _, _), v in zip(config.vib_bands, arrays["vib_bands"][row])
+    }
+    vib["dominant_period_min"] = _num(arrays["vib_dominant_period_min"][row], 1)
+    return out
+
+
+def infer_step_sec(index: pd.Index, default: float = 30.0) -> float:
+    if isinstance(index, pd.DatetimeIndex) and len(index) > 1:
+        step = np.median(np.diff(index.to_numpy().astype("datetime64[ns]").astype(np.int64))) / 1e9
+        if step > 0:
+            return float(step)
+    return default
+
+
+def extract_features(df: pd.DataFrame, thresholds: Any = None, step_sec: Optional[float] = None,
+                     config: FeatureConfig = FeatureConfig()) -> Dict[str, Any]:
+    """
+    Признаки окна телеметрии одного станка. thresholds — TelemetryThresholds /
+    строка ThresholdTable (с .warn / .alarm по каналам) или None.
+    """
+    step = step_sec or infer_step_sec(df.index)
+    values = df[list(CHANNELS)].to_numpy(dtype=np.float64, na_value=np.nan)[None]
+    warn = getattr(thresholds, "warn", None)
+    alarm = getattr(thresholds, "alarm", None)
+    arrays = compute_features(values, step, warn, alarm, config)
+    out = features_to_dict(arrays, 0, CHANNELS, config)
+    return {"window_minutes": round(len(df) * step / 60.0), "step_sec": step, "channels": out}
+
+
+def series_features(values: Sequence[float], step_sec: float, decimals: int = 2) -> Dict[str, Any]:
+    """Сводка одного ряда (например, OEE по интервалам): last/mean/min/max/p10/наклон в час."""
+    v = np.asarray(values, dtype=np.float64)
+    if not len(v) or np.isnan(v).all():
+        return {"n": 0}
+    slope = _slope_per_hour(v[None, :, None], step_sec)[0, 0]
+    return {
+        "n": int((~np.isnan(v)).sum()),
+        "last": _num(v[~np.isnan(v)][-1], decimals),
+        "mean": _num(np.nanmean(v), decimals),
+        "min": _num(np.nanmin(v), decimals),
+        "max": _num(np.nanmax(v), decimals),
+        "p10": _num(np.nanpercentile(v, 10), decimals),
+        "slope_per_h": _num(slope, decimals),
+    }
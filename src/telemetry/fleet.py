@@ -0,0 +1,374 @@
+# src/telemetry/fleet.py
+"""
+Детерминированный симулятор парка станков (N машин, одна смена).
+
+Вся «истина» о смене генерируется сразу массивами NumPy (станки × шаги):
+состояния RUN/IDLE/DOWN, остановки (включая микростопы), выпуск деталей
+и коррелированная телеметрия. Один и тот же seed всегда даёт одинаковый парк.
+"""
+from __future__ import annotations
+
+import time as _time
+import zlib
+from dataclasses import dataclass
+from datetime import date, datetime, time, timedelta
+from typing import Callable, Dict, Iterator, List, Optional, Tuple
+
+import numpy as np
+
+# коды состояний (индексы в STATE_CODES)
+STATE_CODES: Tuple[str, ...] = ("RUN", "IDLE", "DOWN")
+RUN, IDLE, DOWN = 0, 1, 2
+
+# коды причин остановок (индексы в STOP_REASONS)
+STOP_REASONS: Tuple[str, ...] = ("MICROSTOP", "SETUP", "FAULT", "MAINT", "REPAIR")
+_REASON_PROBS = np.array([0.45, 0.20, 0.20, 0.05, 0.10])
+# длительность в шагах по причине: (min, max)
+_REASON_STEPS = np.array([[1, 4], [20, 50], [6, 30], [30, 90], [60, 200]])
+# в какое состояние переводит причина
+_REASON_STATE = np.array([IDLE, IDLE, IDLE, DOWN, DOWN], dtype=np.int8)
+
+CHANNELS: Tuple[str, ...] = ("vibration_mm_s", "bearing_temp_c", "motor_current_pu")
+
+# (код в machine_id, kind, name) — kind совпадает с ключами SVG_MAP в ui.py
+KINDS: Tuple[Tuple[str, str, str], ...] = (
+    ("MILL", "Фрезерный ЧПУ", "Фрезерный станок"),
+    ("LATHE", "Токарный ЧПУ", "Токарный станок"),
+    ("CUT", "Крой металла", "Станок кроя металла"),
+)
+_KIND_RATE_PER_HOUR = np.array([60.0, 75.0, 40.0])  # идеальный темп, шт/ч
+_KIND_VIBRATION = np.array([6.0, 5.0, 6.5])           # мм/с под нагрузкой
+# kind -> идеальный темп, шт/ч (для расчёта Performance по внешним журналам)
+IDEAL_RATE_PER_HOUR: Dict[str, float] = {k[1]: float(r) for k, r in zip(KINDS, _KIND_RATE_PER_HOUR)}
+
+
+def stable_seed(*parts: object) -> int:
+    """Seed, одинаковый во всех процессах (в отличие от hash(), который солится)."""
+    return zlib.crc32("|".join(str(p) for p in parts).encode("utf-8"))
+
+
+@dataclass(frozen=True)
+class FleetSpec:
+    n_machines: int = 3
+    seed: int = 0
+    shift_start: Optional[datetime] = None  # по умолчанию сегодня 08:00
+    shift_hours: float = 8.0
+    step_sec: int = 30
+    machines_per_line: int = 10
+    stop_slots: int = 8          # макс. число остановок за смену на станок
+    stop_probability: float = 0.6
+    open_down_probability: float = 0.1   # доля станков в ремонте/ТО к концу смены
+    open_idle_probability: float = 0.15  # доля станков в простое к концу смены
+
+
+@dataclass(frozen=True)
+class FleetMachine:
+    index: int
+    machine_id: str
+    name: str
+    kind: str
+    line_id: str
+
+
+@dataclass(frozen=True)
+class FleetBatch:
+    """Срез смены по шагам [step, step + k) для всех станков."""
+    step: int
+    timestamps: np.ndarray   # (k,) datetime64[s]
+    state: np.ndarray        # (M, k) int8, коды STATE_CODES
+    parts: np.ndarray        # (M, k) выпуск за шаг
+    good: np.ndarray         # (M, k) годные за шаг
+    telemetry: np.ndarray    # (M, k, 3) float32, каналы CHANNELS
+
+
+class FleetSimulator:
+    def __init__(self, spec: FleetSpec = FleetSpec()):
+        if spec.n_machines <= 0:
+            raise ValueError("n_machines must be positive")
+        self.spec = spec
+        start = spec.shift_start or datetime.combine(date.today(), time(8, 0))
+        self.shift_start = start.replace(microsecond=0)
+        self.n_steps = int(spec.shift_hours * 3600 // spec.step_sec)
+        self.shift_end = self.shift_start + timedelta(seconds=self.n_steps * spec.step_sec)
+        self.timestamps = (
+            np.datetime64(self.shift_start, "s")
+            + np.arange(self.n_steps, dtype=np.int64) * np.timedelta64(spec.step_sec, "s")
+        )
+        self._telemetry: Optional[np.ndarray] = None
+        self._generate()
+
+    # ------------------------------------------------------------------ генерация
+
+    def _rngs(self, stream: str) -> List[np.random.Generator]:
+        """Генератор на станок: ряд станка зависит от (seed, индекс станка, поток), но не от размера парка."""
+        return [np.random.default_rng(stable_seed(self.spec.seed, i, stream)) for i in range(self.spec.n_machines)]
+
+    def _generate(self) -> None:
+        spec = self.spec
+        M, T = spec.n_machines, self.n_steps
+
+        idx = np.arange(M)
+        self.kind_index = (idx % len(KINDS)).astype(np.int8)
+        ordinal = idx // len(KINDS) + 1
+        self.machines: List[FleetMachine] = [
+            FleetMachine(
+                index=i,
+                machine_id=f"CNC-{KINDS[k][0]}-{n}",
+                name=KINDS[k][2],
+                kind=KINDS[k][1],
+                line_id=f"LINE-{i // spec.machines_per_line + 1:02d}",
+            )
+            for i, k, n in zip(idx.tolist(), self.kind_index.tolist(), ordinal.tolist())
+        ]
+        self.index_of: Dict[str, int] = {m.machine_id: m.index for m in self.machines}
+
+        # --- остановки: не более одной на слот, поэтому интервалы не пересекаются
+        S = max(1, spec.stop_slots)
+        slot_len = T // S
+        has_stop = np.empty((M, S), dtype=bool)
+        reason = np.empty((M, S), dtype=np.int8)
+        dur = np.empty((M, S), dtype=np.int64)
+        offset = np.empty((M, S), dtype=np.int64)
+        u = np.empty(M)
+        open_reason = np.empty((M, 2), dtype=np.int8)  # причина открытой остановки: в ремонте/ТО, в простое
+        for i, rng in enumerate(self._rngs("stops")):
+            has_stop[i] = rng.random(S) < spec.stop_probability
+            reason[i] = rng.choice(len(STOP_REASONS), size=S, p=_REASON_PROBS)
+            dur[i] = np.minimum(rng.integers(_REASON_STEPS[reason[i], 0], _REASON_STEPS[reason[i], 1] + 1),
+                                slot_len - 1)
+            offset[i] = (rng.random(S) * (slot_len - dur[i])).astype(np.int64)
+            u[i] = rng.random()
+            open_reason[i] = rng.choice([3, 4], p=[0.3, 0.7]), rng.choice([1, 2])
+        start = np.arange(S) * slot_len + offset
+        end = start + dur
+
+        # часть станков к концу смены стоит: последняя остановка открыта до конца смены
+        open_down = u < spec.open_down_probability
+        open_idle = ~open_down & (u < spec.open_down_probability + spec.open_idle_probability)
+        last = S - 1
+        has_stop[open_down | open_idle, last] = True
+        reason[open_down, last] = open_reason[open_down, 0]
+        reason[open_idle, last] = open_reason[open_idle, 1]
+        end[open_down | open_idle, last] = T
+
+        mi, si = np.nonzero(has_stop)  # порядок: по станку, затем по времени
+        self.stop_machine = mi.astype(np.int32)
+        self.stop_start = start[mi, si].astype(np.int32)
+        self.stop_end = end[mi, si].astype(np.int32)
+        self.stop_reason = reason[mi, si]
+
+        # --- матрица состояний через разностный массив (интервалы не пересекаются)
+        code = _REASON_STATE[self.stop_reason].astype(np.int16)
+        delta = np.zeros((M, T + 1), dtype=np.int16)
+        np.add.at(delta, (self.stop_machine, self.stop_start), code)
+        np.add.at(delta, (self.stop_machine, self.stop_end), -code)
+        self.state = np.cumsum(delta[:, :T], axis=1).astype(np.int8)
+
+        # --- выпуск деталей
+        self.performance_factor = np.empty(M)
+        self.quality_factor = np.empty(M)
+        self.ideal_per_step = _KIND_RATE_PER_HOUR[self.kind_index] * spec.step_sec / 3600.0
+        self.parts = np.empty((M, T), dtype=np.uint16)
+        self.good = np.empty((M, T), dtype=np.uint16)
+        running = self.state == RUN
+        for i, rng in enumerate(self._rngs("parts")):
+            self.performance_factor[i] = rng.uniform(0.80, 0.97)
+            self.quality_factor[i] = rng.uniform(0.95, 0.995)
+            self.parts[i] = rng.poisson(self.ideal_per_step[i] * self.performance_factor[i] * running[i])
+            self.good[i] = rng.binomial(self.parts[i], self.quality_factor[i])
+
+    def _generate_telemetry(self) -> np.ndarray:
+        M, T = self.spec.n_machines, self.n_steps
+        n_spikes = 4
+        pos = np.empty((M, n_spikes), dtype=np.int64)
+        amp = np.empty((M, n_spikes), dtype=np.float32)
+        wear_rate = np.empty(M, dtype=np.float32)
+        noise = np.empty((len(CHANNELS), M, T), dtype=np.float32)
+        for i, rng in enumerate(self._rngs("telemetry")):
+            pos[i] = rng.integers(0, T, size=n_spikes)
+            amp[i] = rng.uniform(1.5, 4.0, n_spikes)
+            wear_rate[i] = rng.uniform(0.0, 1.5)
+            for c, sigma in enumerate((0.35, 0.6, 0.04)):
+                noise[c, i] = rng.normal(0, sigma, T)
+        running = (self.state == RUN).astype(np.float32)
+        load = running * self.performance_factor[:, None].astype(np.float32)
+
+        # редкие «рывки»: импульсы с экспоненциальным затуханием (только в RUN)
+        impulses = np.zeros((M, T), dtype=np.float32)
+        np.add.at(impulses, (np.repeat(np.arange(M), n_spikes), pos.ravel()), amp.ravel())
+        spikes = np.zeros_like(impulses)
+        heat = np.zeros_like(impulses)
+        s = np.zeros(M, dtype=np.float32)
+        h = np.full(M, 0.3, dtype=np.float32)
+        for t in range(T):  # векторизовано по станкам, рекурсия только по времени
+            s = 0.85 * s + impulses[:, t]
+            h = 0.975 * h + 0.025 * load[:, t]
+            spikes[:, t] = s
+            heat[:, t] = h
+        spikes *= running
+
+        wear = wear_rate[:, None] * np.linspace(0, 1, T, dtype=np.float32)
+        vib_base = _KIND_VIBRATION[self.kind_index].astype(np.float32)[:, None]
+
+        out = np.empty((M, T, len(CHANNELS)), dtype=np.float32)
+        out[:, :, 0] = vib_base * load + 0.4 * (1 - running) + wear * running + spikes + noise[0]
+        out[:, :, 1] = 40.0 + 40.0 * heat + 0.6 * spikes + noise[1]
+        out[:, :, 2] = 0.03 + running * (0.55 + 0.25 * load) + 0.02 * spikes + noise[2]
+        np.clip(out[:, :, 0], 0.0, 20.0, out=out[:, :, 0])
+        np.clip(out[:, :, 1], 0.0, 130.0, out=out[:, :, 1])
+        np.clip(out[:, :, 2], 0.0, 1.2, out=out[:, :, 2])
+
+        # DOWN: оборудование отключено — датчиков нет
+        out[self.state == DOWN] = np.nan
+        return out
+
+    # ------------------------------------------------------------------ доступ
+
+    @property
+    def telemetry(self) -> np.ndarray:
+        """(M, T, 3) float32; считается лениво — на больших парках это самая тяжёлая часть."""
+        if self._telemetry is None:
+            self._telemetry = self._generate_telemetry()
+        return self._telemetry
+
+    def step_at(self, ts: Optional[datetime] = None) -> int:
+        """Число прошедших шагов смены на момент ts (0..n_steps)."""
+        ts = ts or datetime.now()
+        elapsed = (ts - self.shift_start).total_seconds()
+        return int(min(max(elapsed // self.spec.step_sec, 0), self.n_steps))
+
+    def state_at(self, step: int) -> np.ndarray:
+        """Состояние всех станков на шаге step (после конца смены — последнее)."""
+        return self.state[:, min(max(step, 1), self.n_steps) - 1]
+
+    def kpis(self, upto: Optional[int] = None) -> Dict[str, np.ndarray]:
+        """Показатели смены по всем станкам на интервале [0, upto)."""
+        upto = self.n_steps if upto is None else max(1, min(upto, self.n_steps))
+        step_h = self.spec.step_sec / 3600.0
+        run_steps = (self.state[:, :upto] == RUN).sum(axis=1)
+        parts = self.parts[:, :upto].sum(axis=1, dtype=np.int64)
+        good = self.good[:, :upto].sum(axis=1, dtype=np.int64)
+
+        availability = run_steps / upto
+        ideal = self.ideal_per_step * run_steps
+        performance = np.divide(parts, ideal, out=np.zeros(len(parts)), where=ideal > 0)
+        performance = np.minimum(performance, 1.0)
+        quality = np.divide(good, parts, out=np.ones(len(parts)), where=parts > 0)
+
+        stops_count = np.bincount(
+            self.stop_machine[self.stop_start < upto], minlength=self.spec.n_machines
+        )
+        return {
+            "availability": availability,
+            "performance": performance,
+            "quality": quality,
+            "oee_percent": np.round(availability * performance * quality * 100.0, 1),
+            "stops_count": stops_count,
+            "run_time_hours": run_steps * step_h,
+            "planned_time_hours": np.full(self.spec.n_machines, self.spec.shift_hours),
+            "parts": parts,
+            "good": good,
+        }
+
+    def oee_buckets(self, bucket_min: int = 15, upto: Optional[int] = None) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        OEE (%) по интервалам bucket_min для всех станков.
+        Возвращает (timestamps (B,), oee (M, B)); неполный последний интервал отбрасывается.
+        """
+        upto = self.n_steps if upto is None else min(upto, self.n_steps)
+        per = max(1, bucket_min * 60 // self.spec.step_sec)
+        B = upto // per
+        M = self.spec.n_machines
+        if B == 0:
+            return self.timestamps[:0], np.zeros((M, 0))
+
+        n = B * per
+        run = (self.state[:, :n] == RUN).reshape(M, B, per).sum(axis=2)
+        parts = self.parts[:, :n].reshape(M, B, per).sum(axis=2, dtype=np.int64)
+        good = self.good[:, :n].reshape(M, B, per).sum(axis=2, dtype=np.int64)
+
+        availability = run / per
+        ideal = self.ideal_per_step[:, None] * run
+        performance = np.minimum(np.divide(parts, ideal, out=np.zeros(run.shape), where=ideal > 0), 1.0)
+        quality = np.divide(good, parts, out=np.ones(run.shape), where=parts > 0)
+        oee = np.round(availability * performance * quality * 100.0, 1)
+        return self.timestamps[:n:per], oee
+
+    def stops_of(self, machine_index: int) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """(start_step, end_step, reason_code) остановок станка, по времени."""
+        lo, hi = np.searchsorted(self.stop_machine, [machine_index, machine_index + 1])
+        return self.stop_start[lo:hi], self.stop_end[lo:hi], self.stop_reason[lo:hi]
+
+    def step_to_datetime(self, step: int) -> datetime:
+        return self.shift_start + timedelta(seconds=int(step) * self.spec.step_sec)
+
+    # ------------------------------------------------------------------ поток
+
+    def batch(self, step: int, k: int = 1) -> FleetBatch:
+        stop = min(step + k, self.n_steps)
+        return FleetBatch(
+            step=step,
+            timestamps=self.timestamps[step:stop],
+            state=self.state[:, step:stop],
+            parts=self.parts[:, step:stop],
+            good=self.good[:, step:stop],
+            telemetry=self.telemetry[:, step:stop],
+        )
+
+    def iter_batches(self, start: int = 0, end: Optional[int] = None, batch_steps: int = 1) -> Iterator[FleetBatch]:
+        end = self.n_steps if end is None else min(end, self.n_steps)
+        for step in range(start, end, batch_steps):
+            yield self.batch(step, min(batch_steps, end - step))
+
+    def stream(
+        self,
+        sink: Callable[[FleetBatch], None],
+        speed: float = 1.0,
+        start: int = 0,
+        end: Optional[int] = None,
+        batch_steps: int = 1,
+    ) -> int:
+        """
+        Проигрывает смену в sink (любой ingest: провайдер, очередь, сокет).
+        speed=1 — реальное время, speed=60 — минута за секунду, speed<=0 — без пауз.
+        Возвращает число отправленных пачек.
+        """
+        period = self.spec.step_sec * batch_steps / speed if speed > 0 else 0.0
+        t0 = _time.monotonic()
+        sent = 0
+        for batch in self.iter_batches(start, end, batch_steps):
+            if period:
+                # расписание от t0, чтобы задержка sink не накапливалась
+                delay = t0 + sent * period - _time.monotonic()
+                if delay > 0:
+                    _time.sleep(delay)
+            sink(batch)
+            sent += 1
+        return sent
+
+
+def main() -> None:
+    import argparse
+
+    p = argparse.ArgumentParser(description="Fleet simulator: генерация и прогон смены")
+    p.add_argument("--machines", type=int, default=1000)
+    p.add_argument("--seed", type=int, default=0)
+    p.add_argument("--speed", type=float, default=0.0, help="0 — без пауз")
+    p.add_argument("--batch-steps", type=int, default=1)
+    args = p.parse_args()
+
+    t0 = _time.perf_counter()
+    sim = FleetSimulator(FleetSpec(n_machines=args.machines, seed=args.seed))
+    _ = sim.telemetry
+    t1 = _time.perf_counter()
+    samples = sim.spec.n_machines * sim.n_steps
+    print(f"generated {args.machines} machines x {sim.n_steps} steps in {t1 - t0:.2f}s "
+          f"({samples / (t1 - t0):,.0f} machine-steps/s), stops={len(sim.stop_start)}")
+
+    sent = sim.stream(lambda b: None, speed=args.speed, batch_steps=args.batch_steps)
+    t2 = _time.perf_counter()
+    print(f"streamed {sent} batches in {t2 - t1:.2f}s ({samples / max(t2 - t1, 1e-9):,.0f} machine-steps/s)")
+
+
+if __name__ == "__main__":
+    main()
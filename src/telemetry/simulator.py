@@ -3,11 +3,17 @@ from __future__ import annotations
 
 from dataclasses import dataclass
 from datetime import datetime, timedelta
-from typing import Dict, Tuple
+from typing import TYPE_CHECKING, Dict, Tuple
 
 import numpy as np
 import pandas as pd
 
+from .fleet import stable_seed
+from ..observability.metrics import timed
+
+if TYPE_CHECKING:
+    from .thresholds import ThresholdTable
+
 
 @dataclass(frozen=True)
 class TelemetryThresholds:
@@ -18,12 +24,22 @@ class TelemetryThresholds:
     current_warn: float = 0.85      # доля от номинала (0..1)
     current_alarm: float = 0.95
 
+    # в порядке ALARM_CHANNELS — так же выглядит ThresholdTable (по строке на станок)
+    @property
+    def warn(self) -> np.ndarray:
+        return np.array([self.vibration_warn, self.temp_warn, self.current_warn])
+
+    @property
+    def alarm(self) -> np.ndarray:
+        return np.array([self.vibration_alarm, self.temp_alarm, self.current_alarm])
+
 
 def _seed_from(machine_id: str, level: str) -> int:
-    # стабильная “случайность” по станку и уровню
-    return abs(hash((machine_id, level))) % (2**32)
+    # стабильная “случайность” по станку и уровню (hash() солится в каждом процессе)
+    return stable_seed(machine_id, level)
 
 
+@timed("telemetry.generate")
 def generate_telemetry_df(
     machine_id: str,
     level: str,
@@ -101,6 +117,7 @@ def generate_telemetry_df(
     return df
 
 
+@timed("telemetry.alarms")
 def compute_alarms(df: pd.DataFrame, thr: TelemetryThresholds) -> Dict[str, str]:
     """
     Возвращает статусы по каналам: ok / warn / alarm.
@@ -130,3 +147,15 @@ def summarize_telemetry(df: pd.DataFrame) -> Dict[str, float]:
         "temp_max": float(df["bearing_temp_c"].max()),
         "current_max": float(df["motor_current_pu"].max()),
     }
+
+
+@timed("telemetry.alarms_fleet")
+def compute_alarms_many(values: np.ndarray, thr: "TelemetryThresholds | ThresholdTable") -> np.ndarray:
+    """
+    То же, что compute_alarms, но сразу для всего парка.
+    values: (M, 3) последние значения в порядке vibration/temp/current (NaN — нет данных).
+    thr: общие пороги или ThresholdTable (свои пороги у каждого станка, строки — как в values).
+    Возвращает (M, 3) int8 — индексы в tables.ALARM_LEVELS.
+    """
+    with np.errstate(invalid="ignore"):
+        return ((values >= thr.warn).astype(np.int8) + (values >= thr.alarm).astype(np.int8))
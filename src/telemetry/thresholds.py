@@ -0,0 +1,161 @@
+"""
+Профили порогов телеметрии из YAML-конфига:
+
+    thresholds:
+      default: {vibration_warn: 8.0, vibration_alarm: 11.0}
+      kinds:
+        Токарный ЧПУ: {vibration_warn: 7.0, vibration_alarm: 9.5}
+      machines:
+        CNC-MILL-1: {temp_warn: 78.0}
+
+Слои: TelemetryThresholds() <- default <- kinds[kind] <- machines[machine_id];
+в каждом слое достаточно указать только отличающиеся поля. Для парка профиль
+компилируется в плотные массивы (станки × каналы) — их compute_alarms_many
+индексирует напрямую. ThresholdWatcher получает новые пороги по подписке на
+изменения конфига (config_loader.ConfigStore).
+"""
+from __future__ import annotations
+
+import logging
+from collections.abc import Mapping
+from dataclasses import dataclass, field, fields, replace
+from typing import Any, Dict, Optional, Sequence, Tuple
+
+import numpy as np
+
+from .simulator import TelemetryThresholds
+
+log = logging.getLogger(__name__)
+
+_FIELDS = tuple(f.name for f in fields(TelemetryThresholds))
+# (warn, alarm) по каналам в порядке ALARM_CHANNELS
+_PAIRS = (("vibration_warn", "vibration_alarm"), ("temp_warn", "temp_alarm"), ("current_warn", "current_alarm"))
+
+
+def _layer(raw: Any, where: str) -> Dict[str, float]:
+    """Частичный набор порогов: проверка имён и типов (опечатка — ошибка при загрузке, а не тихий дефолт)."""
+    if raw is None:
+        return {}
+    if not isinstance(raw, Mapping):
+        raise ValueError(f"thresholds.{where}: expected a mapping, got {type(raw).__name__}")
+    unknown = sorted(set(raw) - set(_FIELDS))
+    if unknown:
+        raise ValueError(f"thresholds.{where}: unknown fields {unknown}; allowed: {list(_FIELDS)}")
+    try:
+        return {k: float(v) for k, v in raw.items()}
+    except (TypeError, ValueError):
+        raise ValueError(f"thresholds.{where}: values must be numbers") from None
+
+
+def _checked(thr: TelemetryThresholds, where: str) -> TelemetryThresholds:
+    for warn, alarm in _PAIRS:
+        if getattr(thr, warn) > getattr(thr, alarm):
+            raise ValueError(f"thresholds.{where}: {warn} must not exceed {alarm}")
+    return thr
+
+
+@dataclass(frozen=True)
+class ThresholdTable:
+    """Скомпилированные пороги парка: warn/alarm (M, 3) в порядке ALARM_CHANNELS."""
+
+    machine_ids: Tuple[str, ...]
+    warn: np.ndarray
+    alarm: np.ndarray
+
+    def row(self, machine_id: str) -> TelemetryThresholds:
+        i = self.machine_ids.index(machine_id)
+        values = {}
+        for c, (warn, alarm) in enumerate(_PAIRS):
+            values[warn] = float(self.warn[i, c])
+            values[alarm] = float(self.alarm[i, c])
+        return TelemetryThresholds(**values)
+
+
+@dataclass(frozen=True)
+class ThresholdProfiles:
+    default: TelemetryThresholds = TelemetryThresholds()
+    kinds: Dict[str, TelemetryThresholds] = field(default_factory=dict)
+    machines: Dict[str, Dict[str, float]] = field(default_factory=dict)  # частичные переопределения
+
+    @classmethod
+    def from_config(cls, cfg: Optional[Mapping[str, Any]]) -> "ThresholdProfiles":
+        """Из словаря конфига приложения (секция thresholds; её может и не быть)."""
+        raw = (cfg or {}).get("thresholds") or {}
+        if not isinstance(raw, Mapping):
+            raise ValueError("thresholds: expected a mapping")
+        unknown = sorted(set(raw) - {"default", "kinds", "machines"})
+        if unknown:
+            raise ValueError(f"thresholds: unknown sections {unknown}; allowed: default, kinds, machines")
+        default = _checked(replace(TelemetryThresholds(), **_layer(raw.get("default"), "default")), "default")
+        kinds = {
+            str(kind): _checked(replace(default, **_layer(layer, f"kinds.{kind}")), f"kinds.{kind}")
+            for kind, layer in (raw.get("kinds") or {}).items()
+        }
+        machines = {str(mid): _layer(layer, f"machines.{mid}") for mid, layer in (raw.get("machines") or {}).items()}
+        # вид станка при загрузке неизвестен: переопределение должно давать warn <= alarm с любым базовым профилем,
+        # иначе ошибка всплыла бы только в resolve()/compile() — на каждом цикле сервиса и отрисовке
+        for mid, override in machines.items():
+            for base in (default, *kinds.values()):
+                _checked(replace(base, **override), f"machines.{mid}")
+        return cls(default=default, kinds=kinds, machines=machines)
+
+    def resolve(self, machine_id: str, kind: Optional[str] = None) -> TelemetryThresholds:
+        """Пороги одного станка (для панели телеметрии и подсказки AI)."""
+        base = self.kinds.get(kind, self.default) if kind is not None else self.default
+        override = self.machines.get(machine_id)
+        return _checked(replace(base, **override), f"machines.{machine_id}") if override else base
+
+    def compile(self, machine_ids: Sequence[str], kinds: Sequence[Optional[str]]) -> ThresholdTable:
+        """Плотные массивы (M, 3): строка профиля вида + точечные переопределения станков."""
+        profiles = [self.default] + list(self.kinds.values())
+        code = {kind: i + 1 for i, kind in enumerate(self.kinds)}
+        matrix = np.array([[[getattr(p, w), getattr(p, a)] for w, a in _PAIRS] for p in profiles])  # (P, 3, 2)
+        rows = matrix[np.array([code.get(k, 0) for k in kinds], dtype=np.intp)]
+        if self.machines:
+            for i, mid in enumerate(machine_ids):
+                if mid in self.machines:
+                    thr = self.resolve(mid, kinds[i])
+                    rows[i] = [[getattr(thr, w), getattr(thr, a)] for w, a in _PAIRS]
+        return ThresholdTable(tuple(machine_ids), np.ascontiguousarray(rows[..., 0]), np.ascontiguousarray(rows[..., 1]))
+
+
+class ThresholdWatcher:
+    """
+    Профили порогов из конфига с горячей перезагрузкой: подписка на общий
+    ConfigStore файла, перекомпиляция — только когда пришёл новый снимок.
+    """
+
+    def __init__(self, config_path: str):
+        from ..config_loader import config_store
+
+        self.path = config_path
+        self.version = 0
+        self._store = config_store(config_path)
+        self._profiles = ThresholdProfiles()
+        self._table: Optional[Tuple[Tuple[Any, ...], ThresholdTable]] = None
+        self._on_config(self._store.current())
+        self._store.subscribe(self._on_config)
+
+    def _on_config(self, snapshot: Mapping[str, Any]) -> None:
+        profiles = ThresholdProfiles.from_config(snapshot)  # уже проверено схемой конфига
+        if self.version and profiles == self._profiles:
+            return
+        self._profiles = profiles
+        self._table = None
+        self.version += 1
+        if self.version > 1:
+            log.info("Thresholds reloaded from %s (v%d)", self.path, self.version)
+
+    def profiles(self) -> ThresholdProfiles:
+        self._store.current()  # проверка mtime (не чаще check_seconds) и оповещение
+        return self._profiles
+
+    def table(self, machine_ids: Sequence[str], kinds: Sequence[Optional[str]]) -> ThresholdTable:
+        """Скомпилированные пороги парка; пересчёт — только при смене порогов или состава парка."""
+        self.profiles()
+        key = (self.version, tuple(machine_ids), tuple(kinds))
+        cached = self._table
+        if cached is None or cached[0] != key:
+            cached = (key, self._profiles.compile(machine_ids, kinds))
+            self._table = cached
+        return cached[1]
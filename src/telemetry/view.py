@@ -0,0 +1,180 @@
+"""
+Представление телеметрии станка с учётом отсечки (IDLE/DOWN): валидны строки
+кадра до границы end, после неё датчики считаются отключёнными. Кадр провайдера
+не копируется и не заполняется NA — граница хранится индексом строки.
+
+Сводка (статусы alarm/warn/ok, last, max) и признаки окна считаются один раз на
+версию данных (отпечаток индекса и значений кадра) и общие для панели телеметрии (src/ui.py) и подсказки модели (app.py).
+
+    view = telemetry_view(machine, df, stops)
+    if view.has_data:
+        s = telemetry_summary(view, thresholds)    # s.alarms, s.last, s.max
+"""
+from __future__ import annotations
+
+import hashlib
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, Hashable, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+from ..models import MachineOverview, StopEvent
+from ..observability.metrics import timed
+from ..tables import ALARM_CHANNELS, ALARM_LEVELS
+from .features import extract_features
+from .fleet import CHANNELS
+from .simulator import TelemetryThresholds, compute_alarms_many
+
+
+def telemetry_cutoff(machine: MachineOverview, stops: Optional[List[StopEvent]]) -> Optional[pd.Timestamp]:
+    """Момент обрыва телеметрии при IDLE/DOWN (None — обрыва нет)."""
+    state = getattr(machine, "state", "RUN")
+    cutoff_ts = None
+    if state == "DOWN" and getattr(machine, "down_start_ts", None):
+        cutoff_ts = pd.to_datetime(machine.down_start_ts)
+
+    if state == "IDLE" and stops:
+        open_stop = next((s for s in stops if getattr(s, "end", None) is None), None)
+        if open_stop:
+            cutoff_ts = pd.to_datetime(open_stop.start)
+        else:
+            last_stop = max(stops, key=lambda s: s.start, default=None)
+            if last_stop:
+                cutoff_ts = pd.to_datetime(last_stop.start)
+    return cutoff_ts
+
+
+class _LruCache:
+    """Маленький LRU на процесс (сессии Streamlit — потоки, поэтому под замком)."""
+
+    def __init__(self, maxsize: int = 512):
+        self.maxsize = maxsize
+        self._data: "OrderedDict[Hashable, Any]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get_or_compute(self, key: Hashable, compute: Callable[[], Any]) -> Any:
+        with self._lock:
+            if key in self._data:
+                self._data.move_to_end(key)
+                return self._data[key]
+        value = compute()  # вне замка: параллельный расчёт того же ключа безвреден
+        with self._lock:
+            self._data[key] = value
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+        return value
+
+    def clear(self) -> None:
+        with self._lock:
+            self._data.clear()
+
+
+_CACHE = _LruCache()
+
+
+def clear_cache() -> None:
+    """Сбросить кэш представлений и сводок (замеры, тесты)."""
+    _CACHE.clear()
+
+
+@dataclass(frozen=True)
+class TelemetryView:
+    machine_id: str
+    state: str
+    frame: pd.DataFrame                  # кадр провайдера как есть
+    values: Tuple[np.ndarray, ...]       # каналы в порядке CHANNELS — массивы кадра, без копии
+    end: int                             # валидны строки [0, end)
+    cutoff_ts: Optional[pd.Timestamp]
+    has_data: bool                       # есть хоть одно значение до отсечки
+    digest: bytes = b""                  # отпечаток индекса и значений кадра
+
+    @property
+    def version(self) -> Tuple[Any, ...]:
+        """Версия данных: станок, отпечаток содержимого кадра и отсечка."""
+        return (self.machine_id, self.digest, self.end)
+
+    @property
+    def truncated(self) -> bool:
+        return self.end < len(self.frame)
+
+    @property
+    def valid(self) -> pd.DataFrame:
+        """Строки до отсечки — срез, без копии значений."""
+        return self.frame if not self.truncated else self.frame.iloc[: self.end]
+
+    def chart_frame(self, column: str) -> pd.DataFrame:
+        """Канал для графика: после отсечки — разрыв (NaN) до конца окна."""
+        if not self.truncated:
+            return self.frame[[column]]
+        return self.valid[[column]].reindex(self.frame.index)
+
+
+@dataclass(frozen=True)
+class TelemetrySummary:
+    alarms: Dict[str, str]                 # vibration / temperature / current -> ok / warn / alarm
+    last: Dict[str, Optional[float]]       # по CHANNELS; None — датчик сейчас не отдаёт данных
+    max: Dict[str, Optional[float]]        # максимум до отсечки
+
+
+def _digest(index: pd.Index, values: Tuple[np.ndarray, ...]) -> bytes:
+    """
+    Отпечаток содержимого кадра. Форма и границы окна не годятся в ключ: кадр того же
+    окна может прийти от другого провайдера (перечитан конфиг) или из демо-симулятора сессии.
+    """
+    h = hashlib.blake2b(digest_size=16)
+    stamps = getattr(index, "asi8", None)
+    h.update(np.ascontiguousarray(stamps if stamps is not None else pd.util.hash_pandas_object(index).to_numpy()))
+    for v in values:
+        h.update(np.ascontiguousarray(v))
+    return h.digest()
+
+
+def _boundary(frame: pd.DataFrame, values: Tuple[np.ndarray, ...],
+              cutoff_ts: Optional[pd.Timestamp]) -> Tuple[int, bool]:
+    end = len(frame) if cutoff_ts is None else int(frame.index.searchsorted(cutoff_ts, side="left"))
+    return end, end > 0 and any(bool(np.isfinite(v[:end]).any()) for v in values)
+
+
+def telemetry_view(machine: MachineOverview, frame: pd.DataFrame,
+                   stops: Optional[List[StopEvent]] = None) -> TelemetryView:
+    """Граница валидных данных — один расчёт на содержимое кадра и отсечку."""
+    cutoff_ts = telemetry_cutoff(machine, stops)
+    # по колонке: для float64 без NA to_numpy отдаёт массив кадра, выборка frame[[...]] — копию
+    values = tuple(frame[ch].to_numpy(dtype=np.float64, na_value=np.nan) for ch in CHANNELS)
+    digest = _digest(frame.index, values)
+    end, has_data = _CACHE.get_or_compute(("view", machine.machine_id, digest, cutoff_ts),
+                                          lambda: _boundary(frame, values, cutoff_ts))
+    return TelemetryView(machine.machine_id, getattr(machine, "state", "RUN"), frame, values, end, cutoff_ts,
+                         has_data, digest)
+
+
+def _float(x: float) -> Optional[float]:
+    return None if np.isnan(x) else float(x)
+
+
+@timed("telemetry.summary")
+def _summarize(view: TelemetryView, thr: TelemetryThresholds) -> TelemetrySummary:
+    end = view.end
+    # после отсечки датчик молчит: текущего значения нет (как и в момент, когда станок стоит)
+    last = np.array([np.nan if view.truncated or not end else v[end - 1] for v in view.values])
+    # fmax пропускает NaN; канал целиком из NaN даёт NaN
+    peak = np.array([np.fmax.reduce(v[:end]) if end else np.nan for v in view.values])
+    codes = compute_alarms_many(last[None, :], thr)[0]
+    return TelemetrySummary(
+        alarms={ch: ALARM_LEVELS[c] for ch, c in zip(ALARM_CHANNELS, codes)},
+        last={ch: _float(v) for ch, v in zip(CHANNELS, last)},
+        max={ch: _float(v) for ch, v in zip(CHANNELS, peak)},
+    )
+
+
+def telemetry_summary(view: TelemetryView, thr: TelemetryThresholds) -> TelemetrySummary:
+    """Статусы и last/max — общие для UI и подсказки модели (кэш по версии данных и порогам)."""
+    return _CACHE.get_or_compute(("summary", *view.version, thr), lambda: _summarize(view, thr))
+
+
+def telemetry_features(view: TelemetryView, thr: TelemetryThresholds) -> Dict[str, Any]:
+    """Признаки окна до отсечки (src/telemetry/features.py), тот же кэш."""
+    return _CACHE.get_or_compute(("features", *view.version, thr), lambda: extract_features(view.valid, thr))
@@ -1,22 +1,32 @@
 from __future__ import annotations
 
-from datetime import datetime
+from dataclasses import asdict
 from pathlib import Path
 from typing import Any, Dict, List, Optional, Union
+from uuid import uuid4
 
+import numpy as np
 import pandas as pd
 import streamlit as st
+import streamlit.components.v1 as components
 
+from .hierarchy import HierarchyRollup
+from .mnemo import MnemoLayout, diff_tiles, svg_template, tile_state
 from .models import MachineOverview, StopEvent
-from .telemetry.simulator import (
-    TelemetryThresholds,
-    compute_alarms,
-    generate_telemetry_df,
-    summarize_telemetry,
-)
+from .observability.metrics import span, timed
+from .tables import STOP_REASONS, StopTable
+from .telemetry.anomaly import detect_anomalies
+from .telemetry.thresholds import ThresholdProfiles
+from .telemetry.simulator import TelemetryThresholds, generate_telemetry_df
+from .telemetry.view import TelemetryView, telemetry_summary, telemetry_view
 
 BASE_DIR = Path(__file__).resolve().parents[1]
 
+# один iframe на всю мнемосхему; фронтенд — статический HTML без сборки
+_mnemo_component = components.declare_component(
+    "mnemo", path=str(Path(__file__).resolve().parent / "components" / "mnemo")
+)
+
 COLOR = {
     "RUN": "#2ecc71",
     "IDLE": "#95a5a6",
@@ -37,12 +47,6 @@ REASON_LABEL = {
     "REPAIR": "Ремонт",
 }
 
-SVG_MAP = {
-    "Фрезерный ЧПУ": "cnc_mill.svg",
-    "Токарный ЧПУ": "cnc_lathe.svg",
-    "Крой металла": "cnc_cut.svg",
-}
-
 
 def tooltip_text(m: MachineOverview) -> str:
     header = f"[{m.name} {m.machine_id}]"
@@ -72,42 +76,106 @@ def tooltip_text(m: MachineOverview) -> str:
 
 
 def load_svg(kind: str, color: str) -> str:
-    svg_file = BASE_DIR / "assets" / "silhouettes" / SVG_MAP[kind]
-    svg = svg_file.read_text(encoding="utf-8")
-    return svg.replace("CURRENT_COLOR", color)
-
-
-def render_mnemo_selectable(machines: List[MachineOverview], selected_id: Optional[str]) -> str:
-    cols = st.columns(len(machines))
-    new_selected = selected_id
-
-    for col, m in zip(cols, machines):
-        with col:
-            svg = load_svg(m.kind, COLOR[m.state])
-            tooltip = tooltip_text(m).replace("\n", "&#10;")
-
-            is_selected = (m.machine_id == selected_id)
-            border = "2px solid #4da3ff" if is_selected else "1px solid rgba(255,255,255,0.15)"
-
-            html = f"""
-            <div title="{tooltip}" style="text-align:center; padding:8px; border:{border}; border-radius:14px;">
-              {svg}
-              <div style="font-weight:600; margin-top:6px;">{m.name}</div>
-              <div style="font-size:12px; opacity:0.8;">{m.machine_id}</div>
-            </div>
-            """
-            st.components.v1.html(html, height=190)
-
-            if st.button("Выбрать", key=f"select_{m.machine_id}", use_container_width=True):
-                new_selected = m.machine_id
-
-    return new_selected
-
-
+    return svg_template(kind).replace("CURRENT_COLOR", color)
+
+
+@timed("ui.mnemo")
+def render_mnemo_selectable(
+    machines: List[MachineOverview],
+    selected_id: Optional[str],
+    layout: Optional[MnemoLayout] = None,
+    alarms: Optional[Dict[str, str]] = None,
+    key: str = "mnemo",
+) -> str:
+    """
+    Мнемосхема одним компонентом. Силуэты и раскладка отправляются в iframe
+    один раз, на каждом rerun — только изменившиеся плитки (state/OEE/alarm).
+    alarms: machine_id -> ok/warn/alarm (необязательно).
+    """
+    layout = layout or MnemoLayout()
+    alarms = alarms or {}
+    tiles = {m.machine_id: tile_state(m, tooltip_text(m), alarms.get(m.machine_id)) for m in machines}
+    groups = layout.arrange(machines)
+    signature = (layout, tuple(tiles))
+
+    sync_key = f"{key}::sync"
+    sync = st.session_state.get(sync_key)
+    value = st.session_state.get(key) or {}
+    resync = value.get("resync")
+
+    if sync is None or sync["signature"] != signature or (resync is not None and resync != sync["resync"]):
+        sync = {"epoch": uuid4().hex, "seq": 0, "signature": signature, "resync": resync, "tiles": tiles}
+        args = {
+            "full": True,
+            "epoch": sync["epoch"],
+            "seq": 0,
+            "templates": {
+                kind: svg_template(kind).replace("CURRENT_COLOR", "currentColor")
+                for kind in {m.kind for m in machines}
+            },
+            "colors": COLOR,
+            "layout": {"columns": layout.columns, "tile_height": layout.tile_height, "groups": groups},
+            "machines": {m.machine_id: {"name": m.name, "kind": m.kind} for m in machines},
+            "delta": tiles,
+        }
+    else:
+        sync["seq"] += 1
+        args = {
+            "full": False,
+            "epoch": sync["epoch"],
+            "seq": sync["seq"],
+            "delta": diff_tiles(sync["tiles"], tiles),
+        }
+        sync["tiles"] = tiles
+    st.session_state[sync_key] = sync
+
+    value = _mnemo_component(**args, selected=selected_id, key=key, default=None) or {}
+    return value.get("selected") or selected_id
+
+
+def _set_scope(key: str, node_id: str) -> None:
+    st.session_state[key] = node_id
+
+
+def render_hierarchy_nav(rollup: HierarchyRollup, key: str = "mnemo_scope") -> str:
+    """
+    Навигация завод -> цех -> линия над мнемосхемой: «крошки» пути и карточки
+    дочерних узлов со сводкой (OEE, остановки, тревоги, потери). Возвращает id
+    выбранного узла; мнемосхема показывает станки его поддерева.
+    """
+    tree = rollup.tree
+    scope = st.session_state.get(key)
+    if scope not in tree.nodes or tree.node(scope).level == "machine":
+        scope = tree.root
+        st.session_state[key] = scope
+
+    path = tree.path(scope)
+    crumbs = st.columns(len(path) + 1)
+    for col, node in zip(crumbs, path):
+        col.button(node.title, key=f"{key}::crumb::{node.id}", disabled=node.id == scope,
+                   on_click=_set_scope, args=(key, node.id), use_container_width=True)
+    s = rollup.summary(scope)
+    oee = "—" if s["oee_percent"] is None else f"{s['oee_percent']:.1f}%"
+    crumbs[-1].caption(f"OEE {oee} • стоят {s['stopped']}/{s['machines']} • {_badge(s['worst_alarm'])}")
+
+    children = [c for c in tree.children(scope) if c.level != "machine"]
+    for start in range(0, len(children), 6):
+        cols = st.columns(6)
+        for col, node in zip(cols, children[start:start + 6]):
+            c = rollup.summary(node.id)
+            col.metric(node.title, "—" if c["oee_percent"] is None else f"{c['oee_percent']:.1f}%",
+                       help=f"OEE, взвешенный по плановому времени; станков: {c['machines']}")
+            col.caption(f"{_badge(c['worst_alarm'])} • стоят {c['stopped']} • потери {c['loss']:,.0f}")
+            col.button("Открыть", key=f"{key}::open::{node.id}", on_click=_set_scope, args=(key, node.id),
+                       use_container_width=True)
+    return scope
+
+
+@timed("ui.machine_panel")
 def render_machine_panel(
     machine: MachineOverview,
     df_oee: Union[pd.DataFrame, Dict[str, Any], List[Dict[str, Any]]],
-    stops: List[StopEvent],
+    stops: Union[List[StopEvent], StopTable],
 ) -> None:
     st.subheader("Карточка оборудования")
     st.code(tooltip_text(machine), language="text")
@@ -139,31 +207,19 @@ def render_machine_panel(
         st.line_chart(df_oee[[oee_col]])
 
     st.subheader("Остановки")
-    if stops:
+    table = stops if isinstance(stops, StopTable) else StopTable.from_events(stops or [])
+    if len(table):
         # последние сверху
-        stops_sorted = sorted(stops, key=lambda s: s.start, reverse=True)
-
-        rows = []
-        for s in stops_sorted:
-            end_ts = getattr(s, "end", None)
-            end_str = end_ts.strftime("%H:%M") if end_ts else "—"
-
-            if getattr(s, "duration_min", None) is not None:
-                dur = s.duration_min
-            else:
-                end_for_calc = end_ts or datetime.now()
-                dur = int((end_for_calc - s.start).total_seconds() // 60)
-
-            rows.append(
-                {
-                    "Начало": s.start.strftime("%H:%M"),
-                    "Конец": end_str,
-                    "Длительность, мин": dur,
-                    "Причина": REASON_LABEL.get(s.reason, s.reason),
-                    "Комментарий": getattr(s, "note", "") or "",
-                }
-            )
-
+        table = table.latest()
+        reasons = np.array([REASON_LABEL.get(r, r) for r in STOP_REASONS], dtype=object)
+        notes = np.array(list(table.notes) + [""], dtype=object)  # код -1 -> ""
+        rows = {
+            "Начало": pd.DatetimeIndex(table.start).strftime("%H:%M"),
+            "Конец": pd.DatetimeIndex(table.end).strftime("%H:%M"),
+            "Длительность, мин": table.duration_min,
+            "Причина": reasons[table.reason],
+            "Комментарий": notes[table.note],
+        }
         st.dataframe(pd.DataFrame(rows), use_container_width=True, hide_index=True)
     else:
         st.caption("Остановок за смену не зарегистрировано.")
@@ -269,57 +325,60 @@ def _render_estop(has_alarm: bool, has_warn: bool, hint: str) -> None:
     )
 
 
-def render_telemetry_panel(
-    machine: MachineOverview,
-    cfg: dict,
-    stops: Optional[List[StopEvent]] = None,
-) -> None:
-    st.subheader("Датчики / PLC (DEMO)")
+@timed("telemetry.load")
+def get_telemetry_df(machine: MachineOverview, cfg: dict, provider: Any = None) -> pd.DataFrame:
+    """
+    Телеметрия станка: от провайдера (живая, сдвигается со временем),
+    иначе — демо-симулятор, закэшированный в сессии, чтобы не "скакало".
+    """
+    df = provider.get_telemetry(machine.machine_id) if provider is not None else None
+    if df is not None:
+        return df
 
     level = cfg.get("level", "BASIC")
     state = getattr(machine, "state", "RUN")
-
-    # кэш, чтобы не "скакало"
     cache_key = f"telemetry::{level}::{machine.machine_id}::{state}"
     if cache_key not in st.session_state:
-        df = generate_telemetry_df(machine.machine_id, level=level, state=state, minutes=240, step_sec=30)
-        st.session_state[cache_key] = df
-    else:
-        df = st.session_state[cache_key]
+        st.session_state[cache_key] = generate_telemetry_df(
+            machine.machine_id, level=level, state=state, minutes=240, step_sec=30
+        )
+    return st.session_state[cache_key]
 
-    # --- cutoff: обрыв телеметрии при IDLE/DOWN ---
-    cutoff_ts = None
-    if state == "DOWN" and getattr(machine, "down_start_ts", None):
-        cutoff_ts = pd.to_datetime(machine.down_start_ts)
 
-    if state == "IDLE" and stops:
-        open_stop = next((s for s in stops if getattr(s, "end", None) is None), None)
-        if open_stop:
-            cutoff_ts = pd.to_datetime(open_stop.start)
-        else:
-            last_stop = max(stops, key=lambda s: s.start, default=None)
-            if last_stop:
-                cutoff_ts = pd.to_datetime(last_stop.start)
+@timed("ui.telemetry_panel")
+def render_telemetry_panel(
+    machine: MachineOverview,
+    cfg: dict,
+    stops: Optional[List[StopEvent]] = None,
+    df: Optional[pd.DataFrame] = None,
+    thresholds: Optional[TelemetryThresholds] = None,
+    view: Optional[TelemetryView] = None,
+) -> None:
+    st.subheader("Датчики / PLC (DEMO)")
 
-    if cutoff_ts is not None:
-        df = df.copy()
-        df.loc[df.index >= cutoff_ts, ["vibration_mm_s", "bearing_temp_c", "motor_current_pu"]] = pd.NA
+    state = getattr(machine, "state", "RUN")
+    # cutoff (обрыв телеметрии при IDLE/DOWN) — граница в общем представлении, без копии кадра
+    if view is None:
+        view = telemetry_view(machine, df if df is not None else get_telemetry_df(machine, cfg), stops)
+    cutoff_ts = view.cutoff_ts
 
     # если данных нет — показываем и выходим
-    if df[["vibration_mm_s", "bearing_temp_c", "motor_current_pu"]].dropna(how="all").empty:
+    if not view.has_data:
         if state == "DOWN":
             st.warning("Оборудование в ремонте/ТО. Датчики отключены — телеметрия недоступна.")
         else:
             st.info("Нет телеметрии за период (нет связи/данных).")
         return
 
-    thr = TelemetryThresholds()
-    alarms = compute_alarms(df, thr)
-    summary = summarize_telemetry(df)
+    # пороги станка: профиль вида + переопределения по machine_id (секция thresholds конфига)
+    thr = thresholds or ThresholdProfiles.from_config(cfg).resolve(machine.machine_id, machine.kind)
+    summary = telemetry_summary(view, thr)
+    alarms = summary.alarms
+    anomalies = detect_anomalies(view.valid, machine.machine_id)
 
     # --- E-STOP индикатор ---
     has_alarm = any(v == "alarm" for v in alarms.values())
-    has_warn = any(v == "warn" for v in alarms.values())
+    has_warn = any(v == "warn" for v in alarms.values()) or any(a.end is None for a in anomalies)
 
     hint = f"Станок: {machine.machine_id} • Состояние: {STATE_LABEL.get(state, state)}"
     if cutoff_ts is not None:
@@ -331,25 +390,36 @@ def render_telemetry_panel(
         return "—" if pd.isna(x) else fmt_str.format(x)
 
     c1, c2, c3 = st.columns(3)
-    c1.metric("Вибрация, мм/с", fmt(summary["vibration_last"], "{:.2f}"), _badge(alarms["vibration"]))
-    c2.metric("Температура, °C", fmt(summary["temp_last"], "{:.1f}"), _badge(alarms["temperature"]))
-    c3.metric("Ток, pu", fmt(summary["current_last"], "{:.2f}"), _badge(alarms["current"]))
+    c1.metric("Вибрация, мм/с", fmt(summary.last["vibration_mm_s"], "{:.2f}"), _badge(alarms["vibration"]))
+    c2.metric("Температура, °C", fmt(summary.last["bearing_temp_c"], "{:.1f}"), _badge(alarms["temperature"]))
+    c3.metric("Ток, pu", fmt(summary.last["motor_current_pu"], "{:.2f}"), _badge(alarms["current"]))
 
     st.caption("Сигналы симулируются. В ADVANCED больше аномалий для демонстрации диагностики.")
 
-    st.line_chart(df[["vibration_mm_s"]], height=160)
-    st.line_chart(df[["bearing_temp_c"]], height=160)
-    st.line_chart(df[["motor_current_pu"]], height=160)
-
-    with st.expander("Пороги (для демонстрации)"):
-        st.write(
-            {
-                "vibration_warn": thr.vibration_warn,
-                "vibration_alarm": thr.vibration_alarm,
-                "temp_warn": thr.temp_warn,
-                "temp_alarm": thr.temp_alarm,
-                "current_warn": thr.current_warn,
-                "current_alarm": thr.current_alarm,
-            }
-        )
+    with span("ui.telemetry_charts"):
+        st.line_chart(view.chart_frame("vibration_mm_s"), height=160)
+        st.line_chart(view.chart_frame("bearing_temp_c"), height=160)
+        st.line_chart(view.chart_frame("motor_current_pu"), height=160)
+
+    with st.expander(f"Аномалии относительно нормы станка ({len(anomalies)})"):
+        if anomalies:
+            st.dataframe(
+                pd.DataFrame(
+                    {
+                        "Начало": [a.start.strftime("%H:%M") for a in anomalies],
+                        "Конец": ["идёт" if a.end is None else a.end.strftime("%H:%M") for a in anomalies],
+                        "Канал": [a.channel for a in anomalies],
+                        "Детекторы": [", ".join(a.detectors) for a in anomalies],
+                        "Пик": [a.peak_value for a in anomalies],
+                        "Оценка": [a.peak_score for a in anomalies],
+                    }
+                ),
+                use_container_width=True,
+                hide_index=True,
+            )
+        else:
+            st.caption("Отклонений от выученной нормы нет.")
+
+    with st.expander(f"Пороги ({machine.kind})"):
+        st.write(asdict(thr))
 